@@ -23,13 +23,14 @@ except ImportError:
     pass  # dotenv is optional
 
 # Import routers from route modules
-from routes import health, climate, accessibility, routing, users, carbon_intensity, hazards, education, maps, assistant
+from routes import health, climate, accessibility, routing, users, carbon_intensity, hazards, education, maps, assistant, notifications, scenarios, realtime
 
 # Import services for controller logic
 from services.chat_service import ChatService
 from services.transit_service import TransitService
 from services.vision_service import VisionService
 from services.climate_service import ClimateEngine
+from services.maps_service import get_walking_router
 
 
 
@@ -84,6 +85,18 @@ app.include_router(maps.router)
 
 app.include_router(assistant.router)
 
+app.include_router(notifications.router)
+
+app.include_router(scenarios.router)
+
+app.include_router(realtime.router)
+
+
+# Load the walking graph and its contraction hierarchies before serving, not in the first request
+@app.on_event("startup")
+def load_walking_router():
+    get_walking_router()
+
 # ============================================================
 # AI-Powered Endpoints (Vision & Chat Services)
 # ============================================================
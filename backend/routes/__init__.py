@@ -9,4 +9,7 @@ from . import carbon_intensity
 from . import hazards
 from . import education
 from . import maps
-from . import assistant
\ No newline at end of file
+from . import assistant
+from . import notifications
+from . import scenarios
+from . import realtime
\ No newline at end of file
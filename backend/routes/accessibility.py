@@ -1,10 +1,15 @@
 # backend/routes/accessibility.py
 # Accessibility information and alerts endpoints
 
-from fastapi import APIRouter, Query
+from fastapi import APIRouter, HTTPException, Query
 from pydantic import BaseModel, Field
 from typing import Optional, List
 
+from services import pathway_service, transfer_service
+from services.accessibility_score_service import AccessibilityNeeds
+from services.obstacle_service import STATION_ALERTS
+from services.stop_index_service import get_stop_index, attribute_mask, FEATURE_BITS, MODE_BITS
+
 router = APIRouter(prefix="/api", tags=["Accessibility"])
 
 
@@ -29,19 +34,15 @@ class StationAccessibilityInfo(BaseModel):
     elevators_working: bool
     accessible_restrooms: bool
 
+class PathwayStatus(BaseModel):
+    """Reported state of an elevator, escalator or other station pathway."""
+    in_service: bool
+
+
 class AccessibilityNeedsRequest(BaseModel):
     """User input for accessibility needs."""
     text: str = Field(..., min_length=1)
 
-
-class AccessibilityNeeds(BaseModel):
-    """Structure for accessibility needs."""
-    needs_step_free: bool
-    max_transfers: Optional[int] = None
-    avoid_long_walks: bool
-    needs_audio: bool
-    needs_visual: bool
-
 # Routes
 
 @router.get(
@@ -115,24 +116,94 @@ async def get_accessibility_alerts(
     **Note:** Currently returns mock data. To be integrated with real-time system.
     """
     # TODO: Integrate with real-time alert system
-    mock_alerts = [
-        {
-            "alert_id": "alert_001",
-            "station_id": "stn_downtown",
-            "station_name": "Downtown Station",
-            "severity": "high",
-            "message": "Main elevator out of service for maintenance",
-            "affected_accessibility": ["wheelchair", "mobility_impaired"],
-            "estimated_resolution_time": "2 hours"
-        }
-    ]
-    
+    mock_alerts = [dict(a) for a in STATION_ALERTS]
+
     # Filter by station if provided
     if station_id:
         mock_alerts = [a for a in mock_alerts if a["station_id"] == station_id]
     
     return {"alerts": mock_alerts, "total_alerts": len(mock_alerts)}
 
+@router.get("/station/{station_id}/path")
+def get_station_path(
+    station_id: str,
+    to_id: str = Query(..., description="Platform (or entrance) stop_id to reach"),
+    from_id: Optional[str] = Query(None, description="Entrance (or platform) stop_id; any entrance if omitted"),
+    step_free: bool = Query(True, description="Only elevators, ramps and level walkways"),
+):
+    """
+    Path inside a station between an entrance and a platform
+
+    **Functionality:**
+    - From GTFS pathways.txt / levels.txt, with current elevator outages
+    - Step-free paths avoid stairs, escalators, steep ramps and narrow passages
+    - Answers are memoized per station, endpoints and the station's outage state
+    """
+    if pathway_service.get_stations() is None:
+        raise HTTPException(status_code=503, detail="No pathways imported. Run scripts/import_gtfs.py on a feed with pathways.txt.")
+    try:
+        path = pathway_service.station_path(station_id, from_id, to_id, step_free)
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if path is None:
+        raise HTTPException(status_code=404, detail="No step-free path inside the station right now" if step_free
+                            else "No path inside the station")
+    return path
+
+
+@router.put("/station/pathways/{pathway_id}/status")
+def set_pathway_status(pathway_id: str, status: PathwayStatus):
+    """Report an elevator or other pathway out of (or back in) service; only its station's paths are recomputed."""
+    try:
+        pathway_service.set_pathway_status(pathway_id, status.in_service)
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    return {"pathway_id": pathway_id, "in_service": status.in_service}
+
+
+@router.get("/stops/nearest")
+def get_nearest_stops(
+    lat: float = Query(...),
+    lon: float = Query(...),
+    k: int = Query(5, ge=1, le=50),
+    require: Optional[str] = Query(None, description="Comma-separated features every stop must have, e.g. 'wheelchair,elevator'"),
+    modes: Optional[str] = Query(None, description="Comma-separated modes, any of which will do, e.g. 'bus,subway'"),
+    max_distance_m: Optional[float] = Query(None, gt=0, le=50_000),
+):
+    """
+    k nearest stops to a point, optionally only those with the listed
+    accessibility features and serving one of the listed modes.
+    """
+    try:
+        need = attribute_mask([x for x in (require or "").split(",") if x.strip()], FEATURE_BITS)
+        mode_mask = attribute_mask([x for x in (modes or "").split(",") if x.strip()], MODE_BITS)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    index = get_stop_index()
+    stops = index.nearest(lat, lon, k, require=need, modes=mode_mask, max_distance_m=max_distance_m)
+    return {"stops": stops, "total": len(stops), "index_version": index.version, "indexed_stops": len(index)}
+
+@router.get("/stops/{stop_id}/transfers")
+def get_stop_transfers(stop_id: str, step_free: bool = Query(False, description="Only stops with a step-free walk")):
+    """
+    Stops within walking transfer distance of a stop, from the precomputed table
+
+    **Functionality:**
+    - Walking time along the walking graph, shortest and step-free
+    - Slope class (flat, moderate, steep) of the walk a wheelchair user would take
+    """
+    table = transfer_service.get_transfers()
+    if table is None:
+        raise HTTPException(status_code=503, detail="No walking transfers built. Run scripts/import_gtfs.py with a walking graph.")
+    stop = table.index_of().get(stop_id)
+    if stop is None:
+        raise HTTPException(status_code=404, detail=f"Unknown stop_id {stop_id}")
+    transfers = [t for t in table.transfers(stop) if t["step_free"] or not step_free]
+    return {"stop_id": stop_id, "transfers": transfers, "total": len(transfers)}
+
 @router.post("/accessibility/needs", response_model=AccessibilityNeeds)
 async def interpret_accessibility_needs(req: AccessibilityNeedsRequest):
     """
@@ -1,8 +1,24 @@
+from datetime import datetime
+
 from fastapi import APIRouter, HTTPException, Query
-from services.maps_service import geocode, route_osrm
+from pydantic import BaseModel, Field
+from typing import List, Optional
+from services.maps_service import geocode, route_osrm_checked, geocode_cache, route_cache, travel_time_matrix, nominatim_scheduler, SchedulerTimeout, route_accessible, isochrone, isochrone_cache
+from services.gazetteer_service import get_index
+from services.route_geometry_service import compact_route
+from services.elevation_service import get_dem
 
 router = APIRouter(prefix="/api/maps", tags=["Maps"])
 
+class LatLon(BaseModel):
+    lat: float = Field(..., ge=-90, le=90)
+    lon: float = Field(..., ge=-180, le=180)
+
+class MatrixRequest(BaseModel):
+    sources: List[LatLon] = Field(..., min_length=1, max_length=500)
+    destinations: List[LatLon] = Field(..., min_length=1, max_length=500)
+    profile: str = Field("foot", pattern="^(foot|driving|cycling)$")
+
 @router.get("/geocode")
 async def maps_geocode(
     q: str = Query(..., min_length=2),
@@ -19,9 +35,23 @@ async def maps_geocode(
                 "type": item.get("type"),
             })
         return {"query": q, "results": cleaned}
+    except SchedulerTimeout as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=502, detail=f"Geocoding failed: {e}")
 
+@router.get("/autocomplete")
+async def maps_autocomplete(
+    q: str = Query(..., min_length=1),
+    limit: int = Query(5, ge=1, le=20),
+):
+    # Local gazetteer only - safe to call on every keystroke, never hits Nominatim
+    return {"query": q, "results": get_index().autocomplete(q, limit=limit)}
+
+@router.get("/geocode/cache-stats")
+async def maps_geocode_cache_stats():
+    return {**geocode_cache.snapshot(), "scheduler": nominatim_scheduler.snapshot()}
+
 @router.get("/route")
 async def maps_route(
     origin_lat: float,
@@ -29,21 +59,98 @@ async def maps_route(
     dest_lat: float,
     dest_lon: float,
     profile: str = Query("foot", pattern="^(foot|driving|cycling)$"),
+    geometry_format: str = Query("geojson", pattern="^(geojson|polyline6)$"),
+    zoom: Optional[float] = Query(None, ge=0, le=22, description="Simplify geometry for this map zoom"),
+    elevation: bool = Query(True, description="Attach per-segment grades when DEM tiles are installed"),
+    needs: str = Query("shortest", pattern="^(shortest|step_free|avoid_slopes|wheelchair)$",
+                       description="Obstacles a foot route must avoid"),
+    strict: bool = Query(False, description="Reject instead of flagging when no route avoids them"),
 ):
     try:
-        data = await route_osrm(origin_lat, origin_lon, dest_lat, dest_lon, profile=profile)
+        data = await route_osrm_checked(origin_lat, origin_lon, dest_lat, dest_lon, profile=profile, needs=needs)
         if data.get("code") != "Ok" or not data.get("routes"):
             raise HTTPException(status_code=400, detail="No route found")
 
-        r0 = data["routes"][0]
-        return {
-            "profile": profile,
-            "distance_m": r0.get("distance"),
-            "duration_s": r0.get("duration"),
-            "geometry": r0.get("geometry"),  
-            "legs": r0.get("legs", []),
-        }
+        validation = (data.get("validation") or [None])[0]
+        if strict and validation and not validation["ok"]:
+            raise HTTPException(status_code=409, detail={
+                "message": f"Every route passes an obstacle ruled out by '{needs}'",
+                "blocking": validation["blocking"],
+            })
+        dem = get_dem() if elevation else None
+        out = {"profile": profile, **compact_route(data["routes"][0], geometry_format, zoom, dem)}
+        if validation is not None:
+            out["validation"] = validation
+            out["alternatives_checked"] = len(data["validation"])
+        return out
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=502, detail=f"Routing failed: {e}")
+
+@router.get("/route/accessible")
+def maps_route_accessible(
+    origin_lat: float,
+    origin_lon: float,
+    dest_lat: float,
+    dest_lon: float,
+    weighting: str = Query("step_free", pattern="^(shortest|step_free|avoid_slopes|wheelchair)$"),
+    max_grade: Optional[float] = Query(None, gt=0, le=0.3, description="Impassable above this grade, e.g. 0.06"),
+    geometry_format: str = Query("geojson", pattern="^(geojson|polyline6)$"),
+    zoom: Optional[float] = Query(None, ge=0, le=22),
+    elevation: bool = Query(True),
+):
+    try:
+        data = route_accessible(origin_lat, origin_lon, dest_lat, dest_lon, weighting, max_grade)
+    except LookupError as e:
+        raise HTTPException(status_code=503, detail=f"Local walking router unavailable: {e}")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    r0 = data["routes"][0]
+    return {
+        "profile": "foot",
+        "weighting": data["weighting"],
+        **compact_route(r0, geometry_format, zoom, get_dem() if elevation else None),
+        "algorithm": r0["algorithm"],
+        "max_grade": r0["max_grade"],
+        "features": r0["features"],
+        "snap_distance_m": r0["snap_distance_m"],
+    }
+
+@router.get("/isochrone")
+def maps_isochrone(
+    lat: float,
+    lon: float,
+    minutes: float = Query(15, gt=0, le=60, description="Walking time budget"),
+    weighting: str = Query("step_free", pattern="^(shortest|step_free|avoid_slopes|wheelchair)$"),
+    max_grade: Optional[float] = Query(None, gt=0, le=0.3),
+    transit: bool = Query(False, description="Also ride the GTFS timetable from the origin"),
+    depart_at: Optional[datetime] = Query(None, description="Departure time for transit (ISO 8601); now if omitted"),
+):
+    try:
+        return isochrone(lat, lon, minutes, weighting, max_grade, transit, depart_at)
+    except LookupError as e:
+        raise HTTPException(status_code=503, detail=f"Isochrone unavailable: {e}")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/isochrone/cache-stats")
+def maps_isochrone_cache_stats():
+    return isochrone_cache.snapshot()
+
+@router.get("/route/cache-stats")
+async def maps_route_cache_stats():
+    return route_cache.snapshot()
+
+@router.post("/matrix")
+async def maps_matrix(req: MatrixRequest):
+    try:
+        result = await travel_time_matrix(
+            [(p.lat, p.lon) for p in req.sources],
+            [(p.lat, p.lon) for p in req.destinations],
+            profile=req.profile,
+        )
+    except Exception as e:
+        raise HTTPException(status_code=502, detail=f"Matrix failed: {e}")
+    return {"profile": req.profile, **result}
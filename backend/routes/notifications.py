@@ -0,0 +1,56 @@
+# backend/routes/notifications.py
+# Per-user notification inbox endpoints
+
+from fastapi import APIRouter, HTTPException, Query
+from pydantic import BaseModel, Field
+from typing import Optional, Dict, Any
+from datetime import date, datetime
+
+from services.notification_service import notification_inbox, NOTIFICATION_TYPES
+
+router = APIRouter(prefix="/api", tags=["Notifications"])
+
+
+# Pydantic Models
+
+class NotificationCreateRequest(BaseModel):
+    """A notification to deliver to a user's inbox"""
+    type: str = Field(..., description=f"One of: {', '.join(sorted(NOTIFICATION_TYPES))}")
+    message: str = Field(..., min_length=1)
+    created_at: Optional[datetime] = Field(None, description="Defaults to now")
+    data: Optional[Dict[str, Any]] = None
+
+
+# Routes
+
+@router.get("/user/{user_id}/notifications")
+async def list_notifications(
+    user_id: str,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    day: Optional[date] = Query(None, description="Only notifications from this day (YYYY-MM-DD)"),
+):
+    """
+    Newest-first page of a user's notifications
+
+    **Functionality:**
+    - Arrivals, delays, CO2 achievements, badges and hazard warnings
+    - Keyset pagination: pass `next_cursor` back as `cursor` to read older items
+    - Only the most recent days/items are retained per user
+    """
+    try:
+        page = notification_inbox.page(user_id, limit=limit, cursor=cursor, day=day)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"user_id": user_id, **page}
+
+
+@router.post("/user/{user_id}/notifications")
+async def create_notification(user_id: str, req: NotificationCreateRequest):
+    """
+    Deliver a notification to a user's inbox
+    """
+    try:
+        return notification_inbox.add(user_id, req.type, req.message, created_at=req.created_at, data=req.data)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
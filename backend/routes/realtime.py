@@ -0,0 +1,104 @@
+# backend/routes/realtime.py
+# GTFS-realtime ingestion: trip updates and service alerts on the live timetable,
+# vehicle positions into predicted arrivals
+
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
+from typing import Optional
+
+from services import eta_service, realtime_service
+
+router = APIRouter(prefix="/api", tags=["Realtime"])
+
+
+@router.post("/realtime/refresh")
+async def refresh_realtime():
+    """
+    Pull the configured GTFS-realtime feeds and apply them to the timetable
+
+    **Functionality:**
+    - Reads GTFS_RT_TRIP_UPDATES and GTFS_RT_ALERTS (URL or local file)
+    - Only trips whose update changed are recomputed; queries keep running meanwhile
+    - Returns the new version, counts and decode/apply timings
+    """
+    try:
+        return await run_in_threadpool(realtime_service.refresh)
+    except LookupError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except OSError as e:
+        raise HTTPException(status_code=502, detail=f"Could not read the realtime feed: {e}")
+
+
+@router.get("/realtime/alerts")
+async def realtime_alerts(
+    route_id: Optional[str] = Query(None, description="Only alerts naming this GTFS route_id"),
+    stop_id: Optional[str] = Query(None, description="Only alerts naming this GTFS stop_id"),
+):
+    """
+    Service alerts in effect now
+
+    **Functionality:**
+    - From the last GTFS-realtime ServiceAlerts feed applied
+    - Filter by route or stop; elevator and other accessibility issues make a stop not step-free for routing
+    """
+    tt = realtime_service.live_timetable()
+    if tt is None:
+        raise HTTPException(status_code=503, detail="No GTFS timetable loaded. Run scripts/import_gtfs.py first.")
+    alerts = tt.alerts_for(route_id, stop_id) if isinstance(tt, realtime_service.LiveTimetable) else []
+    return {"version": getattr(tt, "version", 0), "count": len(alerts), "alerts": alerts}
+
+
+@router.post("/realtime/vehicles/refresh")
+async def refresh_vehicles():
+    """
+    Pull the VehiclePositions feed and rebuild the predicted arrivals board
+
+    **Functionality:**
+    - Reads GTFS_RT_VEHICLE_POSITIONS (URL or local file)
+    - Each vehicle is placed along its trip's shape; its delay there carries to the stops ahead
+    - Returns counts (predicted, off their line, stale, unmatched) and timings
+    """
+    try:
+        return await run_in_threadpool(eta_service.refresh)
+    except LookupError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except OSError as e:
+        raise HTTPException(status_code=502, detail=f"Could not read the realtime feed: {e}")
+
+
+@router.get("/realtime/arrivals")
+async def realtime_arrivals(
+    stop_id: Optional[str] = Query(None, description="GTFS stop_id"),
+    lat: Optional[float] = Query(None, description="Or: the nearest stop with an arrival to this point"),
+    lon: Optional[float] = None,
+    accessible: bool = Query(False, description="Only vehicles a wheelchair can board"),
+    mode: Optional[str] = Query(None, description="bus, tram, subway, rail or ferry"),
+    limit: int = Query(5, ge=1, le=50),
+):
+    """
+    Predicted arrivals at a stop from live vehicle positions
+
+    **Functionality:**
+    - Soonest first, from the last VehiclePositions tick
+    - With lat/lon instead of stop_id: the next matching vehicle at the nearest stop that has one
+    """
+    board = eta_service.get_board()
+    if board is None:
+        raise HTTPException(status_code=503, detail="No vehicle positions yet. POST /api/realtime/vehicles/refresh first.")
+    if stop_id is None:
+        if lat is None or lon is None:
+            raise HTTPException(status_code=400, detail="Give stop_id, or lat and lon.")
+        found = board.next_arrival_near(lat, lon, accessible, mode)
+        if found is None:
+            return {"version": board.version, "stop": None, "arrivals": []}
+        stop, arrival = found
+        return {"version": board.version, "stop": stop, "arrivals": [arrival.to_dict(board.tz)]}
+    s = board.tt.index_of("stop_id").get(stop_id)
+    if s is None:
+        raise HTTPException(status_code=404, detail=f"Unknown stop_id {stop_id}")
+    arrivals = board.arrivals(s, accessible, mode, limit=limit)
+    return {"version": board.version, "stop": board.tt.stop(s), "arrivals": [a.to_dict(board.tz) for a in arrivals]}
@@ -1,14 +1,29 @@
-from fastapi import APIRouter, Query
+from datetime import datetime
+
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel, Field
 from typing import Optional, List, Any, Dict
 
+import numpy as np
+
+from services.accessibility_score_service import AccessibilityNeeds, feature_row, score, score_itineraries, stop_equipment
 from services.emissions_service import EmissionsService
 from services.electricity_maps_service import ElectricityMapsService
+from services.gtfs_service import get_timetable
+from services.maps_service import geocode
+from services.plan_cache_service import plan_cache
+from services.raptor_service import OPTIMIZE, rank
+from services.transit_service import TransitService, resolve_place
 
 router = APIRouter(prefix="/api", tags=["Route Planning"])
 
 _emit = EmissionsService()
 _emaps = ElectricityMapsService()
+_transit = TransitService()
+
+# Emission factors exist for bus and electric rail; map the other GTFS modes onto them.
+_EMISSION_MODE = {"tram": "subway", "rail": "train", "ferry": "bus"}
 
 
 class RouteOption(BaseModel):
@@ -28,6 +43,72 @@ class RouteOption(BaseModel):
     co2_saved_vs_car_kg: Optional[float] = None
     carbon_intensity_gco2_per_kwh: Optional[float] = None
 
+    # Filled in when planned on the GTFS timetable
+    departure: Optional[str] = None
+    arrival: Optional[str] = None
+    transfers: Optional[int] = None
+    walk_distance_m: Optional[int] = None
+    legs: Optional[List[Dict[str, Any]]] = None
+
+
+async def _locate(text: str) -> Optional[Dict[str, Any]]:
+    place = resolve_place(text)
+    if place is not None:
+        return place
+    try:
+        hits = await geocode(text, limit=1)
+    except Exception:
+        return None
+    if not hits:
+        return None
+    return {"name": hits[0].get("display_name", text), "lat": float(hits[0]["lat"]), "lon": float(hits[0]["lon"])}
+
+
+def _latest_intensity(lat: float, lon: float) -> Optional[float]:
+    latest = _emaps.latest_carbon_intensity(lat=lat, lon=lon)
+    if not isinstance(latest, dict):
+        return None
+    value = latest.get("carbonIntensity") or latest.get("carbon_intensity") or latest.get("value")
+    try:
+        return float(value) if value is not None else None
+    except Exception:
+        return None
+
+
+def _route_option(i: int, it: Dict[str, Any], origin: str, destination: str, accessibility_score: float,
+                  carbon_intensity: Optional[float] = None, has_elevator: bool = False,
+                  audio_assistance: bool = False) -> RouteOption:
+    rides = [leg for leg in it["legs"] if leg["mode"] != "walk"]
+    main = max(rides, key=lambda leg: leg["duration_s"])["mode"] if rides else "walk"
+    # CO2 comes per ride from the planner; the car baseline covers the same ridden distance
+    actual_kg = it["co2_g"] / 1000.0
+    car_kg = sum(leg["distance_m"] for leg in rides) / 1000.0 * _emit.engine.EMISSION_CAR
+    return RouteOption(
+        route_id=f"itinerary_{i + 1:03d}",
+        origin=origin,
+        destination=destination,
+        mode=main,
+        estimated_time_minutes=max(1, round(it["duration_s"] / 60)),
+        stops_count=sum(leg["stops"] for leg in rides),
+        accessibility_score=accessibility_score,
+        has_elevator=has_elevator,
+        wheelchair_accessible=bool(it["wheelchair_accessible"]),
+        audio_assistance_available=audio_assistance,
+        departure=it["departure"],
+        arrival=it["arrival"],
+        transfers=it["transfers"],
+        walk_distance_m=it["walk_m"],
+        legs=it["legs"],
+        estimated_co2_kg=round(actual_kg, 3),
+        co2_saved_vs_car_kg=round(max(car_kg - actual_kg, 0.0), 3),
+        carbon_intensity_gco2_per_kwh=carbon_intensity,
+    )
+
+
+@router.get("/route/plan/cache-stats")
+def route_plan_cache_stats():
+    return plan_cache.snapshot()
+
 
 @router.post("/route/plan", response_model=List[RouteOption])
 async def plan_accessible_route(
@@ -37,8 +118,56 @@ async def plan_accessible_route(
     optimize: Optional[str] = Query("balanced", description="'balanced' | 'time' | 'accessibility' | 'emissions'"),
     lat: Optional[float] = Query(None, description="Latitude (for live carbon intensity)"),
     lon: Optional[float] = Query(None, description="Longitude (for live carbon intensity)"),
+    depart_at: Optional[datetime] = Query(None, description="Departure time (ISO 8601); now if omitted"),
+    accessible_only: bool = Query(False, description="Only wheelchair-accessible trips, stops and step-free transfers"),
+    needs_step_free: Optional[bool] = Query(None, description="Weight step-free access in the accessibility score; defaults to accessible_only"),
+    max_transfers: Optional[int] = Query(None, ge=0, description="Transfers above this count are fully penalised in the accessibility score"),
+    avoid_long_walks: bool = Query(False, description="Weight walking distance and slope in the accessibility score"),
+    needs_audio: bool = Query(False, description="Weight audio announcements at stops in the accessibility score"),
+    needs_visual: bool = Query(False, description="Weight visual displays at stops in the accessibility score"),
 ):
-    # Mock routes (existing behavior)
+    needs = AccessibilityNeeds(
+        needs_step_free=accessible_only if needs_step_free is None else needs_step_free,
+        max_transfers=max_transfers,
+        avoid_long_walks=avoid_long_walks,
+        needs_audio=needs_audio,
+        needs_visual=needs_visual,
+    )
+
+    # Step 5: pull live carbon intensity if provided (at most every CARBON_INTENSITY_TTL_S per zone)
+    carbon_intensity, zone = None, None
+    if lat is not None and lon is not None:
+        zone = plan_cache.zone(lat, lon)
+        carbon_intensity = await run_in_threadpool(plan_cache.intensity, zone, lambda: _latest_intensity(lat, lon))
+
+    if get_timetable() is not None:
+        o, d = await _locate(origin), await _locate(destination)
+        if o is not None and d is not None:
+            if (optimize or "balanced").lower() not in OPTIMIZE:
+                raise HTTPException(status_code=400, detail=f"Unknown optimize '{optimize}'. Must be one of: {', '.join(OPTIMIZE)}")
+            try:
+                # same cells, departure bucket, needs and zone as an earlier request: its plan, unless
+                # realtime data or the carbon intensity it depends on has changed since
+                itineraries = await run_in_threadpool(
+                    plan_cache.plan, _transit.plan, (o["lat"], o["lon"]), (d["lat"], d["lon"]), depart_at,
+                    accessible_only, carbon_intensity, zone)
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+            # the planner returns the Pareto front; `optimize` picks which option comes first
+            ranked = rank(itineraries, optimize)
+            scores = score_itineraries(ranked, needs)
+            if (optimize or "").lower() == "accessibility":
+                # highest score for this rider first; rank's barriers-then-arrival order breaks ties
+                order = np.argsort(-scores, kind="stable").tolist()
+                ranked, scores = [ranked[i] for i in order], scores[order]
+            # equipment at every stop boarded or alighted at, from the stops.txt columns and live closures
+            equipment = stop_equipment(ranked)
+            return [_route_option(i, it, origin, destination, float(sc), carbon_intensity, bool(eq[0]), bool(eq[1]))
+                    for i, (it, sc, eq) in enumerate(zip(ranked, scores, equipment))]
+
+    # Mock routes when no GTFS feed has been imported (or the places could not be found),
+    # scored on the equipment they claim
+    mock_scores = score(np.vstack([feature_row(), feature_row(audio=1.0)]), needs)
     routes = [
         RouteOption(
             route_id="route_001",
@@ -47,7 +176,7 @@ async def plan_accessible_route(
             mode="bus",
             estimated_time_minutes=25,
             stops_count=5,
-            accessibility_score=95.0,
+            accessibility_score=float(mock_scores[0]),
             has_elevator=True,
             wheelchair_accessible=True,
             audio_assistance_available=True
@@ -59,28 +188,17 @@ async def plan_accessible_route(
             mode="subway",
             estimated_time_minutes=15,
             stops_count=3,
-            accessibility_score=85.0,
+            accessibility_score=float(mock_scores[1]),
             has_elevator=True,
             wheelchair_accessible=True,
             audio_assistance_available=False
         )
     ]
 
-    # Step 5: pull live carbon intensity if provided
-    carbon_intensity = None
-    if lat is not None and lon is not None:
-        latest = _emaps.latest_carbon_intensity(lat=lat, lon=lon)
-        if isinstance(latest, dict):
-            carbon_intensity = latest.get("carbonIntensity") or latest.get("carbon_intensity") or latest.get("value")
-            try:
-                carbon_intensity = float(carbon_intensity) if carbon_intensity is not None else None
-            except Exception:
-                carbon_intensity = None
-
     # Attach emissions to each route
     enriched: List[RouteOption] = []
     for r in routes:
-        est = _emit.estimate_route_emissions(r.mode, r.estimated_time_minutes, carbon_gco2_per_kwh=carbon_intensity)
+        est = _emit.estimate_route_emissions(_EMISSION_MODE.get(r.mode, r.mode), r.estimated_time_minutes, carbon_gco2_per_kwh=carbon_intensity)
         r.estimated_co2_kg = est["actual_kg"]
         r.co2_saved_vs_car_kg = est["co2_saved_kg"]
         r.carbon_intensity_gco2_per_kwh = est.get("carbon_intensity_gco2_per_kwh")
@@ -0,0 +1,61 @@
+# backend/routes/scenarios.py
+# Mode-shift scenario simulation endpoints
+
+from fastapi import APIRouter, HTTPException
+from pydantic import BaseModel, Field
+from typing import Dict, List, Optional
+
+from services.scenario_simulation_service import ScenarioSimulator, ScenarioConfig, ModeShift, hourly_profile_from_db
+
+router = APIRouter(prefix="/api/climate", tags=["Climate (Scenarios)"])
+_sim = ScenarioSimulator()
+
+
+class ModeShiftRequest(BaseModel):
+    from_mode: str = Field("car", description="Mode trips are moved away from")
+    to_mode: str = Field("electric", description="Mode trips are moved to")
+    fraction: float = Field(0.1, ge=0, le=1, description="Share of matching trips that switch")
+    max_distance_km: Optional[float] = Field(None, gt=0)
+    min_distance_km: Optional[float] = Field(None, ge=0)
+    hours: Optional[List[int]] = Field(None, description="Departure hours (0-23) the shift applies to")
+
+
+class ScenarioRequest(BaseModel):
+    n_trips: int = Field(1_000_000, ge=1, le=20_000_000, description="Synthetic trips per run")
+    n_runs: int = Field(20, ge=1, le=200, description="Monte Carlo replicates")
+    distance_median_km: float = Field(6.0, gt=0)
+    distance_sigma: float = Field(0.8, gt=0, le=3)
+    mode_shares: Optional[Dict[str, float]] = None
+    departure_weights: Optional[List[float]] = Field(None, description="24 hourly weights")
+    location: Optional[str] = Field(None, description="Use seeded carbon-intensity readings for this location")
+    shifts: List[ModeShiftRequest] = Field(default_factory=list)
+    seed: Optional[int] = None
+
+
+@router.post("/scenarios/simulate")
+def simulate_scenario(req: ScenarioRequest):
+    """
+    Monte Carlo policy scenario, e.g. "10% of car trips under 5 km move to electric bus at night".
+    Returns distributions (mean, std, p5/p50/p95) of baseline, scenario and saved CO2 in kg.
+    """
+    cfg = ScenarioConfig(
+        n_trips=req.n_trips,
+        n_runs=req.n_runs,
+        distance_median_km=req.distance_median_km,
+        distance_sigma=req.distance_sigma,
+        shifts=[ModeShift(**s.model_dump()) for s in req.shifts],
+        seed=req.seed,
+    )
+    if req.mode_shares is not None:
+        cfg.mode_shares = req.mode_shares
+    if req.departure_weights is not None:
+        cfg.departure_weights = req.departure_weights
+    if req.location:
+        profile = hourly_profile_from_db(req.location)
+        if profile is not None:
+            cfg.hourly_intensity = profile
+
+    try:
+        return _sim.run(cfg)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
@@ -1,10 +1,61 @@
 # backend/routes/users.py
 # User engagement and gamification endpoints
 
-from fastapi import APIRouter
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+from typing import List, Optional
+from datetime import date
+
+from services.climate_service import ClimateEngine
+from services.leaderboard_service import leaderboard_service, METRICS
+from services.badge_service import badge_engine, TripEvent, EPOCH
+from services.notification_service import notification_inbox
+from services import trip_ledger_service as ledger
 
 router = APIRouter(prefix="/api", tags=["Gamification"])
 
+climate_engine = ClimateEngine()
+
+
+# Pydantic Models
+
+class TripRecordRequest(BaseModel):
+    """A completed trip to credit to the user's totals"""
+    distance_km: float = Field(..., gt=0, description="Distance traveled in kilometers")
+    mode: str = Field(..., description="Transit mode: 'bus', 'walk', 'bike', 'subway', 'car'")
+    city: str = Field(..., min_length=1, description="City leaderboard to rank the user in")
+    trip_date: Optional[date] = Field(None, description="Day the trip was taken (defaults to today)")
+    destination: Optional[str] = Field(None, description="Where the trip ended")
+
+
+class FriendsRequest(BaseModel):
+    """Friend group used for the friends leaderboard"""
+    friend_ids: List[str] = Field(default_factory=list)
+
+
+def _check_metric(metric: str) -> str:
+    if metric not in METRICS:
+        raise HTTPException(status_code=400, detail=f"Invalid metric. Must be one of: {', '.join(METRICS)}")
+    return metric
+
+
+_EXPORT_FORMATS = {
+    "csv": ("text/csv", ledger.stream_csv),
+    "ndjson": ("application/x-ndjson", ledger.stream_ndjson),
+}
+
+
+def _export_response(rows, fmt: str, filename: str) -> StreamingResponse:
+    if fmt not in _EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail="Invalid format. Must be one of: csv, ndjson")
+    media_type, writer = _EXPORT_FORMATS[fmt]
+    return StreamingResponse(
+        writer(rows),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{fmt}"'},
+    )
+
 
 # Routes
 
@@ -27,9 +78,24 @@ async def get_user_stats(user_id: str):
     - Points earned
     - Badges/achievements unlocked
     - Sustainability streak
+    - Ranking on the user's city points leaderboard (as GET /user/{user_id}/rank; null if unranked)
     
-    **Note:** Currently returns mock data. To be integrated with user database.
+    **Note:** Users without recorded trips still get mock data.
     """
+    if badge_engine.has_user(user_id):
+        counters = badge_engine.counters(user_id)
+        totals = leaderboard_service.totals(user_id)
+        return {
+            "user_id": user_id,
+            "total_co2_saved_kg": totals["co2_saved_kg"],
+            "total_trips": int(counters.get("trips", 0)),
+            "total_points": int(totals["points"]),
+            "badges": [b for b in badge_engine.badges(user_id) if b["earned"]],
+            "sustainability_streak_days": badge_engine.current_streak(user_id),
+            "longest_streak_days": int(counters.get("longest_streak", 0)),
+            "ranking": leaderboard_service.rank(user_id, "points"),
+        }
+
     # TODO: Query user profile and trip history from database
     mock_stats = {
         "user_id": user_id,
@@ -41,6 +107,160 @@ async def get_user_stats(user_id: str):
             {"badge_id": "carbon_hero", "name": "Carbon Hero", "description": "Saved 100kg of CO2"}
         ],
         "sustainability_streak_days": 14,
-        "ranking": "Gold Tier"
+        "ranking": {"user_id": user_id, "city": "toronto", "metric": "points", "rank": 3, "score": 12750.0,
+                    "total_users": 120},
     }
     return mock_stats
+
+
+@router.post("/user/{user_id}/trips")
+async def record_user_trip(user_id: str, trip: TripRecordRequest):
+    """
+    Record a completed trip and update the user's leaderboard position
+
+    **Functionality:**
+    - Calculates CO2 saved and points with the climate engine
+    - Adds them to the user's running totals
+    - Re-ranks the user in their city and friend leaderboards incrementally
+    - Updates the day streak and returns any badges unlocked by this trip
+    """
+    trip_day = trip.trip_date or date.today()
+    if trip_day < EPOCH:
+        raise HTTPException(status_code=400, detail=f"trip_date must be on or after {EPOCH.isoformat()}")
+
+    impact = climate_engine.calculate_savings(distance_km=trip.distance_km, mode=trip.mode)
+    totals = leaderboard_service.record_trip(
+        user_id, trip.city, points=impact["points_earned"], co2_saved_kg=impact["co2_saved_kg"]
+    )
+    new_badges = badge_engine.apply(TripEvent(
+        user_id=user_id,
+        day=trip_day,
+        mode=trip.mode,
+        distance_km=trip.distance_km,
+        co2_saved_kg=impact["co2_saved_kg"],
+        points=impact["points_earned"],
+    ))
+    ledger.init_db()
+    trip_id = ledger.insert_trip(
+        user_id,
+        trip.city,
+        trip_day.isoformat(),
+        trip.mode,
+        distance_km=trip.distance_km,
+        co2_saved_kg=impact["co2_saved_kg"],
+        points=impact["points_earned"],
+        destination=trip.destination,
+    )
+    for badge in new_badges:
+        notification_inbox.add(
+            user_id, "badge_earned", f"You earned the {badge['name']} badge! {badge['icon']}",
+            data={"badge_id": badge["badge_id"]},
+        )
+    return {
+        "user_id": user_id,
+        "trip_id": trip_id,
+        "impact": impact,
+        "totals": totals,
+        "rank": leaderboard_service.rank(user_id, "points"),
+        "new_badges": new_badges,
+        "day_streak": badge_engine.current_streak(user_id),
+    }
+
+
+@router.get("/user/{user_id}/badges")
+async def get_user_badges(user_id: str):
+    """
+    All badges with earned status and the user's current day streak
+    """
+    badges = badge_engine.badges(user_id)
+    return {
+        "user_id": user_id,
+        "badges": badges,
+        "badges_earned": sum(1 for b in badges if b["earned"]),
+        "badges_total": len(badges),
+        "day_streak": badge_engine.current_streak(user_id),
+    }
+
+
+@router.get("/leaderboard/{city}")
+async def get_city_leaderboard(
+    city: str,
+    metric: str = Query("points", description="'points' or 'co2_saved_kg'"),
+    limit: int = Query(10, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+):
+    """
+    Top users in a city ranked by points or CO2 saved
+
+    **Returns:**
+    - Ordered entries with rank, user_id and score
+    """
+    _check_metric(metric)
+    entries = leaderboard_service.top(city, metric=metric, k=limit, offset=offset)
+    return {"city": city, "metric": metric, "entries": entries}
+
+
+@router.get("/user/{user_id}/rank")
+async def get_user_rank(
+    user_id: str,
+    metric: str = Query("points", description="'points' or 'co2_saved_kg'"),
+):
+    """
+    A single user's position on their city leaderboard
+    """
+    _check_metric(metric)
+    result = leaderboard_service.rank(user_id, metric)
+    if result is None:
+        raise HTTPException(status_code=404, detail="User has no recorded trips")
+    return result
+
+
+@router.put("/user/{user_id}/friends")
+async def set_user_friends(user_id: str, req: FriendsRequest):
+    """
+    Replace the user's friend group for the friends leaderboard
+    """
+    leaderboard_service.set_friends(user_id, req.friend_ids)
+    return {"user_id": user_id, "friend_ids": sorted(set(req.friend_ids) - {user_id})}
+
+
+@router.get("/user/{user_id}/friends/leaderboard")
+async def get_friends_leaderboard(
+    user_id: str,
+    metric: str = Query("points", description="'points' or 'co2_saved_kg'"),
+    limit: int = Query(10, ge=1, le=100),
+):
+    """
+    The user and their friends ranked by points or CO2 saved
+    """
+    _check_metric(metric)
+    entries = leaderboard_service.friends_top(user_id, metric=metric, k=limit)
+    return {"user_id": user_id, "metric": metric, "entries": entries}
+
+
+@router.get("/user/{user_id}/trips/export")
+def export_user_trips(
+    user_id: str,
+    format: str = Query("csv", description="'csv' or 'ndjson'"),
+):
+    """
+    Download a user's full trip history
+
+    **Functionality:**
+    - Streams rows from the trip ledger page by page
+    - Memory stays flat no matter how many trips the user has
+    """
+    ledger.init_db()
+    return _export_response(ledger.iter_trips(user_id=user_id), format, f"trips_{user_id}")
+
+
+@router.get("/trips/export")
+def export_city_trips(
+    city: str = Query(..., min_length=1, description="City to export, e.g. 'Toronto'"),
+    format: str = Query("csv", description="'csv' or 'ndjson'"),
+):
+    """
+    Download every recorded trip in a city (all users)
+    """
+    ledger.init_db()
+    return _export_response(ledger.iter_trips(city=city), format, f"trips_{city.strip().lower()}")
@@ -0,0 +1,67 @@
+import json
+import math
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from services.route_geometry_service import compact_route
+
+
+def synthetic_route(n_points: int, n_steps: int, seed: int = 7) -> dict:
+    """A wiggly ~1 m-spaced walk with OSRM-shaped legs/steps (geometry, intersections per step)."""
+    rng = random.Random(seed)
+    lat, lon, heading = 43.6452, -79.3806, 0.0
+    coords = []
+    for _ in range(n_points):
+        heading += rng.gauss(0, 0.05)
+        lat += math.cos(heading) * 1.0 / 111_320
+        lon += math.sin(heading) * 1.0 / (111_320 * math.cos(math.radians(lat)))
+        coords.append([round(lon, 6), round(lat, 6)])
+    per = max(1, n_points // n_steps)
+    steps = []
+    for s in range(n_steps):
+        part = coords[s * per:(s + 1) * per + 1] or coords[-2:]
+        steps.append({
+            "distance": float(len(part)), "duration": len(part) / 1.3, "weight": len(part) / 1.3,
+            "name": f"Street {s}", "mode": "walking", "driving_side": "right",
+            "geometry": {"type": "LineString", "coordinates": part},
+            "maneuver": {"type": "turn", "modifier": "left", "location": part[0], "bearing_before": 10, "bearing_after": 100},
+            "intersections": [{"location": part[0], "bearings": [10, 100, 190], "entry": [True, True, False], "in": 0, "out": 1}],
+        })
+    return {
+        "distance": float(n_points), "duration": n_points / 1.3,
+        "geometry": {"type": "LineString", "coordinates": coords},
+        "legs": [{"distance": float(n_points), "duration": n_points / 1.3, "summary": "", "weight": 0, "steps": steps}],
+    }
+
+
+def bench(label: str, fn, repeat: int = 5):
+    best, out = float("inf"), None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn()
+        best = min(best, time.perf_counter() - t0)
+    return label, len(out.encode("utf-8")), best * 1000
+
+
+def main() -> None:
+    for n_points in (5_000, 50_000):
+        route = synthetic_route(n_points, n_steps=n_points // 100)
+        rows = [
+            bench("raw OSRM geojson + full steps", lambda: json.dumps(route)),
+            bench("geojson, trimmed steps", lambda: json.dumps(compact_route(route, "geojson"))),
+            bench("polyline6, trimmed steps", lambda: json.dumps(compact_route(route, "polyline6"))),
+        ]
+        for z in (12, 15, 17):
+            rows.append(bench(f"polyline6 + simplify z{z}", lambda z=z: json.dumps(compact_route(route, "polyline6", z))))
+        print(f"\n{n_points} points, {n_points // 100} steps")
+        print(f"{'variant':34} {'bytes':>10} {'ms':>8}")
+        for label, size, ms in rows:
+            print(f"{label:34} {size:>10,} {ms:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,18 @@
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from services.gazetteer_service import import_csv, GAZETTEER_PATH
+
+
+def main(src: str) -> None:
+    n = import_csv(Path(src))
+    print(f"Imported {n} places from {src} into {GAZETTEER_PATH}. Restart the API to reload the index.")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print("Usage: python scripts/import_gazetteer.py <places.csv>  (columns: name,lat,lon[,kind,weight])")
+        sys.exit(1)
+    main(sys.argv[1])
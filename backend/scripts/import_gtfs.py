@@ -0,0 +1,36 @@
+import argparse
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from services.gtfs_service import import_gtfs, GTFS_PATH, TIMETABLE_PATH, TRANSFER_RADIUS_M
+from services.pathway_service import import_pathways, PATHWAYS_PATH
+from services.stop_index_service import STOPS_PATH
+from services.transfer_service import TRANSFER_WORKERS, TRANSFERS_PATH
+from services.walking_graph_service import WALKING_GRAPH_PATH
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description="Build the RAPTOR timetable from a GTFS static feed.")
+    p.add_argument("feed", nargs="?", default=str(GTFS_PATH), help="GTFS .zip or unpacked directory")
+    p.add_argument("--out", default=str(TIMETABLE_PATH), help="timetable file to write")
+    p.add_argument("--stops", default=str(STOPS_PATH), help="stops.txt for the nearest-stop index ('' to skip)")
+    p.add_argument("--pathways", default=str(PATHWAYS_PATH), help="station pathway graphs to write ('' to skip)")
+    p.add_argument("--transfer-radius", type=float, default=TRANSFER_RADIUS_M,
+                   help="walking transfers between stops within this many metres")
+    p.add_argument("--walking-graph", default=str(WALKING_GRAPH_PATH),
+                   help="walk transfers along this graph from scripts/import_osm.py ('' for straight lines)")
+    p.add_argument("--transfers", default=str(TRANSFERS_PATH), help="walking transfer table to write")
+    p.add_argument("--workers", type=int, default=TRANSFER_WORKERS, help="processes for the walking transfer search")
+    args = p.parse_args()
+    import_gtfs(Path(args.feed), Path(args.out), stops_out=Path(args.stops) if args.stops else None,
+                transfer_radius_m=args.transfer_radius, walking_graph=Path(args.walking_graph) if args.walking_graph else None,
+                transfers_out=Path(args.transfers), workers=args.workers)
+    if args.pathways:
+        import_pathways(Path(args.feed), Path(args.pathways))
+    print("Restart the API (or set TIMETABLE_PATH) to plan on the new timetable.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from services.osm_import_service import import_osm
+from services.walking_graph_service import WALKING_GRAPH_PATH, load_graph
+from services.walking_router_service import WALKING_CH_WEIGHTINGS, WalkingRouter, hierarchy_path, resolve_weighting
+from services.elevation_service import DemTileSet, DEM_DIR
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description="Build the accessible walking graph from an OSM extract.")
+    p.add_argument("extract", help=".osm, .osm.bz2, .osm.gz or .osm.pbf (pbf needs pyosmium)")
+    p.add_argument("--out", default=str(WALKING_GRAPH_PATH), help="graph file to write")
+    p.add_argument("--dem", default=str(DEM_DIR), help="directory of .hgt tiles used to grade untagged ways")
+    p.add_argument("--ch", default=",".join(WALKING_CH_WEIGHTINGS),
+                   help="comma-separated weightings to build contraction hierarchies for (default: WALKING_CH_WEIGHTINGS)")
+    args = p.parse_args()
+    out = Path(args.out)
+    import_osm(Path(args.extract), out, dem=DemTileSet(Path(args.dem)))
+    router = WalkingRouter(load_graph(out))
+    for name in [w.strip() for w in args.ch.split(",") if w.strip()]:
+        t0 = time.perf_counter()
+        path = hierarchy_path(out, name)
+        router.prepare(resolve_weighting(name), path=path)
+        print(f"contraction hierarchy '{name}' -> {path} ({time.perf_counter() - t0:.1f}s)")
+    print("Restart the API (or set WALKING_GRAPH_PATH) to route on the new graph.")
+
+
+if __name__ == "__main__":
+    main()
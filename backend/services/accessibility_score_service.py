@@ -0,0 +1,195 @@
+from typing import Any, Dict, Optional, Sequence
+
+import numpy as np
+from pydantic import BaseModel
+
+from services import realtime_service, transfer_service
+from services.gtfs_service import WC_YES
+from services.stop_index_service import AUDIO, ELEVATOR as ELEVATOR_BIT, VISUAL
+from services.transfer_service import TransferTable
+
+# One column per feature, each a penalty in [0, 1] once normalised (0 is best).
+FEATURES = ("vehicle", "boarding", "elevator", "ramp", "audio", "visual", "walk", "slope", "transfers")
+(VEHICLE, BOARDING, ELEVATOR, RAMP, AUDIO_COL, VISUAL_COL, WALK, SLOPE, TRANSFERS) = range(len(FEATURES))
+
+# What matters to anyone; a stated need multiplies the weights below it.
+BASE_WEIGHTS = {"vehicle": 3.0, "boarding": 2.0, "elevator": 2.0, "ramp": 1.5, "audio": 0.5, "visual": 0.5,
+                "walk": 1.0, "slope": 1.0, "transfers": 1.0}
+NEED_FACTORS = {
+    "needs_step_free": {"vehicle": 4.0, "boarding": 4.0, "elevator": 4.0, "ramp": 4.0, "slope": 2.0},
+    "avoid_long_walks": {"walk": 4.0, "slope": 2.0},
+    "needs_audio": {"audio": 6.0},
+    "needs_visual": {"visual": 6.0},
+    "max_transfers": {"transfers": 3.0},
+}
+# Walking this far (access, transfers and egress together) is the full walk penalty.
+LONG_WALK_M = 1000.0
+# Without a stated max_transfers, this many transfers is the full transfer penalty.
+DEFAULT_MAX_TRANSFERS = 3
+# transfer_service slope classes as penalties: flat, moderate, steep
+SLOPE_PENALTY = np.array([0.0, 0.5, 1.0])
+
+
+class AccessibilityNeeds(BaseModel):
+    """Structure for accessibility needs."""
+    needs_step_free: bool
+    max_transfers: Optional[int] = None
+    avoid_long_walks: bool
+    needs_audio: bool
+    needs_visual: bool
+
+
+def weights(needs: Any = None) -> np.ndarray:
+    """
+    Feature weights in FEATURES order, summing to 1, for a rider's needs (an
+    AccessibilityNeeds or anything with its attributes; None for no stated needs).
+    """
+    w = np.array([BASE_WEIGHTS[f] for f in FEATURES])
+    for need, factors in NEED_FACTORS.items():
+        value = getattr(needs, need, None)
+        if value is None or value is False:
+            continue
+        for f, k in factors.items():
+            w[FEATURES.index(f)] *= k
+    return w / w.sum()
+
+
+def features(itineraries: Sequence[Dict[str, Any]], tt: Any = None,
+             walks: Optional[TransferTable] = None) -> np.ndarray:
+    """
+    Raw feature matrix (one row per raptor itinerary, FEATURES columns) on the
+    timetable `tt` (static or live). Stop-based columns are the share of the
+    stops boarded or alighted at lacking the feature: GTFS wheelchair_boarding
+    for `boarding`, live step-free closures for `elevator`, the stop's audio and
+    visual equipment bits. `vehicle` and `ramp` are the shares of rides and
+    stop-to-stop walks that are not step-free, `slope` the transfer walks'
+    mean slope class on the walking-transfer table. `walk` is metres and
+    `transfers` a count; score() normalises them.
+
+    Audio and visual columns are zero when no stop in the feed has the bit,
+    since the feed then says nothing either way.
+    """
+    n = len(itineraries)
+    out = np.zeros((n, len(FEATURES)))
+    if not n:
+        return out
+    out[:, WALK] = [it["walk_m"] for it in itineraries]
+    out[:, TRANSFERS] = [it["transfers"] for it in itineraries]
+    if tt is None:
+        return out
+
+    ids = tt.index_of("stop_id")
+    stop_row, stop_idx, ride_row, ride_bad, walk_row, walk_bad, walk_slope = [], [], [], [], [], [], []
+    slope_of = _slopes(walks)
+    for r, it in enumerate(itineraries):
+        for leg in it["legs"]:
+            ends = [ids.get(end.get("stop_id")) for end in (leg["from"], leg["to"])]
+            if leg["mode"] != "walk":
+                ride_row.append(r)
+                ride_bad.append(not leg["wheelchair_accessible"])
+                for s in ends:
+                    if s is not None:
+                        stop_row.append(r)
+                        stop_idx.append(s)
+            elif "step_free" in leg:
+                walk_row.append(r)
+                walk_bad.append(not leg["step_free"])
+                walk_slope.append(slope_of(leg["from"]["stop_id"], leg["to"]["stop_id"]))
+
+    if stop_idx:
+        rows, stops = np.asarray(stop_row), np.asarray(stop_idx)
+        base = getattr(tt, "base", tt)
+        bits = np.asarray(base.stop_bits)
+        bad = np.zeros((len(stops), 4))
+        bad[:, 0] = np.asarray(base.stop_wheelchair)[stops] != WC_YES
+        closed = getattr(tt, "closed_stops", frozenset())
+        if closed:
+            bad[:, 1] = np.isin(stops, np.fromiter(closed, dtype=np.int64, count=len(closed)))
+        for col, bit in ((2, AUDIO), (3, VISUAL)):
+            if (bits & bit).any():
+                bad[:, col] = (bits[stops] & bit) == 0
+        out[:, [BOARDING, ELEVATOR, AUDIO_COL, VISUAL_COL]] = _share(rows, bad, n)
+    if ride_row:
+        out[:, VEHICLE] = _share(np.asarray(ride_row), np.asarray(ride_bad, dtype=np.float64)[:, None], n)[:, 0]
+    if walk_row:
+        per_walk = np.column_stack([np.asarray(walk_bad, dtype=np.float64), np.asarray(walk_slope)])
+        out[:, [RAMP, SLOPE]] = _share(np.asarray(walk_row), per_walk, n)
+    return out
+
+
+def score(matrix: np.ndarray, needs: Any = None) -> np.ndarray:
+    """
+    0-100 accessibility scores for a features() matrix: 100 less the weighted
+    sum of penalties, all rows in one matrix product.
+    """
+    limit = getattr(needs, "max_transfers", None)
+    limit = DEFAULT_MAX_TRANSFERS if limit is None else max(int(limit), 0)
+    penalties = np.clip(matrix, 0.0, 1.0)
+    penalties[:, WALK] = np.minimum(matrix[:, WALK] / LONG_WALK_M, 1.0)
+    # over the rider's limit is the full penalty
+    t = matrix[:, TRANSFERS]
+    penalties[:, TRANSFERS] = np.where(t > limit, 1.0, t / (limit + 1))
+    return np.round(100.0 * (1.0 - penalties @ weights(needs)), 1)
+
+
+def score_itineraries(itineraries: Sequence[Dict[str, Any]], needs: Any = None) -> np.ndarray:
+    """Scores for raptor itineraries on the live timetable and the walking-transfer table, if any."""
+    return score(features(itineraries, realtime_service.live_timetable(), transfer_service.get_transfers()), needs)
+
+
+def stop_equipment(itineraries: Sequence[Dict[str, Any]], tt: Any = None) -> np.ndarray:
+    """
+    (n, 2) booleans per raptor itinerary: whether every stop it boards or
+    alights at has a working elevator (its bit set and no live closure), and
+    whether every one has audio announcements. False for walk-only options.
+    `tt` defaults to the live timetable.
+    """
+    out = np.zeros((len(itineraries), 2), dtype=bool)
+    tt = realtime_service.live_timetable() if tt is None else tt
+    if tt is None:
+        return out
+    ids = tt.index_of("stop_id")
+    bits = np.asarray(getattr(tt, "base", tt).stop_bits)
+    closed = getattr(tt, "closed_stops", frozenset())
+    for r, it in enumerate(itineraries):
+        stops = [ids.get(end.get("stop_id")) for leg in it["legs"] if leg["mode"] != "walk"
+                 for end in (leg["from"], leg["to"])]
+        if not stops or None in stops:
+            continue
+        out[r, 0] = all(bits[s] & ELEVATOR_BIT and s not in closed for s in stops)
+        out[r, 1] = all(bits[s] & AUDIO for s in stops)
+    return out
+
+
+def feature_row(**values: float) -> np.ndarray:
+    """One features() row from named penalties (the rest 0), for routes not planned on the timetable."""
+    row = np.zeros(len(FEATURES))
+    for name, value in values.items():
+        if name not in FEATURES:
+            raise ValueError(f"Unknown feature '{name}'. Must be one of: {', '.join(FEATURES)}")
+        row[FEATURES.index(name)] = value
+    return row
+
+
+def _share(rows: np.ndarray, values: np.ndarray, n: int) -> np.ndarray:
+    """Per-itinerary mean of each column of `values`, grouped by `rows` (0 for itineraries with none)."""
+    counts = np.bincount(rows, minlength=n)
+    sums = np.stack([np.bincount(rows, weights=values[:, c], minlength=n) for c in range(values.shape[1])], axis=1)
+    return sums / np.maximum(counts, 1)[:, None]
+
+
+def _slopes(walks: Optional[TransferTable]):
+    """slope(a_id, b_id): the a -> b walk's slope penalty on the transfer table, 0 when it has none."""
+    if walks is None:
+        return lambda a, b: 0.0
+    ids = walks.index_of()
+
+    def slope(a: str, b: str) -> float:
+        i, j = ids.get(a), ids.get(b)
+        if i is None or j is None:
+            return 0.0
+        lo, hi = int(walks.transfer_ptr[i]), int(walks.transfer_ptr[i + 1])
+        hit = np.flatnonzero(np.asarray(walks.transfer_to[lo:hi]) == j)
+        return float(SLOPE_PENALTY[int(walks.slope_class[lo + hit[0]])]) if len(hit) else 0.0
+
+    return slope
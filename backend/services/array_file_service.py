@@ -0,0 +1,85 @@
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, Tuple
+
+import numpy as np
+
+_ALIGN = 64
+
+# magic (8 bytes) | u64 header length | JSON header | arrays, each 64-byte aligned.
+# Arrays are raw little-endian so the loader can np.memmap them in place.
+
+
+def write_arrays(path: Path, magic: bytes, arrays: Dict[str, np.ndarray], meta: Dict[str, Any]) -> Path:
+    """Write named arrays plus a JSON-able meta dict; atomic via a temp file and rename."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    arrays = {name: np.ascontiguousarray(a, dtype=a.dtype.newbyteorder("<")) for name, a in arrays.items()}
+
+    def layout(header_len: int) -> Dict[str, Any]:
+        offset = _round_up(len(magic) + 8 + header_len)
+        entries = {}
+        for name, a in arrays.items():
+            entries[name] = {"dtype": a.dtype.str, "shape": list(a.shape), "offset": offset}
+            offset = _round_up(offset + a.nbytes)
+        return {"arrays": entries, "meta": meta}
+
+    # the header's own length shifts the offsets; iterate until it is stable
+    header = json.dumps(layout(0)).encode("utf-8")
+    while True:
+        again = json.dumps(layout(len(header))).encode("utf-8")
+        if len(again) == len(header):
+            header = again
+            break
+        header = again
+
+    offsets = {name: spec["offset"] for name, spec in json.loads(header)["arrays"].items()}
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    with open(tmp, "wb") as f:
+        f.write(magic)
+        f.write(len(header).to_bytes(8, "little"))
+        f.write(header)
+        for name, a in arrays.items():
+            f.seek(offsets[name])
+            a.tofile(f)
+        f.truncate(_round_up(f.tell()))
+    os.replace(tmp, path)
+    return path
+
+
+def read_arrays(path: Path, magic: bytes, mmap: bool = True) -> Tuple[Dict[str, np.ndarray], Dict[str, Any]]:
+    """(arrays, meta) from write_arrays; arrays are read-only memory maps unless mmap=False."""
+    path = Path(path)
+    with open(path, "rb") as f:
+        if f.read(len(magic)) != magic:
+            raise ValueError(f"{path} is not a {magic.decode('ascii', 'replace')} file")
+        header = json.loads(f.read(int.from_bytes(f.read(8), "little")))
+    arrays = {}
+    for name, spec in header["arrays"].items():
+        shape = tuple(spec["shape"])
+        if mmap and int(np.prod(shape)) > 0:
+            arrays[name] = np.memmap(path, dtype=np.dtype(spec["dtype"]), mode="r", offset=spec["offset"], shape=shape)
+        else:
+            with open(path, "rb") as f:
+                f.seek(spec["offset"])
+                arrays[name] = np.fromfile(f, dtype=np.dtype(spec["dtype"]), count=int(np.prod(shape))).reshape(shape)
+    return arrays, header.get("meta") or {}
+
+
+def pack_strings(values) -> Tuple[np.ndarray, np.ndarray]:
+    """Strings as one UTF-8 byte array plus offsets (n + 1), so they can live in an array file."""
+    encoded = [v.encode("utf-8") for v in values]
+    ptr = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=ptr[1:])
+    return np.frombuffer(b"".join(encoded), dtype=np.uint8).copy(), ptr
+
+
+def unpack_strings(data: np.ndarray, ptr: np.ndarray) -> list:
+    raw = bytes(np.asarray(data))
+    p = np.asarray(ptr).tolist()
+    return [raw[a:b].decode("utf-8") for a, b in zip(p[:-1], p[1:])]
+
+
+def _round_up(n: int) -> int:
+    return (n + _ALIGN - 1) // _ALIGN * _ALIGN
@@ -3,6 +3,11 @@ import random
 from typing import Dict, Any, Optional, Tuple
 from datetime import datetime, timedelta
 
+from services import eta_service
+from services.badge_service import badge_engine
+from services.leaderboard_service import leaderboard_service
+from services.notification_service import notification_inbox
+
 # Mock environmental and location data
 MOCK_ENVIRONMENT = {
     "location": "Toronto",
@@ -104,6 +109,22 @@ notifications_data = {
     ]
 }
 
+# The assistant speaks for a single demo user
+ASSISTANT_USER_ID = "default"
+
+
+def _seed_notification_inbox() -> None:
+    """Load the mock notifications above into the real inbox, oldest first."""
+    today = datetime.now().date()
+    for day_offset, key in ((1, 'yesterday'), (0, 'today')):
+        day = today - timedelta(days=day_offset)
+        for n in sorted(notifications_data[key], key=lambda n: datetime.strptime(n['time'], '%I:%M %p')):
+            t = datetime.strptime(n['time'], '%I:%M %p').time()
+            notification_inbox.add(ASSISTANT_USER_ID, n['type'], n['message'], created_at=datetime.combine(day, t))
+
+
+_seed_notification_inbox()
+
 # Mock trip data
 trip_data = {
     'monthly_co2_saved': 47.3,
@@ -145,20 +166,8 @@ trip_data = {
     ]
 }
 
-# Mock games data
+# Mock games data; points, streak and badges come from the leaderboard and badge engine (_games_stats)
 games_data = {
-    'total_points': 1247,
-    'day_streak': 7,
-    'badges_earned': 8,
-    'badges_total': 10,
-    'badges': [
-        {'id': 1, 'name': 'First Journey', 'icon': '🚌', 'earned': True, 'description': 'Completed your first eco trip'},
-        {'id': 2, 'name': 'Week Warrior', 'icon': '🔥', 'earned': True, 'description': 'Maintained a 7-day streak'},
-        {'id': 3, 'name': 'Bike Champion', 'icon': '🚲', 'earned': True, 'description': 'Used cycling transport'},
-        {'id': 4, 'name': 'Tree Saver', 'icon': '🌳', 'earned': True, 'description': 'Saved significant CO2'},
-        {'id': 5, 'name': 'Metro Master', 'icon': '🚇', 'earned': False, 'description': 'Use metro transport more'},
-        {'id': 6, 'name': 'Eco Hero', 'icon': '⭐', 'earned': False, 'description': 'Reach advanced environmental goals'}
-    ],
     'weekly_progress': [10, 14, 12, 15],
     'active_challenges': [
         {
@@ -404,12 +413,42 @@ The journey has been started... Start by walking to Shloka Market bus stop at 8:
             "data": {"state": "ready_to_start"}
         }
 
+def _next_accessible_bus() -> Optional[Dict[str, Any]]:
+    """Next wheelchair-accessible bus at Shloka Market predicted from live vehicle positions; None without a feed."""
+    board = eta_service.get_board()
+    stop = MOCK_LOCATIONS["shloka market"]
+    found = board.next_arrival_near(stop["lat"], stop["lon"]) if board else None
+    if found is None:
+        return None
+    _, arrival = found
+    at = board.local_time(arrival)
+    minutes = max(0, round((arrival.eta - datetime.now().timestamp()) / 60))
+    late = f", running {arrival.delay_s // 60} min late" if arrival.delay_s >= 120 else ""
+    return {
+        "time": at.strftime("%I:%M %p").lstrip("0"),
+        "minutes": minutes,
+        "route": f"route {arrival.route}" + (f" to {arrival.headsign}" if arrival.headsign else ""),
+        "late": late,
+        "distance_m": round(arrival.distance_m, -1),
+        "arrival": arrival.to_dict(board.tz),
+    }
+
+
 def handle_journey_updates(text: str) -> Dict[str, Any]:
     """Handle real-time journey updates."""
     user_input = text.lower()
     
     if "shloka market" in user_input or "bus stop" in user_input:
         conversation_states["current_state"] = "at_bus_stop"
+        bus = _next_accessible_bus()
+        if bus:
+            response = f"""Perfect! You're at Shloka Market bus stop.
+
+Please wait... The next accessible bus, {bus['route']}, will arrive at {bus['time']}{bus['late']}. It is about {bus['distance_m']:.0f} meters away from your stop."""
+            return {
+                "response": response,
+                "data": {"state": "at_bus_stop", "arrival": bus["arrival"]}
+            }
         
         response = """Perfect! You're at Shloka Market bus stop.
 
@@ -442,6 +481,13 @@ We are tracking your stops now..."""
             "data": {"state": "on_bus", "stops_remaining": 3}
         }
     else:
+        bus = _next_accessible_bus()
+        if bus:
+            return {
+                "response": f"The next accessible bus, {bus['route']}, is due at {bus['time']} "
+                            f"(in {bus['minutes']} min){bus['late']}. Please wait at the bus stop.",
+                "data": {"state": "at_bus_stop", "arrival": bus["arrival"]}
+            }
         return {
             "response": "The bus should be arriving any moment now at 8:10 PM. Please wait at the bus stop.",
             "data": {"state": "at_bus_stop"}
@@ -725,8 +771,9 @@ def handle_notifications_time_selection(text: str) -> Dict[str, Any]:
             "data": {"state": "notifications_menu"}
         }
     
-    # Get notifications for selected timeframe
-    notifications = notifications_data.get(selected_timeframe, [])
+    # Get notifications for selected timeframe from the user's day partition
+    day = datetime.now().date() - timedelta(days=0 if selected_timeframe == 'today' else 1)
+    notifications = notification_inbox.page(ASSISTANT_USER_ID, limit=20, day=day)["notifications"]
     conversation_states["current_state"] = "showing_notifications" 
     conversation_states["selected_timeframe"] = selected_timeframe
     
@@ -897,15 +944,28 @@ def handle_trips_response(text: str) -> Dict[str, Any]:
             "data": {"state": "showing_trips"}
         }
 
+def _games_stats() -> Dict[str, Any]:
+    """games_data with the assistant user's real points, day streak and badges."""
+    badges = badge_engine.badges(ASSISTANT_USER_ID)
+    return {
+        **games_data,
+        'total_points': int(leaderboard_service.totals(ASSISTANT_USER_ID)['points']),
+        'day_streak': badge_engine.current_streak(ASSISTANT_USER_ID),
+        'badges_earned': sum(1 for b in badges if b['earned']),
+        'badges_total': len(badges),
+        'badges': badges,
+    }
+
 def handle_games_request() -> Dict[str, Any]:
     """Handle user's request to access games and eco coach."""
     conversation_states["current_state"] = "games_menu"
+    stats = _games_stats()
     
     response = f"""Welcome to Eco Coach! Here are your current stats...
 
-You have {games_data['total_points']} total points and a {games_data['day_streak']}-day streak! 🔥
+You have {stats['total_points']} total points and a {stats['day_streak']}-day streak! 🔥
 
-You have earned {games_data['badges_earned']} badges so far.
+You have earned {stats['badges_earned']} badges so far.
 
 You have 2 playable games available:
 - CO2 Clicker: Offset emissions by voice
@@ -917,7 +977,7 @@ What would you like to do? You can say 'play CO2 clicker', 'play trivia', 'check
     
     return {
         "response": response,
-        "data": {"state": "games_menu", "games_data": games_data}
+        "data": {"state": "games_menu", "games_data": stats}
     }
 
 def handle_games_menu_selection(text: str) -> Dict[str, Any]:
@@ -957,10 +1017,11 @@ Say the letter A, B, C, or D, or say the full answer."""
     elif any(phrase in user_input for phrase in ['badges', 'check badges', 'my badges']):
         conversation_states["current_state"] = "showing_badges"
         
-        earned_badges = [badge for badge in games_data['badges'] if badge['earned']]
-        unearned_badges = [badge for badge in games_data['badges'] if not badge['earned']]
+        badges = badge_engine.badges(ASSISTANT_USER_ID)
+        earned_badges = [badge for badge in badges if badge['earned']]
+        unearned_badges = [badge for badge in badges if not badge['earned']]
         
-        response = f"You have earned {len(earned_badges)} badges out of {len(games_data['badges'])}:\n\n✅ Completed badges:\n"
+        response = f"You have earned {len(earned_badges)} badges out of {len(badges)}:\n\n✅ Completed badges:\n"
         for badge in earned_badges[:4]:  # Show first 4 earned
             response += f"- {badge['name']}: {badge['description']}\n"
         
@@ -0,0 +1,211 @@
+from dataclasses import dataclass, field
+from datetime import date
+from typing import Callable, Dict, Iterable, List, Optional, Set
+
+# Day 0 of every streak bitmap. Bit i of a user's bitmap = "had a trip on EPOCH + i days".
+EPOCH = date(2024, 1, 1)
+
+SUSTAINABLE_MODES = {"bus", "walk", "bike", "subway", "train", "skytrain", "electric"}
+RAIL_MODES = {"subway", "train", "skytrain", "mrt", "lrt"}
+
+
+@dataclass
+class TripEvent:
+    user_id: str
+    day: date
+    mode: str
+    distance_km: float
+    co2_saved_kg: float
+    points: int
+
+
+@dataclass(frozen=True)
+class BadgeRule:
+    badge_id: str
+    name: str
+    icon: str
+    description: str
+    depends_on: tuple
+    check: Callable[[Dict[str, float]], bool]
+
+
+# Same catalogue the assistant and /stats endpoints show, now with real conditions.
+DEFAULT_RULES: List[BadgeRule] = [
+    BadgeRule("first_journey", "First Journey", "🚌", "Completed your first eco trip",
+              ("sustainable_trips",), lambda c: c["sustainable_trips"] >= 1),
+    BadgeRule("week_warrior", "Week Warrior", "🔥", "Maintained a 7-day streak",
+              ("current_streak",), lambda c: c["current_streak"] >= 7),
+    BadgeRule("bike_champion", "Bike Champion", "🚲", "Used cycling transport",
+              ("mode:bike",), lambda c: c["mode:bike"] >= 1),
+    BadgeRule("eco_warrior", "Eco Warrior", "🌿", "Completed 10 sustainable trips",
+              ("sustainable_trips",), lambda c: c["sustainable_trips"] >= 10),
+    BadgeRule("tree_saver", "Tree Saver", "🌳", "Saved as much CO2 as a tree absorbs in a year (22 kg)",
+              ("co2_saved_kg",), lambda c: c["co2_saved_kg"] >= 22.0),
+    BadgeRule("metro_master", "Metro Master", "🚇", "Took 20 rail trips",
+              ("rail_trips",), lambda c: c["rail_trips"] >= 20),
+    BadgeRule("carbon_hero", "Carbon Hero", "🦸", "Saved 100kg of CO2",
+              ("co2_saved_kg",), lambda c: c["co2_saved_kg"] >= 100.0),
+    BadgeRule("eco_hero", "Eco Hero", "⭐", "Reach advanced environmental goals",
+              ("co2_saved_kg", "longest_streak"), lambda c: c["co2_saved_kg"] >= 250.0 and c["longest_streak"] >= 30),
+]
+
+
+class _Counters(dict):
+    """Missing counters read as 0 so rules never KeyError."""
+
+    def __missing__(self, key: str) -> float:
+        return 0
+
+
+@dataclass
+class UserProgress:
+    counters: _Counters = field(default_factory=_Counters)
+    earned: Dict[str, date] = field(default_factory=dict)
+    bitmap: int = 0
+    last_day: Optional[int] = None
+
+
+class BadgeEngine:
+    """
+    Incremental badge/streak evaluation.
+
+    Each trip event bumps a handful of counters; only rules that depend on one
+    of those counters are re-checked, and earned badges are never re-checked.
+    """
+
+    def __init__(self, rules: Optional[List[BadgeRule]] = None) -> None:
+        self.rules = list(rules or DEFAULT_RULES)
+        self._by_counter: Dict[str, List[BadgeRule]] = {}
+        for rule in self.rules:
+            for counter in rule.depends_on:
+                self._by_counter.setdefault(counter, []).append(rule)
+        self._users: Dict[str, UserProgress] = {}
+
+    def has_user(self, user_id: str) -> bool:
+        return user_id in self._users
+
+    # ---------- streak bitmap ----------
+    @staticmethod
+    def _day_index(d: date) -> int:
+        return (d - EPOCH).days
+
+    @staticmethod
+    def _streak_ending_at(bitmap: int, idx: int) -> int:
+        if idx < 0:
+            return 0
+        full = (1 << (idx + 1)) - 1
+        gaps = ~bitmap & full
+        return idx + 1 - gaps.bit_length()
+
+    def _mark_day(self, p: UserProgress, d: date) -> Set[str]:
+        idx = self._day_index(d)
+        if idx < 0:
+            raise ValueError(f"Trip date {d} is before the streak epoch {EPOCH}")
+        bit = 1 << idx
+        if p.bitmap & bit:
+            return set()
+        p.bitmap |= bit
+        c = p.counters
+        c["active_days"] += 1
+
+        if p.last_day is None or idx > p.last_day:
+            c["current_streak"] = c["current_streak"] + 1 if p.last_day == idx - 1 else 1
+            p.last_day = idx
+        else:
+            # Back-filled day may join two runs; recount from the bitmap.
+            c["current_streak"] = self._streak_ending_at(p.bitmap, p.last_day)
+            run = self._streak_ending_at(p.bitmap, idx)
+            end = idx + 1
+            while p.bitmap >> end & 1:
+                end += 1
+                run += 1
+            c["longest_streak"] = max(c["longest_streak"], run)
+
+        c["longest_streak"] = max(c["longest_streak"], c["current_streak"])
+        return {"active_days", "current_streak", "longest_streak"}
+
+    def current_streak(self, user_id: str, today: Optional[date] = None) -> int:
+        """Streak as seen on `today`: still alive if the last trip was today or yesterday."""
+        p = self._users.get(user_id)
+        if p is None or p.last_day is None:
+            return 0
+        today_idx = self._day_index(today or date.today())
+        if today_idx - p.last_day > 1:
+            return 0
+        return int(p.counters["current_streak"])
+
+    def active_days_between(self, user_id: str, start: date, end: date) -> int:
+        p = self._users.get(user_id)
+        if p is None:
+            return 0
+        lo = max(0, self._day_index(start))
+        hi = self._day_index(end)
+        if hi < lo:
+            return 0
+        window = (p.bitmap >> lo) & ((1 << (hi - lo + 1)) - 1)
+        return bin(window).count("1")
+
+    # ---------- events ----------
+    def apply(self, event: TripEvent) -> List[Dict[str, str]]:
+        """Apply one trip event; return the badges it newly unlocked."""
+        p = self._users.setdefault(event.user_id, UserProgress())
+        c = p.counters
+        mode = (event.mode or "").lower().strip()
+
+        changed = {"trips", f"mode:{mode}", "points", "co2_saved_kg", "distance_km"}
+        c["trips"] += 1
+        c[f"mode:{mode}"] += 1
+        c["points"] += int(event.points)
+        c["co2_saved_kg"] += float(event.co2_saved_kg)
+        c["distance_km"] += float(event.distance_km)
+        if mode in SUSTAINABLE_MODES:
+            c["sustainable_trips"] += 1
+            changed.add("sustainable_trips")
+        if mode in RAIL_MODES:
+            c["rail_trips"] += 1
+            changed.add("rail_trips")
+        changed |= self._mark_day(p, event.day)
+
+        unlocked: List[Dict[str, str]] = []
+        seen: Set[str] = set()
+        for counter in sorted(changed):
+            for rule in self._by_counter.get(counter, ()):
+                if rule.badge_id in p.earned or rule.badge_id in seen:
+                    continue
+                seen.add(rule.badge_id)
+                if rule.check(c):
+                    p.earned[rule.badge_id] = event.day
+                    unlocked.append(self._badge_dict(rule, event.day))
+        return unlocked
+
+    def rebuild(self, events: Iterable[TripEvent]) -> int:
+        """Drop all state and replay an event log. Returns the number of events applied."""
+        self._users = {}
+        n = 0
+        for e in events:
+            self.apply(e)
+            n += 1
+        return n
+
+    # ---------- reads ----------
+    @staticmethod
+    def _badge_dict(rule: BadgeRule, earned_on: Optional[date]) -> Dict[str, str]:
+        return {
+            "badge_id": rule.badge_id,
+            "name": rule.name,
+            "icon": rule.icon,
+            "description": rule.description,
+            "earned": earned_on is not None,
+            "earned_on": earned_on.isoformat() if earned_on else None,
+        }
+
+    def badges(self, user_id: str) -> List[Dict[str, str]]:
+        p = self._users.get(user_id) or UserProgress()
+        return [self._badge_dict(r, p.earned.get(r.badge_id)) for r in self.rules]
+
+    def counters(self, user_id: str) -> Dict[str, float]:
+        p = self._users.get(user_id)
+        return dict(p.counters) if p else {}
+
+
+badge_engine = BadgeEngine()
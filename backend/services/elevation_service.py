@@ -0,0 +1,183 @@
+import math
+import os
+import re
+from itertools import chain
+from pathlib import Path
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+DATA_DIR = Path(__file__).resolve().parents[1] / "data"
+DEM_DIR = Path(os.getenv("DEM_DIR", str(DATA_DIR / "dem")))
+
+# ADA: ramps steeper than 1:12 need handrails/landings; 5% is where effort becomes noticeable.
+GRADE_WARN = float(os.getenv("ROUTE_GRADE_WARN", "0.05"))
+GRADE_STEEP = float(os.getenv("ROUTE_GRADE_STEEP", "0.083"))
+
+_HGT_NAME = re.compile(r"^([NS])(\d{2})([EW])(\d{3})\.hgt$", re.IGNORECASE)
+_VOID = -32768
+_M_PER_DEG_LAT = 111_320.0
+
+TileKey = Tuple[int, int]
+
+
+def _tile_key(name: str) -> Optional[TileKey]:
+    m = _HGT_NAME.match(name)
+    if not m:
+        return None
+    lat = int(m.group(2)) * (1 if m.group(1).upper() == "N" else -1)
+    lon = int(m.group(4)) * (1 if m.group(3).upper() == "E" else -1)
+    return lat, lon
+
+
+class DemTileSet:
+    """
+    SRTM-style .hgt tiles (1x1 degree, big-endian int16, north row first) opened as
+    read-only memory maps on first touch. Only the pages a route crosses are read.
+    """
+
+    def __init__(self, directory: Optional[Path] = None) -> None:
+        self.directory = Path(directory) if directory else DEM_DIR
+        self._paths: Dict[TileKey, Path] = {}
+        self._tiles: Dict[TileKey, np.ndarray] = {}
+        side = 0
+        if self.directory.is_dir():
+            for p in self.directory.iterdir():
+                key = _tile_key(p.name)
+                if key is not None:
+                    self._paths[key] = p
+                    side = max(side, math.isqrt(p.stat().st_size // 2))
+        # ground spacing of the finest tile grid (1" SRTM ~31 m, 3" ~93 m)
+        self.resolution_m = _M_PER_DEG_LAT / (side - 1) if side > 1 else 30.0
+
+    def __len__(self) -> int:
+        return len(self._paths)
+
+    def _tile(self, key: TileKey) -> Optional[np.ndarray]:
+        tile = self._tiles.get(key)
+        if tile is None:
+            path = self._paths.get(key)
+            if path is None:
+                return None
+            side = int(math.isqrt(path.stat().st_size // 2))
+            if side * side * 2 != path.stat().st_size:
+                raise ValueError(f"{path} is not a square int16 grid")
+            # plain ndarray view of the map: same pages, without memmap's per-index overhead
+            tile = np.memmap(path, dtype=">i2", mode="r", shape=(side, side)).view(np.ndarray)
+            self._tiles[key] = tile
+        return tile
+
+    def sample(self, lat: np.ndarray, lon: np.ndarray) -> np.ndarray:
+        """Bilinear elevation (m) at each point; NaN where there is no tile or data is void."""
+        lat = np.asarray(lat, dtype=np.float64)
+        lon = np.asarray(lon, dtype=np.float64)
+        out = np.full(lat.shape, np.nan)
+        tlat = np.floor(lat).astype(np.int64)
+        tlon = np.floor(lon).astype(np.int64)
+        keys = tlat * 1000 + tlon
+        for key in np.unique(keys):
+            sel = keys == key
+            k = (int(tlat[sel][0]), int(tlon[sel][0]))
+            tile = self._tile(k)
+            if tile is None:
+                continue
+            n = tile.shape[0] - 1
+            # fractional pixel position; row 0 is the tile's north edge
+            r = (k[0] + 1 - lat[sel]) * n
+            c = (lon[sel] - k[1]) * n
+            r0 = np.clip(np.floor(r).astype(np.int64), 0, n - 1)
+            c0 = np.clip(np.floor(c).astype(np.int64), 0, n - 1)
+            fr = r - r0
+            fc = c - c0
+            z00 = tile[r0, c0].astype(np.float64)
+            z01 = tile[r0, c0 + 1].astype(np.float64)
+            z10 = tile[r0 + 1, c0].astype(np.float64)
+            z11 = tile[r0 + 1, c0 + 1].astype(np.float64)
+            z = (z00 * (1 - fr) * (1 - fc) + z01 * (1 - fr) * fc
+                 + z10 * fr * (1 - fc) + z11 * fr * fc)
+            void = (z00 == _VOID) | (z01 == _VOID) | (z10 == _VOID) | (z11 == _VOID)
+            z[void] = np.nan
+            out[sel] = z
+        return out
+
+
+def _densify(coords: np.ndarray, step_m: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Insert points so no piece is longer than step_m. Returns points, piece lengths, owning segment."""
+    lat0 = math.radians(float(coords[:, 1].mean()))
+    dx = np.diff(coords[:, 0]) * _M_PER_DEG_LAT * math.cos(lat0)
+    dy = np.diff(coords[:, 1]) * _M_PER_DEG_LAT
+    seg_len = np.hypot(dx, dy)
+    parts = np.maximum(1, np.ceil(seg_len / step_m).astype(np.int64))
+    seg = np.repeat(np.arange(len(seg_len)), parts)
+    # position of each piece start within its segment, as a fraction
+    first = np.cumsum(parts) - parts
+    t = (np.arange(len(seg)) - first[seg]) / parts[seg]
+    starts = coords[seg] + (coords[seg + 1] - coords[seg]) * t[:, None]
+    pts = np.vstack([starts, coords[-1:]])
+    return pts, seg_len[seg] / parts[seg], seg
+
+
+def grade_profile(
+    dem: DemTileSet,
+    coords: Sequence[Sequence[float]],
+    warn: float = GRADE_WARN,
+    steep: float = GRADE_STEEP,
+) -> Optional[Dict[str, Any]]:
+    """
+    Per-segment grade along [lon, lat] coords. Long segments are densified to the DEM
+    spacing so a hill inside one straight segment still shows up in its max grade.
+    None when the route is off the loaded tiles.
+    """
+    if isinstance(coords, np.ndarray):
+        c = coords.astype(np.float64, copy=False)
+    else:
+        c = np.fromiter(chain.from_iterable(coords), dtype=np.float64, count=2 * len(coords)).reshape(-1, 2)
+    if len(c) < 2:
+        return None
+    pts, piece_len, seg = _densify(c, dem.resolution_m)
+    z = dem.sample(pts[:, 1], pts[:, 0])
+    if np.isnan(z).any():
+        return None
+
+    dz = np.diff(z)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        piece_grade = np.where(piece_len > 0, dz / piece_len, 0.0)
+    n_seg = len(c) - 1
+    starts = np.searchsorted(seg, np.arange(n_seg))
+    seg_len = np.add.reduceat(piece_len, starts)
+    seg_rise = np.add.reduceat(dz, starts)
+    seg_max = np.maximum.reduceat(np.abs(piece_grade), starts)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        net = np.where(seg_len > 0, seg_rise / seg_len, 0.0)
+
+    return {
+        "elevation_m": np.round(z[np.r_[starts, len(z) - 1]], 1).tolist(),
+        "grade": np.round(net, 3).tolist(),
+        "max_grade": np.round(seg_max, 3).tolist(),
+        "steep_segments": np.flatnonzero(seg_max > steep).tolist(),
+        "moderate_segments": np.flatnonzero((seg_max > warn) & (seg_max <= steep)).tolist(),
+        "climb_m": round(float(dz[dz > 0].sum()), 1),
+        "descent_m": round(float(-dz[dz < 0].sum()), 1),
+        "route_max_grade": round(float(seg_max.max()), 3),
+        "thresholds": {"warn": warn, "steep": steep},
+    }
+
+
+def edge_grades(dem: DemTileSet, lat_u, lon_u, lat_v, lon_v, length_m) -> np.ndarray:
+    """Signed u->v grade for many edges at once; NaN off the DEM."""
+    zu = dem.sample(lat_u, lon_u)
+    zv = dem.sample(lat_v, lon_v)
+    length = np.asarray(length_m, dtype=np.float64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(length > 0, (zv - zu) / length, 0.0)
+
+
+_dem: Optional[DemTileSet] = None
+
+
+def get_dem() -> Optional[DemTileSet]:
+    """Shared tile set for DEM_DIR; None when no tiles are installed."""
+    global _dem
+    if _dem is None:
+        _dem = DemTileSet()
+    return _dem if len(_dem) else None
@@ -0,0 +1,343 @@
+import bisect
+import os
+import threading
+import time
+from dataclasses import asdict, dataclass
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from services import gtfs_service, realtime_service
+from services.gtfs_service import NO_TIME, WC_YES, Timetable, locate_on_line
+from services.stop_index_service import get_stop_index
+
+# GTFS-realtime VehiclePositions source: an http(s) URL or a local file.
+VEHICLE_POSITIONS_SOURCE = os.getenv("GTFS_RT_VEHICLE_POSITIONS", "")
+# Arrivals predicted further ahead than this are not kept.
+ETA_HORIZON_S = int(os.getenv("ETA_HORIZON_S", "5400"))
+# A vehicle further than this from its trip's line is off it (detour, wrong trip): no prediction.
+MAX_OFF_LINE_M = 150.0
+# Positions this much older than the feed are left out.
+MAX_POSITION_AGE_S = 300
+# A stop this little behind the vehicle still counts as ahead (GPS noise at the kerb).
+AT_STOP_M = 15.0
+# An arrival stays on the board this long after its predicted time, for a bus that is pulling in.
+ARRIVED_GRACE_S = 30
+# Stops within this of the rider are "my stop".
+NEAR_STOP_RADIUS_M = 300.0
+
+STOPPED_AT = 1                                   # VehiclePosition.current_status
+VEHICLE_ACCESSIBLE, VEHICLE_INACCESSIBLE = 2, 3  # VehicleDescriptor.wheelchair_accessible
+
+
+@dataclass
+class Arrival:
+    """One vehicle's predicted arrival at one stop."""
+    stop: int
+    stop_id: str
+    eta: int                 # POSIX seconds
+    trip_id: str
+    route_id: str
+    route: str
+    mode: str
+    headsign: str
+    vehicle_id: str
+    wheelchair_accessible: bool
+    delay_s: int
+    distance_m: float        # along the line, from the vehicle to the stop
+
+    def to_dict(self, tz=None) -> Dict[str, Any]:
+        out = asdict(self)
+        del out["stop"]
+        out["eta"] = datetime.fromtimestamp(self.eta, tz).isoformat()
+        out["distance_m"] = round(self.distance_m)
+        return out
+
+
+class ArrivalBoard:
+    """
+    Predicted arrivals from one VehiclePositions feed, by stop. Built once per
+    feed tick and never modified, so readers take no lock.
+
+    Arrivals are columns (stop, eta, distance, vehicle); per-vehicle fields sit
+    in `vehicles`. For each (mode, accessible) filter the matching rows are
+    grouped by stop, soonest first, so "next accessible bus at my stop" is a
+    dict lookup and the head of one run. Arrival objects are only made for
+    what a lookup returns.
+    """
+
+    def __init__(self, tt: Timetable, stop: np.ndarray, eta: np.ndarray, distance_m: np.ndarray, vehicle: np.ndarray,
+                 vehicles: List[Dict[str, Any]], timestamp: float, version: int = 0,
+                 stats: Optional[Dict[str, Any]] = None) -> None:
+        self.tt = tt
+        self.tz = realtime_service.feed_timezone(tt)
+        self.timestamp = timestamp
+        self.version = version
+        self.stats = stats or {}
+        self.stop, self.eta, self.distance_m, self.vehicle = stop, eta, distance_m, vehicle
+        self._columns = tuple(memoryview(np.ascontiguousarray(c)) for c in (stop, eta, distance_m, vehicle))
+        self.vehicles = vehicles
+        self._stop_ids = tt.strings("stop_id")
+        order = np.lexsort((eta, stop))
+        v_accessible = np.asarray([v["wheelchair_accessible"] for v in vehicles], dtype=bool)
+        v_mode = np.asarray([v["mode"] for v in vehicles], dtype=object)
+        boundaries = np.arange(tt.n_stops + 1)
+        self._runs: Dict[Tuple[Optional[str], bool], Tuple[memoryview, memoryview, List[int]]] = {}
+        for mode in [None, *sorted(set(v_mode.tolist()))]:
+            for accessible in (False, True):
+                ok = np.ones(len(vehicles), dtype=bool) if mode is None else v_mode == mode
+                if accessible:
+                    ok &= v_accessible
+                rows = order[ok[vehicle[order]]] if len(vehicles) else order
+                ptr = np.searchsorted(stop[rows], boundaries)
+                self._runs[(mode, accessible)] = (memoryview(np.ascontiguousarray(eta[rows])), memoryview(ptr),
+                                                  rows.tolist())
+
+    def __len__(self) -> int:
+        return len(self.eta)
+
+    def _arrival(self, row: int) -> Arrival:
+        stop, eta, distance_m, vehicle = self._columns
+        v = self.vehicles[vehicle[row]]
+        return Arrival(stop[row], self._stop_ids[stop[row]], eta[row], v["trip_id"], v["route_id"], v["route"], v["mode"],
+                       v["headsign"], v["vehicle_id"], v["wheelchair_accessible"], v["delay_s"], distance_m[row])
+
+    def _run(self, stop: int, accessible: bool, mode: Optional[str], now: Optional[float]) -> Tuple[int, int, list]:
+        """(first, end, rows): the run's arrivals still to come are rows[first:end]."""
+        run = self._runs.get((mode, accessible))
+        if run is None:
+            return 0, 0, []
+        eta, ptr, rows = run
+        now = time.time() if now is None else now
+        # only arrivals that have gone by since the tick are skipped
+        return bisect.bisect_left(eta, now - ARRIVED_GRACE_S, ptr[stop], ptr[stop + 1]), ptr[stop + 1], rows
+
+    def arrivals(self, stop: int, accessible: bool = False, mode: Optional[str] = None,
+                 now: Optional[float] = None, limit: int = 10) -> List[Arrival]:
+        """Upcoming arrivals at stop index `stop`, soonest first."""
+        first, end, rows = self._run(stop, accessible, mode, now)
+        return [self._arrival(r) for r in rows[first:min(end, first + limit)]]
+
+    def next_arrival(self, stop: int, accessible: bool = False, mode: Optional[str] = None,
+                     now: Optional[float] = None) -> Optional[Arrival]:
+        first, end, rows = self._run(stop, accessible, mode, now)
+        return self._arrival(rows[first]) if first < end else None
+
+    def next_arrival_near(self, lat: float, lon: float, accessible: bool = True, mode: Optional[str] = "bus",
+                          radius_m: float = NEAR_STOP_RADIUS_M,
+                          now: Optional[float] = None) -> Optional[Tuple[Dict[str, Any], Arrival]]:
+        """(stop, arrival) of the next matching vehicle at the nearest stop within radius_m that has one."""
+        ids = self.tt.index_of("stop_id")
+        for stop in get_stop_index().nearest(lat, lon, k=5, max_distance_m=radius_m):
+            s = ids.get(stop["stop_id"])
+            a = self.next_arrival(s, accessible, mode, now) if s is not None else None
+            if a is not None:
+                return stop, a
+        return None
+
+    def local_time(self, a: Arrival) -> datetime:
+        return datetime.fromtimestamp(a.eta, self.tz)
+
+
+class _Predictor:
+    """Projects vehicles onto their trip's line and carries their schedule deviation to the stops ahead."""
+
+    def __init__(self, tt: Timetable, now: float) -> None:
+        self.tt = tt
+        self.now = now
+        self.tz = realtime_service.feed_timezone(tt)
+        self.trip_ids = tt.index_of("trip_id")
+        self.headsigns = tt.strings("trip_headsign")
+        # plain ndarrays: slicing a memmap costs more than the work per vehicle
+        self.arrival, self.departure = np.asarray(tt.arrival), np.asarray(tt.departure)
+        self.pattern_stops, self.pattern_stop_dist = np.asarray(tt.pattern_stops), np.asarray(tt.pattern_stop_dist)
+        self.pattern_stop_seq = np.asarray(tt.pattern_stop_seq)
+        self.v = tt.views()
+        self.trip_pattern = memoryview(np.ascontiguousarray(tt.trip_pattern))
+        self.trip_route = memoryview(np.ascontiguousarray(tt.trip_route))
+        self._lines: Dict[int, Tuple[np.ndarray, np.ndarray, np.ndarray]] = {}
+        self._origins: Dict[date, int] = {}
+
+    def origin(self, day: date) -> int:
+        t = self._origins.get(day)
+        if t is None:
+            t = self._origins[day] = realtime_service.day_origin(day, self.tz)
+        return t
+
+    def line(self, p: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        line = self._lines.get(p)
+        if line is None:
+            line = self._lines[p] = self.tt.pattern_line(p)
+        return line
+
+    def service_day(self, trip, ts: float, first: int, last: int) -> date:
+        """The trip's start_date; without one, whichever of today and yesterday has the trip running nearest `ts`."""
+        d = trip.start_date
+        if len(d) == 8 and d.isdigit():
+            return date(int(d[:4]), int(d[4:6]), int(d[6:]))
+        today = datetime.fromtimestamp(ts, self.tz).date()
+        best, gap = today, None
+        for day in (today, today - timedelta(days=1)):
+            o = self.origin(day)
+            g = max(o + first - ts, ts - (o + last), 0)
+            if gap is None or g < gap:
+                best, gap = day, g
+        return best
+
+    def vehicle(self, vp, ts: float) -> Tuple[str, Optional[tuple]]:
+        """(outcome, (stops, etas, metres to go, vehicle fields)) for one VehiclePosition."""
+        tt = self.tt
+        t = self.trip_ids.get(vp.trip.trip_id)
+        if t is None or not vp.HasField("position"):
+            return "unmatched", None
+        v = self.v
+        p = self.trip_pattern[t]
+        s_lo, s_hi = v["pattern_stop_ptr"][p], v["pattern_stop_ptr"][p + 1]
+        t_lo = v["pattern_trip_ptr"][p]
+        nt = v["pattern_trip_ptr"][p + 1] - t_lo
+        at = v["pattern_time_ptr"][p] + np.arange(s_hi - s_lo) * nt + (t - t_lo)
+        arr, dep = self.arrival[at].astype(np.int64), self.departure[at].astype(np.int64)
+        day = self.service_day(vp.trip, ts, int(dep[0]), int(arr[-1]))
+        patched = tt.patched(day).get(p)
+        skipped = np.zeros(len(arr), dtype=bool)
+        if patched is not None:
+            skipped = np.asarray(patched[0])[at - v["pattern_time_ptr"][p]] == NO_TIME
+
+        sd = self.pattern_stop_dist[s_lo:s_hi]
+        line_lat, line_lon, line_dist = self.line(p)
+        lat, lon = float(vp.position.latitude), float(vp.position.longitude)
+        j = self.hint(vp, p, s_lo, s_hi)
+        along, off = None, None
+        if j is not None:
+            # the segments between the previous stop and the one the feed names
+            i0 = max(int(np.searchsorted(line_dist, sd[max(j - 1, 0)] - AT_STOP_M, side="right")) - 1, 0)
+            i1 = int(np.searchsorted(line_dist, sd[j] + AT_STOP_M, side="left")) + 1
+            along, off, _ = locate_on_line(lat, lon, line_lat[i0:i1], line_lon[i0:i1], line_dist[i0:i1])
+        if off is None or off > MAX_OFF_LINE_M:
+            along, off, _ = locate_on_line(lat, lon, line_lat, line_lon, line_dist)
+            if off > MAX_OFF_LINE_M:
+                return "off_line", None
+        if j is not None and vp.current_status == STOPPED_AT:
+            along = float(sd[j])
+
+        # where the schedule has the trip at `along`, so how late it is there
+        k = int(np.searchsorted(sd, along, side="right"))
+        o = self.origin(day)
+        if k == 0:
+            sched = dep[0]
+        elif k == len(sd):
+            sched = arr[-1]
+        else:
+            span = max(float(sd[k] - sd[k - 1]), 1e-6)
+            sched = dep[k - 1] + (along - sd[k - 1]) / span * (arr[k] - dep[k - 1])
+        delay = int(round(ts - o - sched))
+        if along <= sd[0]:
+            # waiting at the terminal: it will not leave early
+            delay = max(delay, 0)
+
+        ahead = np.flatnonzero((sd >= along - AT_STOP_M) & ~skipped)
+        if not len(ahead):
+            return "finished", None
+        eta = np.maximum.accumulate(np.maximum(o + arr[ahead] + delay, int(ts)))
+        keep = eta <= self.now + ETA_HORIZON_S
+        route = tt.routes[self.trip_route[t]]
+        wc = vp.vehicle.wheelchair_accessible
+        accessible = (wc == VEHICLE_ACCESSIBLE) if wc in (VEHICLE_ACCESSIBLE, VEHICLE_INACCESSIBLE) \
+            else v["trip_wheelchair"][t] == WC_YES
+        ahead = ahead[keep]
+        fields = {"trip_id": vp.trip.trip_id, "route_id": route["route_id"], "route": route["short_name"] or route["long_name"],
+                  "mode": route["mode"], "headsign": self.headsigns[t], "vehicle_id": vp.vehicle.id or vp.vehicle.label,
+                  "wheelchair_accessible": accessible, "delay_s": delay}
+        return "predicted", (self.pattern_stops[s_lo:s_hi][ahead], eta[keep], np.maximum(sd[ahead] - along, 0.0),
+                             fields)
+
+    def hint(self, vp, p: int, s_lo: int, s_hi: int) -> Optional[int]:
+        """Position in the pattern of the stop the vehicle reports it is at or heading to."""
+        tt = self.tt
+        if vp.HasField("current_stop_sequence"):
+            seqs = self.pattern_stop_seq[s_lo:s_hi]
+            j = int(np.searchsorted(seqs, vp.current_stop_sequence))
+            if j < len(seqs) and seqs[j] == vp.current_stop_sequence:
+                return j
+        if vp.stop_id:
+            s = tt.index_of("stop_id").get(vp.stop_id)
+            if s is not None:
+                hits = np.flatnonzero(self.pattern_stops[s_lo:s_hi] == s)
+                if len(hits):
+                    return int(hits[0])
+        return None
+
+
+def build_board(tt: Timetable, feed, now: Optional[float] = None, version: int = 0) -> ArrivalBoard:
+    """An ArrivalBoard from a VehiclePositions feed. A trip several vehicles claim keeps its latest position."""
+    now = time.time() if now is None else now
+    feed_ts = float(feed.header.timestamp or now)
+    latest: Dict[str, Tuple[float, Any]] = {}
+    for entity in feed.entity:
+        if entity.is_deleted or not entity.HasField("vehicle"):
+            continue
+        vp = entity.vehicle
+        ts = float(vp.timestamp or feed_ts)
+        key = vp.trip.trip_id
+        if key not in latest or ts > latest[key][0]:
+            latest[key] = (ts, vp)
+    predictor = _Predictor(tt, now)
+    stats = {"vehicles": len(latest), "predicted": 0, "unmatched": 0, "off_line": 0, "finished": 0, "stale": 0}
+    stops, etas, dists, vehicles = [], [], [], []
+    for ts, vp in latest.values():
+        if feed_ts - ts > MAX_POSITION_AGE_S:
+            stats["stale"] += 1
+            continue
+        outcome, found = predictor.vehicle(vp, ts)
+        stats[outcome] += 1
+        if found is not None:
+            stops.append(found[0])
+            etas.append(found[1])
+            dists.append(found[2])
+            vehicles.append(found[3])
+    counts = [len(s) for s in stops]
+    stats["arrivals"] = sum(counts)
+    return ArrivalBoard(tt, np.concatenate(stops or [np.empty(0, dtype=np.int32)]).astype(np.int64),
+                        np.concatenate(etas or [np.empty(0, dtype=np.int64)]).astype(np.int64),
+                        np.concatenate(dists or [np.empty(0)]),
+                        np.repeat(np.arange(len(vehicles)), counts), vehicles, feed_ts, version, stats)
+
+
+_board: Optional[ArrivalBoard] = None
+_write_lock = threading.Lock()
+
+
+def get_board() -> Optional[ArrivalBoard]:
+    """The latest board, if it was built on the timetable that is loaded now."""
+    board = _board
+    if board is not None and getattr(board.tt, "base", board.tt) is gtfs_service.get_timetable():
+        return board
+    return None
+
+
+def refresh(source: Optional[str] = None, now: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Fetch and decode the VehiclePositions feed (GTFS_RT_VEHICLE_POSITIONS by
+    default), predict and publish a new board. LookupError if there is no
+    timetable or no source; ValueError if the feed does not decode.
+    """
+    global _board
+    source = VEHICLE_POSITIONS_SOURCE if source is None else source
+    if not source:
+        raise LookupError("No VehiclePositions source configured (GTFS_RT_VEHICLE_POSITIONS).")
+    with _write_lock:
+        tt = gtfs_service.get_timetable()
+        if tt is None:
+            raise LookupError("No GTFS timetable loaded. Run scripts/import_gtfs.py first.")
+        t0 = time.perf_counter()
+        feed = realtime_service.parse_feed(realtime_service.read_source(source))
+        t1 = time.perf_counter()
+        version = (_board.version + 1) if _board is not None else 1
+        # predictions use the live timetable's skipped stops, on the static schedule
+        board = build_board(realtime_service.live_timetable(), feed, now, version)
+        _board = board
+        return {"version": version, **board.stats,
+                "timings": {"decode_ms": round((t1 - t0) * 1000, 1),
+                            "predict_ms": round((time.perf_counter() - t1) * 1000, 1)}}
+
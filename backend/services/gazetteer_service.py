@@ -0,0 +1,261 @@
+import csv
+import os
+from bisect import bisect_left
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from services.geocode_cache_service import normalize_query
+
+DATA_DIR = Path(__file__).resolve().parents[1] / "data"
+GAZETTEER_PATH = Path(os.getenv("GAZETTEER_PATH", str(DATA_DIR / "gazetteer.csv")))
+
+CSV_FIELDS = ["name", "lat", "lon", "kind", "weight"]
+
+# Index at most this many word starts per name ("union station toronto" ->
+# "union station toronto", "station toronto", "toronto").
+MAX_WORD_STARTS = 4
+# Prefixes matching more keys than this get their top results precomputed,
+# so no query ever ranks a range larger than BROAD_PREFIX_KEYS.
+BROAD_PREFIX_KEYS = 2_000
+PRECOMPUTED_TOP_K = 20
+
+
+def _trigrams(s: str) -> List[str]:
+    padded = f"  {s} "
+    return list({padded[i:i + 3] for i in range(len(padded) - 2)})
+
+
+class GazetteerIndex:
+    """
+    Immutable autocomplete index over local place names.
+
+    Prefix search runs over a sorted array of word-start keys (a flattened
+    trie: one bisect finds the whole subtree). Typos fall back to trigram
+    overlap. Build a new index and swap it in to update.
+    """
+
+    def __init__(self, entries: Iterable[Dict[str, Any]]) -> None:
+        names: List[str] = []
+        lats: List[float] = []
+        lons: List[float] = []
+        kinds: List[str] = []
+        weights: List[float] = []
+        seen = set()
+        for e in entries:
+            norm = normalize_query(e["name"])
+            if not norm or norm in seen:
+                continue
+            seen.add(norm)
+            names.append(e["name"])
+            lats.append(float(e["lat"]))
+            lons.append(float(e["lon"]))
+            kinds.append(e.get("kind") or "place")
+            weights.append(float(e.get("weight") or 1.0))
+
+        self.names = names
+        self.kinds = kinds
+        self.lat = np.asarray(lats, dtype=np.float64)
+        self.lon = np.asarray(lons, dtype=np.float64)
+        self.weight = np.asarray(weights, dtype=np.float32)
+        self.norm = [normalize_query(n) for n in names]
+
+        # prefix keys: (key, entry_id), sorted by key
+        pairs: List[Tuple[str, int]] = []
+        for i, n in enumerate(self.norm):
+            words = n.split(" ")
+            for w in range(min(len(words), MAX_WORD_STARTS)):
+                pairs.append((" ".join(words[w:]), i))
+        pairs.sort()
+        self._keys = [k for k, _ in pairs]
+        self._key_ids = np.fromiter((i for _, i in pairs), dtype=np.int32, count=len(pairs))
+        # full-name matches rank above later-word matches
+        self._key_is_start = np.fromiter(
+            (k == self.norm[i] for k, i in pairs), dtype=bool, count=len(pairs)
+        )
+
+        # trigram postings
+        postings: Dict[str, List[int]] = {}
+        tri_count = np.zeros(len(names), dtype=np.int16)
+        for i, n in enumerate(self.norm):
+            grams = _trigrams(n)
+            tri_count[i] = len(grams)
+            for g in grams:
+                postings.setdefault(g, []).append(i)
+        self._postings = {g: np.asarray(ids, dtype=np.int32) for g, ids in postings.items()}
+        self._tri_count = tri_count
+
+        self._top_by_prefix: Dict[str, np.ndarray] = {}
+        self._precompute_broad_prefixes()
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    # ---------- prefix ----------
+    def _range(self, prefix: str) -> Tuple[int, int]:
+        lo = bisect_left(self._keys, prefix)
+        hi = bisect_left(self._keys, prefix + "\U0010ffff", lo)
+        return lo, hi
+
+    def _rank_range(self, lo: int, hi: int, k: int) -> np.ndarray:
+        ids = self._key_ids[lo:hi]
+        score = self.weight[ids] * np.where(self._key_is_start[lo:hi], 2.0, 1.0)
+        if len(ids) > k:
+            part = np.argpartition(-score, k)[:k]
+            ids, score = ids[part], score[part]
+        order = np.argsort(-score, kind="stable")
+        # an entry can match through two word starts; keep its best
+        _, first = np.unique(ids[order], return_index=True)
+        return ids[order][np.sort(first)]
+
+    def _precompute_broad_prefixes(self) -> None:
+        keys = self._keys
+        frontier = [""]
+        length = 1
+        while frontier:
+            next_frontier = []
+            for parent in frontier:
+                lo, hi = self._range(parent) if parent else (0, len(keys))
+                j = lo
+                while j < hi:
+                    if len(keys[j]) < length:
+                        j += 1
+                        continue
+                    p = keys[j][:length]
+                    end = bisect_left(keys, p + "\U0010ffff", j, hi)
+                    if end - j > BROAD_PREFIX_KEYS:
+                        self._top_by_prefix[p] = self._rank_range(j, end, PRECOMPUTED_TOP_K * MAX_WORD_STARTS)[:PRECOMPUTED_TOP_K]
+                        next_frontier.append(p)
+                    j = end
+            frontier = next_frontier
+            length += 1
+
+    def prefix_search(self, q: str, k: int) -> np.ndarray:
+        top = self._top_by_prefix.get(q)
+        if top is not None and k <= len(top):
+            return top[:k]
+        lo, hi = self._range(q)
+        return self._rank_range(lo, hi, k * MAX_WORD_STARTS)[:k]
+
+    # ---------- fuzzy ----------
+    def fuzzy_search(self, q: str, k: int, exclude: Optional[set] = None, max_postings: int = 10_000) -> List[Tuple[int, float]]:
+        grams = [g for g in _trigrams(q) if g in self._postings]
+        if not grams:
+            return []
+        # rarest trigrams first keeps the candidate set small
+        grams.sort(key=lambda g: len(self._postings[g]))
+        lists, total = [], 0
+        for g in grams:
+            p = self._postings[g]
+            if lists and total + len(p) > max_postings:
+                break
+            lists.append(p)
+            total += len(p)
+        cand, counts = np.unique(np.concatenate(lists), return_counts=True)
+        if exclude:
+            keep = ~np.isin(cand, np.fromiter(exclude, dtype=np.int32))
+            cand, counts = cand[keep], counts[keep]
+        # trigram Jaccard, vectorized (shared counts only cover the rarer grams we read)
+        n_q = len(_trigrams(q))
+        jaccard = counts / (n_q + self._tri_count[cand].astype(np.float32) - counts)
+        ok = jaccard >= 0.2
+        cand, jaccard = cand[ok], jaccard[ok]
+        if len(cand) > k:
+            part = np.argpartition(-jaccard, k)[:k]
+            cand, jaccard = cand[part], jaccard[part]
+        order = np.lexsort((-self.weight[cand], -jaccard))
+        return [(int(cand[i]), float(jaccard[i])) for i in order]
+
+    # ---------- public ----------
+    def _item(self, i: int, match: str, score: float) -> Dict[str, Any]:
+        return {
+            "display_name": self.names[i],
+            "lat": float(self.lat[i]),
+            "lon": float(self.lon[i]),
+            "type": self.kinds[i],
+            "match": match,
+            "score": round(score, 3),
+        }
+
+    def autocomplete(self, query: str, limit: int = 5) -> List[Dict[str, Any]]:
+        q = normalize_query(query)
+        if not q:
+            return []
+        ids = self.prefix_search(q, limit)
+        out = [self._item(int(i), "prefix", float(self.weight[i])) for i in ids]
+        if len(out) < limit and len(q) >= 3:
+            taken = {int(i) for i in ids}
+            for i, s in self.fuzzy_search(q, limit - len(out), exclude=taken):
+                out.append(self._item(i, "fuzzy", s))
+        return out
+
+
+def _seed_entries() -> List[Dict[str, Any]]:
+    from services.assistant_service import MOCK_LOCATIONS
+
+    out = []
+    for key, loc in MOCK_LOCATIONS.items():
+        # generic phrases like "here" / "bus stop" aren't places
+        if key in ("here", "my current location"):
+            continue
+        out.append({"name": loc["display_name"], "lat": loc["lat"], "lon": loc["lon"], "kind": "landmark", "weight": 5.0})
+    return out
+
+
+def read_csv(path: Path) -> List[Dict[str, Any]]:
+    rows = []
+    with open(path, newline="", encoding="utf-8") as f:
+        for r in csv.DictReader(f):
+            try:
+                rows.append({
+                    "name": (r.get("name") or "").strip(),
+                    "lat": float(r["lat"]),
+                    "lon": float(r["lon"]),
+                    "kind": (r.get("kind") or "place").strip(),
+                    "weight": float(r.get("weight") or 1.0),
+                })
+            except (KeyError, TypeError, ValueError):
+                continue
+    return [r for r in rows if r["name"]]
+
+
+def import_csv(src: Path, dest: Optional[Path] = None) -> int:
+    """Append rows from `src` (name,lat,lon[,kind,weight]) to the gazetteer file."""
+    dest = Path(dest) if dest else GAZETTEER_PATH
+    rows = read_csv(Path(src))
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    new_file = not dest.exists()
+    with open(dest, "a", newline="", encoding="utf-8") as f:
+        w = csv.DictWriter(f, fieldnames=CSV_FIELDS)
+        if new_file:
+            w.writeheader()
+        for r in rows:
+            w.writerow(r)
+    return len(rows)
+
+
+def build_index(path: Optional[Path] = None) -> GazetteerIndex:
+    path = Path(path) if path else GAZETTEER_PATH
+    entries = _seed_entries()
+    if path.exists():
+        entries += read_csv(path)
+    return GazetteerIndex(entries)
+
+
+_index: Optional[GazetteerIndex] = None
+
+
+def get_index() -> GazetteerIndex:
+    global _index
+    if _index is None:
+        _index = build_index()
+    return _index
+
+
+def reload_index(path: Optional[Path] = None) -> int:
+    """Build a fresh index off to the side, then swap the reference."""
+    global _index
+    new_index = build_index(path)
+    _index = new_index
+    return len(new_index)
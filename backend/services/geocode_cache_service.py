@@ -0,0 +1,155 @@
+import json
+import os
+import re
+import sqlite3
+import time
+import unicodedata
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+DB_DIR = Path(__file__).resolve().parents[1] / "data"
+DB_PATH = DB_DIR / "geocode_cache.db"
+
+DEFAULT_TTL_S = float(os.getenv("GEOCODE_CACHE_TTL_S", str(7 * 24 * 3600)))
+DEFAULT_MAX_ENTRIES = int(os.getenv("GEOCODE_CACHE_SIZE", "2048"))
+
+_PUNCT = re.compile(r"[^\w\s]", re.UNICODE)
+_SPACES = re.compile(r"\s+")
+
+
+def normalize_query(query: str) -> str:
+    """'  Union   Station, Toronto! ' -> 'union station toronto'"""
+    q = unicodedata.normalize("NFKC", query or "").casefold()
+    q = _PUNCT.sub(" ", q)
+    return _SPACES.sub(" ", q).strip()
+
+
+class GeocodeCache:
+    """
+    Two-tier cache for Nominatim results: in-memory LRU in front of SQLite.
+
+    Entries are keyed on the normalized query and remember the `limit` they were
+    fetched with, so a request for fewer results is served from a larger entry.
+    """
+
+    def __init__(
+        self,
+        db_path: Optional[Path] = None,
+        ttl_s: float = DEFAULT_TTL_S,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+    ) -> None:
+        self.db_path = Path(db_path) if db_path else DB_PATH
+        self.ttl_s = float(ttl_s)
+        self.max_entries = max(1, int(max_entries))
+        self._mem: "OrderedDict[str, Tuple[float, int, List[Dict[str, Any]]]]" = OrderedDict()
+        self._db_ready = False
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "expired": 0, "stores": 0}
+
+    # ---------- sqlite tier ----------
+    def _connect(self) -> sqlite3.Connection:
+        if not self._db_ready:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            with sqlite3.connect(self.db_path) as conn:
+                conn.execute(
+                    """
+                    CREATE TABLE IF NOT EXISTS geocode_cache (
+                        query TEXT PRIMARY KEY,
+                        fetched_at REAL NOT NULL,
+                        result_limit INTEGER NOT NULL,
+                        results TEXT NOT NULL
+                    )
+                    """
+                )
+                conn.commit()
+            self._db_ready = True
+        return sqlite3.connect(self.db_path)
+
+    def _disk_get(self, key: str) -> Optional[Tuple[float, int, List[Dict[str, Any]]]]:
+        try:
+            with self._connect() as conn:
+                row = conn.execute(
+                    "SELECT fetched_at, result_limit, results FROM geocode_cache WHERE query = ?", (key,)
+                ).fetchone()
+        except sqlite3.Error:
+            return None
+        if row is None:
+            return None
+        return float(row[0]), int(row[1]), json.loads(row[2])
+
+    def _disk_put(self, key: str, entry: Tuple[float, int, List[Dict[str, Any]]]) -> None:
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO geocode_cache (query, fetched_at, result_limit, results) VALUES (?, ?, ?, ?)",
+                    (key, entry[0], entry[1], json.dumps(entry[2])),
+                )
+                conn.commit()
+        except sqlite3.Error:
+            pass
+
+    # ---------- public ----------
+    def _mem_put(self, key: str, entry: Tuple[float, int, List[Dict[str, Any]]]) -> None:
+        self._mem[key] = entry
+        self._mem.move_to_end(key)
+        while len(self._mem) > self.max_entries:
+            self._mem.popitem(last=False)
+
+    def _usable(self, entry: Tuple[float, int, List[Dict[str, Any]]], limit: int, now: float) -> Optional[bool]:
+        """True = serve, False = too few results cached, None = expired."""
+        fetched_at, cached_limit, results = entry
+        if now - fetched_at > self.ttl_s:
+            return None
+        # Nominatim returned fewer than asked for -> there are no more results to fetch
+        return limit <= cached_limit or len(results) < cached_limit
+
+    def get(self, query: str, limit: int) -> Optional[List[Dict[str, Any]]]:
+        key = normalize_query(query)
+        if not key:
+            return None
+        now = time.time()
+
+        entry = self._mem.get(key)
+        if entry is not None:
+            ok = self._usable(entry, limit, now)
+            if ok:
+                self._mem.move_to_end(key)
+                self.stats["memory_hits"] += 1
+                return entry[2][:limit]
+            if ok is None:
+                self._mem.pop(key, None)
+                self.stats["expired"] += 1
+
+        entry = self._disk_get(key)
+        if entry is not None:
+            ok = self._usable(entry, limit, now)
+            if ok:
+                self._mem_put(key, entry)
+                self.stats["disk_hits"] += 1
+                return entry[2][:limit]
+            if ok is None:
+                self.stats["expired"] += 1
+
+        self.stats["misses"] += 1
+        return None
+
+    def put(self, query: str, limit: int, results: List[Dict[str, Any]]) -> None:
+        key = normalize_query(query)
+        if not key:
+            return
+        entry = (time.time(), int(limit), list(results))
+        self._mem_put(key, entry)
+        self._disk_put(key, entry)
+        self.stats["stores"] += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        lookups = self.stats["memory_hits"] + self.stats["disk_hits"] + self.stats["misses"]
+        hits = self.stats["memory_hits"] + self.stats["disk_hits"]
+        return {
+            **self.stats,
+            "memory_entries": len(self._mem),
+            "hit_ratio": round(hits / lookups, 4) if lookups else None,
+        }
+
+    def clear_memory(self) -> None:
+        self._mem.clear()
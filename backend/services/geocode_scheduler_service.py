@@ -0,0 +1,167 @@
+import asyncio
+import itertools
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+INTERACTIVE = 0
+BACKGROUND = 1
+PRIORITIES = {"interactive": INTERACTIVE, "background": BACKGROUND}
+
+# Nominatim usage policy: an absolute maximum of 1 request per second.
+DEFAULT_RATE_PER_S = float(os.getenv("NOMINATIM_RATE_PER_S", "1.0"))
+DEFAULT_BURST = float(os.getenv("NOMINATIM_BURST", "1"))
+DEFAULT_MAX_WAIT_S = float(os.getenv("NOMINATIM_MAX_WAIT_S", "10"))
+
+
+class SchedulerTimeout(Exception):
+    """Raised when a request waited longer than its budget for an upstream slot."""
+
+
+class _Job:
+    __slots__ = ("key", "fetch", "future", "priority", "waiters", "started")
+
+    def __init__(self, key: Hashable, fetch: Callable[[], Awaitable[Any]], future: "asyncio.Future", priority: int) -> None:
+        self.key = key
+        self.fetch = fetch
+        self.future = future
+        self.priority = priority
+        self.waiters = 0
+        self.started = False
+
+
+class RequestScheduler:
+    """
+    Single gate for outbound requests to a rate-limited upstream.
+
+    - token bucket: at most `rate_per_s` starts per second (bursts up to `burst`)
+    - identical keys already queued or in flight share one upstream call
+    - interactive jobs are dispatched before background ones
+    - callers wait at most `max_wait_s`, then get SchedulerTimeout
+    """
+
+    def __init__(
+        self,
+        rate_per_s: float = DEFAULT_RATE_PER_S,
+        burst: float = DEFAULT_BURST,
+        max_wait_s: float = DEFAULT_MAX_WAIT_S,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.rate_per_s = float(rate_per_s)
+        self.burst = max(1.0, float(burst))
+        self.max_wait_s = float(max_wait_s)
+        self._clock = clock
+        self._tokens = self.burst
+        self._last = clock()
+        self._seq = itertools.count()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.PriorityQueue] = None
+        self._jobs: Dict[Hashable, _Job] = {}
+        self._dispatcher: Optional[asyncio.Task] = None
+        self.stats = {"submitted": 0, "merged": 0, "upstream_calls": 0, "timeouts": 0, "dropped": 0}
+
+    # ---------- token bucket ----------
+    def _refill(self) -> None:
+        now = self._clock()
+        self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate_per_s)
+        self._last = now
+
+    async def _wait_for_token(self) -> None:
+        while True:
+            self._refill()
+            if self._tokens >= 1.0:
+                return
+            await asyncio.sleep((1.0 - self._tokens) / self.rate_per_s)
+
+    # ---------- dispatcher ----------
+    def _ensure_started(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # new event loop (tests, reload): state bound to the old loop is unusable
+            self._loop = loop
+            self._queue = asyncio.PriorityQueue()
+            self._jobs = {}
+            self._dispatcher = None
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = loop.create_task(self._dispatch())
+
+    def _next_job(self) -> Optional[_Job]:
+        while not self._queue.empty():
+            priority, _, job = self._queue.get_nowait()
+            if job.started or job.priority != priority:
+                continue  # stale entry left behind by a priority upgrade
+            if job.waiters <= 0:
+                self._jobs.pop(job.key, None)
+                self.stats["dropped"] += 1
+                continue
+            return job
+        return None
+
+    async def _dispatch(self) -> None:
+        while True:
+            # block until there is work, then until there is a slot; only then pick
+            # the job, so anything interactive that arrived meanwhile goes first
+            item = await self._queue.get()
+            self._queue.put_nowait(item)
+            await self._wait_for_token()
+            job = self._next_job()
+            if job is None:
+                continue
+            self._tokens -= 1.0
+            job.started = True
+            self.stats["upstream_calls"] += 1
+            asyncio.get_running_loop().create_task(self._run(job))
+
+    async def _run(self, job: _Job) -> None:
+        try:
+            result = await job.fetch()
+        except Exception as e:
+            if not job.future.done():
+                job.future.set_exception(e)
+        else:
+            if not job.future.done():
+                job.future.set_result(result)
+        finally:
+            self._jobs.pop(job.key, None)
+            # nobody awaited the exception after a timeout; mark it retrieved
+            if job.future.done() and not job.future.cancelled():
+                job.future.exception()
+
+    # ---------- public ----------
+    async def submit(
+        self,
+        key: Hashable,
+        fetch: Callable[[], Awaitable[Any]],
+        priority: int = INTERACTIVE,
+        max_wait_s: Optional[float] = None,
+    ) -> Any:
+        self._ensure_started()
+        self.stats["submitted"] += 1
+        job = self._jobs.get(key)
+        if job is None:
+            job = _Job(key, fetch, self._loop.create_future(), priority)
+            self._jobs[key] = job
+            self._queue.put_nowait((priority, next(self._seq), job))
+        else:
+            self.stats["merged"] += 1
+            if priority < job.priority and not job.started:
+                job.priority = priority
+                self._queue.put_nowait((priority, next(self._seq), job))
+
+        job.waiters += 1
+        budget = self.max_wait_s if max_wait_s is None else max_wait_s
+        try:
+            return await asyncio.wait_for(asyncio.shield(job.future), timeout=budget)
+        except asyncio.TimeoutError:
+            self.stats["timeouts"] += 1
+            raise SchedulerTimeout(f"Upstream is busy; request waited more than {budget:g}s for a slot")
+        finally:
+            job.waiters -= 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "queued_or_in_flight": len(self._jobs),
+            "rate_per_s": self.rate_per_s,
+            "burst": self.burst,
+        }
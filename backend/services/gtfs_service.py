@@ -0,0 +1,839 @@
+import csv
+import io
+import math
+import os
+import time
+import zipfile
+from array import array
+from contextlib import contextmanager
+from datetime import date
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from services.array_file_service import pack_strings, read_arrays, unpack_strings, write_arrays
+from services.stop_index_service import BUS, FEATURE_BITS, FERRY, RAIL, SUBWAY, TRAM, WHEELCHAIR, attribute_names
+from services.transfer_service import (
+    NO_PATH, TRANSFER_WORKERS, TRANSFERS_PATH, TransferTable, build_transfers, save_transfers,
+)
+from services.walking_graph_service import WALKING_GRAPH_PATH, haversine_m
+
+DATA_DIR = Path(__file__).resolve().parents[1] / "data"
+GTFS_PATH = Path(os.getenv("GTFS_PATH", str(DATA_DIR / "gtfs.zip")))
+TIMETABLE_PATH = Path(os.getenv("TIMETABLE_PATH", str(DATA_DIR / "timetable.bin")))
+
+# Stops this close get a walking transfer between them; transfers.txt overrides or forbids pairs.
+TRANSFER_RADIUS_M = float(os.getenv("TRANSFER_RADIUS_M", "250"))
+WALK_SPEED_MPS = 1.2
+# Street distance over straight-line distance, for walks estimated without the walking graph.
+WALK_DETOUR = 1.3
+
+_MAGIC = b"GTFSTT03"
+_M_PER_DEG_LAT = 111_320.0
+
+# wheelchair_boarding / wheelchair_accessible values
+WC_UNKNOWN, WC_YES, WC_NO = 0, 1, 2
+# arrival/departure of a stop a realtime update skips: never reached, never boarded
+NO_TIME = 2 ** 31 - 1
+# A stop further than this from its trip's shape means the shape is wrong; the pattern uses its stops instead.
+SHAPE_MAX_OFFSET_M = 200.0
+
+ARRAY_DTYPES = {
+    # stops (location_type 0 only)
+    "stop_lat": np.float64,
+    "stop_lon": np.float64,
+    "stop_wheelchair": np.uint8,   # own value, or inherited from the parent station
+    "stop_bits": np.uint16,        # stop_index_service attribute bits
+    "stop_id_data": np.uint8,
+    "stop_id_ptr": np.int64,
+    "stop_name_data": np.uint8,
+    "stop_name_ptr": np.int64,
+    "stop_parent_data": np.uint8,
+    "stop_parent_ptr": np.int64,
+    # trips, grouped by pattern and ordered by departure inside each pattern
+    "trip_route": np.int32,
+    "trip_service": np.int32,
+    "trip_wheelchair": np.uint8,
+    "trip_pattern": np.int32,
+    "trip_id_data": np.uint8,
+    "trip_id_ptr": np.int64,
+    "trip_headsign_data": np.uint8,
+    "trip_headsign_ptr": np.int64,
+    # calendar.txt / calendar_dates.txt
+    "service_days": np.uint8,      # bit 0 = Monday
+    "service_start": np.int32,     # YYYYMMDD
+    "service_end": np.int32,
+    "exception_service": np.int32,
+    "exception_date": np.int32,
+    "exception_type": np.int8,     # 1 added, 2 removed
+    # patterns: trips of one route with the same stop sequence that never overtake
+    "pattern_route": np.int32,
+    "pattern_stop_ptr": np.int64,
+    "pattern_stops": np.int32,
+    "pattern_stop_seq": np.int32,  # GTFS stop_sequence of each stop, from the pattern's first trip
+    "pattern_stop_dist": np.float64,  # metres along the pattern's line: its shape, else straight between its stops
+    "pattern_shape": np.int32,     # -1 without a usable shapes.txt shape
+    "pattern_trip_ptr": np.int64,
+    "pattern_time_ptr": np.int64,
+    "arrival": np.int32,           # seconds after midnight of the service day
+    "departure": np.int32,
+    # stop -> (pattern, position in pattern)
+    "stop_pattern_ptr": np.int64,
+    "stop_patterns": np.int32,
+    "stop_pattern_pos": np.int32,
+    # walking transfers
+    "transfer_ptr": np.int64,
+    "transfer_to": np.int32,
+    "transfer_s": np.int32,
+    "transfer_step_free": np.uint8,
+    # shapes.txt polylines used by some pattern
+    "shape_ptr": np.int64,
+    "shape_lat": np.float64,
+    "shape_lon": np.float64,
+    "shape_dist": np.float64,      # metres from the shape's first point
+}
+
+_STRING_COLUMNS = ("stop_id", "stop_name", "stop_parent", "trip_id", "trip_headsign")
+
+
+def route_mode(route_type: int) -> str:
+    """Coarse mode for a GTFS route_type, basic or extended."""
+    if route_type in (0, 5) or 900 <= route_type < 1000:
+        return "tram"
+    if route_type in (1,) or 400 <= route_type < 500:
+        return "subway"
+    if route_type in (2, 12) or 100 <= route_type < 400:
+        return "rail"
+    if route_type == 4 or 1000 <= route_type < 1300:
+        return "ferry"
+    return "bus"
+
+
+_MODE_BITS = {"tram": TRAM, "subway": SUBWAY, "rail": RAIL, "ferry": FERRY, "bus": BUS}
+
+
+class Timetable:
+    """
+    A GTFS feed in columnar form, laid out for RAPTOR.
+
+    Pattern p serves stops pattern_stops[pattern_stop_ptr[p]:pattern_stop_ptr[p + 1]]
+    with trips pattern_trip_ptr[p]..pattern_trip_ptr[p + 1] (global trip indices,
+    earliest first). Its times are stop-major: trip t's time at position j is
+    arrival[pattern_time_ptr[p] + j * n_trips + t], so each stop's departures are
+    one sorted run. Arrays may be read-only memory maps.
+    """
+
+    def __init__(self, arrays: Dict[str, np.ndarray], meta: Optional[Dict[str, Any]] = None) -> None:
+        for name in ARRAY_DTYPES:
+            setattr(self, name, arrays[name])
+        self.meta = dict(meta or {})
+        self.routes: List[Dict[str, Any]] = self.meta.get("routes", [])
+        self.service_ids: List[str] = self.meta.get("service_ids", [])
+        if len(self.pattern_stop_ptr) != len(self.pattern_route) + 1 or len(self.stop_pattern_ptr) != len(self.stop_lat) + 1:
+            raise ValueError("Inconsistent timetable arrays")
+        self._strings: Dict[str, List[str]] = {}
+        self._ids: Dict[str, Dict[str, int]] = {}
+        self._usable: Dict[Tuple[int, bool], memoryview] = {}
+        self._views: Optional[Dict[str, memoryview]] = None
+        self._max_speed: Optional[float] = None
+
+    @property
+    def n_stops(self) -> int:
+        return len(self.stop_lat)
+
+    @property
+    def n_trips(self) -> int:
+        return len(self.trip_route)
+
+    @property
+    def n_patterns(self) -> int:
+        return len(self.pattern_route)
+
+    def arrays(self) -> Dict[str, np.ndarray]:
+        return {name: getattr(self, name) for name in ARRAY_DTYPES}
+
+    def strings(self, column: str) -> List[str]:
+        """Decoded string column (stop_id, stop_name, stop_parent, trip_id, trip_headsign)."""
+        if column not in self._strings:
+            self._strings[column] = unpack_strings(getattr(self, column + "_data"), getattr(self, column + "_ptr"))
+        return self._strings[column]
+
+    def index_of(self, column: str) -> Dict[str, int]:
+        """id -> index for stop_id or trip_id."""
+        if column not in self._ids:
+            self._ids[column] = {v: i for i, v in enumerate(self.strings(column))}
+        return self._ids[column]
+
+    def views(self) -> Dict[str, memoryview]:
+        """memoryviews of the arrays RAPTOR reads one element at a time (much cheaper than numpy scalars)."""
+        if self._views is None:
+            names = ("pattern_stop_ptr", "pattern_stops", "pattern_trip_ptr", "pattern_time_ptr", "arrival",
+                     "departure", "stop_pattern_ptr", "stop_patterns", "stop_pattern_pos", "transfer_ptr",
+                     "transfer_to", "transfer_s", "transfer_step_free", "stop_wheelchair", "trip_wheelchair", "pattern_route",
+                     "pattern_stop_dist")
+            self._views = {n: memoryview(np.ascontiguousarray(getattr(self, n))) for n in names}
+        return self._views
+
+    def pattern_dist_m(self) -> memoryview:
+        """Metres along each pattern's line, aligned with pattern_stops; only differences within a pattern mean anything."""
+        return self.views()["pattern_stop_dist"]
+
+    def pattern_line(self, p: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(lat, lon, metres) of the line pattern p runs along (its shape, or its stops), on pattern_stop_dist's scale."""
+        s = int(self.pattern_shape[p])
+        if s < 0:
+            a, b = int(self.pattern_stop_ptr[p]), int(self.pattern_stop_ptr[p + 1])
+            stops = np.asarray(self.pattern_stops[a:b])
+            return (np.asarray(self.stop_lat)[stops], np.asarray(self.stop_lon)[stops],
+                    np.asarray(self.pattern_stop_dist[a:b]))
+        a, b = int(self.shape_ptr[s]), int(self.shape_ptr[s + 1])
+        return np.asarray(self.shape_lat[a:b]), np.asarray(self.shape_lon[a:b]), np.asarray(self.shape_dist[a:b])
+
+    def max_speed_mps(self) -> float:
+        """Fastest speed along the line between consecutive stops of any pattern's first trip."""
+        if self._max_speed is None:
+            ptr = np.asarray(self.pattern_stop_ptr)
+            nt = np.diff(np.asarray(self.pattern_trip_ptr))
+            pattern = np.repeat(np.arange(self.n_patterns), np.diff(ptr))
+            pos = np.arange(len(pattern)) - ptr[pattern]
+            at = np.asarray(self.pattern_time_ptr)[pattern] + pos * nt[pattern]
+            dist = np.asarray(self.pattern_dist_m())
+            same = pattern[1:] == pattern[:-1]
+            secs = (np.asarray(self.arrival)[at[1:]] - np.asarray(self.departure)[at[:-1]])[same]
+            metres = np.diff(dist)[same]
+            speed = metres / np.maximum(secs, 1)
+            self._max_speed = float(speed.max()) if len(speed) else WALK_SPEED_MPS
+        return self._max_speed
+
+    def patched(self, day: date) -> Dict[int, Tuple[memoryview, memoryview, Optional[tuple]]]:
+        """
+        Per-pattern realtime (arrival, departure, ordered) blocks for `day`;
+        none here (see realtime_service.LiveTimetable).
+        """
+        return {}
+
+    def active_services(self, day: date) -> np.ndarray:
+        ymd = day.year * 10000 + day.month * 100 + day.day
+        active = ((self.service_days & (1 << day.weekday())) != 0) & (self.service_start <= ymd) & (self.service_end >= ymd)
+        on_day = self.exception_date == ymd
+        active[self.exception_service[on_day & (self.exception_type == 1)]] = True
+        active[self.exception_service[on_day & (self.exception_type == 2)]] = False
+        return active
+
+    def usable_trips(self, day: date, accessible: bool = False) -> memoryview:
+        """1 per trip running on `day` (and, if accessible, flagged wheelchair_accessible=1)."""
+        key = (day.toordinal(), accessible)
+        view = self._usable.get(key)
+        if view is None:
+            ok = self.active_services(day)[self.trip_service]
+            if accessible:
+                ok &= np.asarray(self.trip_wheelchair) == WC_YES
+            view = memoryview(ok.astype(np.uint8))
+            if len(self._usable) >= 8:
+                self._usable.pop(next(iter(self._usable)))
+            self._usable[key] = view
+        return view
+
+    def stop(self, s: int) -> Dict[str, Any]:
+        return {
+            "stop_id": self.strings("stop_id")[s],
+            "name": self.strings("stop_name")[s],
+            "lat": float(self.stop_lat[s]),
+            "lon": float(self.stop_lon[s]),
+            "wheelchair_boarding": int(self.stop_wheelchair[s]),
+        }
+
+    def stop_records(self) -> List[Dict[str, Any]]:
+        """Stops in the shape stop_index_service.StopIndex takes."""
+        ids, names = self.strings("stop_id"), self.strings("stop_name")
+        return [{"id": ids[i], "name": names[i], "lat": float(a), "lon": float(b), "bits": int(c)}
+                for i, (a, b, c) in enumerate(zip(self.stop_lat, self.stop_lon, self.stop_bits))]
+
+
+# ---------- import ----------
+
+class GtfsFeed:
+    """GTFS tables from a zip or an unpacked directory, read as streams of rows."""
+
+    def __init__(self, src: Path) -> None:
+        self.src = Path(src)
+        self._zip = None if self.src.is_dir() else zipfile.ZipFile(self.src)
+        # some feeds nest the tables in a folder inside the zip
+        self._names = ({Path(n).name: n for n in self._zip.namelist()} if self._zip
+                       else {p.name: str(p) for p in self.src.iterdir()})
+
+    def close(self) -> None:
+        if self._zip:
+            self._zip.close()
+
+    def has(self, name: str) -> bool:
+        return name in self._names
+
+    @contextmanager
+    def _open(self, name: str):
+        f = self._zip.open(self._names[name]) if self._zip else open(self._names[name], "rb")
+        try:
+            yield io.TextIOWrapper(f, encoding="utf-8-sig", newline="")
+        finally:
+            f.close()
+
+    def rows(self, name: str, columns: Sequence[str], required: bool = False) -> Iterator[List[str]]:
+        """Requested columns of each row ('' where the file lacks the column)."""
+        if not self.has(name):
+            if required:
+                raise ValueError(f"GTFS feed {self.src} has no {name}")
+            return
+        with self._open(name) as f:
+            reader = csv.reader(f)
+            header = [h.strip() for h in next(reader, [])]
+            idx = [header.index(c) if c in header else -1 for c in columns]
+            width = max(idx) + 1
+            for r in reader:
+                if len(r) < width:
+                    r = r + [""] * (width - len(r))
+                yield [r[i].strip() if i >= 0 else "" for i in idx]
+
+
+def _seconds(t: str) -> int:
+    """'25:10:00' -> 90600; -1 for an empty (to be interpolated) time."""
+    if not t:
+        return -1
+    h, m, s = t.split(":")
+    return int(h) * 3600 + int(m) * 60 + int(s)
+
+
+def _wheelchair(v: str) -> int:
+    return int(v) if v in ("1", "2") else WC_UNKNOWN
+
+
+# Optional stops.txt columns (0/1) for equipment GTFS has no field for, as stop_index_service reads them.
+_FEATURE_COLUMNS = ("elevator", "audio", "visual", "tactile")
+
+
+def _features(values: Sequence[str]) -> int:
+    return sum(FEATURE_BITS[c] for c, v in zip(_FEATURE_COLUMNS, values) if v.lower() in ("1", "yes", "true"))
+
+
+def _read_stops(feed: GtfsFeed) -> Dict[str, Any]:
+    rows = list(feed.rows("stops.txt", ["stop_id", "stop_name", "stop_lat", "stop_lon", "location_type",
+                                        "parent_station", "wheelchair_boarding", *_FEATURE_COLUMNS], required=True))
+    station_wc = {r[0]: _wheelchair(r[6]) for r in rows if r[4] == "1"}
+    station_bits = {r[0]: _features(r[7:]) for r in rows if r[4] == "1"}
+    out: Dict[str, list] = {"id": [], "name": [], "parent": [], "lat": [], "lon": [], "wc": [], "bits": []}
+    for sid, name, lat, lon, loc, parent, wc, *features in rows:
+        if loc not in ("", "0"):
+            continue
+        try:
+            lat_f, lon_f = float(lat), float(lon)
+        except ValueError:
+            continue
+        w = _wheelchair(wc)
+        if w == WC_UNKNOWN:
+            w = station_wc.get(parent, WC_UNKNOWN)
+        out["id"].append(sid)
+        out["name"].append(name)
+        out["parent"].append(parent)
+        out["lat"].append(lat_f)
+        out["lon"].append(lon_f)
+        out["wc"].append(w)
+        # a platform has its station's elevators and displays too
+        out["bits"].append(_features(features) | station_bits.get(parent, 0))
+    return out
+
+
+def _read_services(feed: GtfsFeed) -> Tuple[List[str], Dict[str, np.ndarray]]:
+    ids: Dict[str, int] = {}
+    days, start, end = [], [], []
+    weekdays = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+    for r in feed.rows("calendar.txt", ["service_id", *weekdays, "start_date", "end_date"]):
+        ids[r[0]] = len(days)
+        days.append(sum(1 << i for i, v in enumerate(r[1:8]) if v == "1"))
+        start.append(int(r[8] or 0))
+        end.append(int(r[9] or 0))
+    exc_service, exc_date, exc_type = [], [], []
+    for sid, d, kind in feed.rows("calendar_dates.txt", ["service_id", "date", "exception_type"]):
+        if kind not in ("1", "2") or not d:
+            continue
+        if sid not in ids:
+            # calendar_dates-only service: runs exactly on its added dates
+            ids[sid] = len(days)
+            days.append(0)
+            start.append(0)
+            end.append(0)
+        exc_service.append(ids[sid])
+        exc_date.append(int(d))
+        exc_type.append(int(kind))
+    return list(ids), {
+        "service_days": np.asarray(days, dtype=np.uint8),
+        "service_start": np.asarray(start, dtype=np.int32),
+        "service_end": np.asarray(end, dtype=np.int32),
+        "exception_service": np.asarray(exc_service, dtype=np.int32),
+        "exception_date": np.asarray(exc_date, dtype=np.int32),
+        "exception_type": np.asarray(exc_type, dtype=np.int8),
+    }
+
+
+def _fill_times(trip: np.ndarray, starts: np.ndarray, arr: np.ndarray, dep: np.ndarray,
+                lat: np.ndarray, lon: np.ndarray) -> np.ndarray:
+    """
+    Fill in untimed stops by distance between the timed stops around them
+    (in place). Returns a per-row mask of trips that are unusable: untimed
+    first/last stops, or times that run backwards.
+    """
+    arr[arr < 0] = dep[arr < 0]
+    dep[dep < 0] = arr[dep < 0]
+    n = len(trip)
+    bad = np.zeros(n, dtype=bool)
+    miss = np.flatnonzero(dep < 0)
+    if len(miss):
+        step = np.zeros(n)
+        step[1:] = haversine_m(lat[:-1], lon[:-1], lat[1:], lon[1:])
+        step[starts] = 0.0
+        cum = np.cumsum(step)
+        idx = np.arange(n)
+        known = dep >= 0
+        prev = np.maximum.accumulate(np.where(known, idx, -1))[miss]
+        nxt = np.minimum.accumulate(np.where(known, idx, n)[::-1])[::-1][miss]
+        ok = (prev >= 0) & (nxt < n)
+        prev, nxt = np.where(ok, prev, miss), np.where(ok, nxt, miss)
+        ok &= (trip[prev] == trip[miss]) & (trip[nxt] == trip[miss])
+        span = cum[nxt] - cum[prev]
+        frac = np.where(span > 0, (cum[miss] - cum[prev]) / np.where(span > 0, span, 1.0),
+                        (miss - prev) / np.maximum(nxt - prev, 1))
+        t = np.round(dep[prev] + frac * (arr[nxt] - dep[prev])).astype(arr.dtype)
+        arr[miss] = dep[miss] = np.where(ok, t, 0)
+        bad[miss[~ok]] = True
+    bad |= dep < arr
+    backwards = np.zeros(n, dtype=bool)
+    backwards[1:] = arr[1:] < dep[:-1]
+    backwards[starts] = False
+    bad |= backwards
+    # spread to every row of a bad trip
+    return np.isin(trip, np.unique(trip[bad]))
+
+
+def _fifo_chains(arr: np.ndarray, dep: np.ndarray) -> List[List[int]]:
+    """
+    Split trips (rows of arr/dep, already ordered by first departure) into
+    chains in which no trip overtakes another, so each stop's departures are sorted.
+    """
+    chains: List[List[int]] = []
+    last: List[Tuple[np.ndarray, np.ndarray]] = []
+    for i in range(len(arr)):
+        for c, (la, ld) in enumerate(last):
+            if (arr[i] >= la).all() and (dep[i] >= ld).all():
+                chains[c].append(i)
+                last[c] = (arr[i], dep[i])
+                break
+        else:
+            chains.append([i])
+            last.append((arr[i], dep[i]))
+    return chains
+
+
+def locate_on_line(lat: float, lon: float, line_lat: np.ndarray, line_lon: np.ndarray, line_dist: np.ndarray,
+                   slack_m: float = 0.0) -> Tuple[float, float, int]:
+    """
+    (metres along, metres off, segment) of the point of a polyline nearest
+    (lat, lon). With slack_m the earliest segment within slack_m of the
+    nearest wins, so a line that passes by twice resolves to the first pass.
+    """
+    kx = _M_PER_DEG_LAT * math.cos(math.radians(lat))
+    x = (np.asarray(line_lon) - lon) * kx
+    y = (np.asarray(line_lat) - lat) * _M_PER_DEG_LAT
+    if len(x) < 2:
+        return (float(line_dist[0]), float(math.hypot(x[0], y[0])), 0) if len(x) else (0.0, math.inf, 0)
+    dx, dy = np.diff(x), np.diff(y)
+    l2 = dx * dx + dy * dy
+    f = np.clip(-(x[:-1] * dx + y[:-1] * dy) / np.where(l2 > 0, l2, 1.0), 0.0, 1.0)
+    off = np.hypot(x[:-1] + f * dx, y[:-1] + f * dy)
+    k = int(np.argmax(off <= off.min() + slack_m)) if slack_m else int(np.argmin(off))
+    return float(line_dist[k] + f[k] * (line_dist[k + 1] - line_dist[k])), float(off[k]), k
+
+
+def _read_shapes(feed: GtfsFeed, used: set) -> Dict[str, Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    """shape_id -> (lat, lon, metres from the first point) for the shapes in `used`."""
+    points: Dict[str, list] = {}
+    for sid, la, lo, seq in feed.rows("shapes.txt", ["shape_id", "shape_pt_lat", "shape_pt_lon", "shape_pt_sequence"]):
+        if sid in used:
+            try:
+                points.setdefault(sid, []).append((int(seq), float(la), float(lo)))
+            except ValueError:
+                continue
+    shapes = {}
+    for sid, pts in points.items():
+        pts.sort()
+        la, lo = np.asarray([p[1] for p in pts]), np.asarray([p[2] for p in pts])
+        dist = np.zeros(len(pts))
+        dist[1:] = np.cumsum(haversine_m(la[:-1], lo[:-1], la[1:], lo[1:]))
+        shapes[sid] = (la, lo, dist)
+    return shapes
+
+
+def _pattern_lines(p_stops: List[np.ndarray], p_shape: List[str], shapes: Dict[str, tuple],
+                   lat: np.ndarray, lon: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Each stop's distance along its pattern's shape (stops projected in order,
+    never going back), or straight lines between the stops where the pattern
+    has no shape or a stop is too far from it; plus the shapes kept.
+    """
+    stop_dist, pattern_shape, kept = [], [], {}
+    for stops, sid in zip(p_stops, p_shape):
+        line = shapes.get(sid)
+        dists = None
+        if line is not None and len(line[0]) >= 2:
+            dists, lo = [], 0
+            for s in stops.tolist():
+                along, off, k = locate_on_line(float(lat[s]), float(lon[s]), line[0][lo:], line[1][lo:], line[2][lo:], 25.0)
+                if off > SHAPE_MAX_OFFSET_M:
+                    dists = None
+                    break
+                dists.append(max(along, dists[-1]) if dists else along)
+                lo += k
+        if dists is None:
+            step = np.zeros(len(stops))
+            step[1:] = haversine_m(lat[stops[:-1]], lon[stops[:-1]], lat[stops[1:]], lon[stops[1:]])
+            stop_dist.append(np.cumsum(step))
+            pattern_shape.append(-1)
+        else:
+            stop_dist.append(np.asarray(dists))
+            pattern_shape.append(kept.setdefault(sid, len(kept)))
+    lines = [shapes[sid] for sid in kept]
+    ptr = np.zeros(len(lines) + 1, dtype=np.int64)
+    np.cumsum([len(line[0]) for line in lines], out=ptr[1:])
+    shape_lat, shape_lon, shape_dist = (np.concatenate([line[i] for line in lines]) if lines else np.empty(0)
+                                        for i in range(3))
+    return {
+        "pattern_stop_dist": np.concatenate(stop_dist) if stop_dist else np.empty(0),
+        "pattern_shape": np.asarray(pattern_shape, dtype=np.int32),
+        "shape_ptr": ptr,
+        "shape_lat": shape_lat,
+        "shape_lon": shape_lon,
+        "shape_dist": shape_dist,
+    }
+
+
+def _csr(keys: np.ndarray, n: int) -> Tuple[np.ndarray, np.ndarray]:
+    """(stable order by key, indptr of length n + 1)."""
+    order = np.argsort(keys, kind="stable")
+    ptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(keys, minlength=n), out=ptr[1:])
+    return order, ptr
+
+
+def _nearby_pairs(lat: np.ndarray, lon: np.ndarray, radius_m: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """(i, j, metres) for every ordered pair of distinct points within radius_m (grid join)."""
+    n = len(lat)
+    if n < 2 or radius_m <= 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0)
+    kx = _M_PER_DEG_LAT * math.cos(math.radians(float(lat.mean())))
+    x, y = lon * kx, lat * _M_PER_DEG_LAT
+    key = (np.floor(y / radius_m).astype(np.int64) << 32) + np.floor(x / radius_m).astype(np.int64)
+    order = np.argsort(key, kind="stable")
+    skeys = key[order]
+    src, dst = [], []
+    for shift in [(dr << 32) + dc for dr in (-1, 0, 1) for dc in (-1, 0, 1)]:
+        nk = key + shift
+        lo = np.searchsorted(skeys, nk, side="left")
+        counts = np.searchsorted(skeys, nk, side="right") - lo
+        i = np.repeat(np.arange(n), counts)
+        j = order[np.repeat(lo, counts) + (np.arange(int(counts.sum())) - np.repeat(np.cumsum(counts) - counts, counts))]
+        keep = (i != j) & (np.hypot(x[i] - x[j], y[i] - y[j]) <= radius_m)
+        src.append(i[keep])
+        dst.append(j[keep])
+    i, j = np.concatenate(src), np.concatenate(dst)
+    return i, j, haversine_m(lat[i], lon[i], lat[j], lon[j])
+
+
+def _transfers(feed: GtfsFeed, stop_ids: Dict[str, int], lat: np.ndarray, lon: np.ndarray, wc: np.ndarray,
+               radius_m: float, walks: Optional[TransferTable] = None) -> Dict[str, np.ndarray]:
+    """
+    Walking transfers: straight lines times WALK_DETOUR, or the walks of a
+    TransferTable where both stops are on the walking network. A pair whose
+    step-free walk is longer than its shortest walk gets two transfers, the
+    second one step-free. transfers.txt overrides or forbids pairs.
+    """
+    n = len(lat)
+    i, j, d = _nearby_pairs(lat, lon, radius_m)
+    secs = np.ceil(d * WALK_DETOUR / WALK_SPEED_MPS).astype(np.int64)
+    free = np.ones(len(i), dtype=bool)
+    extra: Dict[int, int] = {}
+    if walks is not None:
+        index = np.asarray([stop_ids.get(sid, -1) for sid in walks.stop_ids()], dtype=np.int64)
+        on_graph = np.zeros(n, dtype=bool)
+        on_graph[index[(index >= 0) & walks.snapped()]] = True
+        keep = ~(on_graph[i] & on_graph[j])
+        wi = index[np.repeat(np.arange(walks.n_stops), np.diff(np.asarray(walks.transfer_ptr)))]
+        wj = index[np.asarray(walks.transfer_to)]
+        ok = (wi >= 0) & (wj >= 0)
+        wi, wj = wi[ok], wj[ok]
+        walk_s, free_s = np.asarray(walks.walk_s)[ok], np.asarray(walks.step_free_s)[ok]
+        longer = (free_s != NO_PATH) & (free_s > walk_s)
+        extra = dict(zip((wi[longer] * n + wj[longer]).tolist(), free_s[longer].tolist()))
+        i, j = np.concatenate([i[keep], wi]), np.concatenate([j[keep], wj])
+        secs = np.concatenate([secs[keep], walk_s])
+        free = np.concatenate([free[keep], free_s == walk_s])
+    pairs = dict(zip((i * n + j).tolist(), zip(secs.tolist(), free.tolist())))
+    for a, b, kind, min_s in feed.rows("transfers.txt", ["from_stop_id", "to_stop_id", "transfer_type", "min_transfer_time"]):
+        if a not in stop_ids or b not in stop_ids or a == b:
+            continue
+        k = stop_ids[a] * n + stop_ids[b]
+        if kind == "3":
+            pairs.pop(k, None)
+            extra.pop(k, None)
+        elif kind == "2" and min_s:
+            pairs[k] = (int(float(min_s)), pairs.get(k, (0, True))[1])
+            if k in extra:
+                extra[k] = max(extra[k], int(float(min_s)))
+    keys = np.fromiter(list(pairs.keys()) + list(extra.keys()), dtype=np.int64, count=len(pairs) + len(extra))
+    secs = np.fromiter([v[0] for v in pairs.values()] + list(extra.values()), dtype=np.int64, count=len(keys))
+    free = np.fromiter([v[1] for v in pairs.values()] + [True] * len(extra), dtype=bool, count=len(keys))
+    i, j = keys // max(n, 1), keys % max(n, 1)
+    order, ptr = _csr(i, n)
+    i, j, secs, free = i[order], j[order], secs[order], free[order]
+    return {
+        "transfer_ptr": ptr,
+        "transfer_to": j.astype(np.int32),
+        "transfer_s": secs.astype(np.int32),
+        "transfer_step_free": (free & (wc[i] == WC_YES) & (wc[j] == WC_YES)).astype(np.uint8),
+    }
+
+
+def build_timetable(src: Path, transfer_radius_m: float = TRANSFER_RADIUS_M,
+                    log: Callable[[str], None] = print, walks: Optional[TransferTable] = None) -> Timetable:
+    """Read a GTFS zip (or directory) into a Timetable held in memory; walks replaces straight-line transfers."""
+    feed = GtfsFeed(src)
+    try:
+        return _build(feed, transfer_radius_m, log, walks)
+    finally:
+        feed.close()
+
+
+def _build(feed: GtfsFeed, transfer_radius_m: float, log: Callable[[str], None],
+           walks: Optional[TransferTable] = None) -> Timetable:
+    t0 = time.perf_counter()
+    stops = _read_stops(feed)
+    stop_ids = {s: i for i, s in enumerate(stops["id"])}
+    lat = np.asarray(stops["lat"], dtype=np.float64)
+    lon = np.asarray(stops["lon"], dtype=np.float64)
+    wc = np.asarray(stops["wc"], dtype=np.uint8)
+
+    timezone = next((r[0] for r in feed.rows("agency.txt", ["agency_timezone"]) if r[0]), "")
+    routes, route_ids = [], {}
+    for rid, short, long_name, rtype in feed.rows("routes.txt", ["route_id", "route_short_name", "route_long_name", "route_type"],
+                                                   required=True):
+        route_ids[rid] = len(routes)
+        t = int(rtype or 3)
+        routes.append({"route_id": rid, "short_name": short, "long_name": long_name, "type": t, "mode": route_mode(t)})
+
+    service_ids, services = _read_services(feed)
+    service_index = {s: i for i, s in enumerate(service_ids)}
+    trip_ids, trip_route, trip_service, trip_wc, trip_sign, trip_shape = {}, [], [], [], [], []
+    for rid, sid, tid, wc_trip, sign, shape in feed.rows("trips.txt", ["route_id", "service_id", "trip_id",
+                                                                       "wheelchair_accessible", "trip_headsign", "shape_id"],
+                                                         required=True):
+        if rid not in route_ids or sid not in service_index or tid in trip_ids:
+            continue
+        trip_ids[tid] = len(trip_route)
+        trip_route.append(route_ids[rid])
+        trip_service.append(service_index[sid])
+        trip_wc.append(_wheelchair(wc_trip))
+        trip_sign.append(sign)
+        trip_shape.append(shape)
+    log(f"{len(stop_ids)} stops, {len(routes)} routes, {len(trip_ids)} trips")
+
+    # stop_times.txt is the big one: stream it into flat int arrays
+    st_trip, st_seq, st_stop, st_arr, st_dep = array("i"), array("i"), array("i"), array("i"), array("i")
+    for tid, at, dt, sid, seq in feed.rows("stop_times.txt", ["trip_id", "arrival_time", "departure_time", "stop_id",
+                                                              "stop_sequence"], required=True):
+        t, s = trip_ids.get(tid), stop_ids.get(sid)
+        if t is None or s is None:
+            continue
+        st_trip.append(t)
+        st_seq.append(int(seq))
+        st_stop.append(s)
+        st_arr.append(_seconds(at))
+        st_dep.append(_seconds(dt))
+    log(f"{len(st_trip)} stop times read in {time.perf_counter() - t0:.1f}s")
+
+    trip = np.frombuffer(st_trip, dtype=np.int32)
+    order = np.lexsort((np.frombuffer(st_seq, dtype=np.int32), trip))
+    trip = trip[order]
+    seq = np.frombuffer(st_seq, dtype=np.int32)[order]
+    stop = np.frombuffer(st_stop, dtype=np.int32)[order]
+    arr = np.frombuffer(st_arr, dtype=np.int32)[order]
+    dep = np.frombuffer(st_dep, dtype=np.int32)[order]
+    starts = np.flatnonzero(np.r_[True, trip[1:] != trip[:-1]]) if len(trip) else np.empty(0, dtype=np.int64)
+    bad = _fill_times(trip, starts, arr, dep, lat[stop], lon[stop])
+    if bad.any():
+        log(f"dropping {len(np.unique(trip[bad]))} trips with unusable times")
+        keep = ~bad
+        trip, seq, stop, arr, dep = trip[keep], seq[keep], stop[keep], arr[keep], dep[keep]
+        starts = np.flatnonzero(np.r_[True, trip[1:] != trip[:-1]]) if len(trip) else np.empty(0, dtype=np.int64)
+    ends = np.r_[starts[1:], len(trip)].astype(np.int64)
+
+    # patterns: same route, same stop sequence, split further wherever a trip overtakes another
+    groups: Dict[Tuple[int, bytes], List[int]] = {}
+    for k, (a, b) in enumerate(zip(starts.tolist(), ends.tolist())):
+        if b - a >= 2:
+            groups.setdefault((trip_route[trip[a]], stop[a:b].tobytes()), []).append(k)
+    p_route, p_stops, p_seq, p_shape, p_trips, p_arr, p_dep = [], [], [], [], [], [], []
+    for (route, _), ks in groups.items():
+        ks = np.asarray(ks)
+        rows = starts[ks][:, None] + np.arange(ends[ks[0]] - starts[ks[0]])
+        a, d = arr[rows], dep[rows]
+        by_time = np.lexsort(d.T[::-1])
+        a, d, ks = a[by_time], d[by_time], ks[by_time]
+        for chain in _fifo_chains(a, d):
+            p_route.append(route)
+            p_stops.append(stop[starts[ks[0]]:ends[ks[0]]])
+            p_seq.append(seq[starts[ks[chain[0]]]:ends[ks[chain[0]]]])
+            p_shape.append(trip_shape[trip[starts[ks[chain[0]]]]])
+            p_trips.append(trip[starts[ks[chain]]])
+            p_arr.append(a[chain].T.ravel())
+            p_dep.append(d[chain].T.ravel())
+
+    n_p = len(p_route)
+    n_s = len(stop_ids)
+    pattern_stop_ptr = np.zeros(n_p + 1, dtype=np.int64)
+    np.cumsum([len(s) for s in p_stops], out=pattern_stop_ptr[1:])
+    pattern_trip_ptr = np.zeros(n_p + 1, dtype=np.int64)
+    np.cumsum([len(t) for t in p_trips], out=pattern_trip_ptr[1:])
+    pattern_time_ptr = np.zeros(n_p + 1, dtype=np.int64)
+    np.cumsum([len(t) for t in p_arr], out=pattern_time_ptr[1:])
+    pattern_stops = np.concatenate(p_stops).astype(np.int32) if n_p else np.empty(0, dtype=np.int32)
+    old_trip = np.concatenate(p_trips) if n_p else np.empty(0, dtype=np.int32)
+
+    pattern_of_stop = np.repeat(np.arange(n_p, dtype=np.int32), np.diff(pattern_stop_ptr))
+    pos = (np.arange(len(pattern_stops)) - pattern_stop_ptr[pattern_of_stop]).astype(np.int32)
+    order, stop_pattern_ptr = _csr(pattern_stops, n_s)
+
+    stop_bits = (np.where(wc == WC_YES, WHEELCHAIR, 0) | np.asarray(stops["bits"], dtype=np.int64)).astype(np.uint16)
+    mode_bits = np.asarray([_MODE_BITS[r["mode"]] for r in routes] or [0], dtype=np.uint16)
+    np.bitwise_or.at(stop_bits, pattern_stops, mode_bits[np.asarray(p_route, dtype=np.int64)][pattern_of_stop])
+
+    arrays: Dict[str, np.ndarray] = {
+        "stop_lat": lat,
+        "stop_lon": lon,
+        "stop_wheelchair": wc,
+        "stop_bits": stop_bits,
+        "trip_route": np.asarray(trip_route, dtype=np.int32)[old_trip],
+        "trip_service": np.asarray(trip_service, dtype=np.int32)[old_trip],
+        "trip_wheelchair": np.asarray(trip_wc, dtype=np.uint8)[old_trip],
+        "trip_pattern": np.repeat(np.arange(n_p, dtype=np.int32), np.diff(pattern_trip_ptr)),
+        **services,
+        "pattern_route": np.asarray(p_route, dtype=np.int32),
+        "pattern_stop_ptr": pattern_stop_ptr,
+        "pattern_stops": pattern_stops,
+        "pattern_stop_seq": np.concatenate(p_seq) if n_p else np.empty(0, dtype=np.int32),
+        **_pattern_lines(p_stops, p_shape, _read_shapes(feed, set(p_shape) - {""}), lat, lon),
+        "pattern_trip_ptr": pattern_trip_ptr,
+        "pattern_time_ptr": pattern_time_ptr,
+        "arrival": np.concatenate(p_arr).astype(np.int32) if n_p else np.empty(0, dtype=np.int32),
+        "departure": np.concatenate(p_dep).astype(np.int32) if n_p else np.empty(0, dtype=np.int32),
+        "stop_pattern_ptr": stop_pattern_ptr,
+        "stop_patterns": pattern_of_stop[order],
+        "stop_pattern_pos": pos[order],
+        **_transfers(feed, stop_ids, lat, lon, wc, transfer_radius_m, walks),
+    }
+    trip_id_list = list(trip_ids)
+    strings = {
+        "stop_id": stops["id"],
+        "stop_name": stops["name"],
+        "stop_parent": stops["parent"],
+        "trip_id": [trip_id_list[t] for t in old_trip.tolist()],
+        "trip_headsign": [trip_sign[t] for t in old_trip.tolist()],
+    }
+    for column in _STRING_COLUMNS:
+        arrays[column + "_data"], arrays[column + "_ptr"] = pack_strings(strings[column])
+    arrays = {name: np.asarray(arrays[name], dtype=dtype) for name, dtype in ARRAY_DTYPES.items()}
+
+    meta = {
+        "source": str(feed.src.name),
+        "imported_at": time.time(),
+        "timezone": timezone,
+        "routes": routes,
+        "service_ids": service_ids,
+        "transfer_radius_m": transfer_radius_m,
+        "walking_transfers": walks is not None,
+    }
+    log(f"{n_p} patterns, {len(arrays['transfer_to'])} transfers built in {time.perf_counter() - t0:.1f}s")
+    return Timetable(arrays, meta)
+
+
+def save_timetable(tt: Timetable, path: Path = TIMETABLE_PATH) -> Path:
+    return write_arrays(path, _MAGIC, tt.arrays(), tt.meta)
+
+
+def load_timetable(path: Path = TIMETABLE_PATH, mmap: bool = True) -> Timetable:
+    arrays, meta = read_arrays(path, _MAGIC, mmap=mmap)
+    return Timetable(arrays, meta)
+
+
+def write_stops(tt: Timetable, path: Path) -> Path:
+    """The feed's stops as a stops.txt the nearest-stop index reads (modes served included)."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    with open(tmp, "w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(["stop_id", "stop_name", "stop_lat", "stop_lon", "wheelchair_boarding", *_FEATURE_COLUMNS, "modes"])
+        for s in tt.stop_records():
+            modes = [n for n in attribute_names(s["bits"]) if n in _MODE_BITS]
+            features = [1 if s["bits"] & FEATURE_BITS[c] else 0 for c in _FEATURE_COLUMNS]
+            w.writerow([s["id"], s["name"], s["lat"], s["lon"], 1 if s["bits"] & WHEELCHAIR else 0, *features, "|".join(modes)])
+    os.replace(tmp, path)
+    return path
+
+
+def build_walks(src: Path, transfer_radius_m: float = TRANSFER_RADIUS_M, graph_path: Path = WALKING_GRAPH_PATH,
+                workers: int = TRANSFER_WORKERS, log: Callable[[str], None] = print) -> TransferTable:
+    """Walking transfers between the feed's stops along the walking graph (see transfer_service)."""
+    feed = GtfsFeed(src)
+    try:
+        stops = _read_stops(feed)
+    finally:
+        feed.close()
+    return build_transfers(stops["id"], np.asarray(stops["lat"], dtype=np.float64), np.asarray(stops["lon"], dtype=np.float64),
+                           transfer_radius_m, WALK_SPEED_MPS, graph_path, workers=workers, log=log)
+
+
+def import_gtfs(src: Path, dest: Path = TIMETABLE_PATH, stops_out: Optional[Path] = None,
+                transfer_radius_m: float = TRANSFER_RADIUS_M, log: Callable[[str], None] = print,
+                walking_graph: Optional[Path] = None, transfers_out: Path = TRANSFERS_PATH,
+                workers: int = TRANSFER_WORKERS) -> Timetable:
+    walks = None
+    if walking_graph and Path(walking_graph).exists():
+        walks = build_walks(src, transfer_radius_m, Path(walking_graph), workers, log)
+        save_transfers(walks, transfers_out)
+        log(f"wrote {transfers_out}")
+    tt = build_timetable(src, transfer_radius_m, log, walks)
+    save_timetable(tt, dest)
+    if stops_out:
+        write_stops(tt, stops_out)
+    log(f"wrote {dest}")
+    return tt
+
+
+_timetable: Optional[Timetable] = None
+_loaded = False
+
+
+def get_timetable() -> Optional[Timetable]:
+    """The shared timetable, memory-mapped from TIMETABLE_PATH on first use; None if no feed was imported."""
+    global _timetable, _loaded
+    if not _loaded:
+        _loaded = True
+        if TIMETABLE_PATH.exists():
+            _timetable = load_timetable(TIMETABLE_PATH)
+    return _timetable
+
+
+def reload_timetable(path: Optional[Path] = None, timetable: Optional[Timetable] = None) -> Optional[Timetable]:
+    """Load a fresh timetable off to the side, then swap the reference."""
+    global _timetable, _loaded
+    path = Path(path) if path else TIMETABLE_PATH
+    new_tt = timetable if timetable is not None else (load_timetable(path) if path.exists() else None)
+    _timetable, _loaded = new_tt, True
+    return new_tt
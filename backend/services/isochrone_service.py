@@ -0,0 +1,370 @@
+import heapq
+import math
+import os
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from services.route_cache_service import snap
+from services.route_geometry_service import simplify
+from services.walking_graph_service import WalkingGraph
+from services.walking_router_service import Weighting, WalkingRouter
+
+# Outline raster: reached edges are sampled onto cells this size, grown by one cell.
+ISOCHRONE_CELL_M = float(os.getenv("ISOCHRONE_CELL_M", "50"))
+ISOCHRONE_CACHE_GRID_M = float(os.getenv("ISOCHRONE_CACHE_GRID_M", "50"))
+ISOCHRONE_CACHE_SIZE = int(os.getenv("ISOCHRONE_CACHE_SIZE", "256"))
+
+# A place counts as reached when the network comes within this distance of it.
+PLACE_SNAP_M = 150.0
+MAX_PLACES = 200
+STOP_KINDS = {"stop", "bus_stop", "station", "subway_station", "tram_stop", "platform", "transit"}
+
+_M_PER_DEG_LAT = 111_320.0
+
+IsochroneKey = Tuple[Weighting, int, int, int]
+
+# (di, dj) grid steps; the left turn of each direction is the next one in the list
+_DIRS = [(0, 1), (1, 0), (0, -1), (-1, 0)]
+
+
+def bounded_dijkstra(
+    graph: WalkingGraph,
+    costs: np.ndarray,
+    seeds: Sequence[Tuple[int, float]],
+    limit: float,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Multi-source Dijkstra that stops at `limit`. Seeds are (node, starting cost)
+    pairs, so a walk can start from the origin and from transit arrivals at once.
+    Returns the settled nodes and their costs.
+    """
+    indptr, targets = graph.indptr, graph.targets
+    dist: Dict[int, float] = {}
+    heap: List[Tuple[float, int]] = []
+    for node, c in seeds:
+        if c <= limit and c < dist.get(node, math.inf):
+            dist[node] = c
+            heap.append((c, node))
+    heapq.heapify(heap)
+
+    settled: Dict[int, float] = {}
+    get, inf, push, pop = dist.get, math.inf, heapq.heappush, heapq.heappop
+    while heap:
+        d, u = pop(heap)
+        if u in settled:
+            continue
+        settled[u] = d
+        lo, hi = int(indptr[u]), int(indptr[u + 1])
+        for v, c in zip(targets[lo:hi].tolist(), costs[lo:hi].tolist()):
+            nd = d + c
+            if nd <= limit and nd < get(v, inf):
+                dist[v] = nd
+                push(heap, (nd, v))
+    nodes = np.fromiter(settled.keys(), dtype=np.int64, count=len(settled))
+    return nodes, np.fromiter(settled.values(), dtype=np.float64, count=len(settled))
+
+
+def reached_points(
+    graph: WalkingGraph,
+    costs: np.ndarray,
+    nodes: np.ndarray,
+    node_cost: np.ndarray,
+    limit: float,
+    step_m: float,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Plane (x, y) samples every step_m along the reachable part of each edge leaving
+    a settled node, so long edges and dead ends that run out of budget still count.
+    """
+    indptr = np.asarray(graph.indptr)
+    counts = indptr[nodes + 1] - indptr[nodes]
+    first = np.cumsum(counts) - counts
+    edges = np.repeat(indptr[nodes], counts) + (np.arange(int(counts.sum())) - np.repeat(first, counts))
+    u = np.repeat(nodes, counts)
+    v = np.asarray(graph.targets)[edges].astype(np.int64)
+    c = costs[edges]
+    left = np.repeat(limit - node_cost, counts)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        frac = np.where(np.isfinite(c) & (c > 0), np.clip(left / c, 0.0, 1.0), np.where(c == 0, 1.0, 0.0))
+    reach = frac * np.asarray(graph.length_m, dtype=np.float64)[edges]
+
+    # one sample at each edge start, then every step_m, then the exact reach point
+    parts = np.floor(reach / step_m).astype(np.int64) + 2
+    owner = np.repeat(np.arange(len(edges)), parts)
+    k = np.arange(len(owner)) - np.repeat(np.cumsum(parts) - parts, parts)
+    t = np.minimum(k * step_m, reach[owner]) / np.where(reach[owner] > 0, graph.length_m[edges][owner], 1.0)
+    t = t * (reach[owner] > 0)
+    x, y = graph.x, graph.y
+    px = x[u[owner]] + (x[v[owner]] - x[u[owner]]) * t
+    py = y[u[owner]] + (y[v[owner]] - y[u[owner]]) * t
+    return np.concatenate([x[nodes], px]), np.concatenate([y[nodes], py])
+
+
+def _grow(mask: np.ndarray) -> np.ndarray:
+    """8-neighbour dilation by one cell."""
+    out = mask.copy()
+    out[1:] |= mask[:-1]
+    out[:-1] |= mask[1:]
+    wide = out.copy()
+    out[:, 1:] |= wide[:, :-1]
+    out[:, :-1] |= wide[:, 1:]
+    return out
+
+
+def _fill_holes(mask: np.ndarray) -> np.ndarray:
+    """Cells not connected to the (empty) border through empty cells become filled."""
+    outside = np.zeros_like(mask)
+    outside[0, :] = outside[-1, :] = outside[:, 0] = outside[:, -1] = True
+    outside &= ~mask
+    while True:
+        grown = outside.copy()
+        grown[1:] |= outside[:-1]
+        grown[:-1] |= outside[1:]
+        grown[:, 1:] |= outside[:, :-1]
+        grown[:, :-1] |= outside[:, 1:]
+        grown &= ~mask
+        if np.array_equal(grown, outside):
+            return ~outside
+        outside = grown
+
+
+def _trace_rings(mask: np.ndarray) -> List[List[Tuple[int, int]]]:
+    """
+    Counter-clockwise rings of grid corners (i, j) around the filled cells. Every
+    boundary edge keeps its cell on the left; at a corner shared by two diagonal
+    cells the left turn is taken, so the cells stay separate rings.
+    """
+    m = np.pad(mask, 1)
+    edges: Dict[Tuple[int, int], List[Tuple[int, int]]] = {}
+
+    def add(rs: np.ndarray, cs: np.ndarray, start: Tuple[int, int], step: Tuple[int, int]) -> None:
+        for r, c in zip(rs.tolist(), cs.tolist()):
+            a = (r + start[0], c + start[1])
+            edges.setdefault(a, []).append(step)
+
+    core = m[1:-1, 1:-1]
+    # cell (r, c) of `mask` has corners (r, c) .. (r + 1, c + 1)
+    r, c = np.nonzero(core & ~m[:-2, 1:-1])
+    add(r, c, (0, 0), (0, 1))        # bottom edge, heading east
+    r, c = np.nonzero(core & ~m[1:-1, 2:])
+    add(r, c, (0, 1), (1, 0))        # right edge, heading north
+    r, c = np.nonzero(core & ~m[2:, 1:-1])
+    add(r, c, (1, 1), (0, -1))       # top edge, heading west
+    r, c = np.nonzero(core & ~m[1:-1, :-2])
+    add(r, c, (1, 0), (-1, 0))       # left edge, heading south
+
+    rings = []
+    while edges:
+        start = next(iter(edges))
+        ring = [start]
+        at, heading = start, None
+        while True:
+            out = edges.get(at)
+            if not out:
+                break
+            if heading is None or len(out) == 1:
+                step = out[0]
+            else:
+                i = _DIRS.index(heading)
+                step = next(d for d in (_DIRS[(i + 1) % 4], heading, _DIRS[(i + 3) % 4]) if d in out)
+            out.remove(step)
+            if not out:
+                del edges[at]
+            at = (at[0] + step[0], at[1] + step[1])
+            # keep only corners where the heading changes
+            if step == heading:
+                ring[-1] = at
+            else:
+                ring.append(at)
+            heading = step
+            if at == start:
+                break
+        rings.append(ring)
+    return rings
+
+
+def outline(x: np.ndarray, y: np.ndarray, kx: float, cell_m: float = ISOCHRONE_CELL_M) -> Optional[Dict[str, Any]]:
+    """
+    GeoJSON Polygon/MultiPolygon covering plane points (x, y): the points are
+    rasterised, grown by a cell, holes filled and the cell boundary traced and
+    simplified. kx is the graph's metres per degree of longitude.
+    """
+    if len(x) == 0:
+        return None
+    # two empty cells of margin: one for the growth, one so the border stays outside
+    x0, y0 = float(x.min()) - 2 * cell_m, float(y.min()) - 2 * cell_m
+    col = ((x - x0) // cell_m).astype(np.int64)
+    row = ((y - y0) // cell_m).astype(np.int64)
+    mask = np.zeros((int(row.max()) + 3, int(col.max()) + 3), dtype=bool)
+    mask[row, col] = True
+    mask = _fill_holes(_grow(mask))
+
+    polygons = []
+    for ring in _trace_rings(mask):
+        pts = np.asarray(ring, dtype=np.float64)
+        lon = (x0 + pts[:, 1] * cell_m) / kx
+        lat = (y0 + pts[:, 0] * cell_m) / _M_PER_DEG_LAT
+        coords = simplify(np.column_stack([lon, lat]), cell_m * 0.75)
+        if len(coords) >= 4:
+            polygons.append([np.round(np.asarray(coords), 6).tolist()])
+    if not polygons:
+        return None
+    if len(polygons) == 1:
+        return {"type": "Polygon", "coordinates": polygons[0]}
+    return {"type": "MultiPolygon", "coordinates": polygons}
+
+
+@dataclass
+class PlaceSet:
+    """
+    Named points (stops and POIs) checked against an isochrone. Places are snapped
+    to the walking graph lazily, only once they fall inside a reached area.
+    """
+    names: List[str]
+    kinds: List[str]
+    lat: np.ndarray
+    lon: np.ndarray
+    _snap: Dict[int, Optional[Tuple[int, float]]] = field(default_factory=dict, repr=False)
+
+    @classmethod
+    def from_gazetteer(cls, index: Any) -> "PlaceSet":
+        return cls(list(index.names), list(index.kinds), np.asarray(index.lat), np.asarray(index.lon))
+
+    def snapped(self, graph: WalkingGraph, i: int) -> Optional[Tuple[int, float]]:
+        if i not in self._snap:
+            self._snap[i] = graph.nearest_node(float(self.lat[i]), float(self.lon[i]), PLACE_SNAP_M)
+        return self._snap[i]
+
+
+def reachable_places(
+    graph: WalkingGraph,
+    places: PlaceSet,
+    settled: Dict[int, float],
+    bbox: Tuple[float, float, float, float],
+    limit: float,
+    speed_mps: float,
+) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """(stops, pois) whose snapped node plus the last straight walk fits in `limit`, soonest first."""
+    min_lon, min_lat, max_lon, max_lat = bbox
+    inside = np.flatnonzero(
+        (places.lat >= min_lat) & (places.lat <= max_lat) & (places.lon >= min_lon) & (places.lon <= max_lon)
+    )
+    stops, pois = [], []
+    for i in inside.tolist():
+        s = places.snapped(graph, i)
+        if s is None or s[0] not in settled:
+            continue
+        cost = settled[s[0]] + s[1]
+        if cost > limit:
+            continue
+        item = {
+            "name": places.names[i],
+            "kind": places.kinds[i],
+            "lat": float(places.lat[i]),
+            "lon": float(places.lon[i]),
+            "time_s": round(cost / speed_mps, 1),
+        }
+        (stops if places.kinds[i] in STOP_KINDS else pois).append(item)
+    stops.sort(key=lambda p: p["time_s"])
+    pois.sort(key=lambda p: p["time_s"])
+    return stops[:MAX_PLACES], pois[:MAX_PLACES]
+
+
+def compute_isochrone(
+    router: WalkingRouter,
+    lat: float,
+    lon: float,
+    budget_s: float,
+    weighting: Weighting,
+    places: Optional[PlaceSet] = None,
+    seeds: Sequence[Tuple[float, float, float]] = (),
+    max_snap_m: float = 500.0,
+    cell_m: float = ISOCHRONE_CELL_M,
+) -> Dict[str, Any]:
+    """
+    Everything reachable from (lat, lon) within budget_s under `weighting`.
+
+    `seeds` are extra (lat, lon, seconds already used) starting points, e.g. stops
+    reached by transit. Times are weighted: penalised edges count as slower.
+    Raises ValueError when the origin is off the network.
+    """
+    graph = router.graph
+    o = graph.nearest_node(lat, lon, max_snap_m)
+    if o is None:
+        raise ValueError("Origin is not near the walking network")
+    limit = budget_s * weighting.speed_mps
+    starts = [(o[0], o[1])]
+    for s_lat, s_lon, used_s in seeds:
+        s = graph.nearest_node(s_lat, s_lon, PLACE_SNAP_M)
+        if s is not None:
+            starts.append((s[0], used_s * weighting.speed_mps + s[1]))
+
+    costs = router.costs(weighting)
+    nodes, node_cost = bounded_dijkstra(graph, costs, starts, limit)
+    x, y = reached_points(graph, costs, nodes, node_cost, limit, cell_m / 2)
+    polygon = outline(x, y, graph._kx, cell_m)
+
+    stops: List[Dict[str, Any]] = []
+    pois: List[Dict[str, Any]] = []
+    if places is not None and len(nodes):
+        pad_x, pad_y = PLACE_SNAP_M / graph._kx, PLACE_SNAP_M / _M_PER_DEG_LAT
+        bbox = (float(x.min()) / graph._kx - pad_x, float(y.min()) / _M_PER_DEG_LAT - pad_y,
+                float(x.max()) / graph._kx + pad_x, float(y.max()) / _M_PER_DEG_LAT + pad_y)
+        settled = dict(zip(nodes.tolist(), node_cost.tolist()))
+        stops, pois = reachable_places(graph, places, settled, bbox, limit, weighting.speed_mps)
+
+    return {
+        "origin": {"lat": lat, "lon": lon},
+        "snap_distance_m": round(o[1], 1),
+        "budget_s": budget_s,
+        "weighting": weighting.name,
+        "nodes_reached": int(len(nodes)),
+        "polygon": polygon,
+        "stops": stops,
+        "pois": pois,
+    }
+
+
+class IsochroneCache:
+    """LRU of isochrone results keyed on weighting, snapped origin cell and budget."""
+
+    def __init__(self, grid_m: float = ISOCHRONE_CACHE_GRID_M, max_entries: int = ISOCHRONE_CACHE_SIZE) -> None:
+        self.grid_m = float(grid_m)
+        self.max_entries = max(1, int(max_entries))
+        self._data: "OrderedDict[IsochroneKey, Dict[str, Any]]" = OrderedDict()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def key(self, lat: float, lon: float, budget_s: float, weighting: Weighting) -> IsochroneKey:
+        row, col = snap(lat, lon, self.grid_m)
+        return (weighting, row, col, int(round(budget_s)))
+
+    def get(self, key: IsochroneKey) -> Optional[Dict[str, Any]]:
+        hit = self._data.get(key)
+        if hit is None:
+            self.stats["misses"] += 1
+            return None
+        self._data.move_to_end(key)
+        self.stats["hits"] += 1
+        return hit
+
+    def put(self, key: IsochroneKey, result: Dict[str, Any]) -> None:
+        self._data[key] = result
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def snapshot(self) -> Dict[str, Any]:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return {
+            **self.stats,
+            "entries": len(self._data),
+            "grid_m": self.grid_m,
+            "hit_ratio": round(self.stats["hits"] / lookups, 4) if lookups else None,
+        }
@@ -0,0 +1,273 @@
+import random
+from typing import Dict, List, Optional, Set, Tuple
+
+# Ordered by score descending, ties broken by user_id ascending.
+_Key = Tuple[float, str]
+
+_MAX_LEVEL = 32
+_P = 0.25
+
+METRICS = ("points", "co2_saved_kg")
+
+
+class _Node:
+    __slots__ = ("key", "forward", "span")
+
+    def __init__(self, key: Optional[_Key], level: int) -> None:
+        self.key = key
+        self.forward: List[Optional["_Node"]] = [None] * level
+        self.span: List[int] = [0] * level
+
+
+class _IndexedSkipList:
+    """
+    Skip list with per-link spans (same idea as a Redis sorted set).
+    insert/remove/rank/nth are all expected O(log n).
+    """
+
+    def __init__(self) -> None:
+        self._head = _Node(None, _MAX_LEVEL)
+        self._level = 1
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    @staticmethod
+    def _random_level() -> int:
+        level = 1
+        while level < _MAX_LEVEL and random.random() < _P:
+            level += 1
+        return level
+
+    def insert(self, key: _Key) -> None:
+        update: List[_Node] = [self._head] * _MAX_LEVEL
+        rank = [0] * _MAX_LEVEL
+        x = self._head
+        for i in range(self._level - 1, -1, -1):
+            rank[i] = 0 if i == self._level - 1 else rank[i + 1]
+            while x.forward[i] is not None and x.forward[i].key < key:
+                rank[i] += x.span[i]
+                x = x.forward[i]
+            update[i] = x
+
+        level = self._random_level()
+        if level > self._level:
+            for i in range(self._level, level):
+                rank[i] = 0
+                update[i] = self._head
+                update[i].span[i] = self._size
+            self._level = level
+
+        node = _Node(key, level)
+        for i in range(level):
+            node.forward[i] = update[i].forward[i]
+            update[i].forward[i] = node
+            node.span[i] = update[i].span[i] - (rank[0] - rank[i])
+            update[i].span[i] = (rank[0] - rank[i]) + 1
+
+        for i in range(level, self._level):
+            update[i].span[i] += 1
+        self._size += 1
+
+    def remove(self, key: _Key) -> bool:
+        update: List[_Node] = [self._head] * _MAX_LEVEL
+        x = self._head
+        for i in range(self._level - 1, -1, -1):
+            while x.forward[i] is not None and x.forward[i].key < key:
+                x = x.forward[i]
+            update[i] = x
+
+        target = x.forward[0]
+        if target is None or target.key != key:
+            return False
+
+        for i in range(self._level):
+            if update[i].forward[i] is target:
+                update[i].span[i] += target.span[i] - 1
+                update[i].forward[i] = target.forward[i]
+            else:
+                update[i].span[i] -= 1
+        while self._level > 1 and self._head.forward[self._level - 1] is None:
+            self._level -= 1
+        self._size -= 1
+        return True
+
+    def rank(self, key: _Key) -> int:
+        """1-based position of key, or 0 if absent."""
+        r = 0
+        x = self._head
+        for i in range(self._level - 1, -1, -1):
+            while x.forward[i] is not None and x.forward[i].key <= key:
+                r += x.span[i]
+                x = x.forward[i]
+            if x.key == key:
+                return r
+        return 0
+
+    def slice(self, start: int, count: int) -> List[_Key]:
+        """Keys at 1-based positions [start, start + count)."""
+        if start < 1 or count <= 0 or start > self._size:
+            return []
+        traversed = 0
+        x = self._head
+        for i in range(self._level - 1, -1, -1):
+            while x.forward[i] is not None and traversed + x.span[i] <= start:
+                traversed += x.span[i]
+                x = x.forward[i]
+            if traversed == start:
+                break
+
+        out: List[_Key] = []
+        node: Optional[_Node] = x
+        while node is not None and len(out) < count:
+            out.append(node.key)
+            node = node.forward[0]
+        return out
+
+
+class Leaderboard:
+    """One ranked board for a single metric (e.g. city points)."""
+
+    def __init__(self) -> None:
+        self._scores: Dict[str, float] = {}
+        self._list = _IndexedSkipList()
+
+    def __len__(self) -> int:
+        return len(self._scores)
+
+    def score(self, user_id: str) -> Optional[float]:
+        return self._scores.get(user_id)
+
+    def set(self, user_id: str, score: float) -> None:
+        old = self._scores.get(user_id)
+        if old is not None:
+            if old == score:
+                return
+            self._list.remove((-old, user_id))
+        self._scores[user_id] = score
+        self._list.insert((-score, user_id))
+
+    def remove(self, user_id: str) -> None:
+        old = self._scores.pop(user_id, None)
+        if old is not None:
+            self._list.remove((-old, user_id))
+
+    def rank(self, user_id: str) -> Optional[int]:
+        s = self._scores.get(user_id)
+        if s is None:
+            return None
+        return self._list.rank((-s, user_id))
+
+    def top(self, k: int, offset: int = 0) -> List[Dict[str, object]]:
+        keys = self._list.slice(offset + 1, k)
+        return [
+            {"rank": offset + i + 1, "user_id": uid, "score": -neg}
+            for i, (neg, uid) in enumerate(keys)
+        ]
+
+
+class LeaderboardService:
+    """
+    City-wide and friend-group leaderboards ranked by points and CO2 saved.
+
+    Totals are updated incrementally on every trip; reads never re-sort.
+    """
+
+    def __init__(self) -> None:
+        # (scope, name, metric) -> Leaderboard, scope is "city" or "friends"
+        self._boards: Dict[Tuple[str, str, str], Leaderboard] = {}
+        self._totals: Dict[str, Dict[str, float]] = {}
+        self._user_city: Dict[str, str] = {}
+        self._friends: Dict[str, Set[str]] = {}
+        # member -> owners whose friend group lists that member
+        self._friend_of: Dict[str, Set[str]] = {}
+
+    @staticmethod
+    def _check_metric(metric: str) -> None:
+        if metric not in METRICS:
+            raise ValueError(f"Unknown metric '{metric}'. Must be one of: {', '.join(METRICS)}")
+
+    def _board(self, scope: str, name: str, metric: str) -> Leaderboard:
+        self._check_metric(metric)
+        key = (scope, name, metric)
+        board = self._boards.get(key)
+        if board is None:
+            board = Leaderboard()
+            self._boards[key] = board
+        return board
+
+    @staticmethod
+    def _city_key(city: str) -> str:
+        return (city or "").strip().lower()
+
+    def totals(self, user_id: str) -> Dict[str, float]:
+        return dict(self._totals.get(user_id, {m: 0.0 for m in METRICS}))
+
+    def record_trip(self, user_id: str, city: str, points: int, co2_saved_kg: float) -> Dict[str, float]:
+        """Add one trip's points/CO2 to the user's totals and re-rank them."""
+        totals = self._totals.setdefault(user_id, {m: 0.0 for m in METRICS})
+        totals["points"] += int(points)
+        totals["co2_saved_kg"] = round(totals["co2_saved_kg"] + float(co2_saved_kg), 3)
+
+        city_key = self._city_key(city)
+        old_city = self._user_city.get(user_id)
+        if old_city is not None and old_city != city_key:
+            for m in METRICS:
+                self._board("city", old_city, m).remove(user_id)
+        self._user_city[user_id] = city_key
+
+        for m in METRICS:
+            self._board("city", city_key, m).set(user_id, totals[m])
+            # Friend boards are keyed by the owner; every owner that lists
+            # this user (plus the user's own board) needs the new total.
+            for owner in self._friend_boards_containing(user_id):
+                self._board("friends", owner, m).set(user_id, totals[m])
+
+        return dict(totals)
+
+    def _friend_boards_containing(self, user_id: str) -> List[str]:
+        owners = list(self._friend_of.get(user_id, ()))
+        if user_id in self._friends:
+            owners.append(user_id)
+        return owners
+
+    def set_friends(self, user_id: str, friend_ids: List[str]) -> None:
+        """Replace the friend group for user_id and rebuild only that group's boards."""
+        members = {f for f in friend_ids if f and f != user_id}
+        for old in self._friends.get(user_id, set()) - members:
+            self._friend_of.get(old, set()).discard(user_id)
+        for new in members:
+            self._friend_of.setdefault(new, set()).add(user_id)
+        self._friends[user_id] = members
+        for m in METRICS:
+            board = Leaderboard()
+            for uid in members | {user_id}:
+                board.set(uid, self._totals.get(uid, {}).get(m, 0.0))
+            self._boards[("friends", user_id, m)] = board
+
+    def top(self, city: str, metric: str = "points", k: int = 10, offset: int = 0) -> List[Dict[str, object]]:
+        return self._board("city", self._city_key(city), metric).top(k, offset)
+
+    def friends_top(self, user_id: str, metric: str = "points", k: int = 10) -> List[Dict[str, object]]:
+        """The user's friend group ranked; empty (and nothing stored) until set_friends is called."""
+        self._check_metric(metric)
+        board = self._boards.get(("friends", user_id, metric))
+        return board.top(k) if board is not None else []
+
+    def rank(self, user_id: str, metric: str = "points") -> Optional[Dict[str, object]]:
+        city = self._user_city.get(user_id)
+        if city is None:
+            return None
+        board = self._board("city", city, metric)
+        return {
+            "user_id": user_id,
+            "city": city,
+            "metric": metric,
+            "rank": board.rank(user_id),
+            "score": board.score(user_id),
+            "total_users": len(board),
+        }
+
+
+leaderboard_service = LeaderboardService()
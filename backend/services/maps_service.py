@@ -1,28 +1,287 @@
+import asyncio
+import os
+import threading
 import httpx
-from typing import Any, Dict, List
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from services.geocode_cache_service import GeocodeCache, normalize_query
+from services.geocode_scheduler_service import RequestScheduler, SchedulerTimeout, PRIORITIES
+from services.route_cache_service import RouteCache, MatrixCache
+from services.walking_graph_service import WALKING_GRAPH_PATH, load_graph
+from services.walking_router_service import WALKING_CH_WEIGHTINGS, WalkingRouter, hierarchy_path, resolve_weighting
+from services.isochrone_service import IsochroneCache, PlaceSet, compute_isochrone
+from services.raptor_service import transit_arrivals
+from services import realtime_service
+from services.gazetteer_service import get_index
+from services.obstacle_service import get_obstacle_index, validate_route
 
 NOMINATIM_BASE = "https://nominatim.openstreetmap.org"
 OSRM_BASE = "https://router.project-osrm.org"
 
+# OSRM's public demo server rejects table requests with more than ~100 coordinates
+OSRM_TABLE_MAX_COORDS = int(os.getenv("OSRM_TABLE_MAX_COORDS", "100"))
+OSRM_TABLE_CONCURRENCY = int(os.getenv("OSRM_TABLE_CONCURRENCY", "4"))
+
 HEADERS = {
     "User-Agent": "transit-accessibility-app/1.0 (school project)"
 }
 
-async def geocode(query: str, limit: int = 5) -> List[Dict[str, Any]]:
+geocode_cache = GeocodeCache()
+route_cache = RouteCache()
+nominatim_scheduler = RequestScheduler()
+matrix_cache = MatrixCache()
+isochrone_cache = IsochroneCache()
+
+async def _nominatim_search(query: str, limit: int) -> List[Dict[str, Any]]:
     params = {"q": query, "format": "json", "limit": limit}
     async with httpx.AsyncClient(timeout=20.0, headers=HEADERS) as client:
         r = await client.get(f"{NOMINATIM_BASE}/search", params=params)
         r.raise_for_status()
         return r.json()
 
+async def geocode(query: str, limit: int = 5, priority: str = "interactive") -> List[Dict[str, Any]]:
+    """
+    Cached, rate-limited Nominatim search. Identical queries in flight share one
+    upstream call; raises SchedulerTimeout if no request slot frees up in time.
+    """
+    cached = geocode_cache.get(query, limit)
+    if cached is not None:
+        return cached
+
+    results = await nominatim_scheduler.submit(
+        (normalize_query(query) or query, limit),
+        lambda: _nominatim_search(query, limit),
+        priority=PRIORITIES.get(priority, PRIORITIES["interactive"]),
+    )
+    geocode_cache.put(query, limit, results)
+    return results
+
 async def route_osrm(
     origin_lat: float, origin_lon: float,
     dest_lat: float, dest_lon: float,
     profile: str = "foot",
+    alternatives: bool = False,
 ) -> Dict[str, Any]:
+    # Trips starting/ending within the same grid cells share one OSRM answer
+    key = route_cache.key(origin_lat, origin_lon, dest_lat, dest_lon, f"{profile}+alt" if alternatives else profile)
+    cached = route_cache.get(key)
+    if cached is not None:
+        return cached
+
     coords = f"{origin_lon},{origin_lat};{dest_lon},{dest_lat}"
     params = {"overview": "full", "geometries": "geojson", "steps": "true"}
+    if alternatives:
+        params["alternatives"] = "true"
     async with httpx.AsyncClient(timeout=20.0, headers=HEADERS) as client:
         r = await client.get(f"{OSRM_BASE}/route/v1/{profile}/{coords}", params=params)
         r.raise_for_status()
-        return r.json()
+        data = r.json()
+    if data.get("code") == "Ok":
+        route_cache.put(key, data)
+    return data
+
+def _route_coords(route: Dict[str, Any]) -> List[List[float]]:
+    return (route.get("geometry") or {}).get("coordinates") or []
+
+async def route_osrm_checked(
+    origin_lat: float, origin_lon: float,
+    dest_lat: float, dest_lon: float,
+    profile: str = "foot",
+    needs: str = "shortest",
+) -> Dict[str, Any]:
+    """
+    route_osrm plus obstacle validation for foot routes. When the first route passes
+    something `needs` rules out, OSRM alternatives are fetched and routes that pass
+    move to the front. Adds `validation` (one entry per route, same order).
+    """
+    data = await route_osrm(origin_lat, origin_lon, dest_lat, dest_lon, profile=profile)
+    routes = data.get("routes") or []
+    if profile != "foot" or data.get("code") != "Ok" or not routes:
+        return data
+
+    index = get_obstacle_index()
+    checks = [validate_route(index, _route_coords(routes[0]), needs)]
+    if not checks[0]["ok"]:
+        alt = await route_osrm(origin_lat, origin_lon, dest_lat, dest_lon, profile=profile, alternatives=True)
+        if alt.get("code") == "Ok" and alt.get("routes"):
+            routes = alt["routes"]
+            checks = [validate_route(index, _route_coords(r), needs) for r in routes]
+    # passing routes first, then fewest blockers; OSRM's own order breaks ties
+    order = sorted(range(len(checks)), key=lambda i: (not checks[i]["ok"], len(checks[i]["blocking"])))
+    return {**data, "routes": [routes[i] for i in order], "validation": [checks[i] for i in order]}
+
+def _table_blocks(n_src: int, n_dst: int, max_coords: int) -> List[Tuple[range, range]]:
+    """Split an n_src x n_dst matrix into blocks whose coordinate count fits one request."""
+    half = max(1, max_coords // 2)
+    src_step = min(n_src, half) if n_dst > half else max(1, min(n_src, max_coords - n_dst))
+    dst_step = max(1, min(n_dst, max_coords - src_step))
+    return [
+        (range(i, min(i + src_step, n_src)), range(j, min(j + dst_step, n_dst)))
+        for i in range(0, n_src, src_step)
+        for j in range(0, n_dst, dst_step)
+    ]
+
+async def _osrm_table_block(
+    client: httpx.AsyncClient,
+    sem: asyncio.Semaphore,
+    profile: str,
+    srcs: Sequence[Tuple[float, float]],
+    dsts: Sequence[Tuple[float, float]],
+) -> Dict[str, Any]:
+    coords = ";".join(f"{lon},{lat}" for lat, lon in list(srcs) + list(dsts))
+    params = {
+        "sources": ";".join(str(i) for i in range(len(srcs))),
+        "destinations": ";".join(str(len(srcs) + j) for j in range(len(dsts))),
+        "annotations": "duration,distance",
+    }
+    async with sem:
+        r = await client.get(f"{OSRM_BASE}/table/v1/{profile}/{coords}", params=params)
+    r.raise_for_status()
+    data = r.json()
+    if data.get("code") != "Ok":
+        raise ValueError(f"OSRM table error: {data.get('code')}")
+    return data
+
+async def travel_time_matrix(
+    sources: Sequence[Tuple[float, float]],
+    destinations: Sequence[Tuple[float, float]],
+    profile: str = "foot",
+) -> Dict[str, List[List[Optional[float]]]]:
+    """
+    N x M durations (s) and distances (m) between (lat, lon) points via OSRM's table service.
+    Cells already cached for a source's grid cell are not re-requested; the rest is
+    chunked to fit OSRM's coordinate limit and fetched concurrently.
+    """
+    n, m = len(sources), len(destinations)
+    durations: List[List[Optional[float]]] = [[None] * m for _ in range(n)]
+    distances: List[List[Optional[float]]] = [[None] * m for _ in range(n)]
+    src_cells = [matrix_cache.cell(lat, lon) for lat, lon in sources]
+    dst_cells = [matrix_cache.cell(lat, lon) for lat, lon in destinations]
+
+    missing_src, missing_dst = [], set()
+    for i in range(n):
+        row_missing = False
+        for j in range(m):
+            hit = matrix_cache.get(profile, src_cells[i], dst_cells[j])
+            if hit is None:
+                row_missing = True
+                missing_dst.add(j)
+            else:
+                durations[i][j], distances[i][j] = hit
+        if row_missing:
+            missing_src.append(i)
+    missing_dst = sorted(missing_dst)
+
+    if missing_src:
+        blocks = _table_blocks(len(missing_src), len(missing_dst), OSRM_TABLE_MAX_COORDS)
+        sem = asyncio.Semaphore(max(1, OSRM_TABLE_CONCURRENCY))
+        async with httpx.AsyncClient(timeout=30.0, headers=HEADERS) as client:
+            results = await asyncio.gather(*[
+                _osrm_table_block(
+                    client, sem, profile,
+                    [sources[missing_src[a]] for a in sr],
+                    [destinations[missing_dst[b]] for b in dr],
+                )
+                for sr, dr in blocks
+            ])
+        for (sr, dr), data in zip(blocks, results):
+            dur = data.get("durations") or []
+            dist = data.get("distances") or []
+            for a_off, a in enumerate(sr):
+                i = missing_src[a]
+                for b_off, b in enumerate(dr):
+                    j = missing_dst[b]
+                    d = dur[a_off][b_off] if a_off < len(dur) else None
+                    ds = dist[a_off][b_off] if a_off < len(dist) else None
+                    durations[i][j], distances[i][j] = d, ds
+                    matrix_cache.put(profile, src_cells[i], dst_cells[j], (d, ds))
+
+    return {"durations_s": durations, "distances_m": distances}
+
+_walking_router: Optional[WalkingRouter] = None
+_walking_router_lock = threading.Lock()
+
+def get_walking_router() -> Optional[WalkingRouter]:
+    """
+    Local accessible walking router, loaded once (at app startup); None until a
+    graph has been imported. Hierarchies for WALKING_CH_WEIGHTINGS are
+    memory-mapped from the files import_osm.py writes next to the graph; a
+    missing or stale one is built here and saved for the next start.
+    """
+    global _walking_router
+    if _walking_router is None and WALKING_GRAPH_PATH.exists():
+        with _walking_router_lock:
+            if _walking_router is None:
+                router = WalkingRouter(load_graph(WALKING_GRAPH_PATH))
+                for name in WALKING_CH_WEIGHTINGS:
+                    router.prepare(resolve_weighting(name), path=hierarchy_path(WALKING_GRAPH_PATH, name))
+                _walking_router = router
+    return _walking_router
+
+def route_accessible(
+    origin_lat: float, origin_lon: float,
+    dest_lat: float, dest_lon: float,
+    weighting: str = "step_free",
+    max_grade: Optional[float] = None,
+) -> Dict[str, Any]:
+    """
+    Route on the local pedestrian graph, honouring stairs, kerbs, surfaces and grades.
+    Returns an OSRM-shaped response so callers can treat it like route_osrm.
+    Raises LookupError when no graph is loaded, ValueError when there is no route.
+    """
+    router = get_walking_router()
+    if router is None:
+        raise LookupError(f"No walking graph at {WALKING_GRAPH_PATH}")
+    w = resolve_weighting(weighting, max_grade)
+    route = router.route(origin_lat, origin_lon, dest_lat, dest_lon, w)
+    return {"code": "Ok", "routes": [route], "weighting": w.to_dict()}
+
+_places: Optional[PlaceSet] = None
+_places_source: Any = None
+
+def _place_set() -> PlaceSet:
+    """Gazetteer places for isochrones; a reloaded gazetteer also invalidates cached isochrones."""
+    global _places, _places_source
+    index = get_index()
+    if index is not _places_source:
+        _places, _places_source = PlaceSet.from_gazetteer(index), index
+        isochrone_cache.clear()
+    return _places
+
+def isochrone(
+    lat: float, lon: float,
+    minutes: float = 15.0,
+    weighting: str = "step_free",
+    max_grade: Optional[float] = None,
+    transit: bool = False,
+    depart: Optional[datetime] = None,
+) -> Dict[str, Any]:
+    """
+    Area, stops and places reachable on foot within `minutes` on the local graph.
+    With transit=True, walking also starts from every stop the timetable (with
+    realtime data) reaches sooner by leaving at `depart`; step-blocking
+    weightings ride only accessible trips. Walking-only results are cached per
+    origin cell, budget and weighting. Raises LookupError when no graph (or,
+    for transit, no timetable) is loaded, ValueError when the origin is off the network.
+    """
+    router = get_walking_router()
+    if router is None:
+        raise LookupError(f"No walking graph at {WALKING_GRAPH_PATH}")
+    w = resolve_weighting(weighting, max_grade)
+    places = _place_set()
+    if transit:
+        tt = realtime_service.live_timetable()
+        if tt is None:
+            raise LookupError("No GTFS timetable loaded. Run scripts/import_gtfs.py first.")
+        seeds = transit_arrivals(tt, (lat, lon), minutes * 60, depart, accessible=bool(w.blocked_flags))
+        # depends on the departure time and live data, so never cached
+        result = compute_isochrone(router, lat, lon, minutes * 60, w, places, seeds=seeds)
+        return {**result, "transit_stops": len(seeds), "cached": False}
+    key = isochrone_cache.key(lat, lon, minutes * 60, w)
+    cached = isochrone_cache.get(key)
+    if cached is not None:
+        return {**cached, "origin": {"lat": lat, "lon": lon}, "cached": True}
+    result = compute_isochrone(router, lat, lon, key[-1], w, places)
+    isochrone_cache.put(key, result)
+    return {**result, "cached": False}
@@ -0,0 +1,189 @@
+import os
+import itertools
+from bisect import bisect_left, insort
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+NOTIFICATION_TYPES = {
+    "arrival",
+    "journey_start",
+    "bus_delay",
+    "co2_achievement",
+    "badge_earned",
+    "hazard_warning",
+}
+
+DEFAULT_MAX_PER_USER = int(os.getenv("NOTIFICATIONS_MAX_PER_USER", "500"))
+DEFAULT_MAX_DAYS = int(os.getenv("NOTIFICATIONS_MAX_DAYS", "30"))
+
+
+class _DayPartition:
+    """Notifications for one user and one day, oldest first. `head` skips evicted rows."""
+
+    __slots__ = ("ids", "items", "head")
+
+    def __init__(self) -> None:
+        self.ids: List[int] = []
+        self.items: List[Dict[str, Any]] = []
+        self.head = 0
+
+    def __len__(self) -> int:
+        return len(self.items) - self.head
+
+
+class _UserInbox:
+    __slots__ = ("partitions", "days", "count")
+
+    def __init__(self) -> None:
+        self.partitions: Dict[date, _DayPartition] = {}
+        self.days: List[date] = []  # sorted ascending
+        self.count = 0
+
+
+def encode_cursor(day: date, notification_id: int) -> str:
+    return f"{day.isoformat()}~{notification_id}"
+
+
+def decode_cursor(cursor: str) -> Tuple[date, int]:
+    try:
+        d, nid = cursor.split("~", 1)
+        return date.fromisoformat(d), int(nid)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+class NotificationInbox:
+    """
+    Per-user notification store partitioned by day.
+
+    Pages are newest first and use a keyset cursor (day, id), so reading the
+    latest page only touches the newest partitions regardless of history size.
+    Retention is bounded both by count and by number of days per user.
+    """
+
+    def __init__(self, max_per_user: int = DEFAULT_MAX_PER_USER, max_days: int = DEFAULT_MAX_DAYS) -> None:
+        self.max_per_user = max(1, int(max_per_user))
+        self.max_days = max(1, int(max_days))
+        self._users: Dict[str, _UserInbox] = {}
+        self._ids = itertools.count(1)
+
+    def add(
+        self,
+        user_id: str,
+        ntype: str,
+        message: str,
+        created_at: Optional[datetime] = None,
+        data: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Any]:
+        if ntype not in NOTIFICATION_TYPES:
+            raise ValueError(f"Unknown notification type '{ntype}'")
+        created_at = created_at or datetime.now()
+        day = created_at.date()
+
+        inbox = self._users.setdefault(user_id, _UserInbox())
+        part = inbox.partitions.get(day)
+        if part is None:
+            part = _DayPartition()
+            inbox.partitions[day] = part
+            insort(inbox.days, day)
+
+        nid = next(self._ids)
+        item = {
+            "id": nid,
+            "type": ntype,
+            "message": message,
+            "created_at": created_at.isoformat(timespec="seconds"),
+            "time": created_at.strftime("%I:%M %p").lstrip("0"),
+            "data": data or {},
+        }
+        part.ids.append(nid)
+        part.items.append(item)
+        inbox.count += 1
+        self._enforce_retention(inbox)
+        return item
+
+    def _drop_partition(self, inbox: _UserInbox, day: date) -> None:
+        part = inbox.partitions.pop(day)
+        inbox.count -= len(part)
+        inbox.days.remove(day)
+
+    def _enforce_retention(self, inbox: _UserInbox) -> None:
+        while len(inbox.days) > self.max_days:
+            self._drop_partition(inbox, inbox.days[0])
+        while inbox.count > self.max_per_user:
+            oldest = inbox.days[0]
+            part = inbox.partitions[oldest]
+            part.items[part.head] = None
+            part.head += 1
+            inbox.count -= 1
+            if not len(part):
+                inbox.partitions.pop(oldest)
+                inbox.days.pop(0)
+            elif part.head > 64 and part.head * 2 > len(part.items):
+                # compact so evicted slots don't pile up in a busy day
+                del part.ids[:part.head]
+                del part.items[:part.head]
+                part.head = 0
+
+    def page(
+        self,
+        user_id: str,
+        limit: int = 20,
+        cursor: Optional[str] = None,
+        day: Optional[date] = None,
+    ) -> Dict[str, Any]:
+        """
+        Newest-first page. Pass back `next_cursor` to continue.
+        If `day` is given, only that day's partition is read.
+        """
+        inbox = self._users.get(user_id)
+        limit = max(1, int(limit))
+        if inbox is None or not inbox.days:
+            return {"notifications": [], "next_cursor": None}
+
+        if cursor:
+            c_day, c_id = decode_cursor(cursor)
+        else:
+            c_day, c_id = None, None
+
+        if day is not None:
+            if c_day is not None and c_day != day:
+                return {"notifications": [], "next_cursor": None}
+            days_desc = [day] if day in inbox.partitions else []
+        else:
+            # index of the newest partition we may read from
+            if c_day is None:
+                start = len(inbox.days) - 1
+            else:
+                start = bisect_left(inbox.days, c_day)
+                if start == len(inbox.days) or inbox.days[start] != c_day:
+                    start -= 1
+                    c_id = None
+            days_desc = (inbox.days[i] for i in range(start, -1, -1))
+
+        # read one extra row to know whether another page exists
+        rows: List[Tuple[date, int, Dict[str, Any]]] = []
+        for d in days_desc:
+            part = inbox.partitions[d]
+            end = len(part.ids)
+            if c_id is not None and d == c_day:
+                end = bisect_left(part.ids, c_id, part.head)
+            for i in range(end - 1, part.head - 1, -1):
+                rows.append((d, part.ids[i], part.items[i]))
+                if len(rows) > limit:
+                    break
+            if len(rows) > limit:
+                break
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1][0], rows[-1][1])
+        return {"notifications": [r[2] for r in rows], "next_cursor": next_cursor}
+
+    def count(self, user_id: str) -> int:
+        inbox = self._users.get(user_id)
+        return inbox.count if inbox else 0
+
+
+notification_inbox = NotificationInbox()
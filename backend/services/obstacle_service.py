@@ -0,0 +1,252 @@
+import csv
+import math
+import os
+from itertools import chain
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+DATA_DIR = Path(__file__).resolve().parents[1] / "data"
+OBSTACLES_PATH = Path(os.getenv("OBSTACLES_PATH", str(DATA_DIR / "obstacles.csv")))
+# Obstacles within this distance of a route segment (plus their own radius) are on the route.
+OBSTACLE_BUFFER_M = float(os.getenv("OBSTACLE_BUFFER_M", "15"))
+OBSTACLE_GRID_M = 50.0
+
+CSV_FIELDS = ["id", "lat", "lon", "kind", "radius_m", "description"]
+
+# Obstacle kind bits (uint16), matched against what each rider profile cannot pass.
+STAIRS = 1 << 0
+ELEVATOR_OUTAGE = 1 << 1
+KERB = 1 << 2
+STEEP = 1 << 3
+NARROW = 1 << 4
+ROUGH = 1 << 5
+CLOSURE = 1 << 6
+OBSTRUCTION = 1 << 7
+
+KIND_BITS = {
+    "stairs": STAIRS,
+    "steps": STAIRS,
+    "elevator_outage": ELEVATOR_OUTAGE,
+    "kerb": KERB,
+    "raised_kerb": KERB,
+    "steep": STEEP,
+    "steep_ramp": STEEP,
+    "narrow": NARROW,
+    "rough_surface": ROUGH,
+    "construction": CLOSURE,
+    "closure": CLOSURE,
+    "obstruction": OBSTRUCTION,
+}
+
+_STEP_FREE = STAIRS | ELEVATOR_OUTAGE | KERB | CLOSURE
+
+# Same names as the walking router's weightings; anything matched but not blocked is a warning.
+NEEDS_BLOCK = {
+    "shortest": CLOSURE,
+    "step_free": _STEP_FREE,
+    "avoid_slopes": CLOSURE | STEEP,
+    "wheelchair": _STEP_FREE | STEEP | NARROW | ROUGH | OBSTRUCTION,
+}
+
+# Live station accessibility alerts; also served by GET /api/alerts.
+STATION_ALERTS: List[Dict[str, Any]] = [
+    {
+        "alert_id": "alert_001",
+        "station_id": "stn_downtown",
+        "station_name": "Downtown Station",
+        "severity": "high",
+        "message": "Main elevator out of service for maintenance",
+        "affected_accessibility": ["wheelchair", "mobility_impaired"],
+        "estimated_resolution_time": "2 hours",
+        "kind": "elevator_outage",
+        "lat": 43.6532,
+        "lon": -79.3832,
+    }
+]
+
+_M_PER_DEG_LAT = 111_320.0
+
+
+class ObstacleIndex:
+    """
+    Point obstacles (stairs, outages, closures, ...) bucketed in a uniform grid on a
+    local metric plane. Immutable: build a new index and swap it in to update.
+    """
+
+    def __init__(self, obstacles: Iterable[Dict[str, Any]]) -> None:
+        rows = [o for o in obstacles if o.get("kind") in KIND_BITS]
+        self.ids = [str(o.get("id") or i) for i, o in enumerate(rows)]
+        self.kinds = [o["kind"] for o in rows]
+        self.descriptions = [o.get("description") or "" for o in rows]
+        self.sources = [o.get("source") or "dataset" for o in rows]
+        self.lat = np.asarray([float(o["lat"]) for o in rows], dtype=np.float64)
+        self.lon = np.asarray([float(o["lon"]) for o in rows], dtype=np.float64)
+        self.radius_m = np.asarray([float(o.get("radius_m") or 0.0) for o in rows], dtype=np.float64)
+        self.bits = np.asarray([KIND_BITS[k] for k in self.kinds], dtype=np.uint16)
+
+        lat0 = float(self.lat.mean()) if len(rows) else 0.0
+        self._kx = _M_PER_DEG_LAT * math.cos(math.radians(lat0))
+        self.x = self.lon * self._kx
+        self.y = self.lat * _M_PER_DEG_LAT
+        self.max_radius_m = float(self.radius_m.max()) if len(rows) else 0.0
+        keys = self._key(self.x, self.y)
+        self._order = np.argsort(keys, kind="stable")
+        self._keys = keys[self._order]
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @staticmethod
+    def _key(x: np.ndarray, y: np.ndarray) -> np.ndarray:
+        row = np.floor(np.asarray(y) / OBSTACLE_GRID_M).astype(np.int64)
+        col = np.floor(np.asarray(x) / OBSTACLE_GRID_M).astype(np.int64)
+        return (row << 32) + col
+
+    def near_route(self, coords: Sequence[Sequence[float]], buffer_m: float = OBSTACLE_BUFFER_M
+                   ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        (obstacle ids, nearest segment, distance m) for obstacles within buffer_m of
+        the [lon, lat] polyline. Only obstacles in grid cells the route passes near
+        are measured, so cost follows route length, not index size.
+        """
+        empty = (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0))
+        if not len(self) or len(coords) < 2:
+            return empty
+        if isinstance(coords, np.ndarray):
+            c = coords.astype(np.float64, copy=False)
+        else:
+            c = np.fromiter(chain.from_iterable(coords), dtype=np.float64, count=2 * len(coords)).reshape(-1, 2)
+        x, y = c[:, 0] * self._kx, c[:, 1] * _M_PER_DEG_LAT
+
+        # route sampled every half cell; each sample's segment is paired with every
+        # cell within reach, then joined against the obstacles sorted by cell
+        step = OBSTACLE_GRID_M / 2
+        seg_len = np.hypot(np.diff(x), np.diff(y))
+        parts = np.maximum(1, np.ceil(seg_len / step).astype(np.int64))
+        seg = np.repeat(np.arange(len(seg_len)), parts)
+        t = (np.arange(len(seg)) - np.repeat(np.cumsum(parts) - parts, parts)) / parts[seg]
+        sx = x[seg] + (x[seg + 1] - x[seg]) * t
+        sy = y[seg] + (y[seg + 1] - y[seg]) * t
+        r = int(math.ceil((buffer_m + self.max_radius_m + step) / OBSTACLE_GRID_M))
+        offsets = np.arange(-r, r + 1, dtype=np.int64)
+        shift = ((offsets[:, None] << 32) + offsets[None, :]).ravel()
+        pair_key = (self._key(sx, sy)[:, None] + shift[None, :]).ravel()
+        pair_seg = np.repeat(seg, len(shift))
+        lo = np.searchsorted(self._keys, pair_key, side="left")
+        hi = np.searchsorted(self._keys, pair_key, side="right")
+        counts = hi - lo
+        if not counts.any():
+            return empty
+        sg = np.repeat(pair_seg, counts)
+        k = np.repeat(lo, counts) + (np.arange(int(counts.sum())) - np.repeat(np.cumsum(counts) - counts, counts))
+        ob = self._order[k]
+        d = np.sqrt(_segment_dist2(self.x[ob], self.y[ob], x[sg], y[sg], x[sg + 1], y[sg + 1]))
+
+        # nearest segment per obstacle: sort by (obstacle, distance), take each run's first
+        order = np.lexsort((d, ob))
+        first = order[np.r_[True, ob[order][1:] != ob[order][:-1]]]
+        cand, best_s, best_d = ob[first], sg[first], d[first]
+        hit = best_d <= buffer_m + self.radius_m[cand]
+        return cand[hit], best_s[hit], best_d[hit]
+
+
+def _segment_dist2(px, py, ax, ay, bx, by) -> np.ndarray:
+    sx, sy = bx - ax, by - ay
+    rx, ry = px - ax, py - ay
+    seg_len2 = sx * sx + sy * sy
+    t = np.clip((rx * sx + ry * sy) / np.where(seg_len2 > 0, seg_len2, 1.0), 0.0, 1.0)
+    ox, oy = rx - t * sx, ry - t * sy
+    return ox * ox + oy * oy
+
+
+def validate_route(
+    index: ObstacleIndex,
+    coords: Sequence[Sequence[float]],
+    needs: str = "shortest",
+    buffer_m: float = OBSTACLE_BUFFER_M,
+) -> Dict[str, Any]:
+    """Obstacles along a route, split into those `needs` cannot pass and warnings."""
+    block = NEEDS_BLOCK.get(needs)
+    if block is None:
+        raise ValueError(f"Unknown needs '{needs}'. Must be one of: {', '.join(NEEDS_BLOCK)}")
+    ids, segs, dists = index.near_route(coords, buffer_m)
+    blocking, warnings = [], []
+    for i, s, d in sorted(zip(ids.tolist(), segs.tolist(), dists.tolist()), key=lambda m: m[1]):
+        item = {
+            "id": index.ids[i],
+            "kind": index.kinds[i],
+            "description": index.descriptions[i],
+            "source": index.sources[i],
+            "lat": float(index.lat[i]),
+            "lon": float(index.lon[i]),
+            "segment": s,
+            "distance_m": round(d, 1),
+        }
+        (blocking if int(index.bits[i]) & block else warnings).append(item)
+    return {"ok": not blocking, "needs": needs, "blocking": blocking, "warnings": warnings}
+
+
+def read_csv(path: Path) -> List[Dict[str, Any]]:
+    rows = []
+    with open(path, newline="", encoding="utf-8") as f:
+        for r in csv.DictReader(f):
+            try:
+                rows.append({
+                    "id": (r.get("id") or "").strip(),
+                    "lat": float(r["lat"]),
+                    "lon": float(r["lon"]),
+                    "kind": (r.get("kind") or "").strip().lower(),
+                    "radius_m": float(r.get("radius_m") or 0.0),
+                    "description": (r.get("description") or "").strip(),
+                    "source": "dataset",
+                })
+            except (KeyError, TypeError, ValueError):
+                continue
+    return rows
+
+
+def alert_obstacles(alerts: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Station alerts that carry a location and an obstacle kind."""
+    out = []
+    for a in alerts:
+        if a.get("lat") is None or a.get("lon") is None or a.get("kind") not in KIND_BITS:
+            continue
+        out.append({
+            "id": a.get("alert_id"),
+            "lat": a["lat"],
+            "lon": a["lon"],
+            "kind": a["kind"],
+            # a station entrance is somewhere around the stop coordinate
+            "radius_m": a.get("radius_m", 40.0),
+            "description": f"{a.get('station_name', '')}: {a.get('message', '')}".strip(": "),
+            "source": "station_alert",
+        })
+    return out
+
+
+def build_index(path: Optional[Path] = None) -> ObstacleIndex:
+    path = Path(path) if path else OBSTACLES_PATH
+    rows = alert_obstacles(STATION_ALERTS)
+    if path.exists():
+        rows += read_csv(path)
+    return ObstacleIndex(rows)
+
+
+_index: Optional[ObstacleIndex] = None
+
+
+def get_obstacle_index() -> ObstacleIndex:
+    global _index
+    if _index is None:
+        _index = build_index()
+    return _index
+
+
+def reload_obstacles(path: Optional[Path] = None) -> int:
+    """Build a fresh index off to the side, then swap the reference."""
+    global _index
+    new_index = build_index(path)
+    _index = new_index
+    return len(new_index)
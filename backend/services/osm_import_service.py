@@ -0,0 +1,270 @@
+import bz2
+import gzip
+import math
+import time
+import xml.etree.ElementTree as ET
+from array import array
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from services.elevation_service import DemTileSet, edge_grades
+from services.walking_graph_service import (
+    WalkingGraph, save_graph, haversine_m, WALKING_GRAPH_PATH,
+    STEPS, WHEELCHAIR_NO, WHEELCHAIR_LIMITED, KERB_RAISED, SURFACE_ROUGH, ELEVATOR, CROSSING, KERB_LOWERED,
+)
+
+try:
+    import osmium  # optional: only needed for .pbf extracts
+except ImportError:
+    osmium = None
+
+WALKABLE_HIGHWAYS = {
+    "footway", "path", "pedestrian", "steps", "living_street", "residential", "service",
+    "unclassified", "tertiary", "tertiary_link", "secondary", "secondary_link", "primary",
+    "primary_link", "track", "cycleway", "corridor", "elevator", "crossing", "platform",
+}
+NO_FOOT = {"no", "private", "use_sidepath", "discouraged"}
+ROUGH_SURFACES = {
+    "cobblestone", "sett", "unhewn_cobblestone", "gravel", "fine_gravel", "pebblestone",
+    "grass", "dirt", "earth", "ground", "mud", "sand", "woodchips", "grass_paver", "rock",
+}
+BAD_SMOOTHNESS = {"bad", "very_bad", "horrible", "very_horrible", "impassable"}
+
+# Node ids are matched against the needed set this many at a time (bounds RAM in pass 2).
+NODE_BATCH = 1_000_000
+
+
+# ---------- tag interpretation ----------
+def way_is_walkable(tags: Dict[str, str]) -> bool:
+    hw = tags.get("highway")
+    foot = tags.get("foot")
+    if foot in ("yes", "designated", "permissive"):
+        return hw is not None or tags.get("railway") == "platform"
+    if hw not in WALKABLE_HIGHWAYS:
+        return False
+    if foot in NO_FOOT or tags.get("access") in ("no", "private"):
+        return False
+    return tags.get("area") != "yes" or hw == "pedestrian"
+
+
+def way_flags(tags: Dict[str, str]) -> int:
+    f = 0
+    hw = tags.get("highway")
+    if hw == "steps":
+        f |= STEPS
+    if hw == "elevator":
+        f |= ELEVATOR
+    if tags.get("footway") == "crossing" or hw == "crossing":
+        f |= CROSSING
+    wc = tags.get("wheelchair")
+    if wc == "no":
+        f |= WHEELCHAIR_NO
+    elif wc == "limited":
+        f |= WHEELCHAIR_LIMITED
+    if tags.get("surface") in ROUGH_SURFACES or tags.get("smoothness") in BAD_SMOOTHNESS:
+        f |= SURFACE_ROUGH
+    return f | kerb_flags(tags.get("kerb"))
+
+
+def node_flags(tags: Dict[str, str]) -> int:
+    """Node tags that make every edge touching the node harder or easier."""
+    f = kerb_flags(tags.get("kerb"))
+    if tags.get("highway") == "elevator":
+        f |= ELEVATOR
+    if tags.get("wheelchair") == "no":
+        f |= WHEELCHAIR_NO
+    elif tags.get("wheelchair") == "limited":
+        f |= WHEELCHAIR_LIMITED
+    if tags.get("highway") == "crossing":
+        f |= CROSSING
+    return f
+
+
+def kerb_flags(kerb: Optional[str]) -> int:
+    if kerb in ("raised", "rolled", "yes"):
+        return KERB_RAISED
+    if kerb in ("lowered", "flush", "no"):
+        return KERB_LOWERED
+    return 0
+
+
+def parse_incline(value: Optional[str]) -> float:
+    """'8%' -> 0.08, '-4 %' -> -0.04, '5°' -> tan(5°); 'up'/'down'/unknown -> 0."""
+    if not value:
+        return 0.0
+    v = value.strip().lower().replace(",", ".")
+    try:
+        if v.endswith("%"):
+            return float(v[:-1].strip()) / 100.0
+        if v.endswith("°") or v.endswith("deg"):
+            return math.tan(math.radians(float(v.rstrip("°").replace("deg", "").strip())))
+        g = float(v)
+        return g / 100.0 if abs(g) > 1 else g
+    except ValueError:
+        return 0.0
+
+
+# ---------- readers ----------
+def _open(path: Path):
+    name = path.name.lower()
+    if name.endswith(".bz2"):
+        return bz2.open(path, "rb")
+    if name.endswith(".gz"):
+        return gzip.open(path, "rb")
+    return open(path, "rb")
+
+
+def _is_pbf(path: Path) -> bool:
+    return path.name.lower().endswith(".pbf")
+
+
+def _xml_elements(path: Path, tag: str) -> Iterator[ET.Element]:
+    """Yield each top-level <node>/<way>, clearing the tree as we go so memory stays flat."""
+    with _open(path) as f:
+        context = ET.iterparse(f, events=("start", "end"))
+        _, root = next(context)
+        for event, elem in context:
+            if event == "end" and elem.tag in ("node", "way", "relation"):
+                if elem.tag == tag:
+                    yield elem
+                root.clear()
+
+
+def iter_ways(path: Path) -> Iterator[Tuple[Dict[str, str], List[int]]]:
+    if _is_pbf(path):
+        _require_osmium()
+        for w in osmium.FileProcessor(str(path), osmium.osm.WAY):
+            yield {t.k: t.v for t in w.tags}, [n.ref for n in w.nodes]
+        return
+    for el in _xml_elements(path, "way"):
+        tags = {t.get("k"): t.get("v") for t in el.iter("tag")}
+        yield tags, [int(nd.get("ref")) for nd in el.iter("nd")]
+
+
+def iter_nodes(path: Path) -> Iterator[Tuple[int, float, float, Dict[str, str]]]:
+    if _is_pbf(path):
+        _require_osmium()
+        for n in osmium.FileProcessor(str(path), osmium.osm.NODE):
+            if n.location.valid():
+                yield n.id, n.location.lat, n.location.lon, {t.k: t.v for t in n.tags}
+        return
+    for el in _xml_elements(path, "node"):
+        tags = {t.get("k"): t.get("v") for t in el.iter("tag")} if len(el) else {}
+        yield int(el.get("id")), float(el.get("lat")), float(el.get("lon")), tags
+
+
+def _require_osmium() -> None:
+    if osmium is None:
+        raise RuntimeError("Reading .pbf extracts needs pyosmium (pip install osmium); .osm/.osm.bz2 work without it")
+
+
+# ---------- pipeline ----------
+def import_osm(src: Path, dest: Optional[Path] = None, log=print, dem: Optional[DemTileSet] = None) -> Dict[str, Any]:
+    """
+    Two streaming passes over an OSM extract -> walking graph file.
+
+    Pass 1 keeps walkable ways as flat arrays of node refs plus per-way flags and
+    grade. Pass 2 streams nodes and keeps coordinates only for referenced ids,
+    matched in NODE_BATCH-sized vectorized batches. Nothing else is held in memory.
+    With a DEM, edges whose way has no incline tag get their grade from the terrain.
+    """
+    src = Path(src)
+    dest = Path(dest) if dest else WALKING_GRAPH_PATH
+    t0 = time.perf_counter()
+
+    # pass 1: ways
+    refs = array("q")
+    way_start = array("q", [0])
+    w_flags = array("H")
+    w_grade = array("f")
+    ways_seen = 0
+    for tags, nds in iter_ways(src):
+        ways_seen += 1
+        if len(nds) < 2 or not way_is_walkable(tags):
+            continue
+        refs.extend(nds)
+        way_start.append(len(refs))
+        w_flags.append(way_flags(tags))
+        w_grade.append(parse_incline(tags.get("incline")))
+    if not w_flags:
+        raise ValueError(f"No walkable ways in {src}")
+    refs_np = np.frombuffer(refs, dtype=np.int64)
+    needed = np.unique(refs_np)
+    t1 = time.perf_counter()
+    log(f"pass 1: {ways_seen} ways read, {len(w_flags)} walkable, {len(needed)} nodes referenced ({t1 - t0:.1f}s)")
+
+    # pass 2: coordinates (and kerb/elevator tags) for referenced nodes only
+    lat = np.full(len(needed), np.nan)
+    lon = np.full(len(needed), np.nan)
+    n_flags = np.zeros(len(needed), dtype=np.uint16)
+    ids, lats, lons, fls = array("q"), array("d"), array("d"), array("H")
+
+    def flush() -> None:
+        if not ids:
+            return
+        b_ids = np.array(ids, dtype=np.int64)
+        pos = np.searchsorted(needed, b_ids)
+        pos[pos == len(needed)] = 0
+        hit = needed[pos] == b_ids
+        lat[pos[hit]] = np.array(lats, dtype=np.float64)[hit]
+        lon[pos[hit]] = np.array(lons, dtype=np.float64)[hit]
+        n_flags[pos[hit]] = np.array(fls, dtype=np.uint16)[hit]
+        del ids[:], lats[:], lons[:], fls[:]
+
+    nodes_seen = 0
+    for nid, la, lo, tags in iter_nodes(src):
+        nodes_seen += 1
+        ids.append(nid)
+        lats.append(la)
+        lons.append(lo)
+        fls.append(node_flags(tags) if tags else 0)
+        if len(ids) >= NODE_BATCH:
+            flush()
+    flush()
+    t2 = time.perf_counter()
+    log(f"pass 2: {nodes_seen} nodes read ({t2 - t1:.1f}s)")
+
+    # edges: consecutive refs within each way; drop edges touching nodes missing from the extract
+    node_idx = np.searchsorted(needed, refs_np)
+    way_start_np = np.frombuffer(way_start, dtype=np.int64)
+    way_of_ref = np.repeat(np.arange(len(w_flags)), np.diff(way_start_np))
+    same_way = way_of_ref[1:] == way_of_ref[:-1]
+    u, v = node_idx[:-1][same_way], node_idx[1:][same_way]
+    edge_way = way_of_ref[:-1][same_way]
+    have = ~np.isnan(lat)
+    ok = have[u] & have[v] & (u != v)
+    u, v, edge_way = u[ok], v[ok], edge_way[ok]
+    flags = np.frombuffer(w_flags, dtype=np.uint16)[edge_way] | n_flags[u] | n_flags[v]
+    grade = np.frombuffer(w_grade, dtype=np.float32)[edge_way]
+    dem_filled = 0
+    if dem is not None and len(dem):
+        untagged = grade == 0
+        g = edge_grades(dem, lat[u[untagged]], lon[u[untagged]], lat[v[untagged]], lon[v[untagged]],
+                        haversine_m(lat[u[untagged]], lon[u[untagged]], lat[v[untagged]], lon[v[untagged]]))
+        known = ~np.isnan(g)
+        grade[np.flatnonzero(untagged)[known]] = g[known]
+        dem_filled = int(known.sum())
+
+    # compact to nodes that ended up on an edge
+    used = np.zeros(len(needed), dtype=bool)
+    used[u] = used[v] = True
+    remap = np.cumsum(used) - 1
+    graph = WalkingGraph.from_edges(
+        lat[used], lon[used], remap[u], remap[v], flags=flags, grade=grade,
+        meta={"source": src.name, "imported_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())},
+    )
+    save_graph(graph, dest)
+    t3 = time.perf_counter()
+    stats = {
+        "ways": int(len(w_flags)),
+        "nodes": graph.n_nodes,
+        "edges": graph.n_edges,
+        "steps_edges": int(((flags & STEPS) != 0).sum()),
+        "dem_graded_edges": dem_filled,
+        "seconds": round(t3 - t0, 1),
+        "path": str(dest),
+    }
+    log(f"graph: {stats['nodes']} nodes, {stats['edges']} directed edges -> {dest} ({t3 - t0:.1f}s total)")
+    return stats
@@ -0,0 +1,495 @@
+import heapq
+import math
+import os
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from services import realtime_service
+from services.array_file_service import pack_strings, read_arrays, unpack_strings, write_arrays
+from services.gtfs_service import DATA_DIR, WALK_SPEED_MPS, GtfsFeed
+from services.realtime_service import ACCESSIBILITY_ISSUE, NO_SERVICE
+
+PATHWAYS_PATH = Path(os.getenv("PATHWAYS_PATH", str(DATA_DIR / "pathways.bin")))
+# Live outages (realtime alerts) are re-read at most this often, or when a new realtime snapshot is published.
+OUTAGE_CHECK_S = 30.0
+# Paths kept per Stations instance
+MEMO_SIZE = 4096
+
+_MAGIC = b"GTFSPW01"
+
+# pathways.txt pathway_mode
+WALKWAY, STAIRS, MOVING_SIDEWALK, ESCALATOR, ELEVATOR, FARE_GATE, EXIT_GATE = 1, 2, 3, 4, 5, 6, 7
+MODE_NAMES = {WALKWAY: "walkway", STAIRS: "stairs", MOVING_SIDEWALK: "moving_sidewalk", ESCALATOR: "escalator",
+              ELEVATOR: "elevator", FARE_GATE: "fare_gate", EXIT_GATE: "exit_gate"}
+MECHANICAL = (MOVING_SIDEWALK, ESCALATOR, ELEVATOR)
+# stops.txt location_type
+PLATFORM, STATION, ENTRANCE, NODE, BOARDING_AREA = 0, 1, 2, 3, 4
+
+# Steeper or narrower than this is not step-free (1:12 ramp; a wheelchair plus clearance).
+MAX_STEP_FREE_SLOPE = 0.083
+MIN_STEP_FREE_WIDTH_M = 0.8
+# Traversal time when pathways.txt gives none: per metre by mode, or a flat time without a length.
+_SPEED_MPS = {STAIRS: 0.5, ESCALATOR: 0.75, MOVING_SIDEWALK: 1.8}
+ELEVATOR_S = 60.0
+STAIR_S = 0.6
+DEFAULT_S = 30.0
+
+ARRAY_DTYPES = {
+    # stations with at least one pathway
+    "station_node_ptr": np.int64,
+    "station_id_data": np.uint8,
+    "station_id_ptr": np.int64,
+    "station_name_data": np.uint8,
+    "station_name_ptr": np.int64,
+    # nodes (platforms, entrances, generic nodes, boarding areas), grouped by station
+    "node_kind": np.uint8,         # location_type
+    "node_level": np.int32,        # -1 without one
+    "node_platform": np.int32,     # the platform a boarding area belongs to; -1 otherwise
+    "node_id_data": np.uint8,
+    "node_id_ptr": np.int64,
+    "node_name_data": np.uint8,
+    "node_name_ptr": np.int64,
+    # directed edges by origin node; a bidirectional pathway is two
+    "edge_ptr": np.int64,
+    "edge_to": np.int32,
+    "edge_pathway": np.int32,
+    # pathways.txt
+    "pathway_station": np.int32,
+    "pathway_from": np.int32,
+    "pathway_to": np.int32,
+    "pathway_mode": np.uint8,
+    "pathway_time_s": np.float32,
+    "pathway_length_m": np.float32,  # NaN when not given, as are max_slope and min_width
+    "pathway_max_slope": np.float32,
+    "pathway_min_width": np.float32,
+    "pathway_stairs": np.int32,
+    "pathway_id_data": np.uint8,
+    "pathway_id_ptr": np.int64,
+    "pathway_sign_data": np.uint8,
+    "pathway_sign_ptr": np.int64,
+    # levels.txt
+    "level_index": np.float32,
+    "level_name_data": np.uint8,
+    "level_name_ptr": np.int64,
+}
+
+_STRING_COLUMNS = ("station_id", "station_name", "node_id", "node_name", "pathway_id", "pathway_sign", "level_name")
+
+
+def _float(v: str) -> float:
+    try:
+        return float(v)
+    except ValueError:
+        return math.nan
+
+
+def _traversal_s(mode: int, time_s: float, length_m: float, stairs: int) -> float:
+    if not math.isnan(time_s):
+        return time_s
+    if mode == ELEVATOR:
+        return ELEVATOR_S
+    if not math.isnan(length_m):
+        return length_m / _SPEED_MPS.get(mode, WALK_SPEED_MPS)
+    if mode == STAIRS and stairs > 0:
+        return stairs * STAIR_S
+    return DEFAULT_S
+
+
+class _StationGraph:
+    """One station's nodes and edges as Python lists, for Dijkstra without numpy scalars."""
+
+    def __init__(self, stations: "Stations", st: int) -> None:
+        lo, hi = int(stations.station_node_ptr[st]), int(stations.station_node_ptr[st + 1])
+        self.lo = lo
+        self.n = hi - lo
+        ptr = np.asarray(stations.edge_ptr[lo:hi + 1])
+        to = np.asarray(stations.edge_to[ptr[0]:ptr[-1]]) - lo
+        pw = np.asarray(stations.edge_pathway[ptr[0]:ptr[-1]])
+        cost = stations.cost_s[pw]
+        free = stations.static_step_free[pw]
+        edges = list(zip(to.tolist(), pw.tolist(), cost.tolist(), free.tolist()))
+        starts = (ptr - ptr[0]).tolist()
+        self.adj = [edges[starts[i]:starts[i + 1]] for i in range(self.n)]
+
+
+class Stations:
+    """
+    Station interiors from GTFS pathways.txt / levels.txt. Each station is a
+    small graph over its platforms, entrances, generic nodes and boarding
+    areas; pathways are its edges (walkways, stairs, escalators, elevators,
+    gates). Arrays may be read-only memory maps.
+
+    Paths are memoized per (station, from, to, step_free, the station's
+    outage version): an outage only invalidates the paths of its own station.
+    """
+
+    def __init__(self, arrays: Dict[str, np.ndarray], meta: Optional[Dict[str, Any]] = None) -> None:
+        for name in ARRAY_DTYPES:
+            setattr(self, name, arrays[name])
+        self.meta = dict(meta or {})
+        if len(self.station_node_ptr) != len(self.station_id_ptr) or len(self.edge_ptr) != len(self.node_kind) + 1:
+            raise ValueError("Inconsistent pathway arrays")
+        self._strings: Dict[str, List[str]] = {}
+        self._ids: Dict[str, Dict[str, int]] = {}
+        mode = np.asarray(self.pathway_mode)
+        self.cost_s = np.asarray([_traversal_s(m, t, d, s) for m, t, d, s in zip(
+            mode.tolist(), np.asarray(self.pathway_time_s).tolist(), np.asarray(self.pathway_length_m).tolist(),
+            np.asarray(self.pathway_stairs).tolist())], dtype=np.float64)
+        self.static_step_free = ((mode != STAIRS) & (mode != ESCALATOR)
+                                 & ~(np.abs(np.asarray(self.pathway_max_slope)) > MAX_STEP_FREE_SLOPE)
+                                 & ~(np.asarray(self.pathway_min_width) < MIN_STEP_FREE_WIDTH_M))
+        self.node_station = np.repeat(np.arange(self.n_stations, dtype=np.int32), np.diff(np.asarray(self.station_node_ptr)))
+        self._graphs: Dict[int, _StationGraph] = {}
+        self.out_of_service: Dict[int, frozenset] = {}
+        self.versions: Dict[int, int] = {}
+        self._memo: Dict[tuple, Optional[Dict[str, Any]]] = {}
+        self.outage_source: Any = None
+        self.outages_checked = 0.0
+        self.memo_hits = self.memo_misses = 0
+
+    @property
+    def n_stations(self) -> int:
+        return len(self.station_node_ptr) - 1
+
+    def arrays(self) -> Dict[str, np.ndarray]:
+        return {name: getattr(self, name) for name in ARRAY_DTYPES}
+
+    def strings(self, column: str) -> List[str]:
+        if column not in self._strings:
+            self._strings[column] = unpack_strings(getattr(self, column + "_data"), getattr(self, column + "_ptr"))
+        return self._strings[column]
+
+    def index_of(self, column: str) -> Dict[str, int]:
+        """id -> index for station_id, node_id or pathway_id."""
+        if column not in self._ids:
+            self._ids[column] = {v: i for i, v in enumerate(self.strings(column))}
+        return self._ids[column]
+
+    def graph(self, st: int) -> _StationGraph:
+        g = self._graphs.get(st)
+        if g is None:
+            g = self._graphs[st] = _StationGraph(self, st)
+        return g
+
+    def nodes(self, st: int) -> List[Dict[str, Any]]:
+        lo, hi = int(self.station_node_ptr[st]), int(self.station_node_ptr[st + 1])
+        return [self.node(n) for n in range(lo, hi)]
+
+    def node(self, n: int) -> Dict[str, Any]:
+        level = int(self.node_level[n])
+        return {
+            "stop_id": self.strings("node_id")[n],
+            "name": self.strings("node_name")[n],
+            "location_type": int(self.node_kind[n]),
+            "level": self.strings("level_name")[level] if level >= 0 else None,
+            "level_index": float(self.level_index[level]) if level >= 0 else None,
+        }
+
+    def set_outages(self, pathways: Iterable[int]) -> List[int]:
+        """Make `pathways` the ones out of service; stations whose set changed get a new version (returned)."""
+        by_station: Dict[int, set] = {}
+        station = np.asarray(self.pathway_station)
+        for pw in pathways:
+            by_station.setdefault(int(station[pw]), set()).add(pw)
+        new = {st: frozenset(pws) for st, pws in by_station.items()}
+        changed = [st for st in set(new) | set(self.out_of_service) if new.get(st) != self.out_of_service.get(st)]
+        for st in changed:
+            self.versions[st] = self.versions.get(st, 0) + 1
+        self.out_of_service = new
+        return changed
+
+    def path(self, st: int, source: int, target: int, step_free: bool = True) -> Optional[Dict[str, Any]]:
+        """Fastest path between two nodes of station st (memoized); None if there is none."""
+        key = (st, source, target, step_free, self.versions.get(st, 0))
+        if key in self._memo:
+            self.memo_hits += 1
+            return self._memo[key]
+        self.memo_misses += 1
+        result = self._search(st, source, target, step_free)
+        if len(self._memo) >= MEMO_SIZE:
+            self._memo.pop(next(iter(self._memo)))
+        self._memo[key] = result
+        return result
+
+    def _ends(self, node: int) -> List[int]:
+        """A platform is reached at itself or any of its boarding areas."""
+        if int(self.node_kind[node]) != PLATFORM:
+            return [node]
+        st = int(self.node_station[node])
+        lo, hi = int(self.station_node_ptr[st]), int(self.station_node_ptr[st + 1])
+        return [node] + (lo + np.flatnonzero(np.asarray(self.node_platform[lo:hi]) == node)).tolist()
+
+    def _search(self, st: int, source: int, target: int, step_free: bool) -> Optional[Dict[str, Any]]:
+        g = self.graph(st)
+        out = self.out_of_service.get(st, frozenset())
+        goals = {n - g.lo for n in self._ends(target)}
+        dist = [math.inf] * g.n
+        prev: List[Optional[Tuple[int, int]]] = [None] * g.n
+        heap = []
+        for s in self._ends(source):
+            dist[s - g.lo] = 0.0
+            heap.append((0.0, s - g.lo))
+        heapq.heapify(heap)
+        end = -1
+        while heap:
+            d, u = heapq.heappop(heap)
+            if d > dist[u]:
+                continue
+            if u in goals:
+                end = u
+                break
+            for v, pw, cost, free in g.adj[u]:
+                if (step_free and not free) or pw in out:
+                    continue
+                nd = d + cost
+                if nd < dist[v]:
+                    dist[v] = nd
+                    prev[v] = (u, pw)
+                    heapq.heappush(heap, (nd, v))
+        if end < 0:
+            return None
+        legs = []
+        u = end
+        while prev[u] is not None:
+            p, pw = prev[u]
+            legs.append(self._leg(pw, g.lo + p, g.lo + u))
+            u = p
+        legs.reverse()
+        return {
+            "station_id": self.strings("station_id")[st],
+            "from": self.node(g.lo + u),
+            "to": self.node(g.lo + end),
+            "step_free": all(self.static_step_free[leg["index"]] for leg in legs),
+            "time_s": round(dist[end]),
+            "legs": [{k: v for k, v in leg.items() if k != "index"} for leg in legs],
+        }
+
+    def _leg(self, pw: int, a: int, b: int) -> Dict[str, Any]:
+        return {
+            "index": pw,
+            "pathway_id": self.strings("pathway_id")[pw],
+            "mode": MODE_NAMES.get(int(self.pathway_mode[pw]), "walkway"),
+            "from_stop_id": self.strings("node_id")[a],
+            "to_stop_id": self.strings("node_id")[b],
+            "from_level": self.node(a)["level"],
+            "to_level": self.node(b)["level"],
+            "time_s": round(float(self.cost_s[pw])),
+            "signposted_as": self.strings("pathway_sign")[pw],
+        }
+
+
+# ---------- import ----------
+
+def build_stations(src: Path, log: Callable[[str], None] = print) -> Stations:
+    """Station graphs from a GTFS zip or directory; stations without pathways are left out."""
+    feed = GtfsFeed(src)
+    try:
+        return _build(feed, log)
+    finally:
+        feed.close()
+
+
+def _build(feed: GtfsFeed, log: Callable[[str], None]) -> Stations:
+    levels, level_ids = [], {}
+    for lid, index, name in feed.rows("levels.txt", ["level_id", "level_index", "level_name"]):
+        level_ids[lid] = len(levels)
+        levels.append((_float(index), name or lid))
+    stops = {r[0]: r[1:] for r in feed.rows("stops.txt", ["stop_id", "stop_name", "location_type", "parent_station",
+                                                          "level_id"], required=True)}
+
+    def station_of(sid: str) -> str:
+        _, loc, parent, _ = stops[sid]
+        if loc == "1":
+            return sid
+        if loc == "4":
+            parent = stops[parent][2] if parent in stops else ""
+        return parent
+
+    columns = ["pathway_id", "from_stop_id", "to_stop_id", "pathway_mode", "is_bidirectional", "length",
+               "traversal_time", "stair_count", "max_slope", "min_width", "signposted_as"]
+    pathways = [r for r in feed.rows("pathways.txt", columns)
+                if r[1] in stops and r[2] in stops and station_of(r[1]) and station_of(r[1]) == station_of(r[2])]
+    station_ids = sorted({station_of(r[1]) for r in pathways})
+    station_index = {s: i for i, s in enumerate(station_ids)}
+    node_ids = sorted((sid for sid, (_, loc, _, _) in stops.items()
+                       if loc in ("", "0", "2", "3", "4") and station_of(sid) in station_index),
+                      key=lambda sid: (station_index[station_of(sid)], sid))
+    node_index = {s: i for i, s in enumerate(node_ids)}
+    node_station = np.asarray([station_index[station_of(s)] for s in node_ids], dtype=np.int64)
+    station_node_ptr = np.zeros(len(station_ids) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(node_station, minlength=len(station_ids)), out=station_node_ptr[1:])
+
+    src, dst, pw = [], [], []
+    for i, r in enumerate(pathways):
+        a, b = node_index[r[1]], node_index[r[2]]
+        src.append(a)
+        dst.append(b)
+        pw.append(i)
+        if r[4] == "1":
+            src.append(b)
+            dst.append(a)
+            pw.append(i)
+    src_a = np.asarray(src, dtype=np.int64)
+    order = np.argsort(src_a, kind="stable")
+    edge_ptr = np.zeros(len(node_ids) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(src_a, minlength=len(node_ids)), out=edge_ptr[1:])
+
+    arrays: Dict[str, np.ndarray] = {
+        "station_node_ptr": station_node_ptr,
+        "node_kind": np.asarray([int(stops[s][1] or 0) for s in node_ids]),
+        "node_level": np.asarray([level_ids.get(stops[s][3], -1) for s in node_ids]),
+        "node_platform": np.asarray([node_index.get(stops[s][2], -1) if stops[s][1] == "4" else -1 for s in node_ids]),
+        "edge_ptr": edge_ptr,
+        "edge_to": np.asarray(dst, dtype=np.int64)[order],
+        "edge_pathway": np.asarray(pw, dtype=np.int64)[order],
+        "pathway_station": np.asarray([station_index[station_of(r[1])] for r in pathways]),
+        "pathway_from": np.asarray([node_index[r[1]] for r in pathways]),
+        "pathway_to": np.asarray([node_index[r[2]] for r in pathways]),
+        "pathway_mode": np.asarray([int(r[3] or WALKWAY) for r in pathways]),
+        "pathway_time_s": np.asarray([_float(r[6]) for r in pathways]),
+        "pathway_length_m": np.asarray([_float(r[5]) for r in pathways]),
+        "pathway_max_slope": np.asarray([_float(r[8]) for r in pathways]),
+        "pathway_min_width": np.asarray([_float(r[9]) for r in pathways]),
+        "pathway_stairs": np.asarray([int(_float(r[7])) if r[7] else 0 for r in pathways]),
+        "level_index": np.asarray([lv[0] for lv in levels]),
+    }
+    strings = {
+        "station_id": station_ids,
+        "station_name": [stops[s][0] if s in stops else s for s in station_ids],
+        "node_id": node_ids,
+        "node_name": [stops[s][0] for s in node_ids],
+        "pathway_id": [r[0] for r in pathways],
+        "pathway_sign": [r[10] for r in pathways],
+        "level_name": [lv[1] for lv in levels],
+    }
+    for column in _STRING_COLUMNS:
+        arrays[column + "_data"], arrays[column + "_ptr"] = pack_strings(strings[column])
+    arrays = {name: np.asarray(arrays[name], dtype=dtype).reshape(-1) for name, dtype in ARRAY_DTYPES.items()}
+    log(f"{len(station_ids)} stations with pathways, {len(node_ids)} nodes, {len(pathways)} pathways")
+    return Stations(arrays, {"source": str(feed.src.name), "imported_at": time.time()})
+
+
+def save_stations(stations: Stations, path: Path = PATHWAYS_PATH) -> Path:
+    return write_arrays(path, _MAGIC, stations.arrays(), stations.meta)
+
+
+def load_stations(path: Path = PATHWAYS_PATH, mmap: bool = True) -> Stations:
+    arrays, meta = read_arrays(path, _MAGIC, mmap=mmap)
+    return Stations(arrays, meta)
+
+
+def import_pathways(src: Path, dest: Path = PATHWAYS_PATH, log: Callable[[str], None] = print) -> Stations:
+    stations = build_stations(src, log)
+    save_stations(stations, dest)
+    log(f"wrote {dest}")
+    return stations
+
+
+# ---------- live outages ----------
+
+_stations: Optional[Stations] = None
+_loaded = False
+# pathway_id -> in service, as last reported to set_pathway_status
+_status: Dict[str, bool] = {}
+_status_version = 0
+
+
+def get_stations() -> Optional[Stations]:
+    """The shared station graphs, memory-mapped from PATHWAYS_PATH on first use; None if none were imported."""
+    global _stations, _loaded
+    if not _loaded:
+        _loaded = True
+        if PATHWAYS_PATH.exists():
+            _stations = load_stations(PATHWAYS_PATH)
+    return _stations
+
+
+def reload_stations(path: Optional[Path] = None, stations: Optional[Stations] = None) -> Optional[Stations]:
+    """Load fresh station graphs off to the side, then swap the reference."""
+    global _stations, _loaded
+    path = Path(path) if path else PATHWAYS_PATH
+    new_stations = stations if stations is not None else (load_stations(path) if path.exists() else None)
+    _stations, _loaded = new_stations, True
+    return new_stations
+
+
+def set_pathway_status(pathway_id: str, in_service: bool) -> None:
+    """Record an elevator (or any pathway) going out of or back into service. LookupError if it is unknown."""
+    global _status_version
+    stations = get_stations()
+    if stations is None or pathway_id not in stations.index_of("pathway_id"):
+        raise LookupError(f"Unknown pathway_id {pathway_id}")
+    if _status.get(pathway_id, True) != in_service:
+        _status[pathway_id] = in_service
+        _status_version += 1
+
+
+def _alert_outages(stations: Stations, alerts: List[Dict[str, Any]]) -> set:
+    """
+    Pathways realtime alerts take out: a pathway_id named directly; every
+    pathway at a node under NO_SERVICE; the elevators, escalators and moving
+    sidewalks at a node with an ACCESSIBILITY_ISSUE.
+    """
+    pathway_ids, node_ids = stations.index_of("pathway_id"), stations.index_of("node_id")
+    mode = np.asarray(stations.pathway_mode)
+    ends = np.asarray(stations.pathway_from), np.asarray(stations.pathway_to)
+    out = set()
+    for alert in alerts:
+        if alert["effect"] not in (NO_SERVICE, ACCESSIBILITY_ISSUE):
+            continue
+        for sid in alert["stop_ids"]:
+            if sid in pathway_ids:
+                out.add(pathway_ids[sid])
+            elif sid in node_ids:
+                at = (ends[0] == node_ids[sid]) | (ends[1] == node_ids[sid])
+                if alert["effect"] == ACCESSIBILITY_ISSUE:
+                    at &= np.isin(mode, MECHANICAL)
+                out.update(np.flatnonzero(at).tolist())
+    return out
+
+
+def _sync_outages(stations: Stations) -> None:
+    """Bring the outage set up to date with reported statuses and the live alerts."""
+    live = realtime_service.live_timetable()
+    source = (live, _status_version)
+    now = time.monotonic()
+    if source == stations.outage_source and now - stations.outages_checked < OUTAGE_CHECK_S:
+        return
+    stations.outage_source, stations.outages_checked = source, now
+    ids = stations.index_of("pathway_id")
+    out = {ids[p] for p, ok in _status.items() if not ok and p in ids}
+    if isinstance(live, realtime_service.LiveTimetable):
+        out |= _alert_outages(stations, live.alerts_for())
+    stations.set_outages(out)
+
+
+def station_path(station_id: str, from_id: Optional[str], to_id: str, step_free: bool = True) -> Optional[Dict[str, Any]]:
+    """
+    Fastest (step-free) path inside a station from an entrance or platform to
+    a platform or entrance, with current outages; from any entrance when
+    from_id is None. None if there is none. LookupError without pathway data
+    or for unknown ids; ValueError for nodes of another station.
+    """
+    stations = get_stations()
+    if stations is None:
+        raise LookupError("No pathways imported. Run scripts/import_gtfs.py on a feed with pathways.txt.")
+    st = stations.index_of("station_id").get(station_id)
+    if st is None:
+        raise LookupError(f"No pathways for station {station_id}")
+    nodes = stations.index_of("node_id")
+    for sid in (from_id, to_id):
+        if sid is not None and sid not in nodes:
+            raise LookupError(f"Unknown stop_id {sid}")
+        if sid is not None and int(stations.node_station[nodes[sid]]) != st:
+            raise ValueError(f"{sid} is not in station {station_id}")
+    _sync_outages(stations)
+    target = nodes[to_id]
+    if from_id is not None:
+        return stations.path(st, nodes[from_id], target, step_free)
+    lo, hi = int(stations.station_node_ptr[st]), int(stations.station_node_ptr[st + 1])
+    entrances = [n for n in range(lo, hi) if int(stations.node_kind[n]) == ENTRANCE]
+    found = [p for p in (stations.path(st, n, target, step_free) for n in entrances) if p is not None]
+    return min(found, key=lambda p: p["time_s"]) if found else None
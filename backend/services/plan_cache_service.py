@@ -0,0 +1,314 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from services import realtime_service
+from services.gtfs_service import Timetable
+from services.realtime_service import LiveTimetable, feed_timezone
+from services.route_cache_service import snap
+
+PLAN_CACHE_SIZE = int(os.getenv("PLAN_CACHE_SIZE", "2000"))
+PLAN_CACHE_GRID_M = float(os.getenv("PLAN_CACHE_GRID_M", "50"))
+# Requests departing within one bucket share a plan while it still covers them (see PlanCache.plan).
+PLAN_CACHE_BUCKET_S = int(os.getenv("PLAN_CACHE_BUCKET_S", "300"))
+PLAN_CACHE_TTL_S = float(os.getenv("PLAN_CACHE_TTL_S", "900"))
+# Carbon intensity is fetched at most this often per zone; a zone is a grid cell this size.
+CARBON_INTENSITY_TTL_S = float(os.getenv("CARBON_INTENSITY_TTL_S", "900"))
+CARBON_ZONE_M = 25_000.0
+
+# (origin cell x, origin cell y, destination cell x, destination cell y, departure bucket, accessible only,
+#  carbon zone)
+PlanKey = Tuple[int, int, int, int, int, bool, Optional[Tuple[int, int]]]
+# a plan with no stops to depend on (nothing found, or walk only) depends on every stop
+_ANY_STOP = -1
+CAUSES = ("alerts", "realtime", "carbon", "timetable")
+
+
+@dataclass
+class _Entry:
+    itineraries: List[Dict[str, Any]]
+    stops: Set[int]
+    zone: Optional[Tuple[int, int]]
+    stored: float
+    planned_for: float   # the departure time the itineraries were planned for
+
+
+@dataclass
+class _Intensity:
+    value: Optional[float]
+    fetched: float
+
+
+@dataclass
+class PlanCache:
+    """
+    LRU cache of planned itineraries keyed on snapped origin/destination,
+    departure bucket, accessibility and carbon zone.
+
+    A reverse index maps every stop and carbon zone to the plans that depend
+    on it. Before each lookup the current realtime snapshot is compared with
+    the last one seen: stops whose accessibility changed, or that a delayed or
+    cancelled trip's pattern serves, drop exactly the plans using them. A new
+    carbon intensity for a zone drops that zone's plans; a new static
+    timetable drops everything.
+    """
+    max_entries: int = PLAN_CACHE_SIZE
+    grid_m: float = PLAN_CACHE_GRID_M
+    bucket_s: int = PLAN_CACHE_BUCKET_S
+    ttl_s: float = PLAN_CACHE_TTL_S
+    _data: "OrderedDict[PlanKey, _Entry]" = field(default_factory=OrderedDict, repr=False)
+    _by_stop: Dict[int, Set[PlanKey]] = field(default_factory=dict, repr=False)
+    _by_zone: Dict[Tuple[int, int], Set[PlanKey]] = field(default_factory=dict, repr=False)
+    _intensity: Dict[Tuple[int, int], _Intensity] = field(default_factory=dict, repr=False)
+    _base: Optional[Timetable] = field(default=None, repr=False)
+    _live: Any = field(default=None, repr=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def __post_init__(self) -> None:
+        self.stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0, "expired": 0,
+                      "invalidated": {c: 0 for c in CAUSES}, "invalidations": {c: 0 for c in CAUSES}}
+
+    # ---------- keys ----------
+    def zone(self, lat: float, lon: float) -> Tuple[int, int]:
+        return snap(lat, lon, CARBON_ZONE_M)
+
+    def key(self, origin: Tuple[float, float], destination: Tuple[float, float], depart_ts: float,
+            accessible: bool, zone: Optional[Tuple[int, int]]) -> PlanKey:
+        o, d = snap(*origin, self.grid_m), snap(*destination, self.grid_m)
+        return (*o, *d, int(depart_ts // self.bucket_s), accessible, zone)
+
+    # ---------- carbon intensity ----------
+    def intensity(self, zone: Tuple[int, int], fetch: Callable[[], Optional[float]],
+                  now: Optional[float] = None) -> Optional[float]:
+        """The zone's carbon intensity, fetched when older than CARBON_INTENSITY_TTL_S; a new value invalidates."""
+        now = time.time() if now is None else now
+        cur = self._intensity.get(zone)
+        if cur is not None and now - cur.fetched < CARBON_INTENSITY_TTL_S:
+            return cur.value
+        value = fetch()
+        self.carbon_updated(zone, value, now)
+        return value
+
+    def carbon_updated(self, zone: Tuple[int, int], value: Optional[float], now: Optional[float] = None) -> int:
+        """Record a zone's carbon intensity; plans priced with a different one are dropped (returned)."""
+        now = time.time() if now is None else now
+        with self._lock:
+            cur = self._intensity.get(zone)
+            self._intensity[zone] = _Intensity(value, now)
+            if cur is None or cur.value == value:
+                return 0
+            return self._invalidate(set(self._by_zone.get(zone, ())), "carbon")
+
+    # ---------- plans ----------
+    def plan(self, planner: Callable[..., List[Dict[str, Any]]], origin: Tuple[float, float],
+             destination: Tuple[float, float], depart: Optional[datetime] = None, accessible: bool = False,
+             carbon_gco2_per_kwh: Optional[float] = None, zone: Optional[Tuple[int, int]] = None,
+             now: Optional[float] = None) -> List[Dict[str, Any]]:
+        """
+        planner(origin, destination, depart, accessible, True, carbon)'s
+        itineraries, from the cache when an up-to-date plan for the same
+        bucket covers `depart`: it was planned for `depart` or earlier and none
+        of its transit options has left yet, so it is the front planning for
+        `depart` would give. Otherwise the trip is planned for `depart` itself
+        and replaces the bucket's entry. A hit's walks start and end at this
+        request's origin and destination, and its walk-only option leaves at
+        `depart`.
+        """
+        now = time.time() if now is None else now
+        tt = realtime_service.live_timetable()
+        tz = feed_timezone(tt) if tt is not None else None
+        if depart is None:
+            depart_ts = now
+        else:
+            depart_ts = (depart.replace(tzinfo=tz) if depart.tzinfo is None else depart).timestamp()
+        key = self.key(origin, destination, depart_ts, accessible, zone)
+        with self._lock:
+            self._sync(tt)
+            entry = self._data.get(key)
+            if entry is not None and now - entry.stored > self.ttl_s:
+                self._drop(key)
+                self.stats["expired"] += 1
+                entry = None
+            if entry is not None:
+                self._data.move_to_end(key)
+                if _covers(entry, depart_ts, tz):
+                    self.stats["hits"] += 1
+                    return _for_request(entry.itineraries, origin, destination, depart_ts, tz)
+            self.stats["misses"] += 1
+
+        itineraries = planner(origin, destination, datetime.fromtimestamp(depart_ts, tz), accessible, True,
+                              carbon_gco2_per_kwh)
+        with self._lock:
+            if realtime_service.live_timetable() is tt:
+                self._put(key, _Entry(itineraries, _stops_of(tt, itineraries), zone, now, depart_ts))
+        return itineraries
+
+    def _put(self, key: PlanKey, entry: _Entry) -> None:
+        if key in self._data:
+            self._drop(key)
+        self._data[key] = entry
+        for s in entry.stops:
+            self._by_stop.setdefault(s, set()).add(key)
+        if entry.zone is not None:
+            self._by_zone.setdefault(entry.zone, set()).add(key)
+        self.stats["stores"] += 1
+        while len(self._data) > self.max_entries:
+            self._drop(next(iter(self._data)))
+            self.stats["evictions"] += 1
+
+    def _drop(self, key: PlanKey) -> None:
+        entry = self._data.pop(key)
+        for s in entry.stops:
+            keys = self._by_stop.get(s)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_stop[s]
+        if entry.zone is not None:
+            keys = self._by_zone.get(entry.zone)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_zone[entry.zone]
+
+    def _invalidate(self, keys: Iterable[PlanKey], cause: str) -> int:
+        n = 0
+        for key in keys:
+            if key in self._data:
+                self._drop(key)
+                n += 1
+        self.stats["invalidations"][cause] += 1
+        self.stats["invalidated"][cause] += n
+        return n
+
+    def _invalidate_stops(self, stops: Set[int], cause: str) -> None:
+        if not stops:
+            return
+        keys = set(self._by_stop.get(_ANY_STOP, ()))
+        for s in stops:
+            keys |= self._by_stop.get(s, set())
+        self._invalidate(keys, cause)
+
+    def _sync(self, tt: Any) -> None:
+        """Drop the plans the realtime changes since the last lookup touch."""
+        if tt is self._live:
+            return
+        base = tt.base if isinstance(tt, LiveTimetable) else tt
+        if base is not self._base or base is None:
+            if self._data:
+                self._invalidate(list(self._data), "timetable")
+            self._base, self._live = base, tt
+            return
+        old, new = (t if isinstance(t, LiveTimetable) else LiveTimetable(base) for t in (self._live, tt))
+        self._invalidate_stops(_realtime_stops(base, old, new), "realtime")
+        self._invalidate_stops(_alert_stops(base, old, new), "alerts")
+        self._live = tt
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._by_stop.clear()
+            self._by_zone.clear()
+            self._intensity.clear()
+
+    def snapshot(self) -> Dict[str, Any]:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return {
+            **self.stats,
+            "entries": len(self._data),
+            "indexed_stops": len(self._by_stop),
+            "zones": len(self._intensity),
+            "live_version": getattr(self._live, "version", 0),
+            "bucket_s": self.bucket_s,
+            "hit_ratio": round(self.stats["hits"] / lookups, 4) if lookups else None,
+        }
+
+
+def _timestamp(iso: str, tz) -> float:
+    t = datetime.fromisoformat(iso)
+    return (t.replace(tzinfo=tz) if t.tzinfo is None else t).timestamp()
+
+
+def _walk_only(it: Dict[str, Any]) -> bool:
+    return it["modes"] == ["walk"]
+
+
+def _covers(entry: _Entry, depart_ts: float, tz) -> bool:
+    """
+    Whether the entry's options are the front for depart_ts. Planning later
+    can only lose options, and one that has already left may have hidden a
+    later one it dominated, so every transit option must still be ahead.
+    """
+    return entry.planned_for <= depart_ts and all(
+        _walk_only(it) or _timestamp(it["departure"], tz) >= depart_ts for it in entry.itineraries)
+
+
+def _for_request(itineraries: List[Dict[str, Any]], origin: Tuple[float, float], destination: Tuple[float, float],
+                 depart_ts: float, tz) -> List[Dict[str, Any]]:
+    """
+    Cached options as copies for this request: access and egress walks start
+    and end at its own origin and destination, and the walk-only option leaves
+    at depart_ts. Walk times and distances stay those of the plan, which the
+    cell size keeps within PLAN_CACHE_GRID_M or so.
+    """
+    points = {"Origin": origin, "Destination": destination}
+
+    def end(place: Dict[str, Any]) -> Dict[str, Any]:
+        if "stop_id" in place or place.get("name") not in points:
+            return place
+        lat, lon = points[place["name"]]
+        return {**place, "lat": lat, "lon": lon}
+
+    out = []
+    for it in itineraries:
+        legs = [{**leg, "from": end(leg["from"]), "to": end(leg["to"])} for leg in it["legs"]]
+        it = {**it, "legs": legs}
+        if _walk_only(it):
+            start = datetime.fromtimestamp(depart_ts, tz).isoformat()
+            arrive = datetime.fromtimestamp(depart_ts + it["duration_s"], tz).isoformat()
+            it.update(departure=start, arrival=arrive,
+                      legs=[{**leg, "departure": start, "arrival": arrive} for leg in legs])
+        out.append(it)
+    return out
+
+
+def _stops_of(tt: Any, itineraries: List[Dict[str, Any]]) -> Set[int]:
+    ids = tt.index_of("stop_id")
+    stops = {ids[end["stop_id"]] for it in itineraries for leg in it["legs"] for end in (leg["from"], leg["to"])
+             if "stop_id" in end and end["stop_id"] in ids}
+    return stops or {_ANY_STOP}
+
+
+def _pattern_stops(tt: Timetable, patterns: Set[int]) -> Set[int]:
+    out: Set[int] = set()
+    for p in patterns:
+        out.update(tt.pattern_stops[int(tt.pattern_stop_ptr[p]):int(tt.pattern_stop_ptr[p + 1])].tolist())
+    return out
+
+
+def _realtime_stops(tt: Timetable, old: LiveTimetable, new: LiveTimetable) -> Set[int]:
+    """Stops served by a pattern a trip update changed (copy-on-write blocks make this an identity check)."""
+    patterns: Set[int] = set()
+    for day in set(old.blocks) | set(new.blocks):
+        a, b = old.blocks.get(day, {}), new.blocks.get(day, {})
+        patterns |= {p for p in set(a) | set(b) if a.get(p) is not b.get(p)}
+    for k in set(old.trips) | set(new.trips):
+        if old.trips.get(k) is not new.trips.get(k):
+            patterns.add(int(tt.trip_pattern[k[1]]))
+    return _pattern_stops(tt, patterns)
+
+
+def _alert_stops(tt: Timetable, old: LiveTimetable, new: LiveTimetable) -> Set[int]:
+    """Stops whose step-free state an alert changed, and those a trip cancelled or restored by an alert serves."""
+    trips: Set[int] = set()
+    for day in set(old.alert_cancelled) | set(new.alert_cancelled):
+        trips |= set(old.alert_cancelled.get(day, frozenset())) ^ set(new.alert_cancelled.get(day, frozenset()))
+    patterns = {int(tt.trip_pattern[t]) for t in trips}
+    return set(old.closed_stops ^ new.closed_stops) | _pattern_stops(tt, patterns)
+
+
+plan_cache = PlanCache()
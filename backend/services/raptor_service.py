@@ -0,0 +1,697 @@
+import math
+import os
+from bisect import bisect_left
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from services.climate_service import ClimateEngine
+from services.gtfs_service import NO_TIME, WALK_DETOUR, WALK_SPEED_MPS, WC_YES, Timetable
+
+# Extra seconds to get off one vehicle and onto another (on top of any walk between stops).
+MIN_CHANGE_S = int(os.getenv("MIN_CHANGE_S", "60"))
+MAX_TRANSFERS = int(os.getenv("MAX_TRANSFERS", "4"))
+# Stops within this walk of the origin/destination are considered for boarding/alighting.
+ACCESS_WALK_M = float(os.getenv("ACCESS_WALK_M", "800"))
+# Walk-only itineraries are offered up to this distance.
+MAX_WALK_ONLY_M = 2000.0
+# With no stop inside ACCESS_WALK_M, fall back to this many nearest stops.
+FALLBACK_STOPS = 3
+
+INF = 1 << 40
+_M_PER_DEG_LAT = 111_320.0
+
+# parent label kinds
+_ACCESS, _RIDE, _WALK, _EGRESS = 0, 1, 2, 3
+
+
+def walk_seconds(metres: float) -> int:
+    return int(math.ceil(metres * WALK_DETOUR / WALK_SPEED_MPS))
+
+
+def _straight_m(tt: Timetable, lat: float, lon: float) -> np.ndarray:
+    kx = _M_PER_DEG_LAT * math.cos(math.radians(lat))
+    return np.hypot((np.asarray(tt.stop_lon) - lon) * kx, (np.asarray(tt.stop_lat) - lat) * _M_PER_DEG_LAT)
+
+
+def nearby_stops(tt: Timetable, lat: float, lon: float, accessible: bool = False,
+                 max_walk_m: float = ACCESS_WALK_M) -> Dict[int, int]:
+    """stop -> walking seconds for stops around a point (straight line times WALK_DETOUR)."""
+    d = _straight_m(tt, lat, lon)
+    if accessible:
+        d = np.where(np.asarray(tt.stop_wheelchair) == WC_YES, d, np.inf)
+    near = np.flatnonzero(d <= max_walk_m)
+    if not len(near):
+        near = np.argsort(d)[:FALLBACK_STOPS]
+        near = near[np.isfinite(d[near])]
+    return {int(s): walk_seconds(float(d[s])) for s in near}
+
+
+def earliest_arrival(
+    tt: Timetable,
+    access: Dict[int, int],
+    egress: Dict[int, int],
+    depart_s: int,
+    day: date,
+    accessible: bool = False,
+    max_transfers: int = MAX_TRANSFERS,
+    arrive_by: int = INF,
+    arrivals: Optional[Dict[int, int]] = None,
+) -> List[Tuple[int, int, int, list]]:
+    """
+    Round-based earliest-arrival search (RAPTOR). Round k finds the earliest
+    arrival at every stop using k trips, scanning only patterns through stops
+    improved in round k - 1. Arrivals no earlier than the best known arrival at
+    the destination (or `arrive_by`) are pruned.
+
+    Returns one (arrival_s, rides, egress stop, labels) per round that improved
+    the arrival at the destination, i.e. the Pareto set over arrival time and
+    number of rides; pass each to journey_legs. `arrivals`, if given, is
+    filled with the earliest arrival at every stop reached.
+    """
+    v = tt.views()
+    pattern_stop_ptr, pattern_stops = v["pattern_stop_ptr"], v["pattern_stops"]
+    pattern_trip_ptr, pattern_time_ptr = v["pattern_trip_ptr"], v["pattern_time_ptr"]
+    arrival, departure = v["arrival"], v["departure"]
+    stop_pattern_ptr, stop_patterns, stop_pattern_pos = v["stop_pattern_ptr"], v["stop_patterns"], v["stop_pattern_pos"]
+    transfer_ptr, transfer_to, transfer_s, step_free = v["transfer_ptr"], v["transfer_to"], v["transfer_s"], v["transfer_step_free"]
+    stop_wc = v["stop_wheelchair"]
+    usable = tt.usable_trips(day, accessible)
+    patched = tt.patched(day)
+    static_arrival, static_departure = arrival, departure
+
+    best: Dict[int, int] = {} if arrivals is None else arrivals
+    # per round: stop -> (arrival, ready to board at, parent)
+    rounds: List[Dict[int, Tuple[int, int, tuple]]] = [{}]
+    for s, secs in access.items():
+        a = depart_s + secs
+        if a < best.get(s, INF):
+            best[s] = a
+            rounds[0][s] = (a, a, (_ACCESS, secs))
+    target = arrive_by
+    for s, (a, _, _) in rounds[0].items():
+        if s in egress:
+            target = min(target, a + egress[s])
+    results = []
+
+    for k in range(1, max_transfers + 2):
+        prev = rounds[k - 1]
+        if not prev:
+            break
+        # earliest position at which each pattern touches an improved stop
+        queue: Dict[int, int] = {}
+        for s in prev:
+            for j in range(stop_pattern_ptr[s], stop_pattern_ptr[s + 1]):
+                p, pos = stop_patterns[j], stop_pattern_pos[j]
+                if pos < queue.get(p, INF):
+                    queue[p] = pos
+
+        cur: Dict[int, Tuple[int, int, tuple]] = {}
+        for p, pos0 in queue.items():
+            s_lo = pattern_stop_ptr[p]
+            n = pattern_stop_ptr[p + 1] - s_lo
+            t_lo = pattern_trip_ptr[p]
+            nt = pattern_trip_ptr[p + 1] - t_lo
+            tb = pattern_time_ptr[p]
+            arrival, departure, ordered = static_arrival, static_departure, None
+            if patched and p in patched:
+                arrival, departure, ordered = patched[p]
+                tb = 0
+            trip = -1
+            board = 0
+            for pos in range(pos0, n):
+                s = pattern_stops[s_lo + pos]
+                stop_ok = not accessible or stop_wc[s] == WC_YES
+                if trip >= 0 and stop_ok:
+                    a = arrival[tb + pos * nt + trip]
+                    if a < best.get(s, INF) and a < target and a != NO_TIME:
+                        best[s] = a
+                        cur[s] = (a, a + MIN_CHANGE_S, (_RIDE, p, trip, board, pos))
+                        if s in egress:
+                            target = min(target, a + egress[s])
+                label = prev.get(s)
+                if label is not None and stop_ok:
+                    ready = label[1]
+                    col = tb + pos * nt
+                    if ordered is not None:
+                        i = _earliest_ordered(ordered, ready, col, nt, usable, t_lo)
+                        if i >= 0 and (trip < 0 or departure[col + i] < departure[col + trip]):
+                            trip = i
+                            board = pos
+                    elif trip < 0 or ready <= departure[col + trip]:
+                        # earliest running trip leaving at or after `ready`, earlier than the one we are on
+                        hi = col + (nt if trip < 0 else trip)
+                        i = bisect_left(departure, ready, col, hi)
+                        while i < hi and not usable[t_lo + i - col]:
+                            i += 1
+                        if i < hi:
+                            trip = i - col
+                            board = pos
+
+        # walking transfers from stops reached by a ride this round
+        for s, (a0, _, _) in list(cur.items()):
+            for x in range(transfer_ptr[s], transfer_ptr[s + 1]):
+                if accessible and not step_free[x]:
+                    continue
+                s2 = transfer_to[x]
+                a = a0 + transfer_s[x]
+                if a < best.get(s2, INF) and a < target:
+                    best[s2] = a
+                    cur[s2] = (a, a, (_WALK, s, transfer_s[x]))
+                    if s2 in egress:
+                        target = min(target, a + egress[s2])
+        rounds.append(cur)
+
+        arrive, stop = INF, -1
+        for s, e in egress.items():
+            label = cur.get(s)
+            if label is not None and label[0] + e < arrive:
+                arrive, stop = label[0] + e, s
+        if stop >= 0 and (not results or arrive < results[-1][0]):
+            results.append((arrive, k, stop, rounds))
+    return results
+
+
+def _earliest_ordered(ordered: tuple, ready: int, col: int, nt: int, usable: memoryview, t_lo: int) -> int:
+    """
+    Trip (within the pattern) of the earliest usable departure at or after
+    `ready`, -1 if none, for a realtime block whose trips delays put out of
+    order: `ordered` holds each stop's departures sorted, and their trips.
+    """
+    sorted_departure, order = ordered
+    i = bisect_left(sorted_departure, ready, col, col + nt)
+    while i < col + nt and sorted_departure[i] != NO_TIME:
+        if usable[t_lo + order[i]]:
+            return order[i]
+        i += 1
+    return -1
+
+
+def journey_legs(tt: Timetable, rounds: list, k: int, stop: int,
+                 patched: Optional[Dict[int, tuple]] = None) -> List[Dict[str, Any]]:
+    """Walk labels back from `stop` in round k to the access walk; legs in travel order (without the final walk)."""
+    legs = []
+    s = stop
+    while True:
+        a, _, parent = rounds[k][s]
+        kind = parent[0]
+        if kind == _ACCESS:
+            legs.append({"kind": "access", "to": s, "arrive_s": a, "duration_s": parent[1]})
+            break
+        if kind == _WALK:
+            legs.append({"kind": "walk", "from": parent[1], "to": s, "arrive_s": a, "duration_s": parent[2]})
+            s = parent[1]
+            continue
+        _, p, trip, board, alight = parent
+        leg = _ride_leg(tt, p, trip, board, alight, patched)
+        legs.append(leg)
+        s = leg["from"]
+        k -= 1
+    legs.reverse()
+    return legs
+
+
+def _ride_leg(tt: Timetable, p: int, trip: int, board: int, alight: int,
+              patched: Optional[Dict[int, tuple]] = None) -> Dict[str, Any]:
+    s_lo, t_lo = int(tt.pattern_stop_ptr[p]), int(tt.pattern_trip_ptr[p])
+    nt = int(tt.pattern_trip_ptr[p + 1]) - t_lo
+    tb = int(tt.pattern_time_ptr[p])
+    dist = tt.pattern_dist_m()
+    scheduled = int(tt.departure[tb + board * nt + trip])
+    arrival, departure = tt.arrival, tt.departure
+    if patched and p in patched:
+        arrival, departure, _ = patched[p]
+        tb = 0
+    return {
+        "kind": "ride",
+        "pattern": p,
+        "trip": t_lo + trip,
+        "from": int(tt.pattern_stops[s_lo + board]),
+        "to": int(tt.pattern_stops[s_lo + alight]),
+        "depart_s": int(departure[tb + board * nt + trip]),
+        "arrive_s": int(arrival[tb + alight * nt + trip]),
+        "stops": alight - board,
+        "distance_m": dist[s_lo + alight] - dist[s_lo + board],
+        "delay_s": int(departure[tb + board * nt + trip]) - scheduled,
+    }
+
+
+# Multi-criteria dominance compares criteria in steps of this size (barriers exactly), so
+# options that differ by a minute or a few grams do not multiply the bags.
+MC_ARRIVAL_STEP_S = int(os.getenv("MC_ARRIVAL_STEP_S", "120"))
+MC_WALK_STEP_S = int(os.getenv("MC_WALK_STEP_S", "180"))
+MC_CO2_STEP_G = float(os.getenv("MC_CO2_STEP_G", "50"))
+# Options arriving more than this much later than the earliest arrival are not searched:
+# MC_SLACK_FACTOR * the fastest door-to-door time, clamped to [MC_MIN_SLACK_S, MC_MAX_SLACK_S].
+MC_MIN_SLACK_S = int(os.getenv("MC_MIN_SLACK_S", "600"))
+MC_MAX_SLACK_S = int(os.getenv("MC_MAX_SLACK_S", "1200"))
+MC_SLACK_FACTOR = float(os.getenv("MC_SLACK_FACTOR", "0.25"))
+
+_ENGINE = ClimateEngine()
+
+# label fields; _label appends stepped arrival, walk and CO2 (8-10), which dominance compares
+_ARR, _WALKED, _BARRIERS, _CO2, _READY, _STOP, _RIDES, _PARENT = range(8)
+
+
+def co2_g_per_m(mode: str, carbon_gco2_per_kwh: Optional[float] = None) -> float:
+    """Per-passenger grams of CO2 per metre ridden, from the climate engine's factors."""
+    if mode in ("bus", "ferry"):
+        return _ENGINE.EMISSION_BUS  # kg/km == g/m
+    ci = carbon_gco2_per_kwh if carbon_gco2_per_kwh is not None else _ENGINE.DEFAULT_GRID_GCO2_PER_KWH
+    return _ENGINE.ELECTRIC_KWH_PER_KM * ci / 1000.0
+
+
+def _label(arr: int, walked: int, barriers: int, co2: float, ready: int, stop: int, rides: int, parent: tuple) -> tuple:
+    return (arr, walked, barriers, co2, ready, stop, rides, parent,
+            arr // MC_ARRIVAL_STEP_S, walked // MC_WALK_STEP_S, int(co2 // MC_CO2_STEP_G))
+
+
+def _dominated(label: tuple, bag: List[tuple]) -> bool:
+    """Some label in bag is no worse on every (stepped) criterion."""
+    arr, walked, barriers, co2 = label[8], label[9], label[2], label[10]
+    for b in bag:
+        if b[8] <= arr and b[9] <= walked and b[2] <= barriers and b[10] <= co2:
+            return True
+    return False
+
+
+def _merge(bag: List[tuple], label: tuple) -> List[tuple]:
+    """bag with (a non-dominated) label added and whatever it dominates dropped."""
+    arr, walked, barriers, co2 = label[8], label[9], label[2], label[10]
+    keep = [b for b in bag if not (arr <= b[8] and walked <= b[9] and barriers <= b[2] and co2 <= b[10])]
+    keep.append(label)
+    return keep
+
+
+def _no_later(arrival, tb: int, nt: int, pos: int, n: int, a: int, b: int) -> bool:
+    """Trip a arrives no later than trip b at every stop after pos that b serves."""
+    for q in range(pos + 1, n):
+        tb_ = arrival[tb + q * nt + b]
+        if tb_ == NO_TIME:
+            continue
+        ta = arrival[tb + q * nt + a]
+        if ta == NO_TIME or ta > tb_:
+            return False
+    return True
+
+
+def mc_raptor(
+    tt: Timetable,
+    access: Dict[int, int],
+    egress: Dict[int, int],
+    depart_s: int,
+    day: date,
+    accessible: bool = False,
+    max_transfers: int = MAX_TRANSFERS,
+    carbon_gco2_per_kwh: Optional[float] = None,
+    arrive_by: int = INF,
+) -> List[tuple]:
+    """
+    McRAPTOR: like earliest_arrival, but every stop keeps a bag of labels
+    Pareto-optimal in (arrival, seconds walked, accessibility barriers, grams
+    of CO2); rides are the fifth criterion, implicit in the round number.
+    A barrier is a trip or stop not confirmed wheelchair accessible, or a
+    transfer walk that is not step-free.
+
+    Pruning: a label is dropped when it cannot reach the destination by
+    `arrive_by` (straight line at the feed's top speed), or when one already
+    at its stop, or already at the destination, is no worse on every
+    criterion, compared in MC_*_STEP units.
+    Returns the destination labels; pass each to label_legs.
+    """
+    v = tt.views()
+    pattern_stop_ptr, pattern_stops = v["pattern_stop_ptr"], v["pattern_stops"]
+    pattern_trip_ptr, pattern_time_ptr = v["pattern_trip_ptr"], v["pattern_time_ptr"]
+    arrival, departure = v["arrival"], v["departure"]
+    stop_pattern_ptr, stop_patterns, stop_pattern_pos = v["stop_pattern_ptr"], v["stop_patterns"], v["stop_pattern_pos"]
+    transfer_ptr, transfer_to, transfer_s, step_free = v["transfer_ptr"], v["transfer_to"], v["transfer_s"], v["transfer_step_free"]
+    stop_wc = v["stop_wheelchair"]
+    dist = tt.pattern_dist_m()
+    usable = tt.usable_trips(day, accessible)
+    trip_wc = v["trip_wheelchair"]
+    patched = tt.patched(day)
+    static_arrival, static_departure = arrival, departure
+    route_factor = [co2_g_per_m(r["mode"], carbon_gco2_per_kwh) for r in tt.routes]
+    pattern_route = v["pattern_route"]
+
+    bags: Dict[int, List[tuple]] = {}
+    target: List[tuple] = []
+    new: Dict[int, List[tuple]] = {}
+    for s, secs in access.items():
+        a = depart_s + secs
+        label = _label(a, secs, 0, 0.0, a, s, 0, (_ACCESS, secs))
+        if not _dominated(label, bags.get(s, ())):
+            bags[s] = _merge(bags.get(s, []), label)
+            new.setdefault(s, []).append(label)
+
+    # lower bound on the time left from each stop: straight line at the fastest speed in the feed
+    lower = [0] * tt.n_stops
+    if arrive_by < INF and egress:
+        speed = max(tt.max_speed_mps(), WALK_SPEED_MPS)
+        to_go = np.full(tt.n_stops, np.inf)
+        for s, e in egress.items():
+            to_go = np.minimum(to_go, _straight_m(tt, float(tt.stop_lat[s]), float(tt.stop_lon[s])) / speed)
+        lower = to_go.astype(np.int64).tolist()
+
+    def reach(s: int, label: tuple, marked: Dict[int, List[tuple]]) -> None:
+        if label[0] + lower[s] > arrive_by or _dominated(label, target) or _dominated(label, bags.get(s, ())):
+            return
+        bags[s] = _merge(bags.get(s, []), label)
+        marked.setdefault(s, []).append(label)
+        e = egress.get(s)
+        if e is not None:
+            done = _label(label[0] + e, label[1] + e, label[2], label[3], label[0] + e, -1, label[6], (_EGRESS, e, label))
+            if not _dominated(done, target):
+                # only a journey with no more rides may evict one from the destination bag
+                target[:] = [t for t in target if t[6] < done[6] or not (
+                    done[8] <= t[8] and done[9] <= t[9] and done[2] <= t[2] and done[10] <= t[10])] + [done]
+
+    for k in range(1, max_transfers + 2):
+        prev = {}
+        for s, labels in new.items():
+            alive = {id(b) for b in bags[s]}
+            labels = [label for label in labels if id(label) in alive]
+            if labels:
+                prev[s] = labels
+        if not prev:
+            break
+        queue: Dict[int, int] = {}
+        for s in prev:
+            for j in range(stop_pattern_ptr[s], stop_pattern_ptr[s + 1]):
+                p, pos = stop_patterns[j], stop_pattern_pos[j]
+                if pos < queue.get(p, INF):
+                    queue[p] = pos
+
+        new = {}
+        for p, pos0 in queue.items():
+            s_lo = pattern_stop_ptr[p]
+            n = pattern_stop_ptr[p + 1] - s_lo
+            t_lo = pattern_trip_ptr[p]
+            nt = pattern_trip_ptr[p + 1] - t_lo
+            tb = pattern_time_ptr[p]
+            arrival, departure, ordered = static_arrival, static_departure, None
+            if patched and p in patched:
+                arrival, departure, ordered = patched[p]
+                tb = 0
+            factor = route_factor[pattern_route[p]]
+            # route bag entries: [trip, board pos, walked, barriers, co2 minus factor * dist at boarding, label].
+            # In a static block (no overtaking) a lower trip index arrives no later at every stop; a
+            # realtime block can be out of order, so there the arrivals themselves are compared.
+            route_bag: List[list] = []
+            for pos in range(pos0, n):
+                s = pattern_stops[s_lo + pos]
+                stop_ok = stop_wc[s] == WC_YES
+                if accessible and not stop_ok:
+                    continue
+                d = dist[s_lo + pos]
+                if route_bag:
+                    # arrivals only grow along the pattern (a skipped stop has no arrival at all)
+                    route_bag = [r for r in route_bag if arrival[tb + pos * nt + r[0]] <= arrive_by
+                                 or arrival[tb + pos * nt + r[0]] == NO_TIME]
+                for trip, board, walked, barriers, co2_off, prev_label in route_bag:
+                    a = arrival[tb + pos * nt + trip]
+                    if a == NO_TIME:
+                        continue
+                    reach(s, _label(a, walked, barriers + (not stop_ok), co2_off + factor * d, a + MIN_CHANGE_S, s, k,
+                                    (_RIDE, p, trip, board, pos, prev_label)), new)
+                for label in prev.get(s, ()):
+                    col = tb + pos * nt
+                    if ordered is None:
+                        i = bisect_left(departure, label[_READY], col, col + nt)
+                        while i < col + nt and not usable[t_lo + i - col]:
+                            i += 1
+                        if i == col + nt:
+                            continue
+                        trip = i - col
+                    else:
+                        trip = _earliest_ordered(ordered, label[_READY], col, nt, usable, t_lo)
+                        if trip < 0:
+                            continue
+                    entry = [trip, pos, label[_WALKED],
+                             label[_BARRIERS] + (not stop_ok) + (trip_wc[t_lo + trip] != WC_YES),
+                             label[_CO2] - factor * d, label]
+                    if any(r[2] <= entry[2] and r[3] <= entry[3] and r[4] <= entry[4]
+                           and (r[0] <= entry[0] if ordered is None else _no_later(arrival, tb, nt, pos, n, r[0], entry[0]))
+                           for r in route_bag):
+                        continue
+                    route_bag = [r for r in route_bag if not (
+                        entry[2] <= r[2] and entry[3] <= r[3] and entry[4] <= r[4]
+                        and (entry[0] <= r[0] if ordered is None else _no_later(arrival, tb, nt, pos, n, entry[0], r[0])))]
+                    route_bag.append(entry)
+
+        for s, labels in list(new.items()):
+            alive = {id(b) for b in bags[s]}
+            for label in labels:
+                if id(label) not in alive:
+                    continue
+                for x in range(transfer_ptr[s], transfer_ptr[s + 1]):
+                    free = step_free[x]
+                    if accessible and not free:
+                        continue
+                    secs = transfer_s[x]
+                    a = label[_ARR] + secs
+                    s2 = transfer_to[x]
+                    reach(s2, _label(a, label[_WALKED] + secs, label[_BARRIERS] + (not free), label[_CO2], a, s2, k,
+                                     (_WALK, s, secs, label)), new)
+    return target
+
+
+def label_legs(tt: Timetable, label: tuple,
+               patched: Optional[Dict[int, tuple]] = None) -> Tuple[List[Dict[str, Any]], int]:
+    """(legs as journey_legs gives them, egress seconds) for a destination label from mc_raptor."""
+    egress_s, label = label[_PARENT][1], label[_PARENT][2]
+    legs = []
+    while True:
+        parent = label[_PARENT]
+        if parent[0] == _ACCESS:
+            legs.append({"kind": "access", "to": label[_STOP], "arrive_s": label[_ARR], "duration_s": parent[1]})
+            break
+        if parent[0] == _WALK:
+            legs.append({"kind": "walk", "from": parent[1], "to": label[_STOP], "arrive_s": label[_ARR],
+                         "duration_s": parent[2]})
+        else:
+            legs.append(_ride_leg(tt, *parent[1:5], patched))
+        label = parent[-1]
+    legs.reverse()
+    return legs, egress_s
+
+
+class _Clock:
+    """Service-day seconds <-> wall-clock datetimes in the feed's timezone."""
+
+    def __init__(self, tz_name: str) -> None:
+        self.tz = None
+        if tz_name:
+            try:
+                from zoneinfo import ZoneInfo
+                self.tz = ZoneInfo(tz_name)
+            except Exception:
+                self.tz = None
+
+    def split(self, when: datetime) -> Tuple[date, int]:
+        if when.tzinfo is not None and self.tz is not None:
+            when = when.astimezone(self.tz)
+        return when.date(), when.hour * 3600 + when.minute * 60 + when.second
+
+    def at(self, day: date, secs: int) -> str:
+        t = datetime(day.year, day.month, day.day) + timedelta(seconds=int(secs))
+        return (t.replace(tzinfo=self.tz) if self.tz else t).isoformat()
+
+
+def _walk_leg(frm: Dict[str, Any], to: Dict[str, Any], depart: str, arrive: str, secs: int) -> Dict[str, Any]:
+    metres = secs * WALK_SPEED_MPS
+    return {"mode": "walk", "from": frm, "to": to, "departure": depart, "arrival": arrive,
+            "duration_s": int(secs), "distance_m": round(metres)}
+
+
+def plan(
+    tt: Timetable,
+    origin: Tuple[float, float],
+    destination: Tuple[float, float],
+    depart: Optional[datetime] = None,
+    accessible: bool = False,
+    max_transfers: int = MAX_TRANSFERS,
+    max_walk_m: float = ACCESS_WALK_M,
+    multi_criteria: bool = False,
+    carbon_gco2_per_kwh: Optional[float] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Itineraries from origin to destination (lat, lon) leaving at `depart`
+    (feed-local time if naive, now if None).
+
+    By default: one per number of rides that arrives earlier than any option
+    with fewer rides (fewest rides first), plus a walk-only option when it is the fastest. With
+    multi_criteria=True: the Pareto set over arrival, rides, walking,
+    accessibility barriers and CO2 (mc_raptor), earliest arrival first, with
+    walk-only included when short enough. With accessible=True only wheelchair-accessible trips,
+    wheelchair-boarding stops and step-free transfers are used.
+    """
+    if max_transfers < 0:
+        raise ValueError("max_transfers must be >= 0")
+    clock = _Clock(tt.meta.get("timezone", ""))
+    day, depart_s = clock.split(depart or datetime.now(clock.tz))
+    access = nearby_stops(tt, origin[0], origin[1], accessible, max_walk_m)
+    egress = nearby_stops(tt, destination[0], destination[1], accessible, max_walk_m)
+
+    here = {"name": "Origin", "lat": origin[0], "lon": origin[1]}
+    there = {"name": "Destination", "lat": destination[0], "lon": destination[1]}
+    patched = tt.patched(day)
+    itineraries = []
+    if multi_criteria:
+        fastest = earliest_arrival(tt, access, egress, depart_s, day, accessible, max_transfers)
+        arrive_by = INF
+        if fastest:
+            best = fastest[-1][0]
+            arrive_by = best + min(max(MC_MIN_SLACK_S, int(MC_SLACK_FACTOR * (best - depart_s))), MC_MAX_SLACK_S)
+            if not accessible:
+                # however late it is, the fastest step-free journey stays on the front
+                step_free = earliest_arrival(tt, nearby_stops(tt, origin[0], origin[1], True, max_walk_m),
+                                             nearby_stops(tt, destination[0], destination[1], True, max_walk_m),
+                                             depart_s, day, True, max_transfers)
+                if step_free:
+                    arrive_by = max(arrive_by, step_free[-1][0])
+        labels = mc_raptor(tt, access, egress, depart_s, day, accessible, max_transfers, carbon_gco2_per_kwh,
+                           arrive_by) if fastest else []
+        for label in labels:
+            legs, egress_s = label_legs(tt, label, patched)
+            itineraries.append(_itinerary(tt, clock, day, here, there, legs, egress_s, carbon_gco2_per_kwh))
+        itineraries.sort(key=lambda i: (i["arrival"], i["transfers"]))
+    else:
+        for _, k, stop, rounds in earliest_arrival(tt, access, egress, depart_s, day, accessible, max_transfers):
+            itineraries.append(_itinerary(tt, clock, day, here, there, journey_legs(tt, rounds, k, stop, patched),
+                                          egress[stop], carbon_gco2_per_kwh))
+
+    direct_m = float(np.hypot((destination[1] - origin[1]) * _M_PER_DEG_LAT * math.cos(math.radians(origin[0])),
+                              (destination[0] - origin[0]) * _M_PER_DEG_LAT))
+    walk_s = walk_seconds(direct_m)
+    fastest = min((i["duration_s"] for i in itineraries), default=None)
+    # a straight-line walk is not known to be step-free, so accessible plans never offer it
+    if not accessible and direct_m <= MAX_WALK_ONLY_M and (multi_criteria or fastest is None or walk_s <= fastest):
+        leg = _walk_leg(here, there, clock.at(day, depart_s), clock.at(day, depart_s + walk_s), walk_s)
+        itineraries.insert(0, {
+            "departure": leg["departure"], "arrival": leg["arrival"], "duration_s": walk_s, "transfers": 0,
+            "walk_m": leg["distance_m"], "walk_s": walk_s, "co2_g": 0.0, "barriers": 0,
+            "wheelchair_accessible": None, "modes": ["walk"], "legs": [leg],
+        })
+    return itineraries
+
+
+def transit_arrivals(
+    tt: Timetable,
+    origin: Tuple[float, float],
+    budget_s: float,
+    depart: Optional[datetime] = None,
+    accessible: bool = False,
+    max_walk_m: float = ACCESS_WALK_M,
+) -> List[Tuple[float, float, int]]:
+    """
+    (lat, lon, seconds after `depart`) for every stop reached sooner by transit
+    than by the access walk alone, within budget_s: starting points for a
+    transit isochrone.
+    """
+    clock = _Clock(tt.meta.get("timezone", ""))
+    day, depart_s = clock.split(depart or datetime.now(clock.tz))
+    access = nearby_stops(tt, origin[0], origin[1], accessible, max_walk_m)
+    arrivals: Dict[int, int] = {}
+    earliest_arrival(tt, access, {}, depart_s, day, accessible, arrive_by=depart_s + int(budget_s), arrivals=arrivals)
+    return [(float(tt.stop_lat[s]), float(tt.stop_lon[s]), a - depart_s) for s, a in sorted(arrivals.items())
+            if a < depart_s + access.get(s, INF)]
+
+
+OPTIMIZE = ("balanced", "time", "accessibility", "emissions")
+# "balanced" ranks by arrival plus these penalties, all in seconds.
+BALANCED_TRANSFER_S = 300
+BALANCED_WALK_FACTOR = 1.0      # each walked second counts double
+BALANCED_BARRIER_S = 600
+BALANCED_S_PER_CO2_G = 1.0
+
+
+def rank(itineraries: List[Dict[str, Any]], optimize: str = "balanced") -> List[Dict[str, Any]]:
+    """The itineraries with the one `optimize` prefers first (a point on the Pareto front)."""
+    optimize = (optimize or "balanced").lower()
+    if optimize not in OPTIMIZE:
+        raise ValueError(f"Unknown optimize '{optimize}'. Must be one of: {', '.join(OPTIMIZE)}")
+
+    def arrive(i: Dict[str, Any]) -> float:
+        return datetime.fromisoformat(i["arrival"]).timestamp()
+
+    keys = {
+        "time": lambda i: (arrive(i), i["transfers"]),
+        "accessibility": lambda i: (i["barriers"], arrive(i)),
+        "emissions": lambda i: (i["co2_g"], arrive(i)),
+        "balanced": lambda i: arrive(i) + BALANCED_TRANSFER_S * i["transfers"] + BALANCED_WALK_FACTOR * i["walk_s"]
+        + BALANCED_BARRIER_S * i["barriers"] + BALANCED_S_PER_CO2_G * i["co2_g"],
+    }
+    return sorted(itineraries, key=keys[optimize])
+
+
+def _itinerary(tt: Timetable, clock: _Clock, day: date, here: Dict[str, Any], there: Dict[str, Any],
+               legs: List[Dict[str, Any]], egress_s: int, carbon_gco2_per_kwh: Optional[float] = None) -> Dict[str, Any]:
+    out = []
+    barriers = 0
+    for leg in legs:
+        if leg["kind"] == "access":
+            stop = tt.stop(leg["to"])
+            # leave just in time for the first vehicle rather than at the requested time
+            out.append({"walk_to": stop, "duration_s": leg["duration_s"]})
+        elif leg["kind"] == "walk":
+            secs = leg["duration_s"]
+            out.append(_walk_leg(tt.stop(leg["from"]), tt.stop(leg["to"]), clock.at(day, leg["arrive_s"] - secs),
+                                 clock.at(day, leg["arrive_s"]), secs))
+            out[-1]["step_free"] = _step_free(tt, leg["from"], leg["to"], secs)
+            barriers += not out[-1]["step_free"]
+        else:
+            t = leg["trip"]
+            route = tt.routes[int(tt.trip_route[t])]
+            frm, to = tt.stop(leg["from"]), tt.stop(leg["to"])
+            wc = int(tt.trip_wheelchair[t]) == WC_YES
+            barriers += (not wc) + (frm["wheelchair_boarding"] != WC_YES) + (to["wheelchair_boarding"] != WC_YES)
+            out.append({
+                "mode": route["mode"],
+                "route": route["short_name"] or route["long_name"],
+                "route_id": route["route_id"],
+                "trip_id": tt.strings("trip_id")[t],
+                "headsign": tt.strings("trip_headsign")[t],
+                "from": frm,
+                "to": to,
+                "departure": clock.at(day, leg["depart_s"]),
+                "arrival": clock.at(day, leg["arrive_s"]),
+                "duration_s": leg["arrive_s"] - leg["depart_s"],
+                "stops": leg["stops"],
+                "distance_m": round(leg["distance_m"]),
+                "co2_g": round(leg["distance_m"] * co2_g_per_m(route["mode"], carbon_gco2_per_kwh), 1),
+                "delay_s": leg["delay_s"],
+                "wheelchair_accessible": wc,
+            })
+
+    rides = [leg for leg in legs if leg["kind"] == "ride"]
+    first_board = rides[0]["depart_s"]
+    access = out[0]
+    start_s = first_board - access["duration_s"]
+    out[0] = _walk_leg(here, access["walk_to"], clock.at(day, start_s), clock.at(day, first_board), access["duration_s"])
+    end_s = legs[-1]["arrive_s"]
+    out.append(_walk_leg(out[-1]["to"], there, clock.at(day, end_s), clock.at(day, end_s + egress_s), egress_s))
+    # drop zero-length walks (origin or destination right at the stop)
+    out = [leg for leg in out if leg["mode"] != "walk" or leg["duration_s"] > 0]
+    walks = [leg for leg in out if leg["mode"] == "walk"]
+    return {
+        "departure": clock.at(day, start_s),
+        "arrival": clock.at(day, end_s + egress_s),
+        "duration_s": end_s + egress_s - start_s,
+        "transfers": max(0, len(rides) - 1),
+        "walk_m": sum(leg["distance_m"] for leg in walks),
+        "walk_s": sum(leg["duration_s"] for leg in walks),
+        "co2_g": round(sum(leg.get("co2_g", 0.0) for leg in out), 1),
+        "barriers": barriers,
+        "wheelchair_accessible": barriers == 0,
+        "modes": [leg["mode"] for leg in out if leg["mode"] != "walk"],
+        "legs": out,
+    }
+
+
+def _step_free(tt: Timetable, a: int, b: int, secs: int) -> bool:
+    """Whether the a -> b transfer taking secs is step-free (a pair may have a faster walk and a step-free one)."""
+    lo, hi = int(tt.transfer_ptr[a]), int(tt.transfer_ptr[a + 1])
+    hit = (np.asarray(tt.transfer_to[lo:hi]) == b) & (np.asarray(tt.transfer_s[lo:hi]) == secs)
+    return bool(np.asarray(tt.transfer_step_free[lo:hi])[hit].any())
@@ -0,0 +1,520 @@
+import os
+import threading
+import time
+from datetime import date, datetime, timedelta, tzinfo
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+
+from services import gtfs_service
+from services.gtfs_service import NO_TIME, WC_NO, Timetable
+
+# GTFS-realtime sources: an http(s) URL or a local file, as protobuf or in the protobuf JSON mapping.
+TRIP_UPDATES_SOURCE = os.getenv("GTFS_RT_TRIP_UPDATES", "")
+ALERTS_SOURCE = os.getenv("GTFS_RT_ALERTS", "")
+
+# gtfs-realtime.proto enum values used here
+FULL_DATASET, DIFFERENTIAL = 0, 1
+SCHEDULED, SKIPPED, NO_DATA = 0, 1, 2            # StopTimeUpdate.schedule_relationship
+CANCELED, DELETED = 3, 7                         # TripDescriptor.schedule_relationship
+NO_SERVICE, ACCESSIBILITY_ISSUE = 1, 11          # Alert.effect
+
+# The subset of gtfs-realtime.proto read here: (field, number, type, repeated).
+# Enums are declared int32, which reads the same off the wire.
+_SCHEMA = {
+    "FeedMessage": [("header", 1, "FeedHeader", False), ("entity", 2, "FeedEntity", True)],
+    "FeedHeader": [("gtfs_realtime_version", 1, "string", False), ("incrementality", 2, "int32", False),
+                   ("timestamp", 3, "uint64", False)],
+    "FeedEntity": [("id", 1, "string", False), ("is_deleted", 2, "bool", False), ("trip_update", 3, "TripUpdate", False),
+                   ("vehicle", 4, "VehiclePosition", False), ("alert", 5, "Alert", False)],
+    "TripUpdate": [("trip", 1, "TripDescriptor", False), ("stop_time_update", 2, "StopTimeUpdate", True),
+                   ("vehicle", 3, "VehicleDescriptor", False), ("timestamp", 4, "uint64", False),
+                   ("delay", 5, "int32", False)],
+    "StopTimeEvent": [("delay", 1, "int32", False), ("time", 2, "int64", False), ("uncertainty", 3, "int32", False)],
+    "StopTimeUpdate": [("stop_sequence", 1, "uint32", False), ("arrival", 2, "StopTimeEvent", False),
+                       ("departure", 3, "StopTimeEvent", False), ("stop_id", 4, "string", False),
+                       ("schedule_relationship", 5, "int32", False)],
+    "TripDescriptor": [("trip_id", 1, "string", False), ("start_time", 2, "string", False),
+                       ("start_date", 3, "string", False), ("schedule_relationship", 4, "int32", False),
+                       ("route_id", 5, "string", False), ("direction_id", 6, "uint32", False)],
+    "VehicleDescriptor": [("id", 1, "string", False), ("label", 2, "string", False),
+                          ("license_plate", 3, "string", False), ("wheelchair_accessible", 4, "int32", False)],
+    "VehiclePosition": [("trip", 1, "TripDescriptor", False), ("position", 2, "Position", False),
+                        ("current_stop_sequence", 3, "uint32", False), ("current_status", 4, "int32", False),
+                        ("timestamp", 5, "uint64", False), ("congestion_level", 6, "int32", False),
+                        ("stop_id", 7, "string", False), ("vehicle", 8, "VehicleDescriptor", False),
+                        ("occupancy_status", 9, "int32", False)],
+    "Position": [("latitude", 1, "float", False), ("longitude", 2, "float", False), ("bearing", 3, "float", False),
+                 ("odometer", 4, "double", False), ("speed", 5, "float", False)],
+    "Alert": [("active_period", 1, "TimeRange", True), ("informed_entity", 5, "EntitySelector", True),
+              ("cause", 6, "int32", False), ("effect", 7, "int32", False), ("url", 8, "TranslatedString", False),
+              ("header_text", 10, "TranslatedString", False), ("description_text", 11, "TranslatedString", False)],
+    "TimeRange": [("start", 1, "uint64", False), ("end", 2, "uint64", False)],
+    "EntitySelector": [("agency_id", 1, "string", False), ("route_id", 2, "string", False),
+                       ("route_type", 3, "int32", False), ("trip", 4, "TripDescriptor", False),
+                       ("stop_id", 5, "string", False)],
+    "TranslatedString": [("translation", 1, "Translation", True)],
+    "Translation": [("text", 1, "string", False), ("language", 2, "string", False)],
+}
+
+_feed_message = None
+
+
+def feed_message_class():
+    """The FeedMessage protobuf class, built from _SCHEMA in a private descriptor pool."""
+    global _feed_message
+    if _feed_message is None:
+        from google.protobuf import descriptor_pb2, descriptor_pool, message_factory
+
+        F = descriptor_pb2.FieldDescriptorProto
+        scalars = {"string": F.TYPE_STRING, "bool": F.TYPE_BOOL, "int32": F.TYPE_INT32, "uint32": F.TYPE_UINT32,
+                   "int64": F.TYPE_INT64, "uint64": F.TYPE_UINT64, "float": F.TYPE_FLOAT, "double": F.TYPE_DOUBLE}
+        proto = descriptor_pb2.FileDescriptorProto(name="gtfs_realtime_subset.proto", package="transit_realtime",
+                                                   syntax="proto2")
+        for name, fields in _SCHEMA.items():
+            message = proto.message_type.add(name=name)
+            for field, number, kind, repeated in fields:
+                f = message.field.add(name=field, number=number,
+                                      label=F.LABEL_REPEATED if repeated else F.LABEL_OPTIONAL)
+                if kind in scalars:
+                    f.type = scalars[kind]
+                else:
+                    f.type, f.type_name = F.TYPE_MESSAGE, ".transit_realtime." + kind
+        pool = descriptor_pool.DescriptorPool()
+        pool.Add(proto)
+        _feed_message = message_factory.GetMessageClass(pool.FindMessageTypeByName("transit_realtime.FeedMessage"))
+    return _feed_message
+
+
+def parse_feed(data: Union[bytes, str]):
+    """A FeedMessage from protobuf bytes or its JSON mapping; ValueError if it is neither."""
+    msg = feed_message_class()()
+    try:
+        if isinstance(data, str) or data.lstrip()[:1] == b"{":
+            from google.protobuf import json_format
+
+            json_format.Parse(data, msg, ignore_unknown_fields=True)
+        else:
+            msg.ParseFromString(data)
+    except Exception as e:
+        raise ValueError(f"Not a GTFS-realtime feed: {e}")
+    return msg
+
+
+def read_source(src: str) -> bytes:
+    """Raw feed bytes from an http(s) URL or a local file."""
+    if src.startswith(("http://", "https://")):
+        import httpx
+
+        with httpx.Client(timeout=10.0) as client:
+            r = client.get(src)
+            r.raise_for_status()
+            return r.content
+    return Path(src).read_bytes()
+
+
+def _text(ts) -> str:
+    """First translation of a TranslatedString (English if there is one)."""
+    texts = [(t.language, t.text) for t in ts.translation]
+    for lang, text in texts:
+        if lang.lower().startswith("en"):
+            return text
+    return texts[0][1] if texts else ""
+
+
+class LiveTimetable:
+    """
+    A Timetable with realtime trip updates and alerts laid over it. Everything
+    not overridden here is the static timetable's.
+
+    A delayed trip only touches its pattern: each patched pattern gets its own
+    copy of its stop-major time block (what Timetable.patched returns).
+    Instances are never modified once published; an update builds a new one
+    that shares the untouched blocks and swaps the reference, so queries read
+    a consistent snapshot without locks.
+    """
+
+    def __init__(self, base: Timetable, blocks: Optional[Dict[date, Dict[int, tuple]]] = None,
+                 trips: Optional[Dict[Tuple[date, int], tuple]] = None, alerts: Optional[List[Dict[str, Any]]] = None,
+                 alert_cancelled: Optional[Dict[date, frozenset]] = None, closed_stops: frozenset = frozenset(),
+                 version: int = 0, stats: Optional[Dict[str, Any]] = None) -> None:
+        self.base = base
+        self.blocks = blocks or {}
+        # (service day, trip) -> (the update as bytes, realtime (arrivals, departures) or None if cancelled)
+        self.trips = trips or {}
+        self.alerts = alerts or []
+        self.alert_cancelled = alert_cancelled or {}
+        self.closed_stops = closed_stops
+        self.version = version
+        self.stats = stats or {}
+        self.cancelled: Dict[date, set] = {}
+        for (day, t), (_, times) in self.trips.items():
+            if times is None:
+                self.cancelled.setdefault(day, set()).add(t)
+        for day, ts in self.alert_cancelled.items():
+            self.cancelled.setdefault(day, set()).update(ts)
+        self.stop_wheelchair = np.asarray(base.stop_wheelchair)
+        if closed_stops:
+            self.stop_wheelchair = self.stop_wheelchair.copy()
+            self.stop_wheelchair[sorted(closed_stops)] = WC_NO
+        self._views: Optional[Dict[str, memoryview]] = None
+        self._usable: Dict[Tuple[int, bool], memoryview] = {}
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.base, name)
+
+    def views(self) -> Dict[str, memoryview]:
+        if self._views is None:
+            views = dict(self.base.views())
+            views["stop_wheelchair"] = memoryview(np.ascontiguousarray(self.stop_wheelchair))
+            self._views = views
+        return self._views
+
+    def patched(self, day: date) -> Dict[int, Tuple[memoryview, memoryview, Optional[tuple]]]:
+        return self.blocks.get(day, {})
+
+    def usable_trips(self, day: date, accessible: bool = False) -> memoryview:
+        """The static usable trips minus those cancelled on `day`."""
+        cancelled = self.cancelled.get(day)
+        if not cancelled:
+            return self.base.usable_trips(day, accessible)
+        key = (day.toordinal(), accessible)
+        view = self._usable.get(key)
+        if view is None:
+            ok = np.array(self.base.usable_trips(day, accessible), dtype=np.uint8)
+            ok[sorted(cancelled)] = 0
+            view = memoryview(ok)
+            if len(self._usable) >= 8:
+                self._usable.pop(next(iter(self._usable)))
+            self._usable[key] = view
+        return view
+
+    def stop(self, s: int) -> Dict[str, Any]:
+        out = self.base.stop(s)
+        out["wheelchair_boarding"] = int(self.stop_wheelchair[s])
+        return out
+
+    def alerts_for(self, route_id: Optional[str] = None, stop_id: Optional[str] = None,
+                   now: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Alerts in effect at `now` (default: now) naming the route or stop; all of them if neither is given."""
+        now = time.time() if now is None else now
+        return [a for a in self.alerts if _in_effect(a, now) and (
+            route_id is None and stop_id is None or route_id in a["route_ids"] or stop_id in a["stop_ids"])]
+
+
+def feed_timezone(tt: Timetable) -> Optional[tzinfo]:
+    """The feed's agency_timezone; None (the server's local time) if it has none or it is unknown."""
+    name = tt.meta.get("timezone", "")
+    if name:
+        try:
+            from zoneinfo import ZoneInfo
+            return ZoneInfo(name)
+        except Exception:
+            return None
+    return None
+
+
+def day_origin(day: date, tz: Optional[tzinfo]) -> int:
+    """POSIX time the service day's seconds count from (noon minus 12 h, as GTFS defines it)."""
+    noon = datetime(day.year, day.month, day.day, 12, tzinfo=tz)
+    return int((noon - timedelta(hours=12)).timestamp())
+
+
+def _in_effect(alert: Dict[str, Any], now: float) -> bool:
+    return not alert["active"] or any(start <= now and (not end or now < end) for start, end in alert["active"])
+
+
+class _Updater:
+    """Builds the next LiveTimetable from one feed, copying only the pattern blocks it changes."""
+
+    def __init__(self, live: LiveTimetable) -> None:
+        self.live = live
+        self.tt = live.base
+        self.tz = feed_timezone(self.tt)
+        self._origins: Dict[date, int] = {}
+
+    def today(self, now: float) -> date:
+        return datetime.fromtimestamp(now, self.tz).date()
+
+    def service_day(self, trip, now: float) -> date:
+        d = trip.start_date
+        if len(d) == 8 and d.isdigit():
+            return date(int(d[:4]), int(d[4:6]), int(d[6:]))
+        return self.today(now)
+
+    def origin(self, day: date) -> int:
+        t = self._origins.get(day)
+        if t is None:
+            t = self._origins[day] = day_origin(day, self.tz)
+        return t
+
+    def trip_times(self, t: int, day: date, update) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Realtime (arrivals, departures) over every stop of trip t; None if all
+        its stops are skipped. A delay carries on to later stops until the next
+        update; stops before the first one keep their schedule.
+        """
+        tt = self.tt
+        p = int(tt.trip_pattern[t])
+        s_lo, s_hi = int(tt.pattern_stop_ptr[p]), int(tt.pattern_stop_ptr[p + 1])
+        n = s_hi - s_lo
+        t_lo = int(tt.pattern_trip_ptr[p])
+        nt = int(tt.pattern_trip_ptr[p + 1]) - t_lo
+        col = int(tt.pattern_time_ptr[p]) + np.arange(n) * nt + (t - t_lo)
+        arr = np.asarray(tt.arrival)[col].astype(np.int64)
+        dep = np.asarray(tt.departure)[col].astype(np.int64)
+        origin = self.origin(day)
+
+        # one pass over the updates in plain Python: position, arrival and departure delay (None = no data)
+        arr_s, dep_s = arr.tolist(), dep.tolist()
+        stops = seqs = None
+        hits, a_delays, d_delays, skipped = [], [], [], []
+        j = 0
+        for u in update.stop_time_update:
+            try:
+                if u.HasField("stop_sequence"):
+                    seqs = seqs or tt.pattern_stop_seq[s_lo:s_hi].tolist()
+                    pos = seqs.index(u.stop_sequence, j)
+                else:
+                    stops = stops or tt.pattern_stops[s_lo:s_hi].tolist()
+                    pos = stops.index(tt.index_of("stop_id").get(u.stop_id, -1), j)
+            except ValueError:
+                continue
+            j = pos + 1
+            rel = u.schedule_relationship
+            if rel == SKIPPED:
+                skipped.append(pos)
+                continue
+            a_delay = d_delay = None
+            if rel != NO_DATA:
+                if u.HasField("arrival"):
+                    ev = u.arrival
+                    a_delay = ev.time - origin - arr_s[pos] if ev.time else ev.delay if ev.HasField("delay") else None
+                if u.HasField("departure"):
+                    ev = u.departure
+                    d_delay = ev.time - origin - dep_s[pos] if ev.time else ev.delay if ev.HasField("delay") else None
+                if d_delay is None:
+                    d_delay = a_delay
+                elif a_delay is None:
+                    a_delay = d_delay
+            hits.append(pos)
+            a_delays.append(a_delay)
+            d_delays.append(d_delay)
+
+        # carry each departure delay forward to the next update
+        delay = np.zeros(n, dtype=np.int64)
+        known = np.zeros(n, dtype=bool)
+        if update.HasField("delay"):
+            delay[:] = update.delay
+            known[:] = True
+        if hits:
+            at = np.asarray(hits)
+            has = np.asarray([d is not None for d in d_delays])
+            start = np.zeros(n, dtype=np.int64) - 1
+            start[at] = np.arange(len(at))
+            last = np.maximum.accumulate(start)
+            after = last >= 0
+            idx = last[after]
+            d = np.asarray([x or 0 for x in d_delays], dtype=np.int64)
+            delay[after] = d[idx]
+            known[after] = has[idx]
+            # at the updated stops themselves the arrival may run on a different delay
+            arr_delay = delay.copy()
+            arr_delay[at] = np.asarray([x or 0 for x in a_delays], dtype=np.int64)
+        else:
+            arr_delay = delay
+        new_arr = np.where(known, arr + arr_delay, arr)
+        new_dep = np.where(known, np.maximum(new_arr, dep + delay), dep)
+        if len(skipped) == n:
+            return None
+        new_arr[skipped] = NO_TIME
+        new_dep[skipped] = NO_TIME
+        return new_arr, new_dep
+
+    def block(self, p: int, day: date, trips: Dict[Tuple[date, int], tuple]) -> Optional[tuple]:
+        """Pattern p's time block with the realtime times of its trips on `day`; None if none have any."""
+        tt = self.tt
+        t_lo, t_hi = int(tt.pattern_trip_ptr[p]), int(tt.pattern_trip_ptr[p + 1])
+        nt = t_hi - t_lo
+        live = [(t, trips[(day, t)][1]) for t in range(t_lo, t_hi) if trips.get((day, t), (None, None))[1] is not None]
+        if not live:
+            return None
+        lo, hi = int(tt.pattern_time_ptr[p]), int(tt.pattern_time_ptr[p + 1])
+        arr = np.array(tt.arrival[lo:hi], dtype=np.int32).reshape(-1, nt)
+        dep = np.array(tt.departure[lo:hi], dtype=np.int32).reshape(-1, nt)
+        for t, (a, d) in live:
+            arr[:, t - t_lo] = np.clip(a, 0, NO_TIME)
+            dep[:, t - t_lo] = np.clip(d, 0, NO_TIME)
+        # RAPTOR binary-searches each stop's departures; once delays or skips put them
+        # out of order it needs them sorted, with the trip each belongs to
+        ordered = None
+        if not ((np.diff(dep, axis=1) >= 0).all() and (dep != NO_TIME).all()):
+            order = np.argsort(dep, axis=1, kind="stable")
+            ordered = (memoryview(np.take_along_axis(dep, order, axis=1).ravel()),
+                       memoryview(order.astype(np.int32).ravel()))
+        return memoryview(arr.ravel()), memoryview(dep.ravel()), ordered
+
+    def trip_updates(self, feed, now: float) -> LiveTimetable:
+        tt, live = self.tt, self.live
+        trip_ids = tt.index_of("trip_id")
+        seen: Dict[Tuple[date, int], Optional[tuple]] = {}
+        unmatched = 0
+        for entity in feed.entity:
+            if not entity.HasField("trip_update"):
+                continue
+            update = entity.trip_update
+            t = trip_ids.get(update.trip.trip_id)
+            if t is None:
+                unmatched += 1
+                continue
+            key = (self.service_day(update.trip, now), t)
+            if entity.is_deleted:
+                seen[key] = None
+                continue
+            raw = update.SerializeToString(deterministic=True)
+            old = live.trips.get(key)
+            if old is not None and old[0] == raw:
+                seen[key] = old
+                continue
+            cancelled = update.trip.schedule_relationship in (CANCELED, DELETED)
+            seen[key] = (raw, None if cancelled else self.trip_times(t, key[0], update))
+
+        if feed.header.incrementality == DIFFERENTIAL:
+            trips = dict(live.trips)
+            changed = {k for k in seen if live.trips.get(k) is not seen[k]}
+        else:
+            # a full dataset drops whatever it no longer mentions
+            trips = {}
+            changed = {k for k in seen if live.trips.get(k) is not seen[k]} | (set(live.trips) - set(seen))
+        for k, v in seen.items():
+            if v is None:
+                trips.pop(k, None)
+            else:
+                trips[k] = v
+
+        blocks = dict(live.blocks)
+        touched: Dict[date, set] = {}
+        for day, t in changed:
+            touched.setdefault(day, set()).add(int(tt.trip_pattern[t]))
+        for day, patterns in touched.items():
+            day_blocks = dict(blocks.get(day, {}))
+            for p in patterns:
+                block = self.block(p, day, trips)
+                if block is None:
+                    day_blocks.pop(p, None)
+                else:
+                    day_blocks[p] = block
+            blocks[day] = day_blocks
+        blocks = {day: b for day, b in blocks.items() if b}
+
+        stats = {
+            "trip_updates_timestamp": int(feed.header.timestamp),
+            "trips_delayed": sum(1 for _, times in trips.values() if times is not None),
+            "trips_cancelled": sum(1 for _, times in trips.values() if times is None),
+            "trips_changed": len(changed),
+            "unmatched_trips": unmatched,
+            "patterns_patched": sum(len(b) for b in blocks.values()),
+        }
+        return LiveTimetable(tt, blocks, trips, live.alerts, live.alert_cancelled, live.closed_stops,
+                             live.version + 1, {**live.stats, **stats})
+
+    def service_alerts(self, feed, now: float) -> LiveTimetable:
+        """
+        Replace the alerts. NO_SERVICE alerts in effect now cancel the trips
+        they name, or every trip of a route named without a stop, for today's
+        service day; NO_SERVICE or ACCESSIBILITY_ISSUE on a stop makes it not
+        step-free.
+        """
+        tt, live = self.tt, self.live
+        trip_ids, stop_ids = tt.index_of("trip_id"), tt.index_of("stop_id")
+        route_index = {r["route_id"]: i for i, r in enumerate(tt.routes)}
+        alerts, closed, cancelled = [], set(), set()
+        for entity in feed.entity:
+            if not entity.HasField("alert") or entity.is_deleted:
+                continue
+            a = entity.alert
+            named = a.informed_entity
+            alert = {
+                "id": entity.id,
+                "cause": a.cause,
+                "effect": a.effect,
+                "header": _text(a.header_text),
+                "description": _text(a.description_text),
+                "url": _text(a.url),
+                "active": [(int(r.start), int(r.end)) for r in a.active_period],
+                "route_ids": sorted({e.route_id for e in named if e.route_id}),
+                "stop_ids": sorted({e.stop_id for e in named if e.stop_id}),
+                "trip_ids": sorted({e.trip.trip_id for e in named if e.trip.trip_id}),
+            }
+            alerts.append(alert)
+            if not _in_effect(alert, now):
+                continue
+            if a.effect in (NO_SERVICE, ACCESSIBILITY_ISSUE):
+                closed |= {stop_ids[s] for s in alert["stop_ids"] if s in stop_ids}
+            if a.effect == NO_SERVICE:
+                cancelled |= {trip_ids[t] for t in alert["trip_ids"] if t in trip_ids}
+                routes = [route_index[e.route_id] for e in named
+                          if e.route_id in route_index and not e.stop_id and not e.trip.trip_id]
+                if routes:
+                    cancelled |= set(np.flatnonzero(np.isin(np.asarray(tt.trip_route), routes)).tolist())
+        stats = {"alerts_timestamp": int(feed.header.timestamp), "alerts": len(alerts),
+                 "alert_cancelled_trips": len(cancelled), "stops_not_step_free": len(closed)}
+        return LiveTimetable(tt, live.blocks, live.trips, alerts, {self.today(now): frozenset(cancelled)},
+                             frozenset(closed), live.version + 1, {**live.stats, **stats})
+
+
+def apply_trip_updates(tt: Union[Timetable, LiveTimetable], feed, now: Optional[float] = None) -> LiveTimetable:
+    """`tt` with a TripUpdates feed applied; only trips whose update changed are recomputed."""
+    live = tt if isinstance(tt, LiveTimetable) else LiveTimetable(tt)
+    return _Updater(live).trip_updates(feed, time.time() if now is None else now)
+
+
+def apply_alerts(tt: Union[Timetable, LiveTimetable], feed, now: Optional[float] = None) -> LiveTimetable:
+    """`tt` with its alerts replaced by those of a ServiceAlerts feed."""
+    live = tt if isinstance(tt, LiveTimetable) else LiveTimetable(tt)
+    return _Updater(live).service_alerts(feed, time.time() if now is None else now)
+
+
+_live: Optional[LiveTimetable] = None
+# only writers take it; queries just read the current reference
+_write_lock = threading.Lock()
+
+
+def live_timetable() -> Optional[Union[Timetable, LiveTimetable]]:
+    """The shared timetable with the latest realtime data on it; the static one if there is none yet."""
+    base = gtfs_service.get_timetable()
+    live = _live
+    if live is not None and live.base is base:
+        return live
+    return base
+
+
+def refresh(trip_updates: Optional[str] = None, alerts: Optional[str] = None,
+            now: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Fetch, decode and apply the feeds (GTFS_RT_TRIP_UPDATES and
+    GTFS_RT_ALERTS by default), then publish the result. LookupError if there
+    is no timetable or no source; ValueError if a feed does not decode.
+    """
+    global _live
+    trip_updates = TRIP_UPDATES_SOURCE if trip_updates is None else trip_updates
+    alerts = ALERTS_SOURCE if alerts is None else alerts
+    if not trip_updates and not alerts:
+        raise LookupError("No GTFS-realtime source configured (GTFS_RT_TRIP_UPDATES / GTFS_RT_ALERTS).")
+    with _write_lock:
+        tt = live_timetable()
+        if tt is None:
+            raise LookupError("No GTFS timetable loaded. Run scripts/import_gtfs.py first.")
+        timings = {}
+        for name, src, apply in (("trip_updates", trip_updates, apply_trip_updates), ("alerts", alerts, apply_alerts)):
+            if not src:
+                continue
+            t0 = time.perf_counter()
+            feed = parse_feed(read_source(src))
+            t1 = time.perf_counter()
+            tt = apply(tt, feed, now)
+            timings[name] = {"decode_ms": round((t1 - t0) * 1000, 1),
+                             "apply_ms": round((time.perf_counter() - t1) * 1000, 1)}
+        _live = tt
+        return {"version": tt.version, **tt.stats, "timings": timings}
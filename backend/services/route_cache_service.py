@@ -0,0 +1,128 @@
+import json
+import math
+import os
+import zlib
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+DEFAULT_GRID_M = float(os.getenv("ROUTE_CACHE_GRID_M", "25"))
+DEFAULT_MAX_ENTRIES = int(os.getenv("ROUTE_CACHE_SIZE", "5000"))
+DEFAULT_MAX_BYTES = int(os.getenv("ROUTE_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+
+_M_PER_DEG_LAT = 111_320.0
+
+RouteKey = Tuple[str, int, int, int, int]
+
+
+def snap(lat: float, lon: float, grid_m: float) -> Tuple[int, int]:
+    """Grid cell of a point; cells are ~grid_m on a side at any latitude."""
+    lat_step = grid_m / _M_PER_DEG_LAT
+    row = math.floor(lat / lat_step)
+    # use the row's centre latitude so every point in a row shares one lon step
+    centre = (row + 0.5) * lat_step
+    lon_step = grid_m / (_M_PER_DEG_LAT * max(math.cos(math.radians(centre)), 1e-6))
+    return row, math.floor(lon / lon_step)
+
+
+class RouteCache:
+    """
+    LRU cache of OSRM route responses keyed on snapped origin/destination + profile.
+
+    Responses are stored as zlib-compressed JSON; eviction keeps both the entry
+    count and the total compressed size under their limits.
+    """
+
+    def __init__(
+        self,
+        grid_m: float = DEFAULT_GRID_M,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+    ) -> None:
+        self.grid_m = float(grid_m)
+        self.max_entries = max(1, int(max_entries))
+        self.max_bytes = max(1, int(max_bytes))
+        self._data: "OrderedDict[RouteKey, bytes]" = OrderedDict()
+        self._bytes = 0
+        self.stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0, "raw_bytes_stored": 0}
+
+    def key(self, origin_lat: float, origin_lon: float, dest_lat: float, dest_lon: float, profile: str) -> RouteKey:
+        o = snap(origin_lat, origin_lon, self.grid_m)
+        d = snap(dest_lat, dest_lon, self.grid_m)
+        return (profile, o[0], o[1], d[0], d[1])
+
+    def get(self, key: RouteKey) -> Optional[Dict[str, Any]]:
+        blob = self._data.get(key)
+        if blob is None:
+            self.stats["misses"] += 1
+            return None
+        self._data.move_to_end(key)
+        self.stats["hits"] += 1
+        return json.loads(zlib.decompress(blob))
+
+    def put(self, key: RouteKey, response: Dict[str, Any]) -> None:
+        raw = json.dumps(response, separators=(",", ":")).encode("utf-8")
+        blob = zlib.compress(raw, 6)
+        if len(blob) > self.max_bytes:
+            return
+        old = self._data.pop(key, None)
+        if old is not None:
+            self._bytes -= len(old)
+        self._data[key] = blob
+        self._bytes += len(blob)
+        self.stats["stores"] += 1
+        self.stats["raw_bytes_stored"] += len(raw)
+        while len(self._data) > self.max_entries or self._bytes > self.max_bytes:
+            _, evicted = self._data.popitem(last=False)
+            self._bytes -= len(evicted)
+            self.stats["evictions"] += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return {
+            **self.stats,
+            "entries": len(self._data),
+            "compressed_bytes": self._bytes,
+            "grid_m": self.grid_m,
+            "hit_ratio": round(self.stats["hits"] / lookups, 4) if lookups else None,
+        }
+
+
+class MatrixCache:
+    """
+    Per-origin-cell cache of table results: (profile, origin cell) -> {dest cell: (duration_s, distance_m)}.
+    LRU over origin cells, so a rider's repeated lookups from home stay warm.
+    """
+
+    def __init__(self, grid_m: float = DEFAULT_GRID_M, max_origins: int = DEFAULT_MAX_ENTRIES) -> None:
+        self.grid_m = float(grid_m)
+        self.max_origins = max(1, int(max_origins))
+        self._data: "OrderedDict[Tuple[str, int, int], Dict[Tuple[int, int], Tuple[Optional[float], Optional[float]]]]" = OrderedDict()
+        self.stats = {"cell_hits": 0, "cell_misses": 0, "evictions": 0}
+
+    def cell(self, lat: float, lon: float) -> Tuple[int, int]:
+        return snap(lat, lon, self.grid_m)
+
+    def get(self, profile: str, origin: Tuple[int, int], dest: Tuple[int, int]) -> Optional[Tuple[Optional[float], Optional[float]]]:
+        row = self._data.get((profile, *origin))
+        if row is None or dest not in row:
+            self.stats["cell_misses"] += 1
+            return None
+        self._data.move_to_end((profile, *origin))
+        self.stats["cell_hits"] += 1
+        return row[dest]
+
+    def put(self, profile: str, origin: Tuple[int, int], dest: Tuple[int, int],
+            value: Tuple[Optional[float], Optional[float]]) -> None:
+        key = (profile, *origin)
+        row = self._data.get(key)
+        if row is None:
+            row = {}
+            self._data[key] = row
+        self._data.move_to_end(key)
+        row[dest] = value
+        while len(self._data) > self.max_origins:
+            self._data.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {**self.stats, "origins": len(self._data), "grid_m": self.grid_m}
@@ -0,0 +1,193 @@
+import math
+from itertools import chain
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from services.elevation_service import DemTileSet, grade_profile
+
+GEOMETRY_FORMATS = ("geojson", "polyline6")
+
+# Web-mercator ground resolution at the equator, zoom 0 (m per 256px-tile pixel).
+_M_PER_PX_Z0 = 156_543.033_92
+_M_PER_DEG_LAT = 111_320.0
+# zig-zagged deltas of |lon| <= 180 at 1e-6 fit in 30 bits = 6 five-bit chunks
+_MAX_CHUNKS = 7
+
+# Step fields the turn-by-turn list renders; the rest (per-step geometry,
+# intersections, lanes, weights) is dropped.
+STEP_FIELDS = ("distance", "duration", "name", "mode")
+MANEUVER_FIELDS = ("type", "modifier", "location")
+
+
+def _as_array(coords: Sequence[Sequence[float]]) -> np.ndarray:
+    """(n, 2) float array; much faster than np.asarray on a list of small lists."""
+    if isinstance(coords, np.ndarray):
+        return coords.astype(np.float64, copy=False).reshape(-1, 2)
+    flat = np.fromiter(chain.from_iterable(coords), dtype=np.float64, count=2 * len(coords))
+    return flat.reshape(-1, 2)
+
+
+def encode_polyline(coords: Sequence[Sequence[float]], precision: int = 6) -> str:
+    """
+    Encode [lon, lat] pairs (GeoJSON order) as a Google encoded polyline.
+    precision=6 is what OSRM calls `polyline6`.
+    """
+    if len(coords) == 0:
+        return ""
+    factor = 10 ** precision
+    pts = np.round(_as_array(coords)[:, ::-1] * factor).astype(np.int64)
+    deltas = np.diff(pts, axis=0, prepend=np.zeros((1, 2), dtype=np.int64)).ravel()
+    # zig-zag so the sign lives in the low bit
+    values = np.where(deltas < 0, ~(deltas << 1), deltas << 1)
+    if len(values) and values.max() >= 1 << (5 * _MAX_CHUNKS):
+        raise ValueError("Coordinates out of range for polyline encoding")
+
+    # split each value into 5-bit chunks, low chunk first; every chunk but the
+    # last of a value carries the 0x20 continuation bit
+    shifts = np.arange(_MAX_CHUNKS, dtype=np.int64) * 5
+    chunks = (values[:, None] >> shifts) & 0x1F
+    n_chunks = 1 + ((values[:, None] >> shifts[1:]) > 0).sum(axis=1)
+    col = np.arange(_MAX_CHUNKS)
+    chunks |= np.where(col < (n_chunks - 1)[:, None], 0x20, 0)
+    return (chunks[col < n_chunks[:, None]] + 63).astype(np.uint8).tobytes().decode("ascii")
+
+
+def decode_polyline(encoded: str, precision: int = 6) -> List[List[float]]:
+    """Inverse of encode_polyline; returns [lon, lat] pairs."""
+    factor = 10 ** precision
+    values: List[int] = []
+    shift = result = 0
+    for ch in encoded:
+        b = ord(ch) - 63
+        result |= (b & 0x1F) << shift
+        shift += 5
+        if b < 0x20:
+            values.append(~(result >> 1) if result & 1 else result >> 1)
+            shift = result = 0
+    if len(values) % 2:
+        raise ValueError("Truncated polyline")
+    latlon = np.cumsum(np.asarray(values, dtype=np.int64).reshape(-1, 2), axis=0) / factor
+    return latlon[:, ::-1].tolist()
+
+
+def zoom_tolerance_m(zoom: float, lat: float) -> float:
+    """Ground size of one screen pixel at `zoom`; detail smaller than that is invisible."""
+    return _M_PER_PX_Z0 * math.cos(math.radians(lat)) / (2 ** zoom)
+
+
+def simplify(coords: Sequence[Sequence[float]], tolerance_m: float) -> List[List[float]]:
+    """
+    Douglas-Peucker over [lon, lat] pairs with a tolerance in metres.
+    Points are projected to a local equirectangular plane so the tolerance is
+    isotropic; end points are always kept.
+    """
+    pts = _as_array(coords)
+    n = len(pts)
+    if n <= 2 or tolerance_m <= 0:
+        return pts.tolist()
+
+    lat0 = math.radians(float(pts[:, 1].mean()))
+    x = pts[:, 0] * (_M_PER_DEG_LAT * math.cos(lat0))
+    y = pts[:, 1] * _M_PER_DEG_LAT
+
+    keep = np.zeros(n, dtype=bool)
+    keep[0] = keep[-1] = True
+    tol2 = tolerance_m * tolerance_m
+    # Level-synchronous: every open segment is split in the same vectorized pass,
+    # and points whose segment is already within tolerance drop out.
+    active = np.arange(1, n - 1)
+    # end points of each active point's current segment
+    a = np.zeros(len(active), dtype=np.int64)
+    b = np.full(len(active), n - 1, dtype=np.int64)
+    while len(active):
+        d2 = _segment_dist2(x[active], y[active], x[a], y[a], x[b], y[b])
+        # per-segment max; active is sorted so each segment's points are contiguous
+        new_group = np.r_[True, a[1:] != a[:-1]]
+        starts = np.flatnonzero(new_group)
+        group = np.cumsum(new_group) - 1
+        seg_max = np.maximum.reduceat(d2, starts)
+        cand = np.flatnonzero(d2 == seg_max[group])
+        first_max = cand[np.r_[True, group[cand][1:] != group[cand][:-1]]]
+        split = first_max[seg_max[group[first_max]] > tol2]
+        if len(split) == 0:
+            break
+        keep[active[split]] = True
+        # points of split segments move to the half they fall in; the rest are done
+        split_at = np.full(len(starts), -1, dtype=np.int64)
+        split_at[group[split]] = active[split]
+        pivot = split_at[group]
+        stay = (pivot >= 0) & (active != pivot)
+        left = active < pivot
+        b = np.where(left, pivot, b)
+        a = np.where(left, a, pivot)
+        active, a, b = active[stay], a[stay], b[stay]
+    return pts[keep].tolist()
+
+
+def _segment_dist2(px, py, ax, ay, bx, by) -> np.ndarray:
+    """Squared distance from each p to segment a-b (not the infinite line, so spikes past an end count)."""
+    sx, sy = bx - ax, by - ay
+    rx, ry = px - ax, py - ay
+    seg_len2 = sx * sx + sy * sy
+    t = np.clip((rx * sx + ry * sy) / np.where(seg_len2 > 0, seg_len2, 1.0), 0.0, 1.0)
+    ox, oy = rx - t * sx, ry - t * sy
+    return ox * ox + oy * oy
+
+
+def trim_step(step: Dict[str, Any]) -> Dict[str, Any]:
+    out = {k: step[k] for k in STEP_FIELDS if k in step}
+    maneuver = step.get("maneuver") or {}
+    out["maneuver"] = {k: maneuver[k] for k in MANEUVER_FIELDS if k in maneuver}
+    return out
+
+
+def trim_legs(legs: Sequence[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    return [
+        {
+            "distance": leg.get("distance"),
+            "duration": leg.get("duration"),
+            "summary": leg.get("summary"),
+            "steps": [trim_step(s) for s in leg.get("steps") or []],
+        }
+        for leg in legs
+    ]
+
+
+def compact_route(
+    route: Dict[str, Any],
+    geometry_format: str = "geojson",
+    zoom: Optional[float] = None,
+    dem: Optional[DemTileSet] = None,
+) -> Dict[str, Any]:
+    """
+    Shape one OSRM route (requested with geometries=geojson) for the client:
+    optionally simplified for `zoom`, encoded as polyline6 if asked, legs trimmed.
+    With a DEM, adds per-segment grades for the returned geometry.
+    """
+    if geometry_format not in GEOMETRY_FORMATS:
+        raise ValueError(f"geometry_format must be one of: {', '.join(GEOMETRY_FORMATS)}")
+
+    coords = (route.get("geometry") or {}).get("coordinates") or []
+    points_full = len(coords)
+    if zoom is not None and points_full > 2:
+        mid_lat = coords[points_full // 2][1]
+        coords = simplify(coords, zoom_tolerance_m(zoom, mid_lat))
+
+    if geometry_format == "polyline6":
+        geometry: Any = encode_polyline(coords, 6)
+    else:
+        geometry = {"type": "LineString", "coordinates": coords}
+
+    out = {
+        "distance_m": route.get("distance"),
+        "duration_s": route.get("duration"),
+        "geometry_format": geometry_format,
+        "geometry": geometry,
+        "points": len(coords),
+        "points_full": points_full,
+        "legs": trim_legs(route.get("legs") or []),
+    }
+    if dem is not None:
+        out["elevation"] = grade_profile(dem, coords) if len(coords) > 1 else None
+    return out
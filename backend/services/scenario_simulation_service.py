@@ -0,0 +1,226 @@
+import os
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field, asdict
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from services.climate_service import ClimateEngine
+from services import carbon_intensity_service as cis
+
+MODES = ["car", "bus", "subway", "walk", "bike", "electric"]
+
+# Roughly the diurnal shape used by scripts/seed_carbon_intensity.py (gCO2/kWh).
+DEFAULT_HOURLY_INTENSITY = [
+    80, 80, 80, 80, 80, 80, 80,          # 00-06 overnight low
+    140, 140, 140, 140,                  # 07-10 morning peak
+    120, 120, 120, 120, 120, 120,        # 11-16 midday
+    160, 160, 160, 160,                  # 17-20 evening peak
+    100, 100, 100,                       # 21-23
+]
+
+# Share of trips departing in each hour of the day (normalized on use).
+DEFAULT_DEPARTURE_WEIGHTS = [
+    1, 0.5, 0.3, 0.3, 0.5, 1.5, 4, 8, 9, 6, 4, 4,
+    5, 5, 4, 5, 7, 9, 8, 5, 3, 2, 1.5, 1,
+]
+
+CHUNK_TRIPS = 1_000_000
+
+
+@dataclass
+class ModeShift:
+    """Move `fraction` of `from_mode` trips matching the filters to `to_mode`."""
+    from_mode: str = "car"
+    to_mode: str = "electric"
+    fraction: float = 0.1
+    max_distance_km: Optional[float] = None
+    min_distance_km: Optional[float] = None
+    hours: Optional[List[int]] = None
+
+
+@dataclass
+class ScenarioConfig:
+    n_trips: int = 1_000_000
+    n_runs: int = 20
+    distance_median_km: float = 6.0
+    distance_sigma: float = 0.8
+    mode_shares: Dict[str, float] = field(default_factory=lambda: {"car": 0.55, "bus": 0.2, "subway": 0.1, "walk": 0.1, "bike": 0.05})
+    departure_weights: List[float] = field(default_factory=lambda: list(DEFAULT_DEPARTURE_WEIGHTS))
+    hourly_intensity: List[float] = field(default_factory=lambda: list(DEFAULT_HOURLY_INTENSITY))
+    shifts: List[ModeShift] = field(default_factory=list)
+    seed: Optional[int] = None
+
+
+def mode_factors(engine: Optional[ClimateEngine] = None) -> Dict[str, np.ndarray]:
+    """
+    Per-mode factors in MODES order, matching ClimateEngine.calculate_savings:
+    kg CO2 per km for combustion modes, kWh per km for grid-powered ones.
+    """
+    e = engine or ClimateEngine()
+    kg_per_km = np.zeros(len(MODES))
+    kwh_per_km = np.zeros(len(MODES))
+    kg_per_km[MODES.index("car")] = e.EMISSION_CAR
+    kg_per_km[MODES.index("bus")] = e.EMISSION_BUS
+    kg_per_km[MODES.index("walk")] = e.EMISSION_WALK
+    kg_per_km[MODES.index("bike")] = e.EMISSION_BIKE
+    kwh_per_km[MODES.index("subway")] = e.ELECTRIC_KWH_PER_KM
+    kwh_per_km[MODES.index("electric")] = e.ELECTRIC_KWH_PER_KM
+    return {"kg_per_km": kg_per_km, "kwh_per_km": kwh_per_km}
+
+
+def hourly_profile_from_db(location: str) -> Optional[List[float]]:
+    """Average seeded carbon-intensity readings by UTC hour; None if the DB has no full day."""
+    try:
+        with sqlite3.connect(cis.DB_PATH) as conn:
+            cur = conn.cursor()
+            cur.execute(
+                """
+                SELECT CAST(substr(ts_utc, 12, 2) AS INTEGER) AS hr, AVG(carbon_gco2_per_kwh)
+                FROM carbon_intensity
+                WHERE location = ?
+                GROUP BY hr
+                """,
+                (location,),
+            )
+            rows = cur.fetchall()
+    except sqlite3.Error:
+        return None
+    if len(rows) < 24:
+        return None
+    profile = [0.0] * 24
+    for hr, avg in rows:
+        if 0 <= hr < 24:
+            profile[hr] = float(avg)
+    return profile
+
+
+def _validate(cfg: ScenarioConfig) -> None:
+    if cfg.n_trips <= 0 or cfg.n_runs <= 0:
+        raise ValueError("n_trips and n_runs must be positive")
+    if len(cfg.departure_weights) != 24 or len(cfg.hourly_intensity) != 24:
+        raise ValueError("departure_weights and hourly_intensity need 24 hourly values")
+    for m in cfg.mode_shares:
+        if m not in MODES:
+            raise ValueError(f"Unknown mode '{m}'. Must be one of: {', '.join(MODES)}")
+    if any(v < 0 for v in cfg.mode_shares.values()):
+        raise ValueError("mode_shares must not be negative")
+    if sum(cfg.mode_shares.values()) <= 0:
+        raise ValueError("mode_shares must sum to a positive value")
+    if any(w < 0 for w in cfg.departure_weights):
+        raise ValueError("departure_weights must not be negative")
+    for s in cfg.shifts:
+        if s.from_mode not in MODES or s.to_mode not in MODES:
+            raise ValueError(f"Unknown mode in shift {s.from_mode} -> {s.to_mode}")
+        if not 0.0 <= s.fraction <= 1.0:
+            raise ValueError("shift fraction must be between 0 and 1")
+        if s.hours is not None and any(not 0 <= h <= 23 for h in s.hours):
+            raise ValueError("shift hours must be between 0 and 23")
+
+
+def _simulate_chunk(rng: np.random.Generator, n: int, cfg: ScenarioConfig,
+                    factors: Dict[str, np.ndarray]) -> Dict[str, float]:
+    share = np.array([cfg.mode_shares.get(m, 0.0) for m in MODES], dtype=float)
+    share /= share.sum()
+    hour_w = np.asarray(cfg.departure_weights, dtype=float)
+    hour_w /= hour_w.sum()
+    intensity = np.asarray(cfg.hourly_intensity, dtype=float)
+
+    dist = rng.lognormal(mean=np.log(cfg.distance_median_km), sigma=cfg.distance_sigma, size=n).astype(np.float32)
+    mode = rng.choice(len(MODES), size=n, p=share).astype(np.int8)
+    hour = rng.choice(24, size=n, p=hour_w).astype(np.int8)
+
+    kg, kwh = factors["kg_per_km"], factors["kwh_per_km"]
+    ci = intensity[hour]
+
+    def emissions(m: np.ndarray) -> float:
+        return float(np.dot(dist, kg[m] + kwh[m] * ci / 1000.0))
+
+    baseline = emissions(mode)
+    shifted = mode.copy()
+    moved = 0
+    for s in cfg.shifts:
+        mask = shifted == MODES.index(s.from_mode)
+        if s.max_distance_km is not None:
+            mask &= dist < s.max_distance_km
+        if s.min_distance_km is not None:
+            mask &= dist >= s.min_distance_km
+        if s.hours is not None:
+            mask &= np.isin(hour, np.asarray(s.hours, dtype=np.int8))
+        mask &= rng.random(n) < s.fraction
+        shifted[mask] = MODES.index(s.to_mode)
+        moved += int(mask.sum())
+
+    scenario = emissions(shifted)
+    return {"baseline_kg": baseline, "scenario_kg": scenario, "trips_shifted": moved}
+
+
+def _run_batch(cfg: ScenarioConfig, seeds: Sequence[np.random.SeedSequence],
+               factors: Dict[str, np.ndarray]) -> List[Dict[str, float]]:
+    """One worker's share of the runs. Big populations are simulated in chunks to cap memory."""
+    out = []
+    for ss in seeds:
+        rng = np.random.default_rng(ss)
+        total = {"baseline_kg": 0.0, "scenario_kg": 0.0, "trips_shifted": 0}
+        remaining = cfg.n_trips
+        while remaining > 0:
+            n = min(CHUNK_TRIPS, remaining)
+            part = _simulate_chunk(rng, n, cfg, factors)
+            for k in total:
+                total[k] += part[k]
+            remaining -= n
+        out.append(total)
+    return out
+
+
+def _summary(values: np.ndarray) -> Dict[str, float]:
+    p5, p50, p95 = np.percentile(values, [5, 50, 95])
+    return {
+        "mean": round(float(values.mean()), 3),
+        "std": round(float(values.std()), 3),
+        "p5": round(float(p5), 3),
+        "p50": round(float(p50), 3),
+        "p95": round(float(p95), 3),
+    }
+
+
+class ScenarioSimulator:
+    """
+    Monte Carlo "what if" simulator for mode-shift policies.
+
+    Each run samples a synthetic trip population (distance, mode, departure hour),
+    prices it with ClimateEngine factors and an hourly grid-intensity profile, then
+    applies the scenario's mode shifts and re-prices. Runs are spread over a
+    process pool; within a run everything is vectorized NumPy.
+    """
+
+    def __init__(self, engine: Optional[ClimateEngine] = None, max_workers: Optional[int] = None) -> None:
+        self.factors = mode_factors(engine)
+        self.max_workers = max_workers or int(os.getenv("SCENARIO_MAX_WORKERS", "0")) or (os.cpu_count() or 1)
+
+    def run(self, cfg: ScenarioConfig) -> Dict[str, Any]:
+        _validate(cfg)
+        seeds = np.random.SeedSequence(cfg.seed).spawn(cfg.n_runs)
+        workers = max(1, min(self.max_workers, cfg.n_runs))
+
+        if workers == 1 or cfg.n_trips * cfg.n_runs < 2_000_000:
+            results = _run_batch(cfg, seeds, self.factors)
+        else:
+            batches = [seeds[i::workers] for i in range(workers)]
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                futures = [pool.submit(_run_batch, cfg, b, self.factors) for b in batches]
+                results = [r for f in futures for r in f.result()]
+
+        baseline = np.array([r["baseline_kg"] for r in results])
+        scenario = np.array([r["scenario_kg"] for r in results])
+        shifted = np.array([r["trips_shifted"] for r in results], dtype=float)
+        return {
+            "config": asdict(cfg),
+            "runs": cfg.n_runs,
+            "trips_per_run": cfg.n_trips,
+            "baseline_kg": _summary(baseline),
+            "scenario_kg": _summary(scenario),
+            "co2_saved_kg": _summary(baseline - scenario),
+            "trips_shifted": _summary(shifted),
+        }
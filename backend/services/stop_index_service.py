@@ -0,0 +1,299 @@
+import csv
+import math
+import os
+import time
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+DATA_DIR = Path(__file__).resolve().parents[1] / "data"
+# A GTFS stops.txt, optionally with extra `elevator`, `audio`, `visual`, `tactile` (0/1) and `modes` (bus|subway) columns.
+STOPS_PATH = Path(os.getenv("STOPS_PATH", str(DATA_DIR / "stops.txt")))
+
+# Per-stop attribute bits (uint16): accessibility features in the low byte, modes served in the high byte.
+WHEELCHAIR = 1 << 0    # GTFS wheelchair_boarding=1 (own or inherited from the parent station)
+ELEVATOR = 1 << 1
+AUDIO = 1 << 2
+VISUAL = 1 << 3
+TACTILE = 1 << 4
+BUS = 1 << 8
+SUBWAY = 1 << 9
+TRAM = 1 << 10
+RAIL = 1 << 11
+FERRY = 1 << 12
+
+FEATURE_BITS = {"wheelchair": WHEELCHAIR, "elevator": ELEVATOR, "audio": AUDIO, "visual": VISUAL, "tactile": TACTILE}
+MODE_BITS = {"bus": BUS, "subway": SUBWAY, "tram": TRAM, "rail": RAIL, "ferry": FERRY}
+ATTRIBUTE_NAMES = {bit: name for name, bit in {**FEATURE_BITS, **MODE_BITS}.items()}
+
+# Aim for about this many stops per grid cell.
+STOPS_PER_CELL = 4
+# How often get_stop_index() looks at STOPS_PATH's mtime.
+STOPS_CHECK_S = 5.0
+# Filtered sub-indexes kept per index (one per distinct require/modes combination).
+MAX_SUBSETS = 16
+
+_M_PER_DEG_LAT = 111_320.0
+
+
+def attribute_mask(names: Iterable[str], table: Dict[str, int]) -> int:
+    """OR of the bits for `names`; ValueError on an unknown name."""
+    mask = 0
+    for n in names:
+        bit = table.get(n.strip().lower())
+        if bit is None:
+            raise ValueError(f"Unknown attribute '{n}'. Must be one of: {', '.join(table)}")
+        mask |= bit
+    return mask
+
+
+@lru_cache(maxsize=1024)
+def _names_for(bits: int) -> Tuple[str, ...]:
+    return tuple(name for bit, name in ATTRIBUTE_NAMES.items() if bits & bit)
+
+
+def attribute_names(bits: int) -> List[str]:
+    return list(_names_for(bits))
+
+
+class StopIndex:
+    """
+    Immutable k-nearest-neighbour index over transit stops.
+
+    Stops are bucketed in a dense uniform grid on a local metric plane and stored
+    cell by cell, so every row of a search window is one contiguous slice of
+    the coordinate and attribute arrays. Queries grow the window ring by ring
+    and stop once the k-th best filtered match is nearer than anything outside
+    it. Build a new index and swap it in to update.
+    """
+
+    def __init__(self, stops: Sequence[Dict[str, Any]], version: int = 0) -> None:
+        n = len(stops)
+        self.version = version
+        self.built_at = time.time()
+        self._build(
+            [str(st["id"]) for st in stops],
+            [st.get("name") or "" for st in stops],
+            np.fromiter((float(st["lat"]) for st in stops), dtype=np.float64, count=n),
+            np.fromiter((float(st["lon"]) for st in stops), dtype=np.float64, count=n),
+            np.fromiter((int(st.get("bits") or 0) for st in stops), dtype=np.uint16, count=n),
+        )
+
+    def _build(self, ids: List[str], names: List[str], lat: np.ndarray, lon: np.ndarray, bits: np.ndarray) -> None:
+        n = len(ids)
+        self.lat0 = float(lat.mean()) if n else 0.0
+        self._kx = _M_PER_DEG_LAT * math.cos(math.radians(self.lat0))
+        x, y = lon * self._kx, lat * _M_PER_DEG_LAT
+        if n:
+            self._x0, self._y0 = float(x.min()), float(y.min())
+            w, h = float(x.max()) - self._x0, float(y.max()) - self._y0
+            # cell size for ~STOPS_PER_CELL stops per cell over the bounding box
+            self.cell_m = max(25.0, math.sqrt(max(w * h, 1.0) * STOPS_PER_CELL / n))
+        else:
+            self._x0 = self._y0 = 0.0
+            w = h = 0.0
+            self.cell_m = 100.0
+        self._cols = int(w // self.cell_m) + 1
+        self._rows = int(h // self.cell_m) + 1
+
+        col = ((x - self._x0) // self.cell_m).astype(np.int64)
+        row = ((y - self._y0) // self.cell_m).astype(np.int64)
+        cell = row * self._cols + col
+        order = np.argsort(cell, kind="stable")
+        self._start = np.zeros(self._rows * self._cols + 1, dtype=np.int64)
+        np.cumsum(np.bincount(cell, minlength=self._rows * self._cols), out=self._start[1:])
+
+        # cell-ordered copies: all query-time reads are slices of these
+        self.ids = [ids[i] for i in order.tolist()]
+        self.names = [names[i] for i in order.tolist()]
+        self.lat, self.lon, self.bits = lat[order], lon[order], bits[order]
+        self._x, self._y = x[order], y[order]
+        self._subsets: Dict[Tuple[int, int], "StopIndex"] = {}
+
+    def subset(self, require: int = 0, modes: int = 0) -> "StopIndex":
+        """
+        Index over just the stops passing a filter, built on first use. A filter
+        that keeps 5% of stops would otherwise search a 20x larger window.
+        """
+        if not require and not modes:
+            return self
+        key = (require, modes)
+        sub = self._subsets.get(key)
+        if sub is None:
+            ok = (self.bits & require) == require
+            if modes:
+                ok &= (self.bits & modes) != 0
+            keep = np.flatnonzero(ok)
+            sub = StopIndex.__new__(StopIndex)
+            sub.version, sub.built_at = self.version, self.built_at
+            sub._build([self.ids[i] for i in keep.tolist()], [self.names[i] for i in keep.tolist()],
+                       self.lat[keep], self.lon[keep], self.bits[keep])
+            while len(self._subsets) >= MAX_SUBSETS:
+                self._subsets.pop(next(iter(self._subsets)))
+            self._subsets[key] = sub
+        return sub
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _window(self, row: int, col: int, r: int) -> np.ndarray:
+        """Positions of every stop in the (2r+1)^2 cells around (row, col), clipped to the grid."""
+        r0, r1 = max(0, row - r), min(self._rows - 1, row + r)
+        c0, c1 = max(0, col - r), min(self._cols - 1, col + r)
+        if r0 > r1 or c0 > c1:
+            return np.empty(0, dtype=np.int64)
+        rows = np.arange(r0, r1 + 1) * self._cols
+        lo = self._start[rows + c0]
+        hi = self._start[rows + c1 + 1]
+        counts = hi - lo
+        total = int(counts.sum())
+        if not total:
+            return np.empty(0, dtype=np.int64)
+        return np.repeat(lo - (np.cumsum(counts) - counts), counts) + np.arange(total)
+
+    def query(self, lat: float, lon: float, k: int, max_distance_m: Optional[float] = None) -> np.ndarray:
+        """Positions of the (up to) k stops nearest (lat, lon) on the local plane, nearest first."""
+        if not len(self) or k <= 0:
+            return np.empty(0, dtype=np.int64)
+        px, py = lon * self._kx, lat * _M_PER_DEG_LAT
+        col = int((px - self._x0) // self.cell_m)
+        row = int((py - self._y0) // self.cell_m)
+        # distance from the query to the grid's far side bounds the useful window
+        far = max(abs(col), abs(self._cols - col), abs(row), abs(self._rows - row)) + 1
+        limit_r = far if max_distance_m is None else min(far, int(math.ceil(max_distance_m / self.cell_m)) + 1)
+        r = 1
+        while True:
+            pos = self._window(row, col, r)
+            d2 = (self._x[pos] - px) ** 2 + (self._y[pos] - py) ** 2
+            # outside the window a stop is at least r cells away (the query sits in the centre cell)
+            if len(pos) >= k and np.partition(d2, k - 1)[k - 1] <= (r * self.cell_m) ** 2:
+                break
+            if r >= limit_r:
+                break
+            r = min(limit_r, r * 2)
+        return pos[np.argsort(d2)[:k]]
+
+    def nearest(
+        self,
+        lat: float,
+        lon: float,
+        k: int = 5,
+        require: int = 0,
+        modes: int = 0,
+        max_distance_m: Optional[float] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Up to k stops closest to (lat, lon) having every `require` bit and, if
+        `modes` is set, at least one of its mode bits.
+        """
+        index = self.subset(require, modes)
+        out = []
+        for i in index.query(lat, lon, k, max_distance_m).tolist():
+            s_lat, s_lon = float(index.lat[i]), float(index.lon[i])
+            d = _haversine_m(lat, lon, s_lat, s_lon)
+            if max_distance_m is not None and d > max_distance_m:
+                continue
+            out.append({
+                "stop_id": index.ids[i],
+                "name": index.names[i],
+                "lat": s_lat,
+                "lon": s_lon,
+                "distance_m": round(d, 1),
+                "attributes": attribute_names(int(index.bits[i])),
+            })
+        return out
+
+
+def _haversine_m(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    a = math.sin((p2 - p1) / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(math.radians(lon2 - lon1) / 2) ** 2
+    return 2 * 6_371_000.0 * math.asin(math.sqrt(a))
+
+
+def _flag(value: Optional[str]) -> bool:
+    return (value or "").strip().lower() in ("1", "yes", "true")
+
+
+def read_stops(path: Path) -> List[Dict[str, Any]]:
+    """
+    Boarding points from a GTFS stops.txt. Stops with wheelchair_boarding=0
+    inherit their parent station's value; stations themselves are skipped.
+    """
+    rows = []
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        rows = list(csv.DictReader(f))
+    station_wc = {r.get("stop_id"): (r.get("wheelchair_boarding") or "0").strip()
+                  for r in rows if (r.get("location_type") or "0").strip() == "1"}
+    out = []
+    for r in rows:
+        if (r.get("location_type") or "0").strip() not in ("0", ""):
+            continue
+        try:
+            lat, lon = float(r["stop_lat"]), float(r["stop_lon"])
+        except (KeyError, TypeError, ValueError):
+            continue
+        wc = (r.get("wheelchair_boarding") or "0").strip()
+        if wc in ("", "0"):
+            wc = station_wc.get(r.get("parent_station"), "0")
+        bits = WHEELCHAIR if wc == "1" else 0
+        for name in ("elevator", "audio", "visual", "tactile"):
+            if _flag(r.get(name)):
+                bits |= FEATURE_BITS[name]
+        for m in (r.get("modes") or "").replace(",", "|").split("|"):
+            bits |= MODE_BITS.get(m.strip().lower(), 0)
+        out.append({"id": r.get("stop_id"), "name": r.get("stop_name") or "", "lat": lat, "lon": lon, "bits": bits})
+    return out
+
+
+def _seed_stops() -> List[Dict[str, Any]]:
+    return [
+        {"id": "seed_union", "name": "Union Station", "lat": 43.6452, "lon": -79.3806,
+         "bits": WHEELCHAIR | ELEVATOR | AUDIO | VISUAL | SUBWAY | RAIL},
+        {"id": "seed_shloka_market", "name": "Shloka Market Bus Stop", "lat": 43.6500, "lon": -79.3850,
+         "bits": WHEELCHAIR | BUS},
+    ]
+
+
+def build_index(path: Optional[Path] = None, version: int = 0) -> StopIndex:
+    path = Path(path) if path else STOPS_PATH
+    stops = read_stops(path) if path.exists() else _seed_stops()
+    return StopIndex(stops, version)
+
+
+_index: Optional[StopIndex] = None
+_source_mtime: Optional[float] = None
+_checked_at = 0.0
+
+
+def _mtime(path: Path) -> Optional[float]:
+    try:
+        return path.stat().st_mtime
+    except OSError:
+        return None
+
+
+def get_stop_index() -> StopIndex:
+    """Shared index; rebuilt and swapped when STOPS_PATH changes (checked every STOPS_CHECK_S)."""
+    global _index, _source_mtime, _checked_at
+    now = time.monotonic()
+    if _index is None or now - _checked_at >= STOPS_CHECK_S:
+        _checked_at = now
+        mtime = _mtime(STOPS_PATH)
+        if _index is None or mtime != _source_mtime:
+            _source_mtime = mtime
+            reload_stops()
+    return _index
+
+
+def reload_stops(path: Optional[Path] = None, stops: Optional[Sequence[Dict[str, Any]]] = None) -> int:
+    """
+    Build a fresh index off to the side, then swap the reference. Queries in
+    flight keep the index they started with.
+    """
+    global _index
+    version = (_index.version + 1) if _index is not None else 1
+    new_index = StopIndex(stops, version) if stops is not None else build_index(path, version)
+    _index = new_index
+    return len(new_index)
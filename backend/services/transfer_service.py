@@ -0,0 +1,296 @@
+import heapq
+import math
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from services.array_file_service import pack_strings, read_arrays, unpack_strings, write_arrays
+from services.elevation_service import GRADE_STEEP, GRADE_WARN
+from services.walking_graph_service import DATA_DIR, WALKING_GRAPH_PATH, WalkingGraph, load_graph, save_graph
+from services.walking_router_service import WEIGHTINGS, edge_costs
+
+TRANSFERS_PATH = Path(os.getenv("TRANSFERS_PATH", str(DATA_DIR / "transfers.bin")))
+TRANSFER_WORKERS = int(os.getenv("TRANSFER_WORKERS", "0")) or (os.cpu_count() or 1)
+
+# Stops further than this from the walking network get no graph transfers (the importer keeps straight lines).
+SNAP_M = 150.0
+# A step-free walk may be this much longer than the transfer radius.
+STEP_FREE_DETOUR = 1.5
+# step_free_s of a pair with no step-free walk
+NO_PATH = -1
+# Stops per pool task; small enough to balance, large enough that pickling is noise.
+CHUNK_STOPS = 512
+# Below this many stops the pool costs more than it saves.
+MIN_POOL_STOPS = 2000
+
+# Steepest grade on the walk a wheelchair user would take
+FLAT, MODERATE, STEEP = 0, 1, 2
+SLOPE_NAMES = {FLAT: "flat", MODERATE: "moderate", STEEP: "steep"}
+
+_MAGIC = b"GTFSXF01"
+
+ARRAY_DTYPES = {
+    # per stop, in timetable order
+    "stop_id_data": np.uint8,
+    "stop_id_ptr": np.int64,
+    "stop_snap_m": np.float32,     # NaN when not on the walking network
+    # transfers by origin stop
+    "transfer_ptr": np.int64,
+    "transfer_to": np.int32,
+    "walk_s": np.int32,            # shortest walk
+    "distance_m": np.float32,
+    "step_free_s": np.int32,       # shortest step-free walk; NO_PATH if there is none
+    "slope_class": np.uint8,       # of the step-free walk, else of the shortest one
+}
+
+
+def slope_class(grade: np.ndarray) -> np.ndarray:
+    g = np.abs(np.asarray(grade, dtype=np.float64))
+    return np.where(g > GRADE_STEEP, STEEP, np.where(g > GRADE_WARN, MODERATE, FLAT)).astype(np.uint8)
+
+
+class TransferTable:
+    """
+    Stop-to-stop walking transfers over the pedestrian graph, in CSR form:
+    stop i's transfers are transfer_to[transfer_ptr[i]:transfer_ptr[i + 1]].
+    Arrays may be read-only memory maps.
+    """
+
+    def __init__(self, arrays: Dict[str, np.ndarray], meta: Optional[Dict[str, Any]] = None) -> None:
+        for name in ARRAY_DTYPES:
+            setattr(self, name, arrays[name])
+        self.meta = dict(meta or {})
+        if len(self.transfer_ptr) != len(self.stop_id_ptr) or self.transfer_ptr[-1] != len(self.transfer_to):
+            raise ValueError("Inconsistent transfer arrays")
+        self._stop_ids: Optional[List[str]] = None
+        self._index: Optional[Dict[str, int]] = None
+
+    @property
+    def n_stops(self) -> int:
+        return len(self.transfer_ptr) - 1
+
+    def arrays(self) -> Dict[str, np.ndarray]:
+        return {name: getattr(self, name) for name in ARRAY_DTYPES}
+
+    def stop_ids(self) -> List[str]:
+        if self._stop_ids is None:
+            self._stop_ids = unpack_strings(self.stop_id_data, self.stop_id_ptr)
+        return self._stop_ids
+
+    def index_of(self) -> Dict[str, int]:
+        if self._index is None:
+            self._index = {s: i for i, s in enumerate(self.stop_ids())}
+        return self._index
+
+    def snapped(self) -> np.ndarray:
+        return ~np.isnan(np.asarray(self.stop_snap_m))
+
+    def transfers(self, stop: int) -> List[Dict[str, Any]]:
+        lo, hi = int(self.transfer_ptr[stop]), int(self.transfer_ptr[stop + 1])
+        ids = self.stop_ids()
+        return [{
+            "to_stop_id": ids[j],
+            "walk_s": int(w),
+            "distance_m": round(float(d), 1),
+            "step_free": bool(sf != NO_PATH),
+            "step_free_s": int(sf) if sf != NO_PATH else None,
+            "slope": SLOPE_NAMES[int(c)],
+        } for j, w, d, sf, c in zip(np.asarray(self.transfer_to[lo:hi]).tolist(), np.asarray(self.walk_s[lo:hi]).tolist(),
+                                    np.asarray(self.distance_m[lo:hi]).tolist(), np.asarray(self.step_free_s[lo:hi]).tolist(),
+                                    np.asarray(self.slope_class[lo:hi]).tolist())]
+
+
+# ---------- search ----------
+
+class _Searcher:
+    """Bounded Dijkstra from every stop's snapped node, over plain lists (one per process)."""
+
+    def __init__(self, graph: WalkingGraph, node: np.ndarray, snap_m: np.ndarray, radius_m: float) -> None:
+        self.indptr = np.asarray(graph.indptr).tolist()
+        self.targets = np.asarray(graph.targets).tolist()
+        self.length = np.asarray(graph.length_m, dtype=np.float64).tolist()
+        # step-free walks are measured in metres too; -1 marks the edges they cannot use
+        blocked = ~np.isfinite(edge_costs(graph, WEIGHTINGS["step_free"]))
+        self.free = np.where(blocked, -1.0, np.asarray(graph.length_m, dtype=np.float64)).tolist()
+        self.grade = np.abs(np.asarray(graph.grade, dtype=np.float64)).tolist()
+        self.node = node.tolist()
+        self.snap_m = snap_m.tolist()
+        self.radius_m = radius_m
+        self.stops_at: Dict[int, List[int]] = {}
+        for s, n in enumerate(self.node):
+            if n >= 0:
+                self.stops_at.setdefault(n, []).append(s)
+
+    def _reach(self, source: int, costs: List[float], limit: float) -> Dict[int, Tuple[float, float]]:
+        """node -> (metres, steepest grade on the way) for nodes within limit."""
+        indptr, targets, grade = self.indptr, self.targets, self.grade
+        dist = {source: 0.0}
+        steep = {source: 0.0}
+        settled: Dict[int, Tuple[float, float]] = {}
+        heap = [(0.0, source)]
+        push, pop = heapq.heappush, heapq.heappop
+        while heap:
+            d, u = pop(heap)
+            if u in settled:
+                continue
+            settled[u] = (d, steep[u])
+            for e in range(indptr[u], indptr[u + 1]):
+                c = costs[e]
+                if c < 0:
+                    continue
+                v, nd = targets[e], d + c
+                if nd <= limit and nd < dist.get(v, math.inf):
+                    dist[v] = nd
+                    steep[v] = max(steep[u], grade[e])
+                    push(heap, (nd, v))
+        return settled
+
+    def _pairs(self, s: int, reached: Dict[int, Tuple[float, float]], limit: float) -> Dict[int, Tuple[float, float]]:
+        out = {}
+        base = self.snap_m[s]
+        for n, (d, g) in reached.items():
+            for t in self.stops_at.get(n, ()):
+                total = base + d + self.snap_m[t]
+                if t != s and total <= limit:
+                    out[t] = (total, g)
+        return out
+
+    def search(self, stops: Sequence[int]) -> Tuple[np.ndarray, ...]:
+        src, dst, dist, free, grade = [], [], [], [], []
+        for s in stops:
+            n = self.node[s]
+            if n < 0:
+                continue
+            short = self._pairs(s, self._reach(n, self.length, self.radius_m - self.snap_m[s]), self.radius_m)
+            if not short:
+                continue
+            limit = self.radius_m * STEP_FREE_DETOUR
+            step_free = self._pairs(s, self._reach(n, self.free, limit - self.snap_m[s]), limit)
+            for t, (d, g) in short.items():
+                f = step_free.get(t)
+                src.append(s)
+                dst.append(t)
+                dist.append(d)
+                free.append(f[0] if f else math.nan)
+                grade.append(f[1] if f else g)
+        return (np.asarray(src, dtype=np.int64), np.asarray(dst, dtype=np.int64), np.asarray(dist),
+                np.asarray(free, dtype=np.float64), np.asarray(grade, dtype=np.float64))
+
+
+_worker: Optional[_Searcher] = None
+
+
+def _init_worker(graph_path: str, node: np.ndarray, snap_m: np.ndarray, radius_m: float) -> None:
+    global _worker
+    _worker = _Searcher(load_graph(Path(graph_path)), node, snap_m, radius_m)
+
+
+def _search_chunk(stops: Sequence[int]) -> Tuple[np.ndarray, ...]:
+    return _worker.search(stops)
+
+
+def _snap(graph: WalkingGraph, lat: np.ndarray, lon: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    node = np.full(len(lat), -1, dtype=np.int64)
+    snap_m = np.full(len(lat), np.nan)
+    for i, (a, b) in enumerate(zip(lat.tolist(), lon.tolist())):
+        hit = graph.nearest_node(a, b, SNAP_M)
+        if hit is not None:
+            node[i], snap_m[i] = hit
+    return node, snap_m
+
+
+def build_transfers(
+    stop_ids: List[str],
+    lat: np.ndarray,
+    lon: np.ndarray,
+    radius_m: float,
+    speed_mps: float,
+    graph_path: Path = WALKING_GRAPH_PATH,
+    graph: Optional[WalkingGraph] = None,
+    workers: int = TRANSFER_WORKERS,
+    log: Callable[[str], None] = print,
+) -> TransferTable:
+    """
+    Every stop's walking transfers to the stops within radius_m along the
+    walking graph, with the shortest and the step-free walking time and the
+    slope class of the walk. Each stop is one bounded search, so stops are
+    split into chunks over a process pool; every worker memory-maps the graph.
+    """
+    t0 = time.perf_counter()
+    lat = np.asarray(lat, dtype=np.float64)
+    lon = np.asarray(lon, dtype=np.float64)
+    in_memory = graph is not None
+    graph = graph if in_memory else load_graph(graph_path)
+    node, snap_m = _snap(graph, lat, lon)
+    chunks = [range(i, min(i + CHUNK_STOPS, len(lat))) for i in range(0, len(lat), CHUNK_STOPS)]
+    workers = max(1, min(workers, len(chunks)))
+
+    if workers == 1 or len(lat) < MIN_POOL_STOPS:
+        searcher = _Searcher(graph, node, snap_m, radius_m)
+        parts = [searcher.search(c) for c in chunks]
+    else:
+        with tempfile.TemporaryDirectory() as tmp:
+            # a graph built in memory has no file for the workers to map
+            path = save_graph(graph, Path(tmp) / "walking_graph.bin") if in_memory else graph_path
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                     initargs=(str(path), node, snap_m, radius_m)) as pool:
+                parts = list(pool.map(_search_chunk, chunks))
+
+    src, dst, dist, free, grade = (np.concatenate([p[k] for p in parts]) if parts else np.empty(0) for k in range(5))
+    src = src.astype(np.int64)
+    order = np.lexsort((dst, src))
+    ptr = np.zeros(len(lat) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(src, minlength=len(lat)), out=ptr[1:])
+    free = free[order]
+    arrays = {
+        "stop_snap_m": snap_m,
+        "transfer_ptr": ptr,
+        "transfer_to": dst[order],
+        "walk_s": np.ceil(dist[order] / speed_mps),
+        "distance_m": dist[order],
+        "step_free_s": np.where(np.isnan(free), NO_PATH, np.ceil(np.nan_to_num(free) / speed_mps)),
+        "slope_class": slope_class(grade[order]),
+    }
+    arrays["stop_id_data"], arrays["stop_id_ptr"] = pack_strings(stop_ids)
+    arrays = {name: np.asarray(arrays[name], dtype=dtype).reshape(-1) for name, dtype in ARRAY_DTYPES.items()}
+    log(f"{len(arrays['transfer_to'])} walking transfers for {int((node >= 0).sum())} of {len(lat)} stops "
+        f"on {workers} worker(s) in {time.perf_counter() - t0:.1f}s")
+    return TransferTable(arrays, {"radius_m": radius_m, "speed_mps": speed_mps, "walking_graph": graph.meta.get("source"),
+                                  "built_at": time.time()})
+
+
+def save_transfers(table: TransferTable, path: Path = TRANSFERS_PATH) -> Path:
+    return write_arrays(path, _MAGIC, table.arrays(), table.meta)
+
+
+def load_transfers(path: Path = TRANSFERS_PATH, mmap: bool = True) -> TransferTable:
+    arrays, meta = read_arrays(path, _MAGIC, mmap=mmap)
+    return TransferTable(arrays, meta)
+
+
+_table: Optional[TransferTable] = None
+_loaded = False
+
+
+def get_transfers() -> Optional[TransferTable]:
+    """The shared transfer table, memory-mapped from TRANSFERS_PATH on first use; None if none was built."""
+    global _table, _loaded
+    if not _loaded:
+        _loaded = True
+        if TRANSFERS_PATH.exists():
+            _table = load_transfers(TRANSFERS_PATH)
+    return _table
+
+
+def reload_transfers(path: Optional[Path] = None, table: Optional[TransferTable] = None) -> Optional[TransferTable]:
+    """Load a fresh table off to the side, then swap the reference."""
+    global _table, _loaded
+    path = Path(path) if path else TRANSFERS_PATH
+    new_table = table if table is not None else (load_transfers(path) if path.exists() else None)
+    _table, _loaded = new_table, True
+    return new_table
@@ -1,5 +1,29 @@
 # backend/services/transit_service.py
 import os
+import re
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from services import gtfs_service, realtime_service
+from services.raptor_service import plan
+
+_LAT_LON = re.compile(r"^\s*(-?\d+(?:\.\d+)?)\s*,\s*(-?\d+(?:\.\d+)?)\s*$")
+
+
+def resolve_place(text: str) -> Optional[Dict[str, Any]]:
+    """'lat,lon' or a place name known to the local gazetteer; None otherwise."""
+    m = _LAT_LON.match(text or "")
+    if m:
+        lat, lon = float(m.group(1)), float(m.group(2))
+        if -90 <= lat <= 90 and -180 <= lon <= 180:
+            return {"name": text.strip(), "lat": lat, "lon": lon}
+        return None
+    from services.gazetteer_service import get_index
+
+    hits = get_index().autocomplete(text, limit=1)
+    if not hits:
+        return None
+    return {"name": hits[0]["display_name"], "lat": hits[0]["lat"], "lon": hits[0]["lon"]}
 
 
 class TransitService:
@@ -7,16 +31,46 @@ class TransitService:
         # Zakaria will eventually put Google Maps / Here.com API keys here
         self.api_key = os.getenv("TRANSIT_API_KEY")
 
-    def get_routes(self, origin: str, destination: str):
-        """
-        Retrieves route options from A to B.
+    def plan(
+        self,
+        origin: Tuple[float, float],
+        destination: Tuple[float, float],
+        depart_at: Optional[datetime] = None,
+        accessible_only: bool = False,
+        multi_criteria: bool = False,
+        carbon_gco2_per_kwh: Optional[float] = None,
+    ) -> List[Dict[str, Any]]:
+        """Itineraries on the imported GTFS timetable, with realtime data if any; LookupError if no feed has been imported."""
+        tt = realtime_service.live_timetable()
+        if tt is None:
+            raise LookupError("No GTFS timetable loaded. Run scripts/import_gtfs.py first.")
+        return plan(tt, origin, destination, depart_at, accessible=accessible_only,
+                    multi_criteria=multi_criteria, carbon_gco2_per_kwh=carbon_gco2_per_kwh)
 
-        TODO (Zakaria): Replace this MOCK data with real API calls.
+    def get_routes(self, origin: str, destination: str, accessible_only: bool = False):
+        """
+        Retrieves route options from A to B: planned on the GTFS timetable when
+        one is loaded and both places resolve, mock data otherwise.
         """
         print(f"DEBUG: Fetching routes from {origin} to {destination}")
+        o, d = resolve_place(origin), resolve_place(destination)
+        if o and d and gtfs_service.get_timetable() is not None:
+            out = []
+            for i, it in enumerate(self.plan((o["lat"], o["lon"]), (d["lat"], d["lon"]), accessible_only=accessible_only)):
+                rides = [leg for leg in it["legs"] if leg["mode"] != "walk"]
+                out.append({
+                    "id": f"route_{i + 1}",
+                    "mode": rides[0]["mode"] if rides else "walk",
+                    "line": " > ".join(leg["route"] for leg in rides) or "Walk",
+                    "distance_km": None,
+                    "duration_min": round(it["duration_s"] / 60),
+                    "departure": it["departure"],
+                    "arrival": it["arrival"],
+                    "accessibility": {"wheelchair": bool(it["wheelchair_accessible"])},
+                })
+            return out
 
-        # MOCK DATA: This allows Shlok and Anish to test their parts
-        # without waiting for the real Transit API to be built.
+        # MOCK DATA: no timetable imported (or the places are unknown)
         return [
             {
                 "id": "route_1",
@@ -34,4 +88,4 @@ class TransitService:
                 "duration_min": 15,
                 "accessibility": {"wheelchair": False}
             }
-        ]
\ No newline at end of file
+        ]
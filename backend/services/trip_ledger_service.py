@@ -0,0 +1,141 @@
+import csv
+import io
+import json
+import sqlite3
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+DB_DIR = Path(__file__).resolve().parents[1] / "data"
+DB_PATH = DB_DIR / "trip_ledger.db"
+
+# Same fields as assistant_service.trip_data["recent_trips"], plus ledger keys.
+EXPORT_FIELDS = ["id", "user_id", "city", "date", "transport", "destination", "distance_km", "co2_saved", "points"]
+
+PAGE_SIZE = 1000
+
+
+def init_db() -> None:
+    """Create DB + table if it doesn't exist."""
+    DB_DIR.mkdir(parents=True, exist_ok=True)
+    with sqlite3.connect(DB_PATH) as conn:
+        cur = conn.cursor()
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS trips (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id TEXT NOT NULL,
+                city TEXT NOT NULL,
+                trip_date TEXT NOT NULL,
+                transport TEXT NOT NULL,
+                destination TEXT,
+                distance_km REAL NOT NULL,
+                co2_saved_kg REAL NOT NULL,
+                points INTEGER NOT NULL
+            )
+            """
+        )
+        # keyset pages walk (user_id, id) / (city, id) in primary-key order
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_trips_user_id ON trips(user_id, id)")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_trips_city_id ON trips(city, id)")
+        conn.commit()
+
+
+def insert_trip(
+    user_id: str,
+    city: str,
+    trip_date: str,
+    transport: str,
+    distance_km: float,
+    co2_saved_kg: float,
+    points: int,
+    destination: Optional[str] = None,
+) -> int:
+    """Append one trip to the ledger and return its id."""
+    with sqlite3.connect(DB_PATH) as conn:
+        cur = conn.cursor()
+        cur.execute(
+            """
+            INSERT INTO trips (user_id, city, trip_date, transport, destination, distance_km, co2_saved_kg, points)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            (user_id, (city or "").strip().lower(), trip_date, transport, destination,
+             float(distance_km), float(co2_saved_kg), int(points)),
+        )
+        conn.commit()
+        return int(cur.lastrowid)
+
+
+def iter_trips(
+    user_id: Optional[str] = None,
+    city: Optional[str] = None,
+    page_size: int = PAGE_SIZE,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Yield trips in id order, one keyset page at a time.
+    Only `page_size` rows are ever held in memory.
+    """
+    where, params = [], []
+    if user_id is not None:
+        where.append("user_id = ?")
+        params.append(user_id)
+    if city is not None:
+        where.append("city = ?")
+        params.append(city.strip().lower())
+    where.append("id > ?")
+    sql = (
+        "SELECT id, user_id, city, trip_date, transport, destination, distance_km, co2_saved_kg, points "
+        f"FROM trips WHERE {' AND '.join(where)} ORDER BY id LIMIT ?"
+    )
+
+    last_id = 0
+    # StreamingResponse may resume this generator on different worker threads.
+    with sqlite3.connect(DB_PATH, check_same_thread=False) as conn:
+        cur = conn.cursor()
+        while True:
+            cur.execute(sql, (*params, last_id, int(page_size)))
+            rows = cur.fetchall()
+            if not rows:
+                return
+            for r in rows:
+                yield {
+                    "id": r[0],
+                    "user_id": r[1],
+                    "city": r[2],
+                    "date": r[3],
+                    "transport": r[4],
+                    "destination": r[5],
+                    "distance_km": r[6],
+                    "co2_saved": r[7],
+                    "points": r[8],
+                }
+            last_id = rows[-1][0]
+            if len(rows) < page_size:
+                return
+
+
+def stream_csv(rows: Iterator[Dict[str, Any]]) -> Iterator[str]:
+    """CSV text in chunks: header first, then one chunk per batch of rows."""
+    buf = io.StringIO()
+    writer = csv.DictWriter(buf, fieldnames=EXPORT_FIELDS)
+    writer.writeheader()
+    n = 0
+    for row in rows:
+        writer.writerow(row)
+        n += 1
+        if n % 500 == 0:
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate(0)
+    yield buf.getvalue()
+
+
+def stream_ndjson(rows: Iterator[Dict[str, Any]]) -> Iterator[str]:
+    """One JSON object per line, batched into chunks."""
+    chunk: List[str] = []
+    for row in rows:
+        chunk.append(json.dumps(row, ensure_ascii=False))
+        if len(chunk) == 500:
+            yield "\n".join(chunk) + "\n"
+            chunk = []
+    if chunk:
+        yield "\n".join(chunk) + "\n"
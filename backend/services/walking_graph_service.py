@@ -0,0 +1,197 @@
+import math
+import os
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+from services.array_file_service import read_arrays, write_arrays
+
+DATA_DIR = Path(__file__).resolve().parents[1] / "data"
+WALKING_GRAPH_PATH = Path(os.getenv("WALKING_GRAPH_PATH", str(DATA_DIR / "walking_graph.bin")))
+
+# Per-edge accessibility bits (uint16).
+STEPS = 1 << 0               # highway=steps
+WHEELCHAIR_NO = 1 << 1       # wheelchair=no
+WHEELCHAIR_LIMITED = 1 << 2  # wheelchair=limited
+KERB_RAISED = 1 << 3         # kerb=raised / kerb=rolled at a crossing end
+SURFACE_ROUGH = 1 << 4       # cobblestone, gravel, grass, sett, ...
+ELEVATOR = 1 << 5            # highway=elevator link
+CROSSING = 1 << 6            # footway=crossing
+KERB_LOWERED = 1 << 7        # kerb=lowered / flush
+
+FLAG_NAMES = {
+    STEPS: "steps",
+    WHEELCHAIR_NO: "wheelchair_no",
+    WHEELCHAIR_LIMITED: "wheelchair_limited",
+    KERB_RAISED: "kerb_raised",
+    SURFACE_ROUGH: "surface_rough",
+    ELEVATOR: "elevator",
+    CROSSING: "crossing",
+    KERB_LOWERED: "kerb_lowered",
+}
+
+_MAGIC = b"WGRAPH01"
+_M_PER_DEG_LAT = 111_320.0
+GRID_CELL_M = 100.0
+
+ARRAY_DTYPES = {
+    "lat": np.float64,
+    "lon": np.float64,
+    "indptr": np.int64,
+    "targets": np.int32,
+    "length_m": np.float32,
+    "flags": np.uint16,
+    "grade": np.float32,
+}
+
+
+def flag_names(flags: int) -> list:
+    return [name for bit, name in FLAG_NAMES.items() if flags & bit]
+
+
+class WalkingGraph:
+    """
+    Pedestrian network in compressed sparse row form.
+
+    Node i's outgoing edges are targets[indptr[i]:indptr[i + 1]]; each edge has a
+    length, accessibility flag bits and a signed grade (rise / run in the edge's
+    direction, 0 where unknown). Arrays may be read-only memory maps.
+    """
+
+    def __init__(self, arrays: Dict[str, np.ndarray], meta: Optional[Dict[str, Any]] = None) -> None:
+        self.lat = arrays["lat"]
+        self.lon = arrays["lon"]
+        self.indptr = arrays["indptr"]
+        self.targets = arrays["targets"]
+        self.length_m = arrays["length_m"]
+        self.flags = arrays["flags"]
+        self.grade = arrays["grade"]
+        self.meta = dict(meta or {})
+        if len(self.indptr) != len(self.lat) + 1 or self.indptr[-1] != len(self.targets):
+            raise ValueError("Inconsistent CSR arrays")
+
+        # local equirectangular plane (metres) for heuristics and snapping
+        self.lat0 = float(self.lat.mean()) if len(self.lat) else 0.0
+        self._kx = _M_PER_DEG_LAT * math.cos(math.radians(self.lat0))
+        self.x = np.asarray(self.lon, dtype=np.float64) * self._kx
+        self.y = np.asarray(self.lat, dtype=np.float64) * _M_PER_DEG_LAT
+        self._build_grid()
+
+    @property
+    def n_nodes(self) -> int:
+        return len(self.lat)
+
+    @property
+    def n_edges(self) -> int:
+        return len(self.targets)
+
+    def arrays(self) -> Dict[str, np.ndarray]:
+        return {name: getattr(self, name) for name in ARRAY_DTYPES}
+
+    def sources(self) -> np.ndarray:
+        """Source node of every edge (the row index CSR leaves implicit)."""
+        return np.repeat(np.arange(self.n_nodes, dtype=np.int32), np.diff(self.indptr))
+
+    # ---------- construction ----------
+    @classmethod
+    def from_edges(
+        cls,
+        lat: np.ndarray,
+        lon: np.ndarray,
+        u: np.ndarray,
+        v: np.ndarray,
+        length_m: Optional[np.ndarray] = None,
+        flags: Optional[np.ndarray] = None,
+        grade: Optional[np.ndarray] = None,
+        bidirectional: bool = True,
+        meta: Optional[Dict[str, Any]] = None,
+    ) -> "WalkingGraph":
+        """Build from an edge list. Footways are walkable both ways, so by default each edge is mirrored."""
+        lat = np.asarray(lat, dtype=np.float64)
+        lon = np.asarray(lon, dtype=np.float64)
+        u = np.asarray(u, dtype=np.int64)
+        v = np.asarray(v, dtype=np.int64)
+        if length_m is None:
+            length_m = haversine_m(lat[u], lon[u], lat[v], lon[v])
+        length_m = np.asarray(length_m, dtype=np.float32)
+        flags = np.zeros(len(u), dtype=np.uint16) if flags is None else np.asarray(flags, dtype=np.uint16)
+        grade = np.zeros(len(u), dtype=np.float32) if grade is None else np.nan_to_num(np.asarray(grade, dtype=np.float32))
+
+        if bidirectional:
+            u, v = np.concatenate([u, v]), np.concatenate([v, u])
+            length_m = np.concatenate([length_m, length_m])
+            flags = np.concatenate([flags, flags])
+            grade = np.concatenate([grade, -grade])
+
+        order = np.argsort(u, kind="stable")
+        indptr = np.zeros(len(lat) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(u, minlength=len(lat)), out=indptr[1:])
+        return cls({
+            "lat": lat,
+            "lon": lon,
+            "indptr": indptr,
+            "targets": v[order].astype(np.int32),
+            "length_m": length_m[order],
+            "flags": flags[order],
+            "grade": grade[order].astype(np.float32),
+        }, meta)
+
+    # ---------- snapping ----------
+    def _cell(self, x, y):
+        return np.floor(np.asarray(y) / GRID_CELL_M).astype(np.int64), np.floor(np.asarray(x) / GRID_CELL_M).astype(np.int64)
+
+    def _build_grid(self) -> None:
+        row, col = self._cell(self.x, self.y)
+        keys = (row << 32) + col
+        self._grid_order = np.argsort(keys, kind="stable").astype(np.int32)
+        self._grid_keys = keys[self._grid_order]
+
+    def _candidates(self, row: int, col: int, r: int) -> np.ndarray:
+        rows = np.arange(row - r, row + r + 1, dtype=np.int64)
+        cols = np.arange(col - r, col + r + 1, dtype=np.int64)
+        keys = ((rows[:, None] << 32) + cols[None, :]).ravel()
+        lo = np.searchsorted(self._grid_keys, keys, side="left")
+        hi = np.searchsorted(self._grid_keys, keys, side="right")
+        if not (hi > lo).any():
+            return np.empty(0, dtype=np.int32)
+        return np.concatenate([self._grid_order[a:b] for a, b in zip(lo, hi) if b > a])
+
+    def nearest_node(self, lat: float, lon: float, max_distance_m: float = 500.0) -> Optional[Tuple[int, float]]:
+        """(node, distance_m) of the closest node within max_distance_m, else None."""
+        if self.n_nodes == 0:
+            return None
+        px, py = lon * self._kx, lat * _M_PER_DEG_LAT
+        row, col = (int(a) for a in self._cell(px, py))
+        max_r = max(1, int(math.ceil(max_distance_m / GRID_CELL_M)))
+        r = 1
+        while True:
+            cand = self._candidates(row, col, r)
+            if len(cand):
+                d = np.hypot(self.x[cand] - px, self.y[cand] - py)
+                i = int(np.argmin(d))
+                # anything outside the window is at least r cells away
+                if d[i] <= r * GRID_CELL_M or r >= max_r:
+                    return (int(cand[i]), float(d[i])) if d[i] <= max_distance_m else None
+            if r >= max_r:
+                return None
+            r = min(max_r, r * 2)
+
+
+def haversine_m(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(a, dtype=np.float64)) for a in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * 6_371_000.0 * np.arcsin(np.sqrt(a))
+
+
+# ---------- file format ----------
+def save_graph(graph: WalkingGraph, path: Optional[Path] = None) -> Path:
+    path = Path(path) if path else WALKING_GRAPH_PATH
+    arrays = {name: np.asarray(a, dtype=ARRAY_DTYPES[name]) for name, a in graph.arrays().items()}
+    return write_arrays(path, _MAGIC, arrays, graph.meta)
+
+
+def load_graph(path: Optional[Path] = None, mmap: bool = True) -> WalkingGraph:
+    path = Path(path) if path else WALKING_GRAPH_PATH
+    arrays, meta = read_arrays(path, _MAGIC, mmap)
+    return WalkingGraph(arrays, meta)
@@ -0,0 +1,501 @@
+import heapq
+import json
+import math
+import os
+from collections import OrderedDict
+from dataclasses import dataclass, field, asdict, replace
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from services.array_file_service import read_arrays, write_arrays
+from services.walking_graph_service import (
+    WalkingGraph, STEPS, WHEELCHAIR_NO, WHEELCHAIR_LIMITED, KERB_RAISED, SURFACE_ROUGH, FLAG_NAMES,
+)
+
+# Straight-line distance slightly underestimates edge lengths everywhere in the
+# local projection; the margin keeps A* admissible across a metro-sized graph.
+_HEURISTIC_SCALE = 0.99
+
+# Weightings routed on a contraction hierarchy; import_osm.py builds them next to the graph.
+WALKING_CH_WEIGHTINGS = [w.strip() for w in os.getenv("WALKING_CH_WEIGHTINGS", "").split(",") if w.strip()]
+
+_CH_MAGIC = b"WGRAPHCH"
+CH_ARRAY_DTYPES = {
+    "rank": np.int32,
+    "up_ptr": np.int64,
+    "up_to": np.int32,
+    "up_cost": np.float64,
+    "up_mid": np.int32,
+    "up_edge": np.int64,
+    "down_ptr": np.int64,
+    "down_to": np.int32,
+    "down_cost": np.float64,
+    "down_mid": np.int32,
+    "down_edge": np.int64,
+}
+
+
+@dataclass(frozen=True)
+class Weighting:
+    """
+    How a rider values the network. Edge cost = length_m x multipliers, so cost is
+    never below distance walked (which keeps straight-line A* admissible).
+    """
+    name: str = "shortest"
+    blocked_flags: int = 0
+    flag_penalties: Tuple[Tuple[int, float], ...] = ()
+    max_grade: Optional[float] = None   # |grade| above this is impassable
+    grade_soft: float = 0.05            # grades up to this cost nothing extra
+    grade_penalty: float = 0.0          # extra cost per percentage point above grade_soft
+    speed_mps: float = 1.3
+
+    def to_dict(self) -> Dict[str, Any]:
+        d = asdict(self)
+        d["blocked"] = [FLAG_NAMES[b] for b in FLAG_NAMES if self.blocked_flags & b]
+        d["flag_penalties"] = {FLAG_NAMES[b]: f for b, f in self.flag_penalties}
+        del d["blocked_flags"]
+        return d
+
+
+_STEP_FREE_BLOCKED = STEPS | WHEELCHAIR_NO | KERB_RAISED
+
+WEIGHTINGS: Dict[str, Weighting] = {
+    # minimise walking
+    "shortest": Weighting("shortest"),
+    "step_free": Weighting(
+        "step_free",
+        blocked_flags=_STEP_FREE_BLOCKED,
+        flag_penalties=((WHEELCHAIR_LIMITED, 1.5),),
+    ),
+    "avoid_slopes": Weighting("avoid_slopes", grade_soft=0.05, grade_penalty=0.5),
+    "wheelchair": Weighting(
+        "wheelchair",
+        blocked_flags=_STEP_FREE_BLOCKED,
+        flag_penalties=((WHEELCHAIR_LIMITED, 1.5), (SURFACE_ROUGH, 2.0)),
+        max_grade=0.08,
+        grade_soft=0.05,
+        grade_penalty=0.5,
+        speed_mps=1.0,
+    ),
+}
+
+
+def edge_costs(graph: WalkingGraph, w: Weighting) -> np.ndarray:
+    """Vectorized cost of every edge under `w`; inf where the edge is unusable."""
+    length = np.asarray(graph.length_m, dtype=np.float64)
+    flags = np.asarray(graph.flags)
+    mult = np.ones(len(length))
+    for bit, factor in w.flag_penalties:
+        mult[(flags & bit) != 0] *= max(1.0, factor)
+    grade = np.abs(np.asarray(graph.grade, dtype=np.float64))
+    if w.grade_penalty:
+        mult *= 1.0 + w.grade_penalty * np.maximum(0.0, grade - w.grade_soft) * 100.0
+    cost = length * mult
+    blocked = (flags & w.blocked_flags) != 0
+    if w.max_grade is not None:
+        blocked |= grade > w.max_grade
+    cost[blocked] = np.inf
+    return cost
+
+
+class ContractionHierarchy:
+    """
+    Contraction hierarchy for one weighting: preprocessing adds shortcuts so a query
+    is two small upward Dijkstra searches instead of a search over the whole city.
+    Building takes seconds to minutes on a metro graph, so scripts/import_osm.py
+    builds it offline and saves it next to the graph; queries are ~ms.
+
+    Node v's upward edges are up_to[up_ptr[v]:up_ptr[v + 1]] (to higher-ranked
+    nodes), its downward ones down_to[...] (edges into v from higher-ranked
+    nodes). Each has a cost and either the original edge id or the middle node
+    of the shortcut it stands for. Arrays may be read-only memory maps.
+    """
+
+    def __init__(self, arrays: Dict[str, np.ndarray], meta: Optional[Dict[str, Any]] = None) -> None:
+        for name in CH_ARRAY_DTYPES:
+            setattr(self, name, arrays[name])
+        self.meta = dict(meta or {})
+        self.n = len(self.rank)
+
+    def arrays(self) -> Dict[str, np.ndarray]:
+        return {name: getattr(self, name) for name in CH_ARRAY_DTYPES}
+
+    @classmethod
+    def build(cls, graph: WalkingGraph, costs: np.ndarray, witness_settle_limit: int = 50) -> "ContractionHierarchy":
+        n = graph.n_nodes
+        src = graph.sources().tolist()
+        dst = graph.targets.tolist()
+        cost_l = costs.tolist()
+
+        # out_adj[u][v] = (cost, middle node or -1, original edge or -1); cheapest per pair
+        out_adj: List[Dict[int, Tuple[float, int, int]]] = [dict() for _ in range(n)]
+        in_adj: List[Dict[int, Tuple[float, int, int]]] = [dict() for _ in range(n)]
+        for e, (u, v, c) in enumerate(zip(src, dst, cost_l)):
+            if u == v or c == math.inf:
+                continue
+            cur = out_adj[u].get(v)
+            if cur is None or c < cur[0]:
+                out_adj[u][v] = (c, -1, e)
+                in_adj[v][u] = (c, -1, e)
+
+        rank = [0] * n
+        up: List[List[Tuple[int, float, int, int]]] = [[] for _ in range(n)]    # forward search edges
+        down: List[List[Tuple[int, float, int, int]]] = [[] for _ in range(n)]  # backward search edges
+        contracted = [False] * n
+        deleted_neighbours = [0] * n
+
+        def witness_dists(u: int, skip: int, limit: float, targets: set) -> Dict[int, float]:
+            # bounded Dijkstra that ignores `skip`; stops once every target is settled
+            dist = {u: 0.0}
+            heap = [(0.0, u)]
+            settled = 0
+            left = len(targets)
+            while heap and settled < witness_settle_limit:
+                d, x = heapq.heappop(heap)
+                if d > limit:
+                    break
+                if d > dist[x]:
+                    continue
+                settled += 1
+                if x in targets:
+                    left -= 1
+                    if left == 0:
+                        break
+                for y, (c, _, _) in out_adj[x].items():
+                    if y == skip or contracted[y]:
+                        continue
+                    nd = d + c
+                    if nd < dist.get(y, math.inf):
+                        dist[y] = nd
+                        heapq.heappush(heap, (nd, y))
+            return dist
+
+        def shortcuts(v: int) -> List[Tuple[int, int, float]]:
+            out = []
+            outs = [(w, c) for w, (c, _, _) in out_adj[v].items() if not contracted[w]]
+            if not outs:
+                return out
+            max_out = max(c for _, c in outs)
+            targets = {w for w, _ in outs}
+            for u, (cu, _, _) in in_adj[v].items():
+                if contracted[u]:
+                    continue
+                dist = witness_dists(u, v, cu + max_out, targets - {u})
+                for w, cw in outs:
+                    if w == u:
+                        continue
+                    if dist.get(w, math.inf) > cu + cw:
+                        out.append((u, w, cu + cw))
+            return out
+
+        def simulate(v: int) -> Tuple[int, List[Tuple[int, int, float]]]:
+            sc = shortcuts(v)
+            degree = len(in_adj[v]) + len(out_adj[v])
+            return len(sc) - degree + deleted_neighbours[v], sc
+
+        heap = [(simulate(v)[0], v) for v in range(n)]
+        heapq.heapify(heap)
+        order = 0
+        while heap:
+            _, v = heapq.heappop(heap)
+            if contracted[v]:
+                continue
+            # lazy update: re-evaluate and requeue if it is no longer the cheapest
+            p, sc = simulate(v)
+            if heap and p > heap[0][0]:
+                heapq.heappush(heap, (p, v))
+                continue
+
+            for u, w, c in sc:
+                cur = out_adj[u].get(w)
+                if cur is None or c < cur[0]:
+                    out_adj[u][w] = (c, v, -1)
+                    in_adj[w][u] = (c, v, -1)
+
+            contracted[v] = True
+            rank[v] = order
+            order += 1
+            for w, (c, mid, e) in out_adj[v].items():
+                up[v].append((w, c, mid, e))
+                del in_adj[w][v]
+                deleted_neighbours[w] += 1
+            for u, (c, mid, e) in in_adj[v].items():
+                down[v].append((u, c, mid, e))
+                del out_adj[u][v]
+                deleted_neighbours[u] += 1
+            out_adj[v] = {}
+            in_adj[v] = {}
+
+        arrays = {"rank": np.asarray(rank, dtype=CH_ARRAY_DTYPES["rank"])}
+        for prefix, lists in (("up", up), ("down", down)):
+            ptr = np.zeros(n + 1, dtype=np.int64)
+            np.cumsum([len(edges) for edges in lists], out=ptr[1:])
+            flat = [edge for edges in lists for edge in edges]
+            arrays[f"{prefix}_ptr"] = ptr
+            for col, name in enumerate(("to", "cost", "mid", "edge")):
+                key = f"{prefix}_{name}"
+                arrays[key] = np.fromiter((edge[col] for edge in flat), dtype=CH_ARRAY_DTYPES[key], count=len(flat))
+        return cls(arrays)
+
+    def _edges(self, direction: str, x: int) -> List[Tuple[int, float]]:
+        ptr = getattr(self, f"{direction}_ptr")
+        lo, hi = int(ptr[x]), int(ptr[x + 1])
+        return list(zip(getattr(self, f"{direction}_to")[lo:hi].tolist(), getattr(self, f"{direction}_cost")[lo:hi].tolist()))
+
+    def _upward(self, direction: str, stall_direction: str, s: int) -> Tuple[Dict[int, float], Dict[int, int]]:
+        """
+        Dijkstra over upward edges only, with stall-on-demand: a node reachable more
+        cheaply through a higher-ranked neighbour can't be on a shortest up-down path,
+        so it is not expanded.
+        """
+        dist = {s: 0.0}
+        parent = {s: -1}
+        heap = [(0.0, s)]
+        get, inf = dist.get, math.inf
+        pop, push = heapq.heappop, heapq.heappush
+        while heap:
+            d, x = pop(heap)
+            if d > dist[x]:
+                continue
+            for y, c in self._edges(stall_direction, x):
+                if get(y, inf) + c < d:
+                    break
+            else:
+                for y, c in self._edges(direction, x):
+                    nd = d + c
+                    if nd < get(y, inf):
+                        dist[y] = nd
+                        parent[y] = x
+                        push(heap, (nd, y))
+        return dist, parent
+
+    def _via(self, a: int, b: int) -> Tuple[int, int]:
+        """(middle node or -1, original edge or -1) of hierarchy edge a -> b, stored at its lower-ranked end."""
+        if self.rank[a] < self.rank[b]:
+            direction, at, other = "up", a, b
+        else:
+            direction, at, other = "down", b, a
+        ptr = getattr(self, f"{direction}_ptr")
+        lo, hi = int(ptr[at]), int(ptr[at + 1])
+        k = lo + int(np.flatnonzero(getattr(self, f"{direction}_to")[lo:hi] == other)[0])
+        return int(getattr(self, f"{direction}_mid")[k]), int(getattr(self, f"{direction}_edge")[k])
+
+    def _unpack(self, a: int, b: int, out: List[int]) -> None:
+        mid, e = self._via(a, b)
+        if mid < 0:
+            out.append(e)
+        else:
+            self._unpack(a, mid, out)
+            self._unpack(mid, b, out)
+
+    def query(self, s: int, t: int) -> Optional[Tuple[float, List[int]]]:
+        """(cost, edge ids) of the cheapest s -> t path, or None."""
+        if s == t:
+            return 0.0, []
+        df, pf = self._upward("up", "down", s)
+        db, pb = self._upward("down", "up", t)
+        best, meet = math.inf, -1
+        for x, d in df.items():
+            other = db.get(x)
+            if other is not None and d + other < best:
+                best, meet = d + other, x
+        if meet < 0:
+            return None
+
+        fwd_nodes = []
+        x = meet
+        while x != -1:
+            fwd_nodes.append(x)
+            x = pf[x]
+        fwd_nodes.reverse()
+        bwd_nodes = []
+        x = pb[meet]
+        while x != -1:
+            bwd_nodes.append(x)
+            x = pb[x]
+        nodes = fwd_nodes + bwd_nodes
+
+        edges: List[int] = []
+        for a, b in zip(nodes, nodes[1:]):
+            self._unpack(a, b, edges)
+        return best, edges
+
+
+def astar(graph: WalkingGraph, costs: np.ndarray, s: int, t: int,
+          x: List[float], y: List[float]) -> Optional[Tuple[float, List[int]]]:
+    """(cost, edge ids) of the cheapest s -> t path, or None. Edges are read per node from the CSR arrays."""
+    if s == t:
+        return 0.0, []
+    indptr, targets = graph.indptr, graph.targets
+    tx, ty = x[t], y[t]
+    k = _HEURISTIC_SCALE
+
+    def h(v: int) -> float:
+        return k * math.hypot(x[v] - tx, y[v] - ty)
+
+    dist = {s: 0.0}
+    via_edge: Dict[int, int] = {}
+    heap = [(h(s), 0.0, s)]
+    closed = set()
+    get, inf, push = dist.get, math.inf, heapq.heappush
+    while heap:
+        _, d, u = heapq.heappop(heap)
+        if u == t:
+            edges = []
+            while u != s:
+                e = via_edge[u]
+                edges.append(e)
+                u = _edge_source(indptr, e)
+            edges.reverse()
+            return d, edges
+        if u in closed:
+            continue
+        closed.add(u)
+        lo, hi = int(indptr[u]), int(indptr[u + 1])
+        for e, v, c in zip(range(lo, hi), targets[lo:hi].tolist(), costs[lo:hi].tolist()):
+            nd = d + c
+            if nd < get(v, inf):
+                dist[v] = nd
+                via_edge[v] = e
+                push(heap, (nd + h(v), nd, v))
+    return None
+
+
+def _edge_source(indptr: np.ndarray, e: int) -> int:
+    return int(np.searchsorted(indptr, e, side="right")) - 1
+
+
+def resolve_weighting(name: str, max_grade: Optional[float] = None) -> Weighting:
+    """Named weighting, optionally with a rider's own grade limit (rounded to 0.5%)."""
+    w = WEIGHTINGS.get(name)
+    if w is None:
+        raise ValueError(f"Unknown weighting '{name}'. Must be one of: {', '.join(WEIGHTINGS)}")
+    if max_grade is not None:
+        w = replace(w, max_grade=round(max_grade * 200) / 200)
+    return w
+
+
+# ---------- hierarchy files ----------
+def hierarchy_path(graph_path: Path, name: str) -> Path:
+    """Where the hierarchy for weighting `name` of the graph at graph_path is kept."""
+    graph_path = Path(graph_path)
+    return graph_path.with_name(f"{graph_path.stem}.ch-{name}{graph_path.suffix}")
+
+
+def save_hierarchy(ch: ContractionHierarchy, path: Path) -> Path:
+    arrays = {name: np.asarray(a, dtype=CH_ARRAY_DTYPES[name]) for name, a in ch.arrays().items()}
+    return write_arrays(path, _CH_MAGIC, arrays, ch.meta)
+
+
+def load_hierarchy(path: Path, mmap: bool = True) -> ContractionHierarchy:
+    arrays, meta = read_arrays(path, _CH_MAGIC, mmap)
+    return ContractionHierarchy(arrays, meta)
+
+
+def _hierarchy_meta(graph: WalkingGraph, w: Weighting) -> Dict[str, Any]:
+    """What a saved hierarchy must have been built for: this weighting on this graph."""
+    return json.loads(json.dumps({
+        "weighting": w.to_dict(),
+        "n_nodes": graph.n_nodes,
+        "n_edges": graph.n_edges,
+        "graph_imported_at": graph.meta.get("imported_at"),
+    }))
+
+
+# Each cached cost array is one float per edge; custom grade limits make new keys.
+COST_CACHE_SIZE = 8
+
+
+@dataclass
+class WalkingRouter:
+    """Routes over a WalkingGraph with per-request weightings; CH is used when prepared."""
+    graph: WalkingGraph
+    _costs: "OrderedDict[Weighting, np.ndarray]" = field(default_factory=OrderedDict, repr=False)
+    _ch: Dict[Weighting, ContractionHierarchy] = field(default_factory=dict, repr=False)
+
+    def __post_init__(self) -> None:
+        self._x = self.graph.x.tolist()
+        self._y = self.graph.y.tolist()
+
+    def costs(self, w: Weighting) -> np.ndarray:
+        c = self._costs.get(w)
+        if c is None:
+            c = edge_costs(self.graph, w)
+            self._costs[w] = c
+            while len(self._costs) > COST_CACHE_SIZE:
+                self._costs.popitem(last=False)
+        else:
+            self._costs.move_to_end(w)
+        return c
+
+    def prepare(self, w: Weighting, witness_settle_limit: int = 50, path: Optional[Path] = None) -> ContractionHierarchy:
+        """
+        Optional preprocessing: the contraction hierarchy for `w`, memory-mapped
+        from `path` when it holds one built for this graph and weighting,
+        otherwise built (and saved to `path`, if given).
+        """
+        expected = _hierarchy_meta(self.graph, w)
+        ch = None
+        if path is not None and Path(path).exists():
+            ch = load_hierarchy(path)
+            if ch.meta != expected:
+                ch = None
+        if ch is None:
+            ch = ContractionHierarchy.build(self.graph, self.costs(w), witness_settle_limit)
+            ch.meta = expected
+            if path is not None:
+                save_hierarchy(ch, path)
+        self._ch[w] = ch
+        return ch
+
+    def prepared(self) -> List[str]:
+        return [w.name for w in self._ch]
+
+    def route(
+        self,
+        origin_lat: float, origin_lon: float,
+        dest_lat: float, dest_lon: float,
+        weighting: Weighting = WEIGHTINGS["shortest"],
+        max_snap_m: float = 500.0,
+    ) -> Dict[str, Any]:
+        """OSRM-shaped route (distance, duration, geojson geometry) or ValueError."""
+        o = self.graph.nearest_node(origin_lat, origin_lon, max_snap_m)
+        d = self.graph.nearest_node(dest_lat, dest_lon, max_snap_m)
+        if o is None or d is None:
+            raise ValueError("Origin or destination is not near the walking network")
+
+        ch = self._ch.get(weighting)
+        if ch is not None:
+            found = ch.query(o[0], d[0])
+            algorithm = "ch"
+        else:
+            found = astar(self.graph, self.costs(weighting), o[0], d[0], self._x, self._y)
+            algorithm = "astar"
+        if found is None:
+            raise ValueError(f"No {weighting.name} walking route between these points")
+        cost, edges = found
+        return self._describe(o[0], edges, cost, weighting, algorithm, o[1] + d[1])
+
+    def _describe(self, start: int, edges: List[int], cost: float, w: Weighting,
+                  algorithm: str, snap_m: float) -> Dict[str, Any]:
+        g = self.graph
+        e = np.asarray(edges, dtype=np.int64)
+        nodes = np.concatenate([[start], np.asarray(g.targets)[e]]).astype(np.int64)
+        coords = np.column_stack([np.asarray(g.lon)[nodes], np.asarray(g.lat)[nodes]]).tolist()
+        length = float(np.asarray(g.length_m, dtype=np.float64)[e].sum()) if len(e) else 0.0
+        flags = np.asarray(g.flags)[e]
+        grade = np.abs(np.asarray(g.grade)[e])
+        return {
+            "distance": round(length, 1),
+            "duration": round(length / w.speed_mps, 1),
+            "weight": round(cost, 1),
+            "weight_name": w.name,
+            "algorithm": algorithm,
+            "snap_distance_m": round(snap_m, 1),
+            "geometry": {"type": "LineString", "coordinates": coords},
+            "max_grade": round(float(grade.max()), 4) if len(e) else 0.0,
+            "features": {name: int(((flags & bit) != 0).sum()) for bit, name in FLAG_NAMES.items() if ((flags & bit) != 0).any()},
+            "legs": [],
+        }
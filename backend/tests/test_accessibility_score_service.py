@@ -0,0 +1,137 @@
+import zipfile
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+try:
+    from backend.services import accessibility_score_service as scoring
+    from backend.services.gtfs_service import build_timetable, write_stops
+    from backend.services.realtime_service import ACCESSIBILITY_ISSUE, apply_alerts, parse_feed
+    from backend.services.stop_index_service import AUDIO, ELEVATOR, VISUAL, read_stops
+except Exception:
+    from services import accessibility_score_service as scoring
+    from services.gtfs_service import build_timetable, write_stops
+    from services.realtime_service import ACCESSIBILITY_ISSUE, apply_alerts, parse_feed
+    from services.stop_index_service import AUDIO, ELEVATOR, VISUAL, read_stops
+
+# Union is a station with an elevator, announcements and displays; its platform A inherits them.
+# B has announcements only, C is not step-free, D has everything of its own.
+FEED = {
+    "agency.txt": "agency_id,agency_name,agency_url,agency_timezone\nTTC,Transit,http://example.com,America/Toronto\n",
+    "stops.txt": (
+        "stop_id,stop_name,stop_lat,stop_lon,location_type,parent_station,wheelchair_boarding,elevator,audio,visual\n"
+        "U,Union,43.6450,-79.3800,1,,1,1,1,1\n"
+        "A,Union Platform,43.6450,-79.3800,0,U,0,,,\n"
+        "B,Beta,43.6500,-79.3850,0,,1,0,1,0\n"
+        "C,Gamma,43.6502,-79.3850,0,,2,0,0,0\n"
+        "D,Delta,43.6800,-79.3700,0,,1,1,yes,1\n"
+    ),
+    "routes.txt": "route_id,route_short_name,route_long_name,route_type\nR1,1,King,3\nR2,2,Yonge,3\n",
+    "calendar.txt": (
+        "service_id,monday,tuesday,wednesday,thursday,friday,saturday,sunday,start_date,end_date\n"
+        "WK,1,1,1,1,1,0,0,20260101,20261231\n"
+    ),
+    "trips.txt": "route_id,service_id,trip_id,wheelchair_accessible\nR1,WK,T1,1\nR2,WK,U1,2\n",
+    "stop_times.txt": (
+        "trip_id,arrival_time,departure_time,stop_id,stop_sequence\n"
+        "T1,08:00:00,08:00:00,A,1\nT1,08:05:00,08:05:00,B,2\nT1,08:20:00,08:20:00,D,3\n"
+        "U1,08:10:00,08:10:00,C,1\nU1,08:20:00,08:20:00,D,2\n"
+    ),
+}
+
+
+@pytest.fixture
+def tt(tmp_path):
+    path = tmp_path / "gtfs.zip"
+    with zipfile.ZipFile(path, "w") as z:
+        for name, text in FEED.items():
+            z.writestr(name, text)
+    return build_timetable(path, log=lambda msg: None)
+
+
+def _ride(tt, a, b, accessible):
+    ids = tt.index_of("stop_id")
+    return {"mode": "bus", "from": tt.stop(ids[a]), "to": tt.stop(ids[b]), "wheelchair_accessible": accessible}
+
+
+def _itineraries(tt):
+    ids = tt.index_of("stop_id")
+    direct = {"walk_m": 200, "transfers": 0, "legs": [_ride(tt, "A", "D", True)]}
+    changing = {"walk_m": 650, "transfers": 1, "legs": [
+        _ride(tt, "A", "B", True),
+        {"mode": "walk", "from": tt.stop(ids["B"]), "to": tt.stop(ids["C"]), "step_free": False},
+        _ride(tt, "C", "D", False),
+    ]}
+    walk = {"walk_m": 1800, "transfers": 0, "legs": [{"mode": "walk", "from": {"name": "Origin"}, "to": {"name": "Destination"}}]}
+    return [direct, changing, walk]
+
+
+def test_weights_follow_the_riders_needs():
+    base = scoring.weights()
+    assert base.sum() == pytest.approx(1.0) and (base > 0).all()
+    audio = scoring.weights(SimpleNamespace(needs_audio=True))
+    assert audio[scoring.AUDIO_COL] > 4 * base[scoring.AUDIO_COL]
+
+    quiet, long_walk = scoring.feature_row(audio=1.0), scoring.feature_row(walk=1000.0)
+    matrix = np.vstack([quiet, long_walk, scoring.feature_row(transfers=2)])
+    plain = scoring.score(matrix)
+    assert plain[0] > plain[1]
+    # the same two routes the other way round for a rider relying on announcements
+    needs = SimpleNamespace(needs_step_free=False, needs_audio=True, needs_visual=False, avoid_long_walks=False,
+                            max_transfers=1)
+    scored = scoring.score(matrix, needs)
+    assert scored[0] < scored[1]
+    # over the rider's transfer limit is the whole transfer weight
+    assert scored[2] == pytest.approx(100 * (1 - scoring.weights(needs)[scoring.TRANSFERS]), abs=0.1)
+    assert (scored >= 0).all() and (scored <= 100).all()
+    with pytest.raises(ValueError):
+        scoring.feature_row(stairs=1.0)
+
+
+def test_features_come_from_timetable_stops_rides_walks_and_live_closures(tt):
+    its = _itineraries(tt)
+    f = scoring.features(its, tt)
+    assert f.shape == (3, len(scoring.FEATURES))
+    assert not f[0, :scoring.WALK].any()
+    changing = dict(zip(scoring.FEATURES, f[1]))
+    assert changing["vehicle"] == 0.5 and changing["ramp"] == 1.0
+    # stops A, B, C, D: only C is not step-free; B and C lack displays, C lacks announcements
+    assert (changing["boarding"], changing["audio"], changing["visual"]) == (0.25, 0.25, 0.5)
+    assert changing["walk"] == 650 and changing["transfers"] == 1
+    assert not f[2, :scoring.WALK].any()
+
+    step_free = SimpleNamespace(needs_step_free=True)
+    scores = scoring.score(f, step_free)
+    # 200 m of the 1 km walk allowance is all the direct ride loses
+    assert scores[0] == pytest.approx(100 * (1 - 0.2 * scoring.weights(step_free)[scoring.WALK]), abs=0.1)
+    assert scores[0] > scores[2] > scores[1]
+
+    # D's elevator goes out of service: the direct ride now ends at a stop with no step-free exit
+    live = apply_alerts(tt, parse_feed(b"""{"header": {"gtfsRealtimeVersion": "2.0"},
+      "entity": [{"id": "a1", "alert": {"effect": %d, "informedEntity": [{"stopId": "D"}]}}]}""" % ACCESSIBILITY_ISSUE))
+    f_live = scoring.features(its, live)
+    assert f_live[0, scoring.ELEVATOR] == 0.5 and f_live[1, scoring.ELEVATOR] == 0.25
+    # the static wheelchair_boarding column is unchanged by the outage
+    assert f_live[0, scoring.BOARDING] == 0.0
+    assert scoring.score(f_live)[0] < scoring.score(f)[0]
+
+
+def test_importer_keeps_station_equipment_on_platforms_and_in_stops_txt(tt, tmp_path):
+    ids = tt.index_of("stop_id")
+    bits = np.asarray(tt.stop_bits)
+    assert bits[ids["A"]] & (ELEVATOR | AUDIO | VISUAL) == ELEVATOR | AUDIO | VISUAL
+    assert bits[ids["B"]] & (ELEVATOR | AUDIO | VISUAL) == AUDIO
+    assert bits[ids["D"]] & AUDIO
+    stops = {s["id"]: s["bits"] for s in read_stops(write_stops(tt, tmp_path / "stops.txt"))}
+    assert stops == {s: int(bits[i]) for s, i in ids.items()}
+
+
+def test_stop_equipment_needs_every_boarding_and_alighting_stop_to_have_it(tt):
+    its = _itineraries(tt)
+    # A (from Union) and D have elevators and announcements; B lacks an elevator, C both
+    assert scoring.stop_equipment(its, tt).tolist() == [[True, True], [False, False], [False, False]]
+    live = apply_alerts(tt, parse_feed(b"""{"header": {"gtfsRealtimeVersion": "2.0"},
+      "entity": [{"id": "a1", "alert": {"effect": %d, "informedEntity": [{"stopId": "D"}]}}]}""" % ACCESSIBILITY_ISSUE))
+    # D's elevator out of service: announcements are still there
+    assert scoring.stop_equipment(its[:1], live).tolist() == [[False, True]]
@@ -0,0 +1,52 @@
+from datetime import date, timedelta
+
+try:
+    from backend.services.badge_service import BadgeEngine, TripEvent
+except Exception:
+    from badge_service import BadgeEngine, TripEvent
+
+
+def _trip(day, mode="bus", co2=1.0, user="u1"):
+    return TripEvent(user_id=user, day=day, mode=mode, distance_km=5.0, co2_saved_kg=co2, points=int(co2 * 100))
+
+
+def test_badges_unlock_once_on_the_triggering_event():
+    e = BadgeEngine()
+    first = e.apply(_trip(date(2026, 1, 1)))
+    assert [b["badge_id"] for b in first] == ["first_journey"]
+
+    bike = e.apply(_trip(date(2026, 1, 1), mode="bike"))
+    assert [b["badge_id"] for b in bike] == ["bike_champion"]
+
+    # same-day trips don't extend the streak or re-award anything
+    assert e.apply(_trip(date(2026, 1, 1))) == []
+    assert e.counters("u1")["current_streak"] == 1
+
+
+def test_streak_bitmap_handles_gaps_and_backfill():
+    e = BadgeEngine()
+    start = date(2026, 3, 1)
+    unlocked = []
+    for i in range(7):
+        if i == 3:
+            continue
+        unlocked += e.apply(_trip(start + timedelta(days=i)))
+    assert e.counters("u1")["current_streak"] == 3
+    assert "week_warrior" not in {b["badge_id"] for b in unlocked}
+
+    # back-filling the missing day joins both runs into a 7-day streak
+    late = e.apply(_trip(start + timedelta(days=3)))
+    assert "week_warrior" in {b["badge_id"] for b in late}
+    assert e.counters("u1")["longest_streak"] == 7
+    assert e.current_streak("u1", today=start + timedelta(days=7)) == 7
+    assert e.current_streak("u1", today=start + timedelta(days=9)) == 0
+    assert e.active_days_between("u1", start, start + timedelta(days=2)) == 3
+
+
+def test_rebuild_replays_event_log():
+    e = BadgeEngine()
+    log = [_trip(date(2026, 1, 1) + timedelta(days=i), co2=5.0, user=f"u{i % 3}") for i in range(30)]
+    assert e.rebuild(log) == 30
+    tree = {b["badge_id"]: b["earned"] for b in e.badges("u0")}
+    assert tree["tree_saver"] is True
+    assert tree["carbon_hero"] is False
@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+try:
+    from backend.services.elevation_service import DemTileSet, grade_profile, edge_grades
+except Exception:
+    from services.elevation_service import DemTileSet, grade_profile, edge_grades
+
+SIDE = 1201  # 3 arc-second tile
+PX_M = 111_320 / (SIDE - 1)
+
+
+def _write_tile(tmp_path, rise_per_px=8, void_at=None):
+    # elevation climbs rise_per_px metres per pixel going north; flat east-west
+    rows = np.arange(SIDE)[:, None]
+    z = (2000 - rows * rise_per_px) * np.ones((1, SIDE))
+    z = z.astype(">i2")
+    if void_at is not None:
+        z[void_at] = -32768
+    z.tofile(tmp_path / "N43W080.hgt")
+    return DemTileSet(tmp_path)
+
+
+def test_bilinear_sampling_on_a_plane(tmp_path):
+    dem = _write_tile(tmp_path)
+    # south edge of the tile is row 1200 -> 2000 - 9600
+    z = dem.sample(np.array([43.0, 43.5, 43.0 + 0.25 / (SIDE - 1)]), np.array([-80.0, -79.5, -79.9]))
+    assert z[0] == pytest.approx(2000 - 1200 * 8)
+    assert z[1] == pytest.approx(2000 - 600 * 8)
+    assert z[2] == pytest.approx(2000 - 1199.75 * 8)  # between pixel rows
+    assert np.isnan(dem.sample(np.array([10.0]), np.array([10.0])))[0]
+
+
+def test_grade_profile_flags_steep_segments(tmp_path):
+    dem = _write_tile(tmp_path)
+    lat, lon = 43.5, -79.5
+    north = 300 / 111_320
+    east = 300 / (111_320 * np.cos(np.radians(lat)))
+    # flat 300 m east, then 300 m north (8 m per 92.7 m ~ 8.6%), then back south
+    coords = [[lon, lat], [lon + east, lat], [lon + east, lat + north], [lon + east, lat]]
+    prof = grade_profile(dem, coords, warn=0.05, steep=0.083)
+    assert prof["grade"][0] == pytest.approx(0.0, abs=1e-3)
+    assert prof["grade"][1] == pytest.approx(8 / PX_M, rel=0.02)
+    assert prof["grade"][2] == pytest.approx(-8 / PX_M, rel=0.02)
+    assert prof["steep_segments"] == [1, 2]
+    assert prof["climb_m"] == pytest.approx(prof["descent_m"], rel=0.01)
+    assert len(prof["elevation_m"]) == len(coords)
+
+    assert grade_profile(dem, [[10.0, 10.0], [10.001, 10.0]]) is None
+
+
+def test_void_cells_and_edge_grades(tmp_path):
+    dem = _write_tile(tmp_path, void_at=(600, 600))
+    z = dem.sample(np.array([43.5]), np.array([-79.5]))
+    assert np.isnan(z[0])
+    g = edge_grades(dem, [43.1], [-79.9], [43.1 + 100 / 111_320], [-79.9], [100.0])
+    assert g[0] == pytest.approx(8 / PX_M, rel=0.02)
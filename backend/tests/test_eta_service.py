@@ -0,0 +1,147 @@
+import zipfile
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+import pytest
+
+try:
+    from backend.services import assistant_service, eta_service
+    from backend.services.gtfs_service import build_timetable
+    from backend.services.realtime_service import feed_message_class
+    from backend.services.stop_index_service import StopIndex
+except Exception:
+    from services import assistant_service, eta_service
+    from services.gtfs_service import build_timetable
+    from services.realtime_service import feed_message_class
+    from services.stop_index_service import StopIndex
+
+# R1 runs A - B - C along shape S1, which goes round a block (north) between B and C.
+# T1 is step-free (A 08:00, B 08:05, C 08:10); T2 follows five minutes behind.
+# R2's shape S2 is nowhere near its stops, so C - D falls back to a straight line.
+FEED = {
+    "agency.txt": "agency_id,agency_name,agency_url,agency_timezone\nTTC,Transit,http://example.com,America/Toronto\n",
+    "stops.txt": (
+        "stop_id,stop_name,stop_lat,stop_lon,wheelchair_boarding\n"
+        "A,Alpha,43.6500,-79.4000,1\nB,Beta,43.6500,-79.3850,1\nC,Gamma,43.6500,-79.3700,1\nD,Delta,43.6800,-79.3700,1\n"
+    ),
+    "routes.txt": "route_id,route_short_name,route_long_name,route_type\nR1,504,King,3\nR2,97,Yonge,3\n",
+    "calendar.txt": (
+        "service_id,monday,tuesday,wednesday,thursday,friday,saturday,sunday,start_date,end_date\n"
+        "WK,1,1,1,1,1,0,0,20260101,20261231\n"
+    ),
+    "trips.txt": (
+        "route_id,service_id,trip_id,wheelchair_accessible,trip_headsign,shape_id\n"
+        "R1,WK,T1,1,Gamma,S1\nR1,WK,T2,0,Gamma,S1\nR2,WK,U1,1,Delta,S2\n"
+    ),
+    "stop_times.txt": (
+        "trip_id,arrival_time,departure_time,stop_id,stop_sequence\n"
+        "T1,08:00:00,08:00:00,A,1\nT1,08:05:00,08:05:00,B,2\nT1,08:10:00,08:10:00,C,3\n"
+        "T2,08:05:00,08:05:00,A,1\nT2,08:10:00,08:10:00,B,2\nT2,08:15:00,08:15:00,C,3\n"
+        "U1,08:15:00,08:15:00,C,1\nU1,08:25:00,08:25:00,D,2\n"
+    ),
+    "shapes.txt": (
+        "shape_id,shape_pt_lat,shape_pt_lon,shape_pt_sequence\n"
+        "S1,43.6500,-79.4000,1\nS1,43.6500,-79.3850,2\nS1,43.6550,-79.3850,3\nS1,43.6550,-79.3700,4\nS1,43.6500,-79.3700,5\n"
+        "S2,45.0000,-75.0000,1\nS2,45.1000,-75.0000,2\n"
+    ),
+}
+
+
+def _ts(hh, mm, ss=0):
+    return int(datetime(2026, 10, 19, hh, mm, ss, tzinfo=ZoneInfo("America/Toronto")).timestamp())
+
+
+def _timetable(tmp_path):
+    path = tmp_path / "gtfs.zip"
+    with zipfile.ZipFile(path, "w") as z:
+        for name, text in FEED.items():
+            z.writestr(name, text)
+    return build_timetable(path, log=lambda msg: None)
+
+
+def _feed(*vehicles, at):
+    msg = feed_message_class()()
+    msg.header.gtfs_realtime_version = "2.0"
+    msg.header.timestamp = at
+    for i, (trip_id, lat, lon, ts, extra) in enumerate(vehicles):
+        vp = msg.entity.add(id=str(i)).vehicle
+        vp.trip.trip_id, vp.trip.start_date = trip_id, "20261019"
+        vp.position.latitude, vp.position.longitude = lat, lon
+        vp.timestamp = ts
+        vp.vehicle.id = "bus-" + trip_id
+        for key, value in extra.items():
+            if key == "wheelchair_accessible":
+                vp.vehicle.wheelchair_accessible = value
+            else:
+                setattr(vp, key, value)
+    return msg
+
+
+def test_stops_are_placed_along_their_shape(tmp_path):
+    tt = _timetable(tmp_path)
+    t1 = tt.index_of("trip_id")["T1"]
+    p = int(tt.trip_pattern[t1])
+    lo = int(tt.pattern_stop_ptr[p])
+    dist = list(tt.pattern_dist_m()[lo:lo + 3])
+    # B to C goes round the block: two 556 m legs north and back on top of the 1207 m across
+    assert dist[1] - dist[0] == pytest.approx(1207, abs=5)
+    assert dist[2] - dist[1] == pytest.approx(1207 + 2 * 556, abs=10)
+    assert tt.pattern_shape[p] >= 0
+    u = int(tt.trip_pattern[tt.index_of("trip_id")["U1"]])
+    assert tt.pattern_shape[u] == -1
+    lo = int(tt.pattern_stop_ptr[u])
+    assert tt.pattern_dist_m()[lo + 1] - tt.pattern_dist_m()[lo] == pytest.approx(3336, abs=5)
+
+
+def test_delay_carries_to_stops_ahead_and_accessible_lookup(tmp_path):
+    tt = _timetable(tmp_path)
+    b, c = tt.index_of("stop_id")["B"], tt.index_of("stop_id")["C"]
+    feed = _feed(
+        # T1 is on the loop between B and C, halfway (due there 08:07:30), two minutes late
+        ("T1", 43.6550, -79.3775, _ts(8, 9, 30), {}),
+        # T2 waits at A early; it will not leave before 08:05. Its ramp is out.
+        ("T2", 43.6500, -79.4000, _ts(8, 4, 30), {"current_stop_sequence": 1, "current_status": eta_service.STOPPED_AT,
+                                              "wheelchair_accessible": eta_service.VEHICLE_INACCESSIBLE}),
+        ("NOPE", 43.6500, -79.3900, _ts(8, 9), {}),
+        at=_ts(8, 9, 30),
+    )
+    board = eta_service.build_board(tt, feed, now=_ts(8, 4))
+    assert board.stats["predicted"] == 2 and board.stats["unmatched"] == 1
+
+    t1_at_c = board.next_arrival(c, accessible=True, mode="bus", now=_ts(8, 4))
+    assert (t1_at_c.trip_id, t1_at_c.eta, t1_at_c.delay_s) == ("T1", _ts(8, 12), 120)
+    # distance is along the shape, not straight: 603 m to the corner, then 556 m back down
+    assert t1_at_c.distance_m == pytest.approx(603 + 556, abs=15)
+    assert not [a for a in board.arrivals(b, now=_ts(8, 4)) if a.trip_id == "T1"]
+
+    t2 = board.next_arrival(b, now=_ts(8, 4))
+    assert (t2.trip_id, t2.eta, t2.wheelchair_accessible) == ("T2", _ts(8, 10), False)
+    assert board.next_arrival(b, accessible=True, now=_ts(8, 4)) is None
+    assert [a.trip_id for a in board.arrivals(c, mode="bus", now=_ts(8, 4))] == ["T1", "T2"]
+    # once T1 is due and gone the head of the list moves on
+    assert board.next_arrival(c, mode="bus", now=_ts(8, 13)).trip_id == "T2"
+
+
+def test_refresh_publishes_board_for_the_assistant(tmp_path, monkeypatch):
+    # the modules the assistant itself sees
+    eta = assistant_service.eta_service
+    tt = _timetable(tmp_path)
+    monkeypatch.setattr(eta.gtfs_service, "_timetable", tt)
+    monkeypatch.setattr(eta.gtfs_service, "_loaded", True)
+    monkeypatch.setattr(eta.realtime_service, "_live", None)
+    monkeypatch.setattr(eta, "_board", None)
+    stops = StopIndex(tt.stop_records())
+    monkeypatch.setattr(eta, "get_stop_index", lambda: stops)
+
+    path = tmp_path / "vehicles.pb"
+    path.write_bytes(_feed(("T1", 43.6500, -79.3925, _ts(8, 4), {}), at=_ts(8, 4)).SerializeToString())
+    out = eta.refresh(str(path), now=_ts(8, 4))
+    assert out["version"] == 1 and out["predicted"] == 1
+
+    # Shloka Market is stop B; T1 is halfway there, a minute and a half late
+    monkeypatch.setattr(assistant_service, "datetime", type("FixedNow", (datetime,), {
+        "now": classmethod(lambda cls, tz=None: datetime.fromtimestamp(_ts(8, 4), tz))}))
+    reply = assistant_service.handle_journey_updates("I'm at the bus stop")
+    assert "route 504 to Gamma, will arrive at 8:06 AM" in reply["response"]
+    assert reply["data"]["arrival"]["trip_id"] == "T1"
+    assert "(in 2 min)" in assistant_service.handle_bus_arrival("where is it")["response"]
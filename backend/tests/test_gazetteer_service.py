@@ -0,0 +1,39 @@
+try:
+    from backend.services import gazetteer_service as gz
+except Exception:
+    from services import gazetteer_service as gz
+
+
+def _index():
+    return gz.GazetteerIndex([
+        {"name": "Union Station, Toronto", "lat": 43.6452, "lon": -79.3806, "kind": "station", "weight": 10},
+        {"name": "Union Square", "lat": 43.60, "lon": -79.30, "kind": "landmark", "weight": 2},
+        {"name": "Queen Station", "lat": 43.6525, "lon": -79.3793, "kind": "station", "weight": 5},
+        {"name": "St Andrew Station", "lat": 43.6476, "lon": -79.3848, "kind": "station", "weight": 4},
+    ])
+
+
+def test_prefix_matches_rank_by_weight_and_word_starts():
+    idx = _index()
+    assert [r["display_name"] for r in idx.autocomplete("uni", 5)] == ["Union Station, Toronto", "Union Square"]
+    # "sta" matches later words too; full-name starts are not required
+    names = [r["display_name"] for r in idx.autocomplete("Station", 5)]
+    assert "Queen Station" in names and "Union Station, Toronto" in names
+
+
+def test_typo_falls_back_to_trigram_match():
+    out = _index().autocomplete("quen staton", 3)
+    assert out and out[0]["display_name"] == "Queen Station"
+    assert out[0]["match"] == "fuzzy"
+
+
+def test_csv_import_extends_seeded_index(tmp_path):
+    src = tmp_path / "places.csv"
+    src.write_text("name,lat,lon,kind\nDundas West Station,43.6566,-79.4527,station\nbad,row\n", encoding="utf-8")
+    dest = tmp_path / "gazetteer.csv"
+    assert gz.import_csv(src, dest) == 1
+
+    idx = gz.build_index(dest)
+    assert idx.autocomplete("dundas w", 1)[0]["lat"] == 43.6566
+    # MOCK_LOCATIONS are always seeded
+    assert idx.autocomplete("cn tow", 1)[0]["display_name"] == "CN Tower, Toronto"
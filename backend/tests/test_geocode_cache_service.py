@@ -0,0 +1,40 @@
+try:
+    from backend.services.geocode_cache_service import GeocodeCache, normalize_query
+except Exception:
+    from geocode_cache_service import GeocodeCache, normalize_query
+
+_RESULTS = [{"display_name": f"Union Station {i}", "lat": "43.6", "lon": "-79.3"} for i in range(5)]
+
+
+def test_normalize_folds_case_whitespace_and_punctuation():
+    assert normalize_query("  Union   Station, TORONTO! ") == "union station toronto"
+    assert normalize_query("union station toronto") == normalize_query("Union-Station Toronto")
+
+
+def test_memory_then_disk_hits_and_limit_folding(tmp_path):
+    db = tmp_path / "geo.db"
+    cache = GeocodeCache(db_path=db, max_entries=10)
+    assert cache.get("Union Station", 5) is None
+    cache.put("Union Station", 5, _RESULTS)
+
+    assert len(cache.get("union station", 3)) == 3
+    assert cache.get("UNION STATION", 8) is None  # more than was fetched
+
+    # new process: memory is empty, SQLite still has the entry
+    restarted = GeocodeCache(db_path=db)
+    assert restarted.get("union  station", 5) == _RESULTS
+    assert restarted.get("union station", 5) == _RESULTS
+    snap = restarted.snapshot()
+    assert snap["disk_hits"] == 1 and snap["memory_hits"] == 1
+
+
+def test_ttl_expiry_and_lru_eviction(tmp_path):
+    cache = GeocodeCache(db_path=tmp_path / "geo.db", ttl_s=-1)
+    cache.put("cn tower", 5, _RESULTS[:1])
+    assert cache.get("cn tower", 5) is None
+    assert cache.stats["expired"] >= 1
+
+    lru = GeocodeCache(db_path=tmp_path / "geo2.db", max_entries=2)
+    for q in ("a1", "b2", "c3"):
+        lru.put(q, 5, [])
+    assert lru.snapshot()["memory_entries"] == 2
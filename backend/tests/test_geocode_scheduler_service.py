@@ -0,0 +1,69 @@
+import asyncio
+import time
+
+import pytest
+
+try:
+    from backend.services.geocode_scheduler_service import RequestScheduler, SchedulerTimeout, INTERACTIVE, BACKGROUND
+except Exception:
+    from geocode_scheduler_service import RequestScheduler, SchedulerTimeout, INTERACTIVE, BACKGROUND
+
+
+def test_burst_of_500_collapses_duplicates_and_respects_rate():
+    rate = 200.0
+    sched = RequestScheduler(rate_per_s=rate, burst=1, max_wait_s=5)
+    starts = []
+
+    async def main():
+        def fetch_for(q):
+            async def fetch():
+                starts.append(time.monotonic())
+                await asyncio.sleep(0.01)
+                return q
+            return fetch
+
+        queries = [f"q{i % 25}" for i in range(500)]
+        return await asyncio.gather(*[sched.submit(q, fetch_for(q)) for q in queries])
+
+    results = asyncio.run(main())
+    assert results[:25] == [f"q{i}" for i in range(25)]
+    assert len(starts) == 25
+    assert sched.stats["merged"] == 475
+    # no window of 1/rate seconds ever saw two upstream starts (small jitter allowed)
+    gaps = [b - a for a, b in zip(starts, starts[1:])]
+    assert min(gaps) >= (1 / rate) * 0.8
+
+
+def test_interactive_jumps_ahead_of_queued_background():
+    sched = RequestScheduler(rate_per_s=50, burst=1, max_wait_s=5)
+    order = []
+
+    async def main():
+        def fetch_for(q):
+            async def fetch():
+                order.append(q)
+                return q
+            return fetch
+
+        bg = [asyncio.create_task(sched.submit(f"bg{i}", fetch_for(f"bg{i}"), priority=BACKGROUND)) for i in range(5)]
+        await asyncio.sleep(0)
+        fg = asyncio.create_task(sched.submit("fg", fetch_for("fg"), priority=INTERACTIVE))
+        await asyncio.gather(*bg, fg)
+
+    asyncio.run(main())
+    assert order.index("fg") <= 1
+
+
+def test_bounded_wait_raises_clear_timeout():
+    sched = RequestScheduler(rate_per_s=1, burst=1, max_wait_s=0.05)
+
+    async def slow():
+        await asyncio.sleep(0.5)
+        return "late"
+
+    async def main():
+        await sched.submit("a", slow)
+
+    with pytest.raises(SchedulerTimeout):
+        asyncio.run(main())
+    assert sched.stats["timeouts"] == 1
@@ -0,0 +1,159 @@
+import zipfile
+from datetime import date, datetime
+
+import numpy as np
+import pytest
+
+try:
+    from backend.services.gtfs_service import build_timetable, save_timetable, load_timetable
+    from backend.services.raptor_service import plan, rank, transit_arrivals
+except Exception:
+    from services.gtfs_service import build_timetable, save_timetable, load_timetable
+    from services.raptor_service import plan, rank, transit_arrivals
+
+# R1 runs A - B - C east (T3 leaves after T1 but overtakes it); R2 and R4 run
+# north to D from C and from E, a step-free 55 m walk from C; R3 is a slow direct
+# A - D bus that only runs on 2026-10-19 and has no wheelchair access.
+FEED = {
+    "agency.txt": "agency_id,agency_name,agency_url,agency_timezone\nTTC,Transit,http://example.com,America/Toronto\n",
+    "stops.txt": (
+        "stop_id,stop_name,stop_lat,stop_lon,location_type,parent_station,wheelchair_boarding\n"
+        "A,Alpha,43.6500,-79.4000,0,,1\n"
+        "STN,Beta Station,43.6500,-79.3850,1,,1\n"
+        "B,Beta,43.6500,-79.3850,0,STN,\n"
+        "C,Gamma,43.6500,-79.3700,0,,1\n"
+        "E,Gamma East,43.6505,-79.3700,0,,1\n"
+        "D,Delta,43.6800,-79.3700,0,,1\n"
+    ),
+    "routes.txt": (
+        "route_id,route_short_name,route_long_name,route_type\n"
+        "R1,1,King,3\nR2,2,Yonge,1\nR3,3,Express,3\nR4,4,Bay,3\n"
+    ),
+    "calendar.txt": (
+        "service_id,monday,tuesday,wednesday,thursday,friday,saturday,sunday,start_date,end_date\n"
+        "WK,1,1,1,1,1,0,0,20260101,20261231\n"
+    ),
+    "calendar_dates.txt": "service_id,date,exception_type\nSPECIAL,20261019,1\n",
+    "trips.txt": (
+        "route_id,service_id,trip_id,wheelchair_accessible\n"
+        "R1,WK,T1,1\nR1,WK,T3,2\nR2,WK,U1,2\nR3,SPECIAL,V1,2\nR4,WK,W1,1\n"
+    ),
+    "stop_times.txt": (
+        "trip_id,arrival_time,departure_time,stop_id,stop_sequence\n"
+        "T1,08:00:00,08:00:00,A,1\nT1,,,B,2\nT1,08:10:00,08:10:00,C,3\n"
+        "T3,08:01:00,08:01:00,A,1\nT3,08:04:00,08:04:00,B,2\nT3,08:08:00,08:08:00,C,3\n"
+        "U1,08:15:00,08:15:00,C,1\nU1,08:25:00,08:25:00,D,2\n"
+        "V1,08:02:00,08:02:00,A,1\nV1,08:38:00,08:38:00,D,2\n"
+        "W1,08:30:00,08:30:00,E,1\nW1,08:40:00,08:40:00,D,2\n"
+    ),
+}
+
+A, D = (43.6500, -79.4000), (43.6800, -79.3700)
+
+
+def _feed(tmp_path):
+    path = tmp_path / "gtfs.zip"
+    with zipfile.ZipFile(path, "w") as z:
+        for name, text in FEED.items():
+            z.writestr(name, text)
+    return build_timetable(path, log=lambda msg: None)
+
+
+def _trips(itinerary):
+    return [leg["trip_id"] for leg in itinerary["legs"] if leg["mode"] != "walk"]
+
+
+def test_import_fills_times_inherits_wheelchair_and_splits_overtaking(tmp_path):
+    tt = _feed(tmp_path)
+    ids = tt.index_of("stop_id")
+    assert "STN" not in ids and tt.n_stops == 5
+    assert tt.stop_wheelchair[ids["B"]] == 1
+
+    # T3 overtakes T1, so R1 needs two patterns to keep departures sorted per stop
+    r1 = [p for p in range(tt.n_patterns) if tt.routes[tt.pattern_route[p]]["route_id"] == "R1"]
+    assert len(r1) == 2
+    t1 = tt.index_of("trip_id")["T1"]
+    p = tt.trip_pattern[t1]
+    nt = tt.pattern_trip_ptr[p + 1] - tt.pattern_trip_ptr[p]
+    local = t1 - tt.pattern_trip_ptr[p]
+    times = [int(tt.arrival[tt.pattern_time_ptr[p] + j * nt + local]) for j in range(3)]
+    # B is halfway between A and C, so its missing time is halfway too
+    assert times == [8 * 3600, 8 * 3600 + 300, 8 * 3600 + 600]
+
+    # C and E are 55 m apart and both step-free
+    c, e = ids["C"], ids["E"]
+    lo, hi = tt.transfer_ptr[c], tt.transfer_ptr[c + 1]
+    assert tt.transfer_to[lo:hi].tolist() == [e] and tt.transfer_step_free[lo]
+
+    save_timetable(tt, tmp_path / "tt.bin")
+    back = load_timetable(tmp_path / "tt.bin")
+    for name, a in tt.arrays().items():
+        assert np.array_equal(a, getattr(back, name)), name
+    assert back.strings("trip_id") == tt.strings("trip_id") and back.meta["timezone"] == "America/Toronto"
+
+
+def test_raptor_returns_pareto_itineraries_and_honours_accessible_only(tmp_path):
+    tt = _feed(tmp_path)
+    depart = datetime(2026, 10, 19, 7, 55)
+
+    its = plan(tt, A, D, depart)
+    # one ride arriving 08:38, or two rides (overtaking T3, then U1) arriving 08:25
+    assert [_trips(i) for i in its] == [["V1"], ["T3", "U1"]]
+    assert its[1]["arrival"] == "2026-10-19T08:25:00-04:00" and its[1]["transfers"] == 1
+    assert not its[1]["wheelchair_accessible"]
+
+    step_free = plan(tt, A, D, depart, accessible=True)
+    assert [_trips(i) for i in step_free] == [["T1", "W1"]]
+    legs = step_free[0]["legs"]
+    assert [leg["mode"] for leg in legs] == ["bus", "walk", "bus"]
+    assert legs[1]["from"]["stop_id"] == "C" and legs[1]["to"]["stop_id"] == "E"
+    assert step_free[0]["wheelchair_accessible"]
+
+
+def test_service_calendar_decides_which_trips_run(tmp_path):
+    tt = _feed(tmp_path)
+    monday, tuesday, saturday = date(2026, 10, 19), date(2026, 10, 20), date(2026, 10, 24)
+    services = dict(zip(tt.service_ids, range(len(tt.service_ids))))
+    assert tt.active_services(monday)[[services["WK"], services["SPECIAL"]]].tolist() == [True, True]
+    assert tt.active_services(tuesday)[[services["WK"], services["SPECIAL"]]].tolist() == [True, False]
+
+    assert [_trips(i) for i in plan(tt, A, D, datetime(2026, 10, 20, 7, 55))] == [["T3", "U1"]]
+    assert plan(tt, A, D, datetime(2026, 10, 24, 7, 55)) == []
+    # after the last departure there is nothing either
+    assert plan(tt, A, D, datetime(2026, 10, 20, 8, 20)) == []
+
+
+def test_multi_criteria_front_and_optimize_picks_a_point(tmp_path):
+    tt = _feed(tmp_path)
+    its = plan(tt, A, D, datetime(2026, 10, 19, 7, 55), multi_criteria=True, carbon_gco2_per_kwh=30)
+    # T3 + U1 ties T1 + U1 once times are stepped, so only one is kept; the slow
+    # V1 ride (no transfer) and the later, step-free T1 + walk + W1 are on the front too
+    assert [_trips(i) for i in its] == [["T1", "U1"], ["V1"], ["T1", "W1"]]
+    assert [i["barriers"] for i in its] == [1, 1, 0]
+    # the subway leg on a clean grid emits less than any all-bus option
+    assert its[0]["co2_g"] < its[1]["co2_g"] < its[2]["co2_g"]
+
+    assert _trips(rank(its, "time")[0]) == ["T1", "U1"]
+    assert _trips(rank(its, "emissions")[0]) == ["T1", "U1"]
+    assert _trips(rank(its, "accessibility")[0]) == ["T1", "W1"]
+    with pytest.raises(ValueError):
+        rank(its, "scenic")
+
+    # A to B is short enough to walk, but a straight-line walk is not known to be step-free
+    b = (43.6500, -79.3850)
+    assert plan(tt, A, b, datetime(2026, 10, 19, 7, 55), multi_criteria=True)[0]["modes"] == ["walk"]
+    assert all(i["modes"] != ["walk"] for i in plan(tt, A, b, datetime(2026, 10, 19, 7, 55), accessible=True, multi_criteria=True))
+
+
+def test_transit_arrivals_seed_stops_reached_by_riding_within_the_budget(tmp_path):
+    tt = _feed(tmp_path)
+    ids = tt.index_of("stop_id")
+    at = {(lat, lon): secs for lat, lon, secs in transit_arrivals(tt, A, 20 * 60, datetime(2026, 10, 20, 7, 59))}
+    where = {s: (float(tt.stop_lat[i]), float(tt.stop_lon[i])) for s, i in ids.items()}
+    # T3 reaches C at 08:08; E is a walk on from there; D (08:25) is past the budget and A is the origin
+    assert at[where["C"]] == 9 * 60 and where["E"] in at
+    assert where["D"] not in at and where["A"] not in at
+    # riding only accessible trips, T1 gets to C two minutes later
+    step_free = {(lat, lon): secs for lat, lon, secs in
+                 transit_arrivals(tt, A, 20 * 60, datetime(2026, 10, 20, 7, 59), accessible=True)}
+    assert step_free[where["C"]] == 11 * 60
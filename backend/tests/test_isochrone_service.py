@@ -0,0 +1,97 @@
+import numpy as np
+import pytest
+
+try:
+    from backend.services import maps_service as ms
+    from backend.services.isochrone_service import (
+        IsochroneCache, PlaceSet, bounded_dijkstra, compute_isochrone, outline,
+    )
+    from backend.services.walking_router_service import WalkingRouter, WEIGHTINGS, astar
+    from backend.tests.test_walking_router_service import _grid, _stairs_graph
+except Exception:
+    from services import maps_service as ms
+    from services.isochrone_service import (
+        IsochroneCache, PlaceSet, bounded_dijkstra, compute_isochrone, outline,
+    )
+    from services.walking_router_service import WalkingRouter, WEIGHTINGS, astar
+    from tests.test_walking_router_service import _grid, _stairs_graph
+
+
+def _inside(lon, lat, ring):
+    xs, ys = np.asarray(ring)[:, 0], np.asarray(ring)[:, 1]
+    hit = False
+    for i in range(len(ring) - 1):
+        if (ys[i] > lat) != (ys[i + 1] > lat):
+            x = xs[i] + (lat - ys[i]) * (xs[i + 1] - xs[i]) / (ys[i + 1] - ys[i])
+            hit ^= lon < x
+    return hit
+
+
+def test_bounded_dijkstra_matches_point_to_point_costs():
+    g = _grid(25)
+    r = WalkingRouter(g)
+    costs = r.costs(WEIGHTINGS["step_free"])
+    limit = 600.0
+    nodes, cost = bounded_dijkstra(g, costs, [(300, 0.0)], limit)
+    reached = dict(zip(nodes.tolist(), cost.tolist()))
+    assert cost.max() <= limit
+    for t in range(0, g.n_nodes, 7):
+        found = astar(g, costs, 300, t, r._x, r._y)
+        if found is not None and found[0] <= limit:
+            assert reached[t] == pytest.approx(found[0])
+        else:
+            assert t not in reached
+
+
+def test_stairs_and_seeds_change_what_is_reachable():
+    g = _stairs_graph()
+    r = WalkingRouter(g)
+    places = PlaceSet(["Top of stairs"], ["bus_stop"], g.lat[1:2].copy(), g.lon[1:2].copy())
+    lat, lon = float(g.lat[0]), float(g.lon[0])
+
+    fast = compute_isochrone(r, lat, lon, 60, WEIGHTINGS["shortest"], places)
+    assert [s["name"] for s in fast["stops"]] == ["Top of stairs"]
+    assert fast["stops"][0]["time_s"] == pytest.approx(50 / 1.3, abs=1)
+
+    step_free = compute_isochrone(r, lat, lon, 60, WEIGHTINGS["step_free"], places)
+    assert step_free["stops"] == []
+    # arriving at node 1 by transit 10 s in puts it back in reach
+    seeded = compute_isochrone(r, lat, lon, 60, WEIGHTINGS["step_free"], places,
+                               seeds=[(float(g.lat[1]), float(g.lon[1]), 10.0)])
+    assert seeded["stops"][0]["time_s"] == pytest.approx(10.0)
+
+
+def test_outline_covers_reached_nodes_and_results_are_cached():
+    g = _grid(40)
+    r = WalkingRouter(g)
+    lat, lon = float(g.lat[820]), float(g.lon[820])
+    res = compute_isochrone(r, lat, lon, 480, WEIGHTINGS["step_free"])
+    assert res["polygon"]["type"] == "Polygon"
+    ring = res["polygon"]["coordinates"][0]
+    assert ring[0] == ring[-1]
+    nodes, _ = bounded_dijkstra(g, r.costs(WEIGHTINGS["step_free"]), [(820, 0.0)], 480 * 1.3)
+    assert all(_inside(float(g.lon[n]), float(g.lat[n]), ring) for n in nodes.tolist())
+    # far corner of the grid is well outside a 8 minute walk
+    assert not _inside(float(g.lon[0]), float(g.lat[0]), ring)
+    assert outline(np.empty(0), np.empty(0), g._kx) is None
+
+    cache = IsochroneCache(grid_m=50)
+    key = cache.key(lat, lon, 480, WEIGHTINGS["step_free"])
+    assert cache.get(key) is None
+    cache.put(key, res)
+    assert cache.get(cache.key(lat + 1e-5, lon, 480, WEIGHTINGS["step_free"])) is res
+    assert cache.get(cache.key(lat, lon, 600, WEIGHTINGS["step_free"])) is None
+    assert cache.snapshot()["hits"] == 1
+
+
+def test_a_cached_isochrone_reports_the_requests_own_origin(monkeypatch):
+    g = _grid(20)
+    monkeypatch.setattr(ms, "_walking_router", WalkingRouter(g))
+    monkeypatch.setattr(ms, "_place_set", lambda: PlaceSet([], [], np.empty(0), np.empty(0)))
+    monkeypatch.setattr(ms, "isochrone_cache", IsochroneCache(grid_m=50))
+    lat, lon = float(g.lat[210]), float(g.lon[210])
+    first = ms.isochrone(lat, lon, 5)
+    again = ms.isochrone(lat + 1e-5, lon, 5)
+    assert not first["cached"] and again["cached"]
+    assert again["origin"] == {"lat": lat + 1e-5, "lon": lon}
+    assert first["origin"] == {"lat": lat, "lon": lon} and again["polygon"] == first["polygon"]
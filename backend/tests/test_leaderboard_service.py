@@ -0,0 +1,47 @@
+import random
+
+try:
+    from backend.services.leaderboard_service import LeaderboardService, Leaderboard
+except Exception:
+    from leaderboard_service import LeaderboardService, Leaderboard
+
+
+def test_leaderboard_rank_and_top_match_sorted_order():
+    board = Leaderboard()
+    rng = random.Random(7)
+    scores = {}
+    for i in range(500):
+        uid = f"u{i}"
+        scores[uid] = rng.randint(0, 50)
+        board.set(uid, scores[uid])
+    # update a few users in place
+    for uid in ("u1", "u42", "u499"):
+        scores[uid] += 100
+        board.set(uid, scores[uid])
+    board.remove("u3")
+    del scores["u3"]
+
+    expected = sorted(scores.items(), key=lambda kv: (-kv[1], kv[0]))
+    assert [e["user_id"] for e in board.top(20)] == [uid for uid, _ in expected[:20]]
+    assert [e["user_id"] for e in board.top(5, offset=100)] == [uid for uid, _ in expected[100:105]]
+    for pos, (uid, _) in enumerate(expected, 1):
+        assert board.rank(uid) == pos
+
+
+def test_service_city_and_friend_boards_update_incrementally():
+    s = LeaderboardService()
+    s.record_trip("alice", "Toronto", points=100, co2_saved_kg=1.0)
+    s.record_trip("bob", "toronto ", points=300, co2_saved_kg=0.5)
+    s.record_trip("carol", "Vancouver", points=900, co2_saved_kg=9.0)
+    s.set_friends("alice", ["bob", "carol"])
+
+    assert [e["user_id"] for e in s.top("Toronto")] == ["bob", "alice"]
+    assert [e["user_id"] for e in s.top("Toronto", metric="co2_saved_kg")] == ["alice", "bob"]
+    assert s.rank("alice")["rank"] == 2
+
+    s.record_trip("alice", "Toronto", points=250, co2_saved_kg=0.0)
+    assert s.rank("alice")["rank"] == 1
+    assert [e["user_id"] for e in s.friends_top("alice")] == ["carol", "alice", "bob"]
+    # reading a board for someone with no friend group stores nothing
+    boards = len(s._boards)
+    assert s.friends_top("dave") == [] and "dave" not in s._friends and len(s._boards) == boards
@@ -0,0 +1,44 @@
+import asyncio
+
+try:
+    from backend.services import maps_service as ms
+    from backend.services.route_cache_service import MatrixCache
+except Exception:
+    from services import maps_service as ms
+    from services.route_cache_service import MatrixCache
+
+
+def test_table_blocks_respect_coordinate_limit_and_cover_matrix():
+    for n, m in [(3, 4), (150, 7), (7, 150), (120, 130)]:
+        blocks = ms._table_blocks(n, m, 100)
+        assert all(len(s) + len(d) <= 100 for s, d in blocks)
+        covered = {(i, j) for s, d in blocks for i in s for j in d}
+        assert len(covered) == n * m
+
+
+def test_matrix_chunks_concurrently_and_caches_per_origin_cell(monkeypatch):
+    calls = []
+
+    async def fake_block(client, sem, profile, srcs, dsts):
+        calls.append((len(srcs), len(dsts)))
+        # duration = 100 * src lat offset + dst index, easy to check
+        return {
+            "code": "Ok",
+            "durations": [[round(s[0] * 1000) + d[1] for d in dsts] for s in srcs],
+            "distances": [[1.0 for _ in dsts] for _ in srcs],
+        }
+
+    monkeypatch.setattr(ms, "_osrm_table_block", fake_block)
+    monkeypatch.setattr(ms, "matrix_cache", MatrixCache(grid_m=10))
+    monkeypatch.setattr(ms, "OSRM_TABLE_MAX_COORDS", 10)
+
+    sources = [(0.001 * i, 0.0) for i in range(6)]
+    dests = [(1.0, float(j)) for j in range(8)]
+    out = asyncio.run(ms.travel_time_matrix(sources, dests))
+    assert out["durations_s"][5][7] == 5 + 7
+    assert len(calls) > 1 and all(a + b <= 10 for a, b in calls)
+
+    calls.clear()
+    again = asyncio.run(ms.travel_time_matrix(sources[:2], dests))
+    assert calls == []
+    assert again["durations_s"][1] == out["durations_s"][1]
@@ -0,0 +1,53 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+try:
+    from backend.services.notification_service import NotificationInbox
+except Exception:
+    from notification_service import NotificationInbox
+
+
+def _fill(inbox, user="u1", days=3, per_day=5):
+    start = datetime(2026, 5, 1, 8, 0)
+    for d in range(days):
+        for i in range(per_day):
+            inbox.add(user, "arrival", f"d{d}-n{i}", created_at=start + timedelta(days=d, minutes=i))
+
+
+def test_cursor_pages_walk_newest_to_oldest_across_days():
+    inbox = NotificationInbox(max_per_user=100, max_days=10)
+    _fill(inbox)
+
+    seen = []
+    cursor = None
+    while True:
+        page = inbox.page("u1", limit=4, cursor=cursor)
+        seen += [n["message"] for n in page["notifications"]]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+
+    assert len(seen) == 15
+    assert seen[0] == "d2-n4"
+    assert seen[-1] == "d0-n0"
+
+
+def test_day_filter_and_retention_bounds():
+    inbox = NotificationInbox(max_per_user=7, max_days=2)
+    _fill(inbox)
+
+    assert inbox.count("u1") == 7
+    day0 = datetime(2026, 5, 1).date()
+    day1 = datetime(2026, 5, 2).date()
+    assert inbox.page("u1", day=day0)["notifications"] == []
+    assert [n["message"] for n in inbox.page("u1", day=day1)["notifications"]] == ["d1-n4", "d1-n3"]
+
+
+def test_invalid_type_and_cursor_raise():
+    inbox = NotificationInbox()
+    with pytest.raises(ValueError):
+        inbox.add("u1", "spam", "hi")
+    inbox.add("u1", "bus_delay", "late")
+    with pytest.raises(ValueError):
+        inbox.page("u1", cursor="garbage")
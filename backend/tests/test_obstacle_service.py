@@ -0,0 +1,83 @@
+import asyncio
+
+import numpy as np
+
+try:
+    from backend.services import maps_service as ms
+    from backend.services.obstacle_service import ObstacleIndex, validate_route, read_csv, _segment_dist2
+except Exception:
+    from services import maps_service as ms
+    from services.obstacle_service import ObstacleIndex, validate_route, read_csv, _segment_dist2
+
+M_LAT = 1 / 111_320
+
+
+def _line(lat0, lon0, lat1, lon1, n=50):
+    return np.column_stack([np.linspace(lon0, lon1, n), np.linspace(lat0, lat1, n)]).tolist()
+
+
+def test_grid_match_equals_brute_force_distance():
+    rng = np.random.default_rng(3)
+    obstacles = [
+        {"id": i, "lat": 43.64 + rng.random() * 0.02, "lon": -79.40 + rng.random() * 0.03,
+         "kind": "stairs", "radius_m": rng.random() * 30}
+        for i in range(3000)
+    ]
+    index = ObstacleIndex(obstacles)
+    lat = 43.641 + np.cumsum(rng.normal(2e-5, 1e-4, 400)).clip(0, 0.018)
+    lon = np.linspace(-79.399, -79.372, 400)
+    coords = np.column_stack([lon, lat])
+    ids, segs, dists = index.near_route(coords, buffer_m=15)
+
+    x, y = lon * index._kx, lat * 111_320
+    d = np.sqrt(np.min(_segment_dist2(index.x[:, None], index.y[:, None], x[:-1], y[:-1], x[1:], y[1:]), axis=1))
+    expected = np.flatnonzero(d <= 15 + index.radius_m)
+    assert sorted(ids.tolist()) == expected.tolist()
+    assert np.allclose(dists[np.argsort(ids)], d[expected])
+
+
+def test_needs_decide_what_blocks(tmp_path):
+    path = tmp_path / "obstacles.csv"
+    path.write_text(
+        "id,lat,lon,kind,radius_m,description\n"
+        f"s1,{43.65 + 5 * M_LAT},-79.385,stairs,0,Stairs to bridge\n"
+        "c1,43.65,-79.375,construction,10,Sidewalk closed\n"
+        "far,43.66,-79.38,stairs,0,Other street\n"
+        "x,not-a-number,-79.38,stairs,0,bad row\n"
+    )
+    index = ObstacleIndex(read_csv(path))
+    assert len(index) == 3
+    route = _line(43.65, -79.39, 43.65, -79.37)
+
+    anyone = validate_route(index, route, "shortest")
+    assert not anyone["ok"]
+    assert [o["id"] for o in anyone["blocking"]] == ["c1"]
+    assert [o["id"] for o in anyone["warnings"]] == ["s1"]
+
+    step_free = validate_route(index, route, "step_free")
+    # ordered along the route: the stairs come first
+    assert [o["id"] for o in step_free["blocking"]] == ["s1", "c1"]
+    assert validate_route(index, _line(43.64, -79.39, 43.64, -79.37), "wheelchair")["ok"]
+
+
+def test_blocked_foot_route_falls_back_to_osrm_alternative(monkeypatch):
+    index = ObstacleIndex([{"id": "s1", "lat": 43.65, "lon": -79.38, "kind": "stairs"}])
+    direct = {"geometry": {"coordinates": _line(43.65, -79.39, 43.65, -79.37)}, "distance": 1600}
+    detour = {"geometry": {"coordinates": _line(43.65, -79.39, 43.651, -79.37)}, "distance": 1700}
+    calls = []
+
+    async def fake_route(*args, profile="foot", alternatives=False):
+        calls.append(alternatives)
+        return {"code": "Ok", "routes": [direct, detour] if alternatives else [direct]}
+
+    monkeypatch.setattr(ms, "route_osrm", fake_route)
+    monkeypatch.setattr(ms, "get_obstacle_index", lambda: index)
+
+    ok = asyncio.run(ms.route_osrm_checked(43.65, -79.39, 43.65, -79.37, needs="shortest"))
+    assert calls == [False] and ok["validation"][0]["ok"] and ok["routes"][0] is direct
+
+    calls.clear()
+    out = asyncio.run(ms.route_osrm_checked(43.65, -79.39, 43.65, -79.37, needs="step_free"))
+    assert calls == [False, True]
+    assert out["routes"][0] is detour and out["validation"][0]["ok"]
+    assert not out["validation"][1]["ok"]
@@ -0,0 +1,71 @@
+import bz2
+
+import numpy as np
+import pytest
+
+try:
+    from backend.services import osm_import_service as osm
+    from backend.services.walking_graph_service import load_graph, STEPS, KERB_RAISED, SURFACE_ROUGH
+    from backend.services.walking_router_service import WalkingRouter, WEIGHTINGS
+except Exception:
+    from services import osm_import_service as osm
+    from services.walking_graph_service import load_graph, STEPS, KERB_RAISED, SURFACE_ROUGH
+    from services.walking_router_service import WalkingRouter, WEIGHTINGS
+
+# 1 --steps-- 2 is the short way; 1 - 3 - 4 - 2 goes round on a footway with a
+# raised kerb at 4 and an 8% incline; 5 - 6 is a motorway; 7 is never referenced.
+OSM = """<?xml version="1.0" encoding="UTF-8"?>
+<osm version="0.6">
+  <node id="1" lat="43.0000" lon="-79.0000"/>
+  <node id="2" lat="43.0000" lon="-78.9994"/>
+  <node id="3" lat="43.0005" lon="-79.0000"/>
+  <node id="4" lat="43.0005" lon="-78.9994"><tag k="kerb" v="raised"/></node>
+  <node id="5" lat="43.0100" lon="-79.0000"/>
+  <node id="6" lat="43.0100" lon="-78.9990"/>
+  <node id="7" lat="43.0200" lon="-79.0000"><tag k="shop" v="bakery"/><tag k="wheelchair" v="no"/></node>
+  <way id="10"><nd ref="1"/><nd ref="2"/><tag k="highway" v="steps"/><tag k="incline" v="up"/></way>
+  <way id="11"><nd ref="1"/><nd ref="3"/><nd ref="4"/><tag k="highway" v="footway"/><tag k="surface" v="sett"/></way>
+  <way id="12"><nd ref="4"/><nd ref="2"/><tag k="highway" v="footway"/><tag k="incline" v="8%"/></way>
+  <way id="13"><nd ref="5"/><nd ref="6"/><tag k="highway" v="motorway"/></way>
+  <way id="14"><nd ref="3"/><nd ref="99"/><tag k="highway" v="footway"/></way>
+  <relation id="20"><member type="way" ref="10" role=""/></relation>
+</osm>
+"""
+
+
+@pytest.mark.parametrize("suffix", [".osm", ".osm.bz2"])
+def test_import_builds_walkable_graph(tmp_path, monkeypatch, suffix):
+    src = tmp_path / f"extract{suffix}"
+    data = OSM.encode("utf-8")
+    src.write_bytes(bz2.compress(data) if suffix.endswith(".bz2") else data)
+    monkeypatch.setattr(osm, "NODE_BATCH", 2)  # exercise batched node matching
+
+    stats = osm.import_osm(src, tmp_path / "walk.bin", log=lambda *_: None)
+    g = load_graph(tmp_path / "walk.bin")
+
+    # nodes 1-4 only: motorway dropped, node 7 unreferenced, node 99 missing from the extract
+    assert stats["nodes"] == g.n_nodes == 4
+    assert g.n_edges == 2 * 4
+    assert sorted(np.round(g.lat, 4).tolist()) == [43.0, 43.0, 43.0005, 43.0005]
+    assert ((g.flags & STEPS) != 0).sum() == 2
+    assert ((g.flags & KERB_RAISED) != 0).sum() == 4   # both edges touching node 4, both directions
+    assert ((g.flags & SURFACE_ROUGH) != 0).sum() == 4
+    assert np.isclose(g.grade, 0.08).sum() == 1 and np.isclose(g.grade, -0.08).sum() == 1
+
+    router = WalkingRouter(g)
+    short = router.route(43.0, -79.0, 43.0, -78.9994, WEIGHTINGS["shortest"])
+    assert short["features"].get("steps") == 1
+    with pytest.raises(ValueError):
+        router.route(43.0, -79.0, 43.0, -78.9994, WEIGHTINGS["step_free"])  # raised kerb blocks the detour
+
+
+def test_tag_parsing():
+    assert osm.parse_incline("8%") == pytest.approx(0.08)
+    assert osm.parse_incline("-4 %") == pytest.approx(-0.04)
+    assert osm.parse_incline("5°") == pytest.approx(0.0875, abs=1e-4)
+    assert osm.parse_incline("up") == 0.0
+    assert osm.way_is_walkable({"highway": "footway"})
+    assert not osm.way_is_walkable({"highway": "footway", "access": "private"})
+    assert not osm.way_is_walkable({"highway": "motorway"})
+    assert osm.way_is_walkable({"highway": "motorway", "foot": "yes"})
+    assert osm.way_flags({"highway": "footway", "wheelchair": "limited", "smoothness": "bad"}) != 0
@@ -0,0 +1,126 @@
+import zipfile
+
+import pytest
+
+try:
+    from backend.services import pathway_service
+except Exception:
+    from services import pathway_service
+
+# the modules pathway_service itself sees
+realtime_service = pathway_service.realtime_service
+gtfs_service = realtime_service.gtfs_service
+
+# Union: street entrances E1 and E2, a concourse node N1 below, platforms P1 (with
+# boarding area BA1, reached by elevator EL2 or stairs) and P2 (down a gentle ramp).
+# E1 has stairs and elevator EL1; E2 only a one-way escalator down and a steep ramp.
+FEED = {
+    "agency.txt": "agency_id,agency_name,agency_url,agency_timezone\nTTC,Transit,http://example.com,America/Toronto\n",
+    "levels.txt": "level_id,level_index,level_name\nL0,0,Street\nL1,-1,Concourse\nL2,-2,Platforms\n",
+    "stops.txt": (
+        "stop_id,stop_name,stop_lat,stop_lon,location_type,parent_station,level_id,wheelchair_boarding\n"
+        "UNION,Union,43.6452,-79.3806,1,,,1\n"
+        "E1,Front St entrance,43.6454,-79.3806,2,UNION,L0,1\n"
+        "E2,Bay St entrance,43.6450,-79.3800,2,UNION,L0,1\n"
+        "N1,Concourse,43.6452,-79.3806,3,UNION,L1,\n"
+        "P1,Platform 1,43.6452,-79.3808,0,UNION,L2,1\n"
+        "BA1,Platform 1 car 4,43.6452,-79.3809,4,P1,L2,\n"
+        "P2,Platform 2,43.6452,-79.3804,0,UNION,L2,1\n"
+        "K,King,43.6490,-79.3780,0,,,1\n"
+    ),
+    "pathways.txt": (
+        "pathway_id,from_stop_id,to_stop_id,pathway_mode,is_bidirectional,length,traversal_time,stair_count,max_slope,"
+        "min_width,signposted_as\n"
+        "PW1,E1,N1,2,1,,,20,,,\n"
+        "EL1,E1,N1,5,1,,45,,,,Elevator to concourse\n"
+        "ES1,E2,N1,4,0,30,,,,,\n"
+        "EL2,N1,BA1,5,1,,50,,,,Elevator to platform 1\n"
+        "PW5,N1,P1,2,1,,,,,,\n"
+        "PW6,N1,P2,1,1,40,,,0.05,1.5,To platform 2\n"
+        "PW7,E2,N1,1,1,60,,,0.12,,\n"
+    ),
+    "routes.txt": "route_id,route_short_name,route_long_name,route_type\nL1,1,Line 1,1\n",
+    "calendar.txt": (
+        "service_id,monday,tuesday,wednesday,thursday,friday,saturday,sunday,start_date,end_date\n"
+        "WK,1,1,1,1,1,0,0,20260101,20261231\n"
+    ),
+    "trips.txt": "route_id,service_id,trip_id\nL1,WK,S1\n",
+    "stop_times.txt": (
+        "trip_id,arrival_time,departure_time,stop_id,stop_sequence\n"
+        "S1,08:00:00,08:00:00,P1,1\nS1,08:03:00,08:03:00,K,2\n"
+    ),
+}
+
+
+def _feed_path(tmp_path):
+    path = tmp_path / "gtfs.zip"
+    with zipfile.ZipFile(path, "w") as z:
+        for name, text in FEED.items():
+            z.writestr(name, text)
+    return path
+
+
+def _legs(path):
+    return [leg["pathway_id"] for leg in path["legs"]]
+
+
+@pytest.fixture
+def stations(tmp_path, monkeypatch):
+    out = tmp_path / "pathways.bin"
+    built = pathway_service.import_pathways(_feed_path(tmp_path), out, log=lambda msg: None)
+    assert built.n_stations == 1
+    loaded = pathway_service.load_stations(out)
+    monkeypatch.setattr(pathway_service, "_stations", loaded)
+    monkeypatch.setattr(pathway_service, "_loaded", True)
+    monkeypatch.setattr(pathway_service, "_status", {})
+    monkeypatch.setattr(realtime_service, "_live", None)
+    return loaded
+
+
+def test_step_free_path_uses_elevators_and_boarding_areas(stations):
+    path = pathway_service.station_path("UNION", "E1", "P1")
+    # platform 1 counts as reached at its boarding area
+    assert _legs(path) == ["EL1", "EL2"] and path["to"]["stop_id"] == "BA1"
+    assert path["step_free"] and path["time_s"] == 95
+    assert [(leg["from_level"], leg["to_level"]) for leg in path["legs"]] == [("Street", "Concourse"), ("Concourse", "Platforms")]
+    # with stairs allowed the 20 steps and the flight down are quicker
+    assert _legs(pathway_service.station_path("UNION", "E1", "P1", step_free=False)) == ["PW1", "PW5"]
+    # E2 has only an escalator and a 12% ramp, so "any entrance" picks E1
+    assert pathway_service.station_path("UNION", "E2", "P2") is None
+    assert pathway_service.station_path("UNION", None, "P2")["from"]["stop_id"] == "E1"
+    # the escalator only runs down
+    assert pathway_service.station_path("UNION", "N1", "E2", step_free=False)["legs"][0]["pathway_id"] == "PW7"
+
+    with pytest.raises(LookupError):
+        pathway_service.station_path("UNION", "E1", "NOPE")
+    with pytest.raises(LookupError):
+        pathway_service.station_path("UNION", "E1", "K")
+
+
+def test_outages_invalidate_only_their_station(stations):
+    assert _legs(pathway_service.station_path("UNION", "E1", "P1")) == ["EL1", "EL2"]
+    misses = stations.memo_misses
+    pathway_service.station_path("UNION", "E1", "P1")
+    assert stations.memo_misses == misses and stations.memo_hits >= 1
+
+    pathway_service.set_pathway_status("EL2", False)
+    assert pathway_service.station_path("UNION", "E1", "P1") is None
+    assert stations.versions[0] == 1
+    pathway_service.set_pathway_status("EL2", True)
+    assert _legs(pathway_service.station_path("UNION", "E1", "P1")) == ["EL1", "EL2"]
+    assert stations.versions[0] == 2
+    with pytest.raises(LookupError):
+        pathway_service.set_pathway_status("NOPE", False)
+
+
+def test_realtime_accessibility_alert_takes_out_elevators_at_a_node(stations, tmp_path, monkeypatch):
+    tt = gtfs_service.build_timetable(_feed_path(tmp_path), log=lambda msg: None)
+    monkeypatch.setattr(gtfs_service, "_timetable", tt)
+    monkeypatch.setattr(gtfs_service, "_loaded", True)
+    feed = realtime_service.parse_feed(b"""{"header": {"gtfsRealtimeVersion": "2.0"}, "entity": [
+        {"id": "a1", "alert": {"effect": %d, "informedEntity": [{"stopId": "E1"}],
+         "headerText": {"translation": [{"text": "Front St elevator out"}]}}}]}""" % realtime_service.ACCESSIBILITY_ISSUE)
+    monkeypatch.setattr(realtime_service, "_live", realtime_service.apply_alerts(tt, feed))
+    # EL1 is out, so the only step-free way down is gone; the stairs still work
+    assert pathway_service.station_path("UNION", None, "P2") is None
+    assert _legs(pathway_service.station_path("UNION", "E1", "P2", step_free=False)) == ["PW1", "PW6"]
@@ -0,0 +1,190 @@
+import zipfile
+from datetime import datetime
+
+import pytest
+
+try:
+    from backend.services import plan_cache_service
+    from backend.services.raptor_service import plan as raptor_plan
+except Exception:
+    from services import plan_cache_service
+    from services.raptor_service import plan as raptor_plan
+
+# the modules the cache itself sees
+realtime_service = plan_cache_service.realtime_service
+gtfs_service = realtime_service.gtfs_service
+
+# R1 runs A - B - C (T1 at 08:00, T2 at 08:05), R2 runs C - D (U1 08:15, U2 08:30); R3 runs X - Y alone.
+FEED = {
+    "agency.txt": "agency_id,agency_name,agency_url,agency_timezone\nTTC,Transit,http://example.com,America/Toronto\n",
+    "stops.txt": (
+        "stop_id,stop_name,stop_lat,stop_lon,wheelchair_boarding\n"
+        "A,Alpha,43.6500,-79.4000,1\nB,Beta,43.6500,-79.3850,1\nC,Gamma,43.6500,-79.3700,1\n"
+        "D,Delta,43.6800,-79.3700,1\nX,Xray,43.7000,-79.5000,1\nY,Yankee,43.7300,-79.5000,1\n"
+    ),
+    "routes.txt": "route_id,route_short_name,route_long_name,route_type\nR1,1,King,3\nR2,2,Yonge,3\nR3,3,Other,3\n",
+    "calendar.txt": (
+        "service_id,monday,tuesday,wednesday,thursday,friday,saturday,sunday,start_date,end_date\n"
+        "WK,1,1,1,1,1,0,0,20260101,20261231\n"
+    ),
+    "trips.txt": "route_id,service_id,trip_id,wheelchair_accessible\nR1,WK,T1,1\nR1,WK,T2,1\nR2,WK,U1,1\nR2,WK,U2,1\nR3,WK,X1,1\n",
+    "stop_times.txt": (
+        "trip_id,arrival_time,departure_time,stop_id,stop_sequence\n"
+        "T1,08:00:00,08:00:00,A,1\nT1,08:05:00,08:05:00,B,2\nT1,08:10:00,08:10:00,C,3\n"
+        "T2,08:05:00,08:05:00,A,1\nT2,08:10:00,08:10:00,B,2\nT2,08:15:00,08:15:00,C,3\n"
+        "U1,08:15:00,08:15:00,C,1\nU1,08:25:00,08:25:00,D,2\n"
+        "U2,08:30:00,08:30:00,C,1\nU2,08:40:00,08:40:00,D,2\n"
+        "X1,08:00:00,08:00:00,X,1\nX1,08:10:00,08:10:00,Y,2\n"
+    ),
+}
+
+A, D, X, Y = (43.6500, -79.4000), (43.6800, -79.3700), (43.7000, -79.5000), (43.7300, -79.5000)
+DEPART = datetime(2026, 10, 19, 7, 55)
+NOW = datetime(2026, 10, 19, 7, 50).timestamp()
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    path = tmp_path / "gtfs.zip"
+    with zipfile.ZipFile(path, "w") as z:
+        for name, text in FEED.items():
+            z.writestr(name, text)
+    tt = gtfs_service.build_timetable(path, log=lambda msg: None)
+    monkeypatch.setattr(gtfs_service, "_timetable", tt)
+    monkeypatch.setattr(gtfs_service, "_loaded", True)
+    monkeypatch.setattr(realtime_service, "_live", None)
+    return plan_cache_service.PlanCache()
+
+
+class Planner:
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, origin, destination, depart, accessible, multi_criteria, carbon):
+        self.calls.append((origin, destination, depart, accessible))
+        return raptor_plan(realtime_service.live_timetable(), origin, destination, depart, accessible,
+                           multi_criteria=multi_criteria, carbon_gco2_per_kwh=carbon)
+
+
+def _rides(its):
+    return [[leg["trip_id"] for leg in it["legs"] if leg["mode"] != "walk"] for it in its]
+
+
+def _publish(monkeypatch, apply, feed):
+    monkeypatch.setattr(realtime_service, "_live", apply(realtime_service.live_timetable(), feed, now=NOW))
+
+
+def test_requests_in_one_cell_and_bucket_share_a_plan(cache):
+    planner = Planner()
+    first = cache.plan(planner, A, D, DEPART, now=NOW)
+    assert ["T1", "U1"] in _rides(first)
+    # 10 m away, two minutes later: same plan, since nothing it rides has left yet
+    again = cache.plan(planner, (A[0] + 0.0001, A[1]), D, datetime(2026, 10, 19, 7, 57), now=NOW)
+    assert _rides(again) == _rides(first) and len(planner.calls) == 1
+    assert planner.calls[0][2].replace(tzinfo=None) == DEPART
+    # other needs, another bucket or a different zone are other plans
+    cache.plan(planner, A, D, DEPART, accessible=True, now=NOW)
+    cache.plan(planner, A, D, datetime(2026, 10, 19, 8, 1), now=NOW)
+    cache.plan(planner, A, D, DEPART, zone=cache.zone(*A), now=NOW)
+    assert len(planner.calls) == 4
+    stats = cache.snapshot()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 4, 4) and stats["hit_ratio"] == 0.2
+    # past its TTL a plan is made again
+    cache.plan(planner, A, D, DEPART, now=NOW + cache.ttl_s + 1)
+    assert len(planner.calls) == 5 and cache.snapshot()["expired"] == 1
+
+
+def test_realtime_delays_and_alerts_drop_only_plans_through_their_stops(cache, monkeypatch):
+    planner = Planner()
+    cache.plan(planner, A, D, DEPART, now=NOW)
+    cache.plan(planner, X, Y, DEPART, now=NOW)
+
+    # T1 runs 8 minutes late from B: the A - D plan rides it, X - Y does not
+    msg = realtime_service.feed_message_class()()
+    msg.header.gtfs_realtime_version = "2.0"
+    tu = msg.entity.add(id="1").trip_update
+    tu.trip.trip_id, tu.trip.start_date = "T1", "20261019"
+    u = tu.stop_time_update.add(stop_sequence=2)
+    u.departure.delay = 480
+    _publish(monkeypatch, realtime_service.apply_trip_updates, msg)
+
+    cache.plan(planner, X, Y, DEPART, now=NOW)
+    assert len(planner.calls) == 2
+    assert _rides(cache.plan(planner, A, D, DEPART, now=NOW))[-1][-1] == "U2"
+    assert len(planner.calls) == 3
+    assert cache.snapshot()["invalidated"]["realtime"] == 1
+
+    # an elevator outage at Yankee drops the X - Y plan only
+    _publish(monkeypatch, realtime_service.apply_alerts, realtime_service.parse_feed(b"""{
+      "header": {"gtfsRealtimeVersion": "2.0"},
+      "entity": [{"id": "a1", "alert": {"effect": %d, "informedEntity": [{"stopId": "Y"}]}}]}"""
+                                                                                   % realtime_service.ACCESSIBILITY_ISSUE))
+    cache.plan(planner, A, D, DEPART, now=NOW)
+    assert len(planner.calls) == 3
+    cache.plan(planner, X, Y, DEPART, now=NOW)
+    assert len(planner.calls) == 4
+    stats = cache.snapshot()
+    assert stats["invalidated"]["alerts"] == 1 and stats["hits"] == 2
+
+
+def test_carbon_intensity_updates_drop_their_zone_and_a_new_timetable_drops_all(cache, monkeypatch):
+    planner = Planner()
+    zone = cache.zone(*A)
+    fetched = []
+
+    def fetch(value):
+        return lambda: fetched.append(value) or value
+
+    assert cache.intensity(zone, fetch(120.0), now=NOW) == 120.0
+    # within the TTL the intensity is not fetched again
+    assert cache.intensity(zone, fetch(999.0), now=NOW + 60) == 120.0 and fetched == [120.0]
+    cache.plan(planner, A, D, DEPART, carbon_gco2_per_kwh=120.0, zone=zone, now=NOW)
+    cache.plan(planner, X, Y, DEPART, now=NOW)
+
+    # the same value again keeps the plan; a new one drops it
+    cache.intensity(zone, fetch(120.0), now=NOW + plan_cache_service.CARBON_INTENSITY_TTL_S + 1)
+    assert cache.snapshot()["entries"] == 2
+    assert cache.carbon_updated(zone, 80.0, now=NOW + 120) == 1
+    assert cache.snapshot()["entries"] == 1 and cache.snapshot()["invalidated"]["carbon"] == 1
+
+    # a freshly imported timetable invalidates everything
+    monkeypatch.setattr(gtfs_service, "_timetable", gtfs_service.Timetable(gtfs_service._timetable.arrays(),
+                                                                         gtfs_service._timetable.meta))
+    cache.plan(planner, A, D, DEPART, now=NOW)
+    assert cache.snapshot()["invalidated"]["timetable"] == 1
+
+
+def test_a_cached_plan_whose_options_have_left_is_planned_again_for_the_request(cache):
+    planner = Planner()
+    eight = datetime(2026, 10, 19, 8, 0)
+    assert _rides(cache.plan(planner, A, D, eight, now=NOW))[0] == ["T1", "U1"]
+    # a minute later, in the same bucket, T1 has left: T2 is what planning for 08:01 gives
+    later = datetime(2026, 10, 19, 8, 1)
+    fresh = raptor_plan(realtime_service.live_timetable(), A, D, later, multi_criteria=True)
+    assert cache.plan(planner, A, D, later, now=NOW) == fresh and len(planner.calls) == 2
+    assert all(leg["trip_id"] != "T1" for it in fresh for leg in it["legs"] if leg["mode"] != "walk")
+    # the 08:01 plan replaced the bucket's entry: it covers 08:02, not 08:00
+    cache.plan(planner, A, D, datetime(2026, 10, 19, 8, 2), now=NOW)
+    assert len(planner.calls) == 2
+    assert _rides(cache.plan(planner, A, D, eight, now=NOW))[0] == ["T1", "U1"] and len(planner.calls) == 3
+    assert (cache.snapshot()["hits"], cache.snapshot()["misses"]) == (1, 3)
+
+
+def test_the_walk_only_option_leaves_at_the_requested_time(cache):
+    planner = Planner()
+    B = (43.6500, -79.3850)
+    first = cache.plan(planner, A, B, DEPART, now=NOW)
+    assert first[0]["modes"] == ["walk"] and first[0]["departure"].startswith("2026-10-19T07:55:00")
+    # 10 m away, in the same cell: the walk starts at this request's own point
+    here = (A[0] - 0.0001, A[1])
+    again = cache.plan(planner, here, B, datetime(2026, 10, 19, 7, 57), now=NOW)
+    assert len(planner.calls) == 1
+    walk = again[0]
+    assert walk["departure"].startswith("2026-10-19T07:57:00") and walk["legs"][0]["departure"] == walk["departure"]
+    assert (walk["legs"][0]["from"]["lat"], walk["legs"][0]["from"]["lon"]) == here
+    assert first[0]["legs"][0]["from"]["lat"] == A[0]
+    assert datetime.fromisoformat(walk["arrival"]).timestamp() == (
+        datetime.fromisoformat(walk["departure"]).timestamp() + walk["duration_s"])
+    # the cached entry itself is unchanged
+    assert first[0]["departure"].startswith("2026-10-19T07:55:00")
+    assert _rides(again[1:]) == _rides(first[1:])
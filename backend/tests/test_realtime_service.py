@@ -0,0 +1,175 @@
+import zipfile
+from datetime import datetime
+
+try:
+    from backend.services.gtfs_service import NO_TIME, build_timetable
+    from backend.services.raptor_service import plan
+    from backend.services.realtime_service import (
+        ACCESSIBILITY_ISSUE, CANCELED, DIFFERENTIAL, NO_SERVICE, SKIPPED, apply_alerts, apply_trip_updates,
+        feed_message_class, parse_feed,
+    )
+except Exception:
+    from services.gtfs_service import NO_TIME, build_timetable
+    from services.raptor_service import plan
+    from services.realtime_service import (
+        ACCESSIBILITY_ISSUE, CANCELED, DIFFERENTIAL, NO_SERVICE, SKIPPED, apply_alerts, apply_trip_updates,
+        feed_message_class, parse_feed,
+    )
+
+# R1 runs A - B - C (T1 at 08:00, T2 at 08:05); R2 runs C - D (U1 08:15, U2 08:30);
+# R3 is another line on its own pattern that no update touches.
+FEED = {
+    "agency.txt": "agency_id,agency_name,agency_url,agency_timezone\nTTC,Transit,http://example.com,America/Toronto\n",
+    "stops.txt": (
+        "stop_id,stop_name,stop_lat,stop_lon,wheelchair_boarding\n"
+        "A,Alpha,43.6500,-79.4000,1\nB,Beta,43.6500,-79.3850,1\nC,Gamma,43.6500,-79.3700,1\n"
+        "D,Delta,43.6800,-79.3700,1\nX,Xray,43.7000,-79.5000,1\nY,Yankee,43.7100,-79.5000,1\n"
+    ),
+    "routes.txt": "route_id,route_short_name,route_long_name,route_type\nR1,1,King,3\nR2,2,Yonge,3\nR3,3,Other,3\n",
+    "calendar.txt": (
+        "service_id,monday,tuesday,wednesday,thursday,friday,saturday,sunday,start_date,end_date\n"
+        "WK,1,1,1,1,1,0,0,20260101,20261231\n"
+    ),
+    "trips.txt": (
+        "route_id,service_id,trip_id,wheelchair_accessible\n"
+        "R1,WK,T1,1\nR1,WK,T2,1\nR2,WK,U1,1\nR2,WK,U2,1\nR3,WK,X1,1\n"
+    ),
+    "stop_times.txt": (
+        "trip_id,arrival_time,departure_time,stop_id,stop_sequence\n"
+        "T1,08:00:00,08:00:00,A,10\nT1,08:05:00,08:05:00,B,20\nT1,08:10:00,08:10:00,C,30\n"
+        "T2,08:05:00,08:05:00,A,10\nT2,08:10:00,08:10:00,B,20\nT2,08:15:00,08:15:00,C,30\n"
+        "U1,08:15:00,08:15:00,C,1\nU1,08:25:00,08:25:00,D,2\n"
+        "U2,08:30:00,08:30:00,C,1\nU2,08:40:00,08:40:00,D,2\n"
+        "X1,08:00:00,08:00:00,X,1\nX1,08:10:00,08:10:00,Y,2\n"
+    ),
+}
+
+A, D = (43.6500, -79.4000), (43.6800, -79.3700)
+DEPART = datetime(2026, 10, 19, 7, 55)
+NOW = datetime(2026, 10, 19, 7, 50).timestamp()
+
+
+def _timetable(tmp_path):
+    path = tmp_path / "gtfs.zip"
+    with zipfile.ZipFile(path, "w") as z:
+        for name, text in FEED.items():
+            z.writestr(name, text)
+    return build_timetable(path, log=lambda msg: None)
+
+
+def _feed(*updates, incrementality=0):
+    msg = feed_message_class()()
+    msg.header.gtfs_realtime_version = "2.0"
+    msg.header.incrementality = incrementality
+    for i, (trip_id, stops, rel) in enumerate(updates):
+        tu = msg.entity.add(id=str(i)).trip_update
+        tu.trip.trip_id, tu.trip.start_date, tu.trip.schedule_relationship = trip_id, "20261019", rel
+        for key, delay, stop_rel in stops:
+            u = tu.stop_time_update.add(schedule_relationship=stop_rel)
+            if isinstance(key, int):
+                u.stop_sequence = key
+            else:
+                u.stop_id = key
+            if delay is not None:
+                u.departure.delay = delay
+    return msg
+
+
+def _rides(its):
+    return [[leg["trip_id"] for leg in it["legs"] if leg["mode"] != "walk"] for it in its]
+
+
+def test_delays_propagate_and_routing_sees_them(tmp_path):
+    tt = _timetable(tmp_path)
+    assert _rides(plan(tt, A, D, DEPART)) == [["T1", "U1"]]
+
+    # T1 runs 8 minutes late from B (stop_sequence 20) on, so it misses U1 at C
+    live = apply_trip_updates(tt, _feed(("T1", [(20, 480, 0)], 0)), now=NOW)
+    t1 = tt.index_of("trip_id")["T1"]
+    p = int(tt.trip_pattern[t1])
+    arr, dep, ordered = live.patched(DEPART.date())[p]
+    nt = int(tt.pattern_trip_ptr[p + 1] - tt.pattern_trip_ptr[p])
+    local = t1 - int(tt.pattern_trip_ptr[p])
+    assert [dep[j * nt + local] - tt.departure[tt.pattern_time_ptr[p] + j * nt + local] for j in range(3)] == [0, 480, 480]
+    # T1 now leaves B after T2, so the block is no longer in departure order
+    assert ordered is not None and list(live.patched(DEPART.date())) == [p]
+
+    its = plan(live, A, D, DEPART)
+    assert _rides(its)[0][-1] == "U2"
+    assert its[0]["arrival"] == "2026-10-19T08:40:00-04:00"
+    # the static timetable and other days are untouched
+    assert _rides(plan(tt, A, D, DEPART)) == [["T1", "U1"]]
+    assert _rides(plan(live, A, D, datetime(2026, 10, 20, 7, 55))) == [["T1", "U1"]]
+
+
+def test_multi_criteria_compares_real_arrivals_on_an_out_of_order_block(tmp_path, monkeypatch):
+    # R1 as a subway on a zero-carbon grid, so boarding further along costs no CO2 to tell options apart
+    monkeypatch.setitem(FEED, "routes.txt", FEED["routes.txt"].replace("R1,1,King,3", "R1,1,King,1"))
+    tt = _timetable(tmp_path)
+    # T1 leaves A at 08:00 but now reaches B at 08:13 and C at 08:18, behind T2 (B 08:10, C 08:15)
+    live = apply_trip_updates(tt, _feed(("T1", [(20, 480, 0)], 0)), now=NOW)
+    near_a, c = (43.6500, -79.3994), (43.6500, -79.3700)
+    its = plan(live, near_a, c, datetime(2026, 10, 19, 7, 45), multi_criteria=True, max_walk_m=1500,
+               carbon_gco2_per_kwh=0.0)
+    # boarding T1 at A walks least; walking on to B for T2 arrives first, and must not be pruned
+    # just because T1 has the lower trip index
+    arrivals = {tuple(_rides([i])[0]): i["arrival"] for i in its}
+    assert arrivals[("T1",)] == "2026-10-19T08:18:00-04:00"
+    assert arrivals[("T2",)] == "2026-10-19T08:15:00-04:00"
+
+
+def test_legs_on_a_delayed_pattern_read_its_own_patched_times(tmp_path):
+    tt = _timetable(tmp_path)
+    u1 = tt.index_of("trip_id")["U1"]
+    assert int(tt.pattern_time_ptr[int(tt.trip_pattern[u1])]) != 0
+    # U1 leaves C two minutes late and keeps the delay to D
+    live = apply_trip_updates(tt, _feed(("U1", [(1, 120, 0)], 0)), now=NOW)
+    for its in (plan(live, A, D, DEPART), plan(live, A, D, DEPART, multi_criteria=True)):
+        it = next(i for i in its if _rides([i])[0] == ["T1", "U1"])
+        ride = [leg for leg in it["legs"] if leg["mode"] != "walk"][-1]
+        assert (ride["departure"], ride["arrival"]) == ("2026-10-19T08:17:00-04:00", "2026-10-19T08:27:00-04:00")
+        assert ride["delay_s"] == 120 and it["arrival"] == "2026-10-19T08:27:00-04:00"
+
+
+def test_cancellations_skips_and_incremental_updates(tmp_path):
+    tt = _timetable(tmp_path)
+    day = DEPART.date()
+    live = apply_trip_updates(tt, _feed(("U1", [], CANCELED), ("T2", [("B", None, SKIPPED)], 0)), now=NOW)
+    assert live.stats["trips_cancelled"] == 1 and live.stats["trips_changed"] == 2
+    assert _rides(plan(live, A, D, DEPART)) == [["T1", "U2"]]
+    t2 = tt.index_of("trip_id")["T2"]
+    p = int(tt.trip_pattern[t2])
+    assert NO_TIME in list(live.patched(day)[p][1])
+
+    # the same feed again changes nothing and keeps every block
+    again = apply_trip_updates(live, _feed(("U1", [], CANCELED), ("T2", [("B", None, SKIPPED)], 0)), now=NOW)
+    assert again.stats["trips_changed"] == 0 and again.patched(day)[p] is live.patched(day)[p]
+    # a differential update adds to what is there; a full dataset drops what it no longer mentions
+    diff = apply_trip_updates(again, _feed(("T1", [("A", 60, 0)], 0), incrementality=DIFFERENTIAL), now=NOW)
+    assert diff.stats["trips_changed"] == 1 and diff.stats["trips_cancelled"] == 1
+    full = apply_trip_updates(diff, _feed(("T1", [("A", 60, 0)], 0)), now=NOW)
+    assert full.stats["trips_cancelled"] == 0 and NO_TIME not in list(full.patched(day)[p][1])
+    assert _rides(plan(full, A, D, DEPART)) == [["T1", "U1"]]
+    # the earlier snapshot is still what it was
+    assert _rides(plan(live, A, D, DEPART)) == [["T1", "U2"]]
+
+
+def test_alerts_cancel_routes_and_close_stops_and_json_feeds_parse(tmp_path):
+    tt = _timetable(tmp_path)
+    feed = parse_feed(b"""{
+      "header": {"gtfsRealtimeVersion": "2.0", "timestamp": "1792400000"},
+      "entity": [
+        {"id": "a1", "alert": {"effect": %d, "informedEntity": [{"routeId": "R2"}],
+          "headerText": {"translation": [{"text": "Yonge closed", "language": "en"}]}}},
+        {"id": "a2", "alert": {"effect": %d, "informedEntity": [{"stopId": "C"}],
+          "headerText": {"translation": [{"text": "Elevator out at Gamma"}]}}}
+      ]}""" % (NO_SERVICE, ACCESSIBILITY_ISSUE))
+    live = apply_alerts(tt, feed, now=NOW)
+    assert [a["header"] for a in live.alerts_for(stop_id="C")] == ["Elevator out at Gamma"]
+    assert [a["id"] for a in live.alerts_for(route_id="R2")] == ["a1"]
+    # Yonge is out today, so nothing reaches D; Gamma is no longer step-free
+    assert plan(live, A, D, DEPART) == []
+    assert live.stop(tt.index_of("stop_id")["C"])["wheelchair_boarding"] == 2
+    assert tt.stop(tt.index_of("stop_id")["C"])["wheelchair_boarding"] == 1
+    # trip updates applied afterwards keep the alerts
+    assert apply_trip_updates(live, _feed(("T1", [("A", 60, 0)], 0)), now=NOW).alerts_for(route_id="R2")
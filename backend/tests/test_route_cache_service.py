@@ -0,0 +1,44 @@
+import json
+import zlib
+
+try:
+    from backend.services.route_cache_service import RouteCache, snap
+except Exception:
+    from route_cache_service import RouteCache, snap
+
+
+def _resp(n=50):
+    coords = [[-79.38 + i * 1e-4, 43.64 + i * 1e-4] for i in range(n)]
+    return {"code": "Ok", "routes": [{"distance": 1200.0, "duration": 900.0, "geometry": {"type": "LineString", "coordinates": coords}}]}
+
+
+def test_nearby_points_share_a_key_and_far_points_do_not():
+    cache = RouteCache(grid_m=50)
+    # centre of the origin's cell, then a point 5 m north of it
+    row, _ = snap(43.6452, -79.3806, 50)
+    lat = (row + 0.5) * 50 / 111_320
+    k1 = cache.key(lat, -79.3806, 43.6426, -79.3871, "foot")
+    k2 = cache.key(lat + 5 / 111_320, -79.3806, 43.6426, -79.3871, "foot")
+    assert k1 == k2
+    assert cache.key(lat + 200 / 111_320, -79.3806, 43.6426, -79.3871, "foot") != k1
+    assert cache.key(lat, -79.3806, 43.6426, -79.3871, "cycling") != k1
+
+
+def test_round_trip_compression_and_lru_bounds():
+    cache = RouteCache(grid_m=25, max_entries=2)
+    keys = [cache.key(43.6 + i * 0.01, -79.4, 43.7, -79.3, "foot") for i in range(3)]
+    for k in keys:
+        cache.put(k, _resp())
+    assert cache.get(keys[0]) is None
+    assert cache.get(keys[2]) == _resp()
+    snap_ = cache.snapshot()
+    assert snap_["entries"] == 2 and snap_["evictions"] == 1
+    assert snap_["compressed_bytes"] < snap_["raw_bytes_stored"]
+
+
+def test_byte_budget_evicts_oldest():
+    one = len(zlib.compress(json.dumps(_resp(500)).encode()))
+    cache = RouteCache(max_entries=100, max_bytes=int(one * 2.5))
+    for i in range(4):
+        cache.put(cache.key(43.6 + i * 0.01, -79.4, 43.7, -79.3, "foot"), _resp(500))
+    assert cache.snapshot()["entries"] == 2
@@ -0,0 +1,101 @@
+import math
+import random
+
+import pytest
+
+try:
+    from backend.services.route_geometry_service import (
+        encode_polyline, decode_polyline, simplify, zoom_tolerance_m, compact_route, trim_step,
+    )
+except Exception:
+    from route_geometry_service import (
+        encode_polyline, decode_polyline, simplify, zoom_tolerance_m, compact_route, trim_step,
+    )
+
+
+def _wiggly(n, seed=3):
+    rng = random.Random(seed)
+    lat, lon, h = 43.6452, -79.3806, 0.0
+    out = []
+    for _ in range(n):
+        h += rng.gauss(0, 0.1)
+        lat += math.cos(h) * 2 / 111_320
+        lon += math.sin(h) * 2 / 80_500
+        out.append([round(lon, 6), round(lat, 6)])
+    return out
+
+
+def test_polyline_matches_reference_encoding_and_round_trips():
+    # the reference example from Google's encoded polyline docs (precision 5)
+    coords = [[-120.2, 38.5], [-120.95, 40.7], [-126.453, 43.252]]
+    assert encode_polyline(coords, 5) == "_p~iF~ps|U_ulLnnqC_mqNvxq`@"
+    decoded = decode_polyline("_p~iF~ps|U_ulLnnqC_mqNvxq`@", 5)
+    assert [v for p in decoded for v in p] == pytest.approx([v for p in coords for v in p])
+
+    path = _wiggly(2000) + [[179.999999, -89.5], [-180.0, 89.5]]
+    decoded = decode_polyline(encode_polyline(path, 6), 6)
+    assert len(decoded) == len(path)
+    assert max(abs(a - b) for p, q in zip(path, decoded) for a, b in zip(p, q)) < 1e-9
+    assert encode_polyline([]) == ""
+
+
+def test_simplify_stays_within_tolerance_and_keeps_ends():
+    path = _wiggly(3000)
+    tol = 5.0
+    out = simplify(path, tol)
+    assert out[0] == path[0] and out[-1] == path[-1]
+    assert 2 < len(out) < len(path) / 4
+
+    # every dropped point is within tol of the simplified line segment covering it
+    kx, ky = 80_500.0, 111_320.0
+    kept_idx = [path.index(p) for p in out]
+    for a, b in zip(kept_idx, kept_idx[1:]):
+        ax, ay = path[a][0] * kx, path[a][1] * ky
+        bx, by = path[b][0] * kx, path[b][1] * ky
+        for p in path[a + 1:b]:
+            px, py = p[0] * kx, p[1] * ky
+            sx, sy = bx - ax, by - ay
+            t = max(0.0, min(1.0, ((px - ax) * sx + (py - ay) * sy) / (sx * sx + sy * sy)))
+            assert math.hypot(px - ax - t * sx, py - ay - t * sy) <= tol * 1.01
+
+
+def test_simplify_collapses_straight_line_and_keeps_spikes():
+    line = [[-79.0 + i * 1e-5, 43.0] for i in range(100)]
+    assert simplify(line, 1.0) == [line[0], line[-1]]
+    spike = line[:50] + [[line[50][0], 43.001]] + line[51:]
+    assert [line[50][0], 43.001] in simplify(spike, 1.0)
+
+
+def test_zoom_tolerance_halves_per_zoom_level():
+    assert zoom_tolerance_m(15, 43.6) == pytest.approx(zoom_tolerance_m(14, 43.6) / 2)
+    assert zoom_tolerance_m(0, 0) == pytest.approx(156_543.03, rel=1e-6)
+
+
+def test_compact_route_trims_steps_and_encodes():
+    coords = _wiggly(500)
+    step = {
+        "distance": 12.3, "duration": 9.0, "weight": 9.0, "name": "King St", "mode": "walking",
+        "geometry": {"type": "LineString", "coordinates": coords[:10]},
+        "intersections": [{"location": coords[0], "bearings": [0, 90]}],
+        "maneuver": {"type": "turn", "modifier": "left", "location": coords[0], "bearing_after": 90},
+    }
+    route = {
+        "distance": 1000.0, "duration": 700.0,
+        "geometry": {"type": "LineString", "coordinates": coords},
+        "legs": [{"distance": 1000.0, "duration": 700.0, "summary": "King St", "steps": [step]}],
+    }
+    assert trim_step(step) == {
+        "distance": 12.3, "duration": 9.0, "name": "King St", "mode": "walking",
+        "maneuver": {"type": "turn", "modifier": "left", "location": coords[0]},
+    }
+
+    full = compact_route(route)
+    assert full["geometry"]["coordinates"] == coords and full["points"] == 500
+
+    small = compact_route(route, "polyline6", zoom=14)
+    assert isinstance(small["geometry"], str)
+    assert small["points_full"] == 500 and small["points"] < 100
+    assert decode_polyline(small["geometry"])[0] == pytest.approx(coords[0])
+
+    with pytest.raises(ValueError):
+        compact_route(route, "wkb")
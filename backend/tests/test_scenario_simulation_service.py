@@ -0,0 +1,47 @@
+import pytest
+
+try:
+    from backend.services.scenario_simulation_service import ScenarioSimulator, ScenarioConfig, ModeShift
+except Exception:
+    from services.scenario_simulation_service import ScenarioSimulator, ScenarioConfig, ModeShift
+
+
+def test_no_shift_saves_nothing_and_is_reproducible():
+    sim = ScenarioSimulator(max_workers=1)
+    a = sim.run(ScenarioConfig(n_trips=20_000, n_runs=3, seed=42))
+    b = sim.run(ScenarioConfig(n_trips=20_000, n_runs=3, seed=42))
+    assert a["co2_saved_kg"]["mean"] == 0.0
+    assert a["baseline_kg"] == b["baseline_kg"]
+
+
+def test_car_to_electric_night_shift_saves_co2_only_in_window():
+    sim = ScenarioSimulator(max_workers=1)
+    night = list(range(0, 6))
+    cfg = ScenarioConfig(
+        n_trips=50_000, n_runs=4, seed=1,
+        shifts=[ModeShift("car", "electric", fraction=1.0, max_distance_km=5.0, hours=night)],
+    )
+    out = sim.run(cfg)
+    assert out["co2_saved_kg"]["p5"] > 0
+    assert out["scenario_kg"]["mean"] < out["baseline_kg"]["mean"]
+
+    # a window with no departures shifts nothing
+    cfg.departure_weights = [0.0] * 6 + [1.0] * 18
+    assert sim.run(cfg)["trips_shifted"]["mean"] == 0
+
+
+def test_invalid_mode_rejected():
+    with pytest.raises(ValueError):
+        ScenarioSimulator(max_workers=1).run(ScenarioConfig(n_trips=10, n_runs=1, mode_shares={"hoverboard": 1.0}))
+
+
+@pytest.mark.parametrize("cfg", [
+    ScenarioConfig(n_trips=10, n_runs=1, shifts=[ModeShift(hours=[300])]),
+    ScenarioConfig(n_trips=10, n_runs=1, shifts=[ModeShift(hours=[24])]),
+    ScenarioConfig(n_trips=10, n_runs=1, shifts=[ModeShift(hours=[-1])]),
+    ScenarioConfig(n_trips=10, n_runs=1, mode_shares={"car": 1.0, "bus": -0.5}),
+    ScenarioConfig(n_trips=10, n_runs=1, departure_weights=[-1.0] + [1.0] * 23),
+])
+def test_out_of_range_hours_and_negative_weights_rejected(cfg):
+    with pytest.raises(ValueError):
+        ScenarioSimulator(max_workers=1).run(cfg)
@@ -0,0 +1,68 @@
+import os
+
+import numpy as np
+
+try:
+    from backend.services import stop_index_service as sis
+    from backend.services.stop_index_service import StopIndex, read_stops, WHEELCHAIR, ELEVATOR, BUS, SUBWAY
+except Exception:
+    from services import stop_index_service as sis
+    from services.stop_index_service import StopIndex, read_stops, WHEELCHAIR, ELEVATOR, BUS, SUBWAY
+
+
+def test_knn_with_filters_matches_brute_force():
+    rng = np.random.default_rng(7)
+    n = 3000
+    lat = 43.6 + rng.random(n) * 0.2
+    lon = -79.5 + rng.random(n) * 0.3
+    bits = (np.where(rng.random(n) < 0.3, WHEELCHAIR, 0) | np.where(rng.random(n) < 0.1, ELEVATOR, 0)
+            | np.where(rng.random(n) < 0.8, BUS, SUBWAY))
+    index = StopIndex([{"id": i, "lat": a, "lon": b, "bits": int(c)} for i, (a, b, c) in enumerate(zip(lat, lon, bits))])
+
+    for _ in range(60):
+        qlat, qlon = 43.55 + rng.random() * 0.3, -79.55 + rng.random() * 0.4
+        for require, modes in [(0, 0), (WHEELCHAIR, 0), (WHEELCHAIR | ELEVATOR, SUBWAY)]:
+            got = [s["stop_id"] for s in index.nearest(qlat, qlon, 4, require=require, modes=modes)]
+            ok = ((bits & require) == require) & (((bits & modes) != 0) if modes else True)
+            cand = np.flatnonzero(ok)
+            d = ((lon[cand] - qlon) * index._kx) ** 2 + ((lat[cand] - qlat) * 111_320) ** 2
+            assert got == [str(c) for c in cand[np.argsort(d)[:4]]]
+
+    near = index.nearest(43.7, -79.35, 50, max_distance_m=300)
+    assert near and all(s["distance_m"] <= 300 for s in near)
+    assert [s["distance_m"] for s in near] == sorted(s["distance_m"] for s in near)
+
+
+def test_gtfs_stops_inherit_station_wheelchair_boarding(tmp_path):
+    path = tmp_path / "stops.txt"
+    path.write_text(
+        "stop_id,stop_name,stop_lat,stop_lon,location_type,parent_station,wheelchair_boarding,elevator,modes\n"
+        "STN,Union,43.6452,-79.3806,1,,1,,\n"
+        "P1,Union Platform 1,43.6451,-79.3805,0,STN,0,1,subway\n"
+        "P2,Union Platform 2,43.6453,-79.3807,0,STN,2,,subway\n"
+        "B1,King St,43.6490,-79.3840,0,,,,bus\n"
+    )
+    stops = {s["id"]: s["bits"] for s in read_stops(path)}
+    assert set(stops) == {"P1", "P2", "B1"}
+    assert stops["P1"] == WHEELCHAIR | ELEVATOR | SUBWAY
+    assert stops["P2"] == SUBWAY
+    assert stops["B1"] == BUS
+
+
+def test_index_is_rebuilt_and_swapped_when_stop_file_changes(tmp_path, monkeypatch):
+    path = tmp_path / "stops.txt"
+    path.write_text("stop_id,stop_name,stop_lat,stop_lon,wheelchair_boarding\nA,Alpha,43.65,-79.38,1\n")
+    monkeypatch.setattr(sis, "STOPS_PATH", path)
+    monkeypatch.setattr(sis, "STOPS_CHECK_S", 0.0)
+    monkeypatch.setattr(sis, "_index", None)
+
+    first = sis.get_stop_index()
+    assert [s["stop_id"] for s in first.nearest(43.65, -79.38, 5)] == ["A"]
+
+    path.write_text("stop_id,stop_name,stop_lat,stop_lon,wheelchair_boarding\nA,Alpha,43.65,-79.38,1\nB,Beta,43.651,-79.38,1\n")
+    os.utime(path, (1, 1))
+    second = sis.get_stop_index()
+    assert second is not first and second.version == first.version + 1
+    assert len(second) == 2
+    # a reader holding the old index still sees a complete, consistent snapshot
+    assert len(first) == 1
@@ -0,0 +1,103 @@
+import zipfile
+
+import numpy as np
+import pytest
+
+try:
+    from backend.services import transfer_service
+    from backend.services.gtfs_service import build_timetable
+    from backend.services.raptor_service import _step_free
+    from backend.services.transfer_service import NO_PATH, STEEP, build_transfers, load_transfers, save_transfers
+    from backend.services.walking_graph_service import STEPS, WalkingGraph
+except Exception:
+    from services import transfer_service
+    from services.gtfs_service import build_timetable
+    from services.raptor_service import _step_free
+    from services.transfer_service import NO_PATH, STEEP, build_transfers, load_transfers, save_transfers
+    from services.walking_graph_service import STEPS, WalkingGraph
+
+# A and B are 80 m apart by stairs, or 137 m round a 6% ramp; C is 80 m east of B up
+# a 10% street. D is nowhere near the walking network.
+STOPS = {"A": (43.6500, -79.4000), "B": (43.6500, -79.3990), "C": (43.6500, -79.3980), "D": (43.7000, -79.4000)}
+FEED = {
+    "agency.txt": "agency_id,agency_name,agency_url,agency_timezone\nTTC,Transit,http://example.com,America/Toronto\n",
+    "stops.txt": "stop_id,stop_name,stop_lat,stop_lon,wheelchair_boarding\n" + "".join(
+        f"{s},{s},{lat},{lon},1\n" for s, (lat, lon) in STOPS.items()),
+    "routes.txt": "route_id,route_short_name,route_long_name,route_type\nR1,1,King,3\n",
+    "calendar.txt": (
+        "service_id,monday,tuesday,wednesday,thursday,friday,saturday,sunday,start_date,end_date\n"
+        "WK,1,1,1,1,1,0,0,20260101,20261231\n"
+    ),
+    "trips.txt": "route_id,service_id,trip_id\nR1,WK,T1\n",
+    "stop_times.txt": (
+        "trip_id,arrival_time,departure_time,stop_id,stop_sequence\n"
+        "T1,08:00:00,08:00:00,A,1\nT1,08:05:00,08:05:00,D,2\n"
+    ),
+}
+
+
+def _graph():
+    lat = np.array([43.6500, 43.6500, 43.6505, 43.6500])
+    lon = np.array([-79.4000, -79.3990, -79.3995, -79.3980])
+    u, v = np.array([0, 0, 2, 1]), np.array([1, 2, 1, 3])
+    return WalkingGraph.from_edges(lat, lon, u, v, flags=np.array([STEPS, 0, 0, 0]),
+                                   grade=np.array([0.0, 0.06, -0.06, 0.1]))
+
+
+def _build(graph, **kwargs):
+    lat, lon = (np.array([p[k] for p in STOPS.values()]) for k in (0, 1))
+    return build_transfers(list(STOPS), lat, lon, 250.0, 1.2, graph=graph, log=lambda msg: None, **kwargs)
+
+
+def _row(table, a, b):
+    ids = table.index_of()
+    return next(t for t in table.transfers(ids[a]) if t["to_stop_id"] == b)
+
+
+def test_walks_follow_the_graph_with_step_free_times_and_slopes():
+    table = _build(_graph(), workers=1)
+    ab = _row(table, "A", "B")
+    assert ab["distance_m"] == pytest.approx(80.5, abs=1)
+    assert ab["walk_s"] == 68 and ab["step_free"] and ab["step_free_s"] == pytest.approx(115, abs=2)
+    assert ab["slope"] == "moderate"
+    # the step-free way to C is round the ramp then up the 10% street
+    ac = _row(table, "A", "C")
+    assert ac["walk_s"] == pytest.approx(161 / 1.2, abs=2) and ac["slope"] == "steep"
+    # D is off the network and gets nothing here
+    assert not table.snapped()[table.index_of()["D"]]
+    assert table.transfers(table.index_of()["D"]) == []
+
+    blocked = _graph()
+    blocked.flags[1] = STEPS
+    row = _row(_build(blocked, workers=1), "A", "B")
+    assert not row["step_free"] and row["step_free_s"] is None
+
+
+def test_process_pool_matches_in_process_and_round_trips(tmp_path, monkeypatch):
+    serial = _build(_graph(), workers=1)
+    monkeypatch.setattr(transfer_service, "MIN_POOL_STOPS", 0)
+    monkeypatch.setattr(transfer_service, "CHUNK_STOPS", 1)
+    pooled = _build(_graph(), workers=2)
+    for name, a in serial.arrays().items():
+        assert np.array_equal(a, pooled.arrays()[name], equal_nan=a.dtype.kind == "f"), name
+
+    save_transfers(pooled, tmp_path / "transfers.bin")
+    loaded = load_transfers(tmp_path / "transfers.bin")
+    assert isinstance(loaded.walk_s, np.memmap) and loaded.stop_ids() == list(STOPS)
+    assert _row(loaded, "B", "C")["slope"] == "steep" and int(loaded.slope_class.max()) == STEEP
+    assert (np.asarray(loaded.step_free_s) != NO_PATH).all()
+
+
+def test_timetable_gets_a_fast_and_a_step_free_transfer(tmp_path):
+    path = tmp_path / "gtfs.zip"
+    with zipfile.ZipFile(path, "w") as z:
+        for name, text in FEED.items():
+            z.writestr(name, text)
+    tt = build_timetable(path, log=lambda msg: None, walks=_build(_graph(), workers=1))
+    assert tt.meta["walking_transfers"]
+    a, b = tt.index_of("stop_id")["A"], tt.index_of("stop_id")["B"]
+    lo, hi = int(tt.transfer_ptr[a]), int(tt.transfer_ptr[a + 1])
+    to_b = sorted((int(s), int(f)) for t, s, f in zip(tt.transfer_to[lo:hi], tt.transfer_s[lo:hi], tt.transfer_step_free[lo:hi])
+                  if t == b)
+    assert to_b[0] == (68, 0) and to_b[1][1] == 1
+    assert not _step_free(tt, a, b, 68) and _step_free(tt, a, b, to_b[1][0])
@@ -0,0 +1,38 @@
+import csv
+import io
+import json
+
+from services import trip_ledger_service as ledger
+
+
+def _use_tmp_db(tmp_path, monkeypatch):
+    monkeypatch.setattr(ledger, "DB_DIR", tmp_path)
+    monkeypatch.setattr(ledger, "DB_PATH", tmp_path / "trip_ledger.db")
+    ledger.init_db()
+
+
+def test_iter_trips_pages_through_whole_ledger(tmp_path, monkeypatch):
+    _use_tmp_db(tmp_path, monkeypatch)
+    for i in range(25):
+        ledger.insert_trip("u1" if i % 2 else "u2", "Toronto", "2026-01-01", "bus", 5.0, 0.41, 41)
+    ledger.insert_trip("u1", "Vancouver", "2026-01-02", "bike", 3.0, 0.51, 51)
+
+    u1 = list(ledger.iter_trips(user_id="u1", page_size=4))
+    assert len(u1) == 13
+    assert [r["id"] for r in u1] == sorted(r["id"] for r in u1)
+
+    toronto = list(ledger.iter_trips(city=" TORONTO", page_size=7))
+    assert len(toronto) == 25
+
+
+def test_csv_and_ndjson_streams_round_trip(tmp_path, monkeypatch):
+    _use_tmp_db(tmp_path, monkeypatch)
+    ledger.insert_trip("u1", "Toronto", "2026-01-22", "Bus", 5.0, 1.3, 130, destination="Meskel Square")
+
+    text = "".join(ledger.stream_csv(ledger.iter_trips(user_id="u1")))
+    rows = list(csv.DictReader(io.StringIO(text)))
+    assert rows[0]["destination"] == "Meskel Square"
+    assert float(rows[0]["co2_saved"]) == 1.3
+
+    lines = "".join(ledger.stream_ndjson(ledger.iter_trips(user_id="u1"))).splitlines()
+    assert json.loads(lines[0])["transport"] == "Bus"
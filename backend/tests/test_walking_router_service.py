@@ -0,0 +1,127 @@
+import random
+
+import numpy as np
+import pytest
+
+try:
+    from backend.services.walking_graph_service import WalkingGraph, save_graph, load_graph, STEPS
+    from backend.services.walking_router_service import (
+        WalkingRouter, WEIGHTINGS, astar, hierarchy_path, resolve_weighting,
+    )
+except Exception:
+    from services.walking_graph_service import WalkingGraph, save_graph, load_graph, STEPS
+    from services.walking_router_service import WalkingRouter, WEIGHTINGS, astar, hierarchy_path, resolve_weighting
+
+M_LAT = 1 / 111_320
+
+
+def _grid(n, spacing_m=60.0, seed=1):
+    rng = np.random.default_rng(seed)
+    ii, jj = np.meshgrid(np.arange(n), np.arange(n), indexing="ij")
+    lat = 43.64 + ii.ravel() * spacing_m * M_LAT + rng.normal(0, 3e-5, n * n)
+    lon = -79.39 + jj.ravel() * spacing_m / 80_500 + rng.normal(0, 3e-5, n * n)
+    idx = np.arange(n * n).reshape(n, n)
+    u = np.concatenate([idx[:, :-1].ravel(), idx[:-1, :].ravel()])
+    v = np.concatenate([idx[:, 1:].ravel(), idx[1:, :].ravel()])
+    keep = rng.random(len(u)) > 0.1
+    u, v = u[keep], v[keep]
+    flags = np.where(rng.random(len(u)) < 0.05, STEPS, 0)
+    grade = rng.normal(0, 0.03, len(u))
+    return WalkingGraph.from_edges(lat, lon, u, v, flags=flags, grade=grade)
+
+
+def _stairs_graph():
+    # 0 -- stairs (50 m) -- 1, or 0 - 2 - 3 - 1 around the block (~150 m step-free)
+    lat = np.array([43.0, 43.0, 43.0 + 50 * M_LAT, 43.0 + 50 * M_LAT])
+    lon = np.array([-79.0, -79.0 + 50 / 81_400, -79.0, -79.0 + 50 / 81_400])
+    u = np.array([0, 0, 2, 3])
+    v = np.array([1, 2, 3, 1])
+    flags = np.array([STEPS, 0, 0, 0])
+    grade = np.array([0.0, 0.02, 0.0, -0.1])  # 3 -> 1 climbs 10% when walked 1 -> 3
+    return WalkingGraph.from_edges(lat, lon, u, v, flags=flags, grade=grade)
+
+
+def test_graph_file_round_trips_through_mmap(tmp_path):
+    g = _grid(12)
+    path = save_graph(g, tmp_path / "walk.bin")
+    loaded = load_graph(path)
+    assert isinstance(loaded.targets, np.memmap)
+    for name, arr in g.arrays().items():
+        assert np.array_equal(np.asarray(getattr(loaded, name)), arr)
+    assert loaded.nearest_node(float(g.lat[17]), float(g.lon[17]))[0] == 17
+
+
+def test_nearest_node_matches_brute_force():
+    g = _grid(30)
+    rng = random.Random(4)
+    for _ in range(50):
+        lat = 43.64 + rng.uniform(0, 30 * 60) * M_LAT
+        lon = -79.39 + rng.uniform(0, 30 * 60) / 80_500
+        node, d = g.nearest_node(lat, lon, max_distance_m=1000)
+        brute = np.hypot(g.x - lon * g._kx, g.y - lat * 111_320)
+        assert node == int(np.argmin(brute)) and d == pytest.approx(brute.min())
+    assert g.nearest_node(44.5, -79.39) is None
+
+
+def test_weightings_change_the_route():
+    router = WalkingRouter(_stairs_graph())
+    short = router.route(43.0, -79.0, 43.0, -79.0 + 50 / 81_400, WEIGHTINGS["shortest"])
+    assert short["features"] == {"steps": 1} and short["distance"] == pytest.approx(50, abs=1)
+
+    step_free = router.route(43.0, -79.0, 43.0, -79.0 + 50 / 81_400, WEIGHTINGS["step_free"])
+    assert "steps" not in step_free["features"]
+    assert step_free["distance"] == pytest.approx(150, abs=2)
+    assert step_free["max_grade"] == pytest.approx(0.1)
+
+    with pytest.raises(ValueError):
+        router.route(43.0, -79.0, 43.0, -79.0 + 50 / 81_400, resolve_weighting("step_free", max_grade=0.06))
+
+
+def test_contraction_hierarchy_matches_astar():
+    g = _grid(25)
+    router = WalkingRouter(g)
+    w = WEIGHTINGS["wheelchair"]
+    ch = router.prepare(w)
+    costs = router.costs(w)
+    rng = random.Random(0)
+    for _ in range(60):
+        s, t = rng.randrange(g.n_nodes), rng.randrange(g.n_nodes)
+        a = astar(g, costs, s, t, router._x, router._y)
+        c = ch.query(s, t)
+        assert (a is None) == (c is None)
+        if a is None:
+            continue
+        assert c[0] == pytest.approx(a[0])
+        # unpacked shortcuts are a connected chain of real edges from s to t
+        src = g.sources()
+        node = s
+        for e in c[1]:
+            assert src[e] == node
+            node = int(g.targets[e])
+        assert node == t
+        assert costs[c[1]].sum() == pytest.approx(c[0])
+
+    out = router.route(float(g.lat[0]), float(g.lon[0]), float(g.lat[-1]), float(g.lon[-1]), w)
+    assert out["algorithm"] == "ch"
+
+
+def test_contraction_hierarchy_is_saved_next_to_the_graph_and_memory_mapped(tmp_path):
+    g = _grid(12)
+    graph_path = save_graph(g, tmp_path / "walking_graph.bin")
+    w = WEIGHTINGS["step_free"]
+    path = hierarchy_path(graph_path, w.name)
+    assert path == tmp_path / "walking_graph.ch-step_free.bin"
+    built = WalkingRouter(load_graph(graph_path)).prepare(w, path=path)
+    assert path.exists()
+
+    loaded = WalkingRouter(load_graph(graph_path)).prepare(w, path=path)
+    assert isinstance(loaded.up_to, np.memmap)
+    rng = random.Random(1)
+    for _ in range(20):
+        s, t = rng.randrange(g.n_nodes), rng.randrange(g.n_nodes)
+        assert loaded.query(s, t) == built.query(s, t)
+
+    # a hierarchy saved for another weighting is not used; it is rebuilt and replaced
+    WalkingRouter(load_graph(graph_path)).prepare(WEIGHTINGS["shortest"], path=path)
+    again = WalkingRouter(load_graph(graph_path)).prepare(w, path=path)
+    assert not isinstance(again.up_to, np.memmap) and again.meta["weighting"]["name"] == "step_free"
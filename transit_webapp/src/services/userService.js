@@ -31,7 +31,14 @@ export const userService = {
           }
         ],
         sustainability_streak_days: 7,
-        ranking: "Silver Tier"
+        ranking: {
+          user_id: userId,
+          city: "toronto",
+          metric: "points",
+          rank: 12,
+          score: 4730,
+          total_users: 120
+        }
       };
     }
   },